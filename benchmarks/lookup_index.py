@@ -0,0 +1,86 @@
+"""
+Benchmark the first-level index of the BIN lookup engine.
+
+The benchmark opens a BIN database with and without the first-level index and reports the time it takes to open it
+(which includes building the jump table when the file has no index of its own) and the number of lookups per second
+for a fixed set of random addresses.
+
+Usage:
+    python benchmarks/lookup_index.py [BIN_FILE] [--rows ROWS] [--lookups LOOKUPS]
+
+When no BIN file is given, a synthetic DB1 database with ROWS IPv4 ranges (and no index) is written to a temporary
+directory and benchmarked instead.
+"""
+import argparse, os, random, struct, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ip2location_toolkit.reader.database import BINDatabase
+
+
+def write_synthetic_db(path, rows, seed=0):
+    """
+    Write a DB1 BIN database with `rows` random IPv4 ranges and no index.
+    """
+    generator = random.Random(seed)
+    ip_froms = sorted(generator.sample(range(1, 2 ** 32 - 1), rows - 1))
+    ipv4_base = 64
+    strings_base = ipv4_base + (rows + 1) * 8
+    countries = [b'\x02US\x18United States of America', b'\x02DE\x07Germany', b'\x02JP\x05Japan']
+    pointers = []
+    offset = strings_base
+    for country in countries:
+        pointers.append(offset)
+        offset += len(country)
+    header = struct.pack('<5B6IB', 1, 2, 23, 9, 1, rows + 1, ipv4_base + 1, 0, 0, 0, 0, 1)
+    with open(path, 'wb') as file:
+        file.write(header.ljust(ipv4_base, b'\x00'))
+        row = struct.Struct('<II')
+        file.write(b''.join(row.pack(ip_from, generator.choice(pointers)) for ip_from in [0] + ip_froms))
+        file.write(row.pack(2 ** 32 - 1, 0))
+        file.write(b''.join(countries))
+
+def benchmark(path, lookups, use_index):
+    """
+    Open a database and look up the addresses of `lookups`.
+
+    :return: A tuple of the time it took to open the database and the number of lookups per second.
+    """
+    start = time.perf_counter()
+    database = BINDatabase(path, use_index=use_index)
+    open_time = time.perf_counter() - start
+    try:
+        start = time.perf_counter()
+        for ip in lookups:
+            database.lookup(ip)
+        lookup_time = time.perf_counter() - start
+    finally:
+        database.close()
+    return open_time, len(lookups) / lookup_time
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the first-level index of the BIN lookup engine.')
+    parser.add_argument('path', nargs='?', help='The BIN database to benchmark (default is a synthetic database)')
+    parser.add_argument('--rows', type=int, default=1000000, help='The number of ranges of the synthetic database (default is 1000000)')
+    parser.add_argument('--lookups', type=int, default=200000, help='The number of lookups to time (default is 200000)')
+    args = parser.parse_args()
+
+    generator = random.Random(1)
+    lookups = ['{}.{}.{}.{}'.format(*generator.getrandbits(32).to_bytes(4, 'big')) for _ in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.path
+        if path is None:
+            path = os.path.join(tmp_dir, 'DB1SYNTHETIC.BIN')
+            write_synthetic_db(path, args.rows)
+        print('Database: {}'.format(path))
+        results = {}
+        for use_index in (False, True):
+            open_time, rate = results[use_index] = benchmark(path, lookups, use_index)
+            label = 'with index' if use_index else 'without index'
+            print('   {:<14} open: {:8.2f} ms   lookups: {:10,.0f}/s'.format(label, open_time * 1000, rate))
+        print('   index open-time cost: {:.2f} ms, lookup speedup: {:.2f}x'.format(
+            (results[True][0] - results[False][0]) * 1000, results[True][1] / results[False][1]))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark the scaling of the multi-process lookup pool.
+
+The benchmark looks up a batch of random IPv4 addresses with pools of 1, 2, 4 and 8 worker processes and reports the
+number of lookups per second of each pool and its speedup over the single-worker pool. The workers search with
+Python lookups by default; pass --vectorized to let them search with NumPy. Pass --ipv6 to replace a share of the
+addresses with random global unicast IPv6 addresses, to benchmark mixed batches.
+
+Usage:
+    python benchmarks/lookup_pool.py [BIN_FILE] [--rows ROWS] [--lookups LOOKUPS] [--workers 1 2 4 8] [--vectorized] [--ipv6 SHARE]
+
+When no BIN file is given, a synthetic DB1 database with ROWS IPv4 ranges (a synthetic DB1 IPv6 database with the
+IPv4 and IPv6 sections when --ipv6 is given) is written to a temporary directory and benchmarked instead.
+"""
+import argparse, ipaddress, os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ip2location_toolkit.reader.generator import generate_database
+from ip2location_toolkit.reader.pool import LookupPool
+from lookup_index import write_synthetic_db
+
+
+def benchmark(path, addresses, workers, vectorized, repeat=3):
+    """
+    Look up `addresses` with a pool of `workers` processes.
+
+    :return: The best number of lookups per second out of `repeat` runs.
+    """
+    with LookupPool(path, workers=workers, chunk_size=max(1, len(addresses) // (workers * 4)), vectorized=vectorized) as pool:
+        pool.find_rows(addresses[:1000])
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            pool.find_rows(addresses)
+            best = min(best, time.perf_counter() - start)
+    return len(addresses) / best
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scaling of the multi-process lookup pool.')
+    parser.add_argument('path', nargs='?', help='The BIN database to benchmark (default is a synthetic database)')
+    parser.add_argument('--rows', type=int, default=1000000, help='The number of ranges of the synthetic database (default is 1000000)')
+    parser.add_argument('--lookups', type=int, default=1000000, help='The number of addresses to look up (default is 1000000)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='The pool sizes to benchmark (default is 1 2 4 8)')
+    parser.add_argument('--vectorized', action='store_true', help='Let the workers search with NumPy')
+    parser.add_argument('--ipv6', type=float, default=0.0, help='The share of IPv6 addresses in the batch, between 0 and 1 (default is 0)')
+    args = parser.parse_args()
+
+    generator = random.Random(1)
+    addresses = [generator.getrandbits(32) for _ in range(args.lookups)]
+    for position in generator.sample(range(args.lookups), int(args.lookups * args.ipv6)):
+        addresses[position] = str(ipaddress.IPv6Address((0x2 << 124) | generator.getrandbits(125)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.path
+        if path is None:
+            path = os.path.join(tmp_dir, 'DB1SYNTHETIC.BIN')
+            if args.ipv6:
+                generate_database('DB1LITEBINIPV6', path, rows=args.rows, seed=1)
+            else:
+                write_synthetic_db(path, args.rows)
+        print('Database: {} ({} CPUs)'.format(path, os.cpu_count()))
+        baseline = None
+        for workers in args.workers:
+            rate = benchmark(path, addresses, workers, args.vectorized)
+            baseline = baseline or rate
+            print('   {:>2} workers: {:12,.0f} lookups/s   speedup: {:.2f}x'.format(workers, rate, rate / baseline))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+Run the offline benchmark suite of the download, extraction and lookup paths.
+
+Every benchmark runs without network access: a synthetic DB1 database is written to a temporary directory, zipped,
+and served by the local stand-in for the download server used by the tests. The suite measures:
+
+    ==========================  =========================================================================
+    Benchmark                   Measure
+    ==========================  =========================================================================
+    download_file               `download_file` throughput with one connection (MB/s of the archive)
+    download_file_segmented     `download_file` throughput with 4 connections (MB/s of the archive)
+    download_extract_db         `download_extract_db` throughput, saving the archive (MB/s of the archive)
+    download_extract_db_stream  `download_extract_db` throughput, extracting as it downloads (MB/s)
+    unzip_db                    `unzip_db` throughput (MB/s of the extracted database)
+    rename_file                 `rename_file` calls per second
+    lookup                      `BINDatabase.lookup` calls per second
+    lookup_records              Addresses per second looked up in batches with `lookup_records`
+    batch_find_rows             Addresses per second searched with `BatchReader.find_rows` (needs NumPy)
+    cli_startup                 Runs per second of ``ip2location-toolkit --help`` in a new interpreter
+    ==========================  =========================================================================
+
+Every measure is a rate, so higher is better; each benchmark keeps the best of REPEAT runs. The results are printed
+and can be written to a JSON file with --output. Given a JSON file of earlier results with --baseline, the suite
+compares the results to it and exits with status 1 if a benchmark is slower than its baseline by more than the
+--threshold fraction.
+
+Usage:
+    python benchmarks/suite.py [--output FILE] [--baseline FILE] [--threshold 0.1] [--only NAME ...] [--rows ROWS] [--lookups LOOKUPS] [--repeat REPEAT]
+"""
+import argparse, contextlib, datetime, io, json, os, platform, random, shutil, subprocess, sys, tempfile, time, zipfile
+from unittest.mock import patch
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from ip2location_toolkit.downloader.download import download_extract_db, download_file, rename_file, unzip_db
+from ip2location_toolkit.downloader.metadata import remove_metadata
+from ip2location_toolkit.reader.batch import BatchReader, lookup_records, numpy
+from ip2location_toolkit.reader.database import BINDatabase
+from tests.utils import LocalHTTPServer, SilentTqdm, random_token
+from lookup_index import write_synthetic_db
+
+DB_CODE = 'DB1LITEBIN'
+MEMBER_NAME = 'IP2LOCATION-LITE-DB1.BIN'
+DEFAULT_THRESHOLD = 0.1
+MB = 1000000
+
+
+class Context:
+    """
+    The synthetic database, its archive and the addresses shared by the benchmarks.
+    """
+    def __init__(self, directory, rows, lookups, repeat):
+        self.directory = directory
+        self.repeat = repeat
+        self.database = os.path.join(directory, MEMBER_NAME)
+        write_synthetic_db(self.database, rows)
+        self.archive = os.path.join(directory, DB_CODE + '.zip')
+        with zipfile.ZipFile(self.archive, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.write(self.database, MEMBER_NAME)
+            archive.writestr('LICENSE_LITE.TXT', 'Synthetic database for benchmarks.')
+        with open(self.archive, 'rb') as file:
+            self.payload = file.read()
+        self.database_size = os.path.getsize(self.database)
+        generator = random.Random(1)
+        self.addresses = ['{}.{}.{}.{}'.format(*generator.getrandbits(32).to_bytes(4, 'big')) for _ in range(lookups)]
+
+    def scratch_dir(self, name):
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        return path
+
+
+def best_time(function, repeat, setup=None):
+    """
+    Run `function` `repeat` times, calling `setup` before each run.
+
+    :return: The shortest run time in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Silence the progress output of the download functions.
+    """
+    with patch('ip2location_toolkit.downloader.download.tqdm', SilentTqdm), contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def _download(context, connections):
+    path = os.path.join(context.scratch_dir('download'), DB_CODE + '.zip')
+    def setup():
+        if os.path.exists(path):
+            os.remove(path)
+        remove_metadata(path)
+    with LocalHTTPServer(context.payload) as server, quiet():
+        seconds = best_time(lambda: download_file(server.url, path, resume=False, connections=connections), context.repeat, setup)
+    return len(context.payload) / MB / seconds
+
+def bench_download_file(context):
+    return _download(context, 1), 'MB/s'
+
+def bench_download_file_segmented(context):
+    return _download(context, 4), 'MB/s'
+
+def _download_extract(context, stream):
+    output = context.scratch_dir('extract')
+    cwd = os.getcwd()
+    # The archive is saved to the temporary directory of the current directory, not to the download cache.
+    os.chdir(context.scratch_dir('cwd'))
+    def setup():
+        context.scratch_dir('cwd/__tmp__')
+        context.scratch_dir('extract')
+    try:
+        with LocalHTTPServer(context.payload) as server, quiet():
+            with patch('ip2location_toolkit.downloader.download.get_download_url', return_value=server.url):
+                seconds = best_time(lambda: download_extract_db(DB_CODE, random_token(), output, stream=stream, raise_errors=True, cache=False), context.repeat, setup)
+    finally:
+        os.chdir(cwd)
+    return len(context.payload) / MB / seconds
+
+def bench_download_extract_db(context):
+    return _download_extract(context, False), 'MB/s'
+
+def bench_download_extract_db_stream(context):
+    return _download_extract(context, True), 'MB/s'
+
+def bench_unzip_db(context):
+    output = context.scratch_dir('unzip')
+    with quiet():
+        seconds = best_time(lambda: unzip_db(context.archive, output), context.repeat, lambda: context.scratch_dir('unzip'))
+    return context.database_size / MB / seconds, 'MB/s'
+
+def bench_rename_file(context, count=1000):
+    path = os.path.join(context.scratch_dir('rename'), 'A.BIN')
+    shutil.copyfile(context.database, path)
+    def rename():
+        current = path
+        for index in range(count):
+            current = rename_file(current, 'B.BIN' if index % 2 == 0 else 'A.BIN')
+    return count / best_time(rename, context.repeat), 'renames/s'
+
+def bench_lookup(context):
+    with BINDatabase(context.database) as database:
+        lookup = database.lookup
+        seconds = best_time(lambda: [lookup(ip) for ip in context.addresses], context.repeat)
+    return len(context.addresses) / seconds, 'lookups/s'
+
+def bench_lookup_records(context):
+    with BINDatabase(context.database) as database:
+        batch_reader = BatchReader(database) if numpy is not None else None
+        try:
+            seconds = best_time(lambda: lookup_records(database, context.addresses, batch_reader), context.repeat)
+        finally:
+            if batch_reader is not None:
+                batch_reader.close()
+    return len(context.addresses) / seconds, 'lookups/s'
+
+def bench_batch_find_rows(context):
+    if numpy is None:
+        return None
+    with BINDatabase(context.database) as database, BatchReader(database) as batch_reader:
+        addresses = numpy.array([int.from_bytes(bytes(map(int, ip.split('.'))), 'big') for ip in context.addresses], dtype=numpy.uint32)
+        seconds = best_time(lambda: batch_reader.find_rows(addresses), context.repeat)
+    return len(addresses) / seconds, 'lookups/s'
+
+def bench_cli_startup(context):
+    command = [sys.executable, '-m', 'ip2location_toolkit', '--help']
+    seconds = best_time(lambda: subprocess.run(command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, check=True), context.repeat)
+    return 1 / seconds, 'starts/s'
+
+BENCHMARKS = {
+    'download_file': bench_download_file,
+    'download_file_segmented': bench_download_file_segmented,
+    'download_extract_db': bench_download_extract_db,
+    'download_extract_db_stream': bench_download_extract_db_stream,
+    'unzip_db': bench_unzip_db,
+    'rename_file': bench_rename_file,
+    'lookup': bench_lookup,
+    'lookup_records': bench_lookup_records,
+    'batch_find_rows': bench_batch_find_rows,
+    'cli_startup': bench_cli_startup,
+}
+
+
+def run_benchmarks(names, rows, lookups, repeat):
+    """
+    Run the benchmarks of `names`.
+
+    :return: A dictionary of the metadata of the run and of the results, mapping the name of each benchmark to its ``value`` and ``unit``. Benchmarks that cannot run (batch_find_rows without NumPy) are left out.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        context = Context(tmp_dir, rows, lookups, repeat)
+        for name in names:
+            result = BENCHMARKS[name](context)
+            if result is None:
+                print('   {:<28} skipped'.format(name))
+                continue
+            value, unit = result
+            results[name] = {'value': value, 'unit': unit}
+            print('   {:<28} {:14,.2f} {}'.format(name, value, unit))
+        metadata = {
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'numpy': numpy.__version__ if numpy is not None else None,
+            'rows': rows,
+            'lookups': lookups,
+            'repeat': repeat,
+            'archive_size': len(context.payload),
+            'database_size': context.database_size,
+        }
+    return {'metadata': metadata, 'results': results}
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare results to a baseline. Benchmarks missing from either side are not compared.
+
+    :return: A list of ``(name, baseline value, value, change)`` tuples, where `change` is the relative change of the value, and the list of the names of the benchmarks slower than their baseline by more than `threshold`.
+    """
+    comparison = []
+    regressions = []
+    for name, result in results['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base.get('value'):
+            continue
+        change = result['value'] / base['value'] - 1
+        comparison.append((name, base['value'], result['value'], change))
+        if change < -threshold:
+            regressions.append(name)
+    return comparison, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the offline benchmark suite of the download, extraction and lookup paths.')
+    parser.add_argument('--output', '-o', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', '-b', help='Compare the results to the results of this JSON file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='The slowdown over the baseline, as a fraction, that counts as a regression (default is 0.1)')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS), metavar='NAME', help='The benchmarks to run (default is all of them: {})'.format(', '.join(BENCHMARKS)))
+    parser.add_argument('--rows', type=int, default=1000000, help='The number of ranges of the synthetic database (default is 1000000)')
+    parser.add_argument('--lookups', type=int, default=100000, help='The number of addresses of the lookup benchmarks (default is 100000)')
+    parser.add_argument('--repeat', type=int, default=3, help='The number of runs of each benchmark (default is 3)')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    print('Running {} benchmarks on a synthetic database of {} ranges...'.format(len(args.only), args.rows))
+    results = run_benchmarks(args.only, args.rows, args.lookups, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=4)
+        print('Results written to {}'.format(args.output))
+
+    if baseline is None:
+        return
+    comparison, regressions = compare_results(results, baseline, args.threshold)
+    print('Comparison to {} (threshold {:.0%}):'.format(args.baseline, args.threshold))
+    for name, base, value, change in comparison:
+        print('   {:<28} {:14,.2f} -> {:14,.2f} {:+8.1%}{}'.format(name, base, value, change, '   REGRESSION' if name in regressions else ''))
+    if regressions:
+        print('{} benchmark(s) regressed: {}'.format(len(regressions), ', '.join(regressions)))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+This module contains the catalog of the databases the toolkit can download, indexed once when it is imported.
+
+`db_codes.CODES` groups the database codes by product and title. The catalog flattens it into entries and builds the
+indexes the validators, the selector and the bulk downloader query, so that validating a code or finding the code of
+a selection takes constant time instead of a scan of every entry:
+
+    - a frozenset of the codes, for membership tests,
+    - a map from each code to its entry (product, title, IP type and format),
+    - a map from each (product, title, IP type, format) selection to its code.
+
+Formats are named ``csv`` and ``bin`` (``cvs``, the key used by `CODES` for CSV databases, is accepted as an alias).
+
+Example:
+    get_entry('DB11LITEBIN')
+    # DatabaseEntry(code='DB11LITEBIN', product='ip2location', title='IP-COUNTRY-REGION-CITY-LATITUDE-LONGITUDE-ZIPCODE-TIMEZONE', ip_type='ipv4', db_format='bin')
+    filter_entries(product='ip2proxy', ip_type='ipv6', db_format='bin')
+
+Classes:
+    - DatabaseEntry: A database of the catalog.
+
+Functions:
+    - is_valid_code(code): Check whether a code is the code of a database of the catalog.
+    - get_entry(code): Get the entry of a database code.
+    - find_code(product, title, ip_type, db_format): Get the code of a database from its selection.
+    - filter_entries(product, title, ip_type, db_format): Get the entries matching every given field.
+    - get_products(): Get the products of the catalog.
+    - get_titles(product): Get the titles of the databases of a product.
+"""
+from collections import namedtuple
+from .db_codes import CODES
+
+IP_TYPES = ('ipv4', 'ipv6')
+FORMATS = ('csv', 'bin')
+FORMAT_ALIASES = {'cvs': 'csv'}
+
+DatabaseEntry = namedtuple('DatabaseEntry', ['code', 'product', 'title', 'ip_type', 'db_format'])
+DatabaseEntry.__doc__ = 'A database of the catalog: its code, product ("ip2location" or "ip2proxy"), title, IP type ("ipv4" or "ipv6") and format ("csv" or "bin").'
+
+
+def _build_entries(codes):
+    entries = []
+    seen = {}
+    for product, databases in codes.items():
+        for database in databases:
+            for ip_type in IP_TYPES:
+                for db_format, code in database[ip_type].items():
+                    entry = DatabaseEntry(code, product, database['title'], ip_type, FORMAT_ALIASES.get(db_format, db_format))
+                    if code in seen:
+                        raise ValueError('The database code {} is listed twice ({} and {}).'.format(code, seen[code][1:], entry[1:]))
+                    seen[code] = entry
+                    entries.append(entry)
+    return tuple(entries)
+
+ENTRIES = _build_entries(CODES)
+CODE_SET = frozenset(entry.code for entry in ENTRIES)
+_BY_CODE = {entry.code: entry for entry in ENTRIES}
+_BY_SELECTION = {entry[1:]: entry.code for entry in ENTRIES}
+_TITLES = {}
+for _entry in ENTRIES:
+    _TITLES.setdefault(_entry.product, [])
+    if _entry.title not in _TITLES[_entry.product]:
+        _TITLES[_entry.product].append(_entry.title)
+del _entry
+
+
+def is_valid_code(code):
+    """
+    Check whether a code is the code of a database of the catalog.
+
+    :param code: The database code.
+    :type code: str
+    :return: True if the code is in the catalog.
+    :rtype: bool
+    """
+    return code in CODE_SET
+
+def get_entry(code):
+    """
+    Get the entry of a database code.
+
+    :param code: The database code.
+    :type code: str
+    :return: The entry, or None if the code is not in the catalog.
+    :rtype: DatabaseEntry
+    """
+    return _BY_CODE.get(code)
+
+def find_code(product, title, ip_type, db_format):
+    """
+    Get the code of a database from its product, title, IP type and format.
+
+    :param product: The product ("ip2location" or "ip2proxy").
+    :type product: str
+    :param title: The title of the database (for example IP-COUNTRY).
+    :type title: str
+    :param ip_type: The IP type ("ipv4" or "ipv6").
+    :type ip_type: str
+    :param db_format: The format ("csv" or "bin").
+    :type db_format: str
+    :raises ValueError: If no database matches the selection.
+    :return: The database code.
+    :rtype: str
+    """
+    selection = (product, title, ip_type, FORMAT_ALIASES.get(db_format, db_format))
+    try:
+        return _BY_SELECTION[selection]
+    except KeyError:
+        raise ValueError('No database matches the selection ({}).'.format(', '.join(map(str, selection))))
+
+def filter_entries(product=None, title=None, ip_type=None, db_format=None):
+    """
+    Get the entries matching every given field. Fields left to None match every entry.
+
+    :param product: The product ("ip2location" or "ip2proxy").
+    :type product: str
+    :param title: The title of the database.
+    :type title: str
+    :param ip_type: The IP type ("ipv4" or "ipv6").
+    :type ip_type: str
+    :param db_format: The format ("csv" or "bin").
+    :type db_format: str
+    :return: The matching entries, in the order of `db_codes.CODES`.
+    :rtype: list
+    """
+    fields = ((1, product), (2, title), (3, ip_type), (4, FORMAT_ALIASES.get(db_format, db_format)))
+    fields = [(index, value) for index, value in fields if value is not None]
+    return [entry for entry in ENTRIES if all(entry[index] == value for index, value in fields)]
+
+def get_products():
+    """
+    Get the products of the catalog.
+
+    :return: The products, in the order of `db_codes.CODES`.
+    :rtype: list
+    """
+    return list(_TITLES)
+
+def get_titles(product):
+    """
+    Get the titles of the databases of a product.
+
+    :param product: The product ("ip2location" or "ip2proxy").
+    :type product: str
+    :return: The titles, in the order of `db_codes.CODES` (an empty list for unknown products).
+    :rtype: list
+    """
+    return list(_TITLES.get(product, ()))
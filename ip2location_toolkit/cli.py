@@ -5,15 +5,26 @@ It includes functions for downloading and selecting IP2Location databases.
 
 Functions:
     download: Downloads the IP2Location database file using the specified database code and token.
+    bulk: Downloads many IP2Location database files concurrently.
+    update: Updates the outdated BIN databases among files and directories.
+    queue_add: Adds database downloads to the download queue.
+    queue_run: Runs the queued downloads as fast as the download quotas allow.
+    compile_db: Compiles a LITE CSV database into a BIN database file.
+    generate_db: Writes a synthetic database file for load testing.
+    serve: Serves lookups from a BIN database over HTTP and a Unix socket.
+    enrich: Enriches log lines with the records of their IP addresses.
     select: Prompts the user to select a database type, content, IP type, and database format.
+
+The modules and the dependencies of each command (requests and tqdm for the downloads, NumPy for the lookups) are
+imported by the function running it, so that starting the tool, printing the help or running a command that does not
+download anything does not load them. The defaults shown in the help are read from `defaults`.
 """
 
-from .downloader.download import download_extract_db
-from .downloader.cli import db_code_prompt, token_prompt, output_prompt
-from .selector.cli import selection_input, get_code
-from .db_codes import CODES
-import argparse
+import argparse, contextlib, sys
 from pathlib import Path
+from .defaults import ENRICH_BATCH_SIZE as DEFAULT_BATCH_SIZE, ENRICH_FORMATS as FORMATS, METRICS_FORMATS
+from .defaults import SCAN_WORKERS as DEFAULT_SCAN_WORKERS, GENERATE_ROWS as DEFAULT_ROWS, GENERATE_VERSION as DEFAULT_VERSION
+from .defaults import SERVER_HOST as DEFAULT_HOST, SERVER_MAX_BATCH as DEFAULT_MAX_BATCH, SERVER_MAX_DELAY as DEFAULT_MAX_DELAY, SERVER_PORT as DEFAULT_PORT
 
 
 def run():
@@ -26,8 +37,215 @@ def run():
     parser.add_argument('--token', '-t', help='Your IP2Location API Token')
     parser.add_argument('--code', '-c', help='Database code to download')
     parser.add_argument('--output', '-o', help='Output directory', type=Path)
+    parser.add_argument('--connections', '-n', help='Number of connections to download the database with (default: 1)', type=int, default=1)
+    parser.add_argument('--stream', '-s', help='Extract the database while it is being downloaded, without saving the zip archive', action='store_true')
+    parser.add_argument('--metrics-file', help='Write the timing and byte metrics of the run to this file when the command ends', type=Path)
+    parser.add_argument('--metrics-format', help='Format of the metrics file (default: json for .json files, prometheus otherwise)', choices=METRICS_FORMATS)
+    parser.add_argument('--cache-dir', help='Directory of the shared download cache (default: $IP2LOCATION_TOOLKIT_CACHE_DIR or ~/.cache/ip2location_toolkit)', type=Path)
+    parser.add_argument('--cache-size', help='Size budget of the download cache in bytes, 0 to disable it (default: $IP2LOCATION_TOOLKIT_CACHE_SIZE or 2 GB)', type=int)
+    parser.add_argument('--no-cache', help='Download the databases without the shared download cache', action='store_true')
+
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    bulk_parser = subparsers.add_parser('bulk', help='Download many databases concurrently')
+    bulk_parser.add_argument('codes', nargs='*', help='Database codes to download')
+    bulk_parser.add_argument('--manifest', '-m', help='File listing the databases to download, one code per line optionally followed by an output directory')
+    bulk_parser.add_argument('--token', '-t', help='Your IP2Location API Token', default=argparse.SUPPRESS)
+    bulk_parser.add_argument('--output', '-o', help='Output directory', type=Path, default=argparse.SUPPRESS)
+    bulk_parser.add_argument('--workers', '-w', help='Number of databases to download at the same time (default: 4)', type=int, default=4)
+    bulk_parser.add_argument('--connections', '-n', help='Number of connections to download each database with (default: 1)', type=int, default=argparse.SUPPRESS)
+    bulk_parser.add_argument('--stream', '-s', help='Extract the databases while they are being downloaded', action='store_true', default=argparse.SUPPRESS)
+    bulk_parser.add_argument('--report', '-r', help='Write a JSON report of the results to this file')
+
+    update_parser = subparsers.add_parser('update', help='Update downloaded BIN databases, downloading each database once')
+    update_parser.add_argument('files', nargs='*', help='BIN database files to update', type=Path)
+    update_parser.add_argument('--scan', nargs='+', metavar='DIR', help='Update the BIN databases found in these directories (recursively)', type=Path, default=[])
+    update_parser.add_argument('--token', '-t', help='Your IP2Location API Token', default=argparse.SUPPRESS)
+    update_parser.add_argument('--workers', '-w', help='Number of files read at the same time (default: {})'.format(DEFAULT_SCAN_WORKERS), type=int, default=DEFAULT_SCAN_WORKERS)
+    update_parser.add_argument('--connections', '-n', help='Number of connections to download each database with (default: 1)', type=int, default=argparse.SUPPRESS)
+    update_parser.add_argument('--force', '-f', help='Update the databases even if they are up to date', action='store_true')
+    update_parser.add_argument('--no-remote-check', help='Download the outdated databases without checking that the remote databases changed', action='store_true')
+    update_parser.add_argument('--keep-previous', help='Keep the replaced versions next to the databases', action='store_true')
+    update_parser.add_argument('--report', '-r', help='Write the JSON report to this file instead of the standard output')
+
+    delta_parser = subparsers.add_parser('delta', help='Create or apply a compact patch between two releases of a BIN database')
+    delta_subparsers = delta_parser.add_subparsers(dest='delta_command', required=True)
+    delta_create_parser = delta_subparsers.add_parser('create', help='Create a patch rebuilding the new release from the old one')
+    delta_create_parser.add_argument('old', help='The old release', type=Path)
+    delta_create_parser.add_argument('new', help='The new release', type=Path)
+    delta_create_parser.add_argument('--output', '-o', help='The patch file (default: the new release with the .delta extension)', type=Path, default=argparse.SUPPRESS)
+    delta_apply_parser = delta_subparsers.add_parser('apply', help='Rebuild the new release from the old one and a patch')
+    delta_apply_parser.add_argument('old', help='The old release', type=Path)
+    delta_apply_parser.add_argument('delta', help='The patch file', type=Path)
+    delta_apply_parser.add_argument('--output', '-o', help='The rebuilt release (default: replace the old release)', type=Path, default=argparse.SUPPRESS)
+    delta_apply_parser.add_argument('--keep-previous', help='Keep the replaced release next to the database', action='store_true')
+
+    queue_parser = subparsers.add_parser('queue', help='Queue database downloads and run them within the download limits')
+    queue_subparsers = queue_parser.add_subparsers(dest='queue_command', required=True)
+    queue_add_parser = queue_subparsers.add_parser('add', help='Add database downloads to the queue')
+    queue_add_parser.add_argument('codes', nargs='+', help='Database codes to download')
+    queue_add_parser.add_argument('--token', '-t', help='Your IP2Location API Token', default=argparse.SUPPRESS)
+    queue_add_parser.add_argument('--output', '-o', help='Output directory', type=Path, default=argparse.SUPPRESS)
+    queue_run_parser = queue_subparsers.add_parser('run', help='Run the queued downloads of a token as fast as the quotas allow')
+    queue_run_parser.add_argument('--token', '-t', help='Your IP2Location API Token', default=argparse.SUPPRESS)
+    queue_run_parser.add_argument('--code-quota', help='Number of downloads of a database per day, 0 for no limit (default: 5)', type=int)
+    queue_run_parser.add_argument('--token-quota', help='Number of downloads with the token per day, 0 for no limit (default: no limit)', type=int)
+    queue_run_parser.add_argument('--no-wait', help='Return when no download can run yet instead of waiting for the quotas', action='store_true')
+    queue_run_parser.add_argument('--connections', '-n', help='Number of connections to download each database with (default: 1)', type=int, default=argparse.SUPPRESS)
+    queue_run_parser.add_argument('--stream', '-s', help='Extract the databases while they are being downloaded', action='store_true', default=argparse.SUPPRESS)
+    queue_list_parser = queue_subparsers.add_parser('list', help='List the jobs of the queue')
+    queue_clear_parser = queue_subparsers.add_parser('clear', help='Remove the finished jobs from the queue')
+    for queue_command_parser in (queue_add_parser, queue_run_parser, queue_list_parser, queue_clear_parser):
+        queue_command_parser.add_argument('--queue-file', help='The queue file (default: $IP2LOCATION_TOOLKIT_QUEUE_FILE or queue.json in the cache directory)', type=Path)
+
+    compile_parser = subparsers.add_parser('compile', help='Compile a LITE CSV database into a BIN database file')
+    compile_parser.add_argument('csv', help='The CSV file, or the zip archive containing it', type=Path)
+    compile_parser.add_argument('--output', '-o', help='The compiled file (default: the CSV file with the .BIN extension)', type=Path, default=argparse.SUPPRESS)
+    compile_parser.add_argument('--code', '-c', help='Database code of the CSV file (default: guessed from the file name)', default=argparse.SUPPRESS)
+    compile_parser.add_argument('--db-version', help='Version of the database in the format "year.month.day" (default: the download date of the CSV file)')
+
+    generate_parser = subparsers.add_parser('generate', help='Write a synthetic database file for load testing')
+    generate_parser.add_argument('db_code', help='Code of the database to generate, for example DB11LITEBIN or PX2LITECSV')
+    generate_parser.add_argument('--output', '-o', help='The generated file (default: the database code with the .BIN, .CSV or .zip extension)', type=Path, default=argparse.SUPPRESS)
+    generate_parser.add_argument('--rows', '-r', help='Number of ranges holding records (default: {})'.format(DEFAULT_ROWS), type=int, default=DEFAULT_ROWS)
+    generate_parser.add_argument('--seed', help='Seed of the random generator (default: 0)', type=int, default=0)
+    generate_parser.add_argument('--cities', help='Number of distinct cities (default: one per 20 ranges, at most 100000)', type=int)
+    generate_parser.add_argument('--db-version', help='Version written in the header of BIN databases (default: {})'.format(DEFAULT_VERSION), default=DEFAULT_VERSION)
+    generate_parser.add_argument('--zip', help='Write a zip archive holding the database, like the downloaded archives', action='store_true')
+
+    serve_parser = subparsers.add_parser('serve', help='Serve lookups from a BIN database over HTTP and a Unix socket')
+    serve_parser.add_argument('database', help='The BIN database file', type=Path)
+    serve_parser.add_argument('--host', help='Address to listen for HTTP requests on (default: {})'.format(DEFAULT_HOST), default=DEFAULT_HOST)
+    serve_parser.add_argument('--port', '-p', help='Port to listen for HTTP requests on (default: {})'.format(DEFAULT_PORT), type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--no-http', help='Do not listen for HTTP requests', action='store_true')
+    serve_parser.add_argument('--unix-socket', '-u', help='Path of a Unix socket to listen on')
+    serve_parser.add_argument('--max-batch', help='Maximum number of lookups resolved together (default: {})'.format(DEFAULT_MAX_BATCH), type=int, default=DEFAULT_MAX_BATCH)
+    serve_parser.add_argument('--max-delay', help='Maximum number of seconds a lookup waits for others to be resolved with (default: {})'.format(DEFAULT_MAX_DELAY), type=float, default=DEFAULT_MAX_DELAY)
+
+    enrich_parser = subparsers.add_parser('enrich', help='Enrich log lines with the records of their IP addresses')
+    enrich_parser.add_argument('inputs', nargs='*', help='Log files to enrich, "-" for the standard input (default: the standard input)', default=['-'])
+    enrich_parser.add_argument('--database', '-d', help='The BIN database file', type=Path)
+    enrich_parser.add_argument('--code', '-c', help='Code of a downloaded BIN database to use instead of --database', default=argparse.SUPPRESS)
+    enrich_parser.add_argument('--database-dir', help='Directory the database of --code was downloaded to (default: the current directory)', type=Path)
+    enrich_parser.add_argument('--field', '-f', help='1-based position of the field holding the IP address (default: 1)', type=int)
+    enrich_parser.add_argument('--delimiter', help='Delimiter of the fields (default: whitespace)')
+    enrich_parser.add_argument('--regex', '-r', help='Regular expression matching the IP address, in its "ip" group or first group if it has one')
+    enrich_parser.add_argument('--format', '-F', help='Output format (default: jsonl)', choices=FORMATS, default='jsonl')
+    enrich_parser.add_argument('--fields', help='Comma-separated record fields to output (default: all the fields of the database)')
+    enrich_parser.add_argument('--output-file', '-O', help='File to write the enriched lines to (default: the standard output)', type=Path)
+    enrich_parser.add_argument('--workers', '-w', help='Number of worker processes looking up batches (default: 1, looking up in a thread)', type=int, default=1)
+    enrich_parser.add_argument('--batch-size', help='Number of lines looked up together (default: {})'.format(DEFAULT_BATCH_SIZE), type=int, default=DEFAULT_BATCH_SIZE)
     args = parser.parse_args()
 
+    try:
+        if not configure_cache(args.cache_dir, args.cache_size, args.no_cache):
+            sys.exit(1)
+        run_command(args)
+    finally:
+        if args.metrics_file:
+            from .metrics import write_metrics
+            try:
+                write_metrics(args.metrics_file, args.metrics_format)
+            except (ValueError, OSError) as e:
+                from colorama import Fore
+                print(Fore.RED + 'Error: ' + Fore.RESET + 'Failed to write the metrics ({})'.format(getattr(e, 'message', e)))
+
+
+def configure_cache(directory=None, max_size=None, disabled=False):
+    """
+    Configures the shared download cache used by the commands.
+
+    :param directory: The directory of the cache (default: the default cache directory).
+    :type directory: str
+    :param max_size: The size budget of the cache in bytes, 0 to disable it (default: the default budget).
+    :type max_size: int
+    :param disabled: Whether to download without the cache.
+    :type disabled: bool
+    :return: True if the cache was configured, False if the default budget is not valid.
+    :rtype: bool
+    """
+    from .downloader.cache import DownloadCache, get_default_max_size, set_download_cache
+    if disabled or max_size == 0:
+        set_download_cache(None)
+        return True
+    if directory is None and max_size is None:
+        return True
+    try:
+        max_size = get_default_max_size() if max_size is None else max_size
+    except ValueError as e:
+        from colorama import Fore
+        print(Fore.RED + 'Error: ' + Fore.RESET + str(e))
+        return False
+    set_download_cache(DownloadCache(directory, max_size) if max_size > 0 else None)
+    return True
+
+
+def run_command(args):
+    """
+    Runs the command of the parsed command line arguments.
+
+    :param args: The parsed arguments.
+    :type args: argparse.Namespace
+    :return: None
+    """
+    if args.command == 'bulk':
+        from .downloader.bulk import STATUS_OK
+        results = bulk(args.codes, args.manifest, args.token, args.output, args.workers, args.connections, args.stream, args.report)
+        if any(result['status'] != STATUS_OK for result in results):
+            sys.exit(1)
+        return
+
+    if args.command == 'update':
+        from .downloader.scan import STATUS_ERROR, STATUS_UNKNOWN
+        paths = list(args.files) + list(args.scan)
+        results = update(paths, args.token, args.workers, args.force, not args.no_remote_check, args.keep_previous, args.connections, args.report)
+        if results is None or any(result['status'] in (STATUS_ERROR, STATUS_UNKNOWN) for result in results):
+            sys.exit(1)
+        return
+
+    if args.command == 'compile':
+        if not compile_db(args.csv, args.output, args.code, args.db_version):
+            sys.exit(1)
+        return
+
+    if args.command == 'delta':
+        if args.delta_command == 'create':
+            result = create_delta(args.old, args.new, args.output)
+        else:
+            result = apply_delta(args.old, args.delta, args.output, args.keep_previous)
+        if not result:
+            sys.exit(1)
+        return
+
+    if args.command == 'queue':
+        if args.queue_command == 'add':
+            result = queue_add(args.codes, args.token, args.output, args.queue_file)
+        elif args.queue_command == 'run':
+            result = queue_run(args.token, args.queue_file, args.code_quota, args.token_quota, not args.no_wait, args.connections, args.stream)
+        elif args.queue_command == 'list':
+            result = queue_list(args.queue_file)
+        else:
+            result = queue_clear(args.queue_file)
+        if result is None:
+            sys.exit(1)
+        return
+
+    if args.command == 'generate':
+        if not generate_db(args.db_code, args.output, args.rows, args.seed, args.db_version, args.cities, args.zip):
+            sys.exit(1)
+        return
+
+    if args.command == 'serve':
+        if not serve(args.database, args.host, None if args.no_http else args.port, args.unix_socket, args.max_batch, args.max_delay):
+            sys.exit(1)
+        return
+
+    if args.command == 'enrich':
+        fields = args.fields.split(',') if args.fields else None
+        options = dict(field=args.field, delimiter=args.delimiter, regex=args.regex, output_format=args.format, fields=fields, output_file=args.output_file, workers=args.workers, batch_size=args.batch_size)
+        if not enrich(args.inputs, args.database, args.code, args.database_dir, **options):
+            sys.exit(1)
+        return
+
     if args.code:
         db_code = args.code
     else:
@@ -43,10 +261,10 @@ def run():
     else:
         token = None
 
-    download(db_code, token, output_path)
+    download(db_code, token, output_path, connections=args.connections, stream=args.stream)
 
 
-def download(db_code=None, token=None, output=None, enable_select=True):
+def download(db_code=None, token=None, output=None, enable_select=True, connections=1, stream=False):
     """
     Downloads the IP2Location database file using the specified database code and token.
 
@@ -58,17 +276,441 @@ def download(db_code=None, token=None, output=None, enable_select=True):
     :type output: str
     :param enable_select: Whether to enable the database selection prompt. Defaults to True.
     :type enable_select: bool
+    :param connections: The number of connections to download the database with. Defaults to 1.
+    :type connections: int
+    :param stream: Whether to extract the database while it is being downloaded. Defaults to False.
+    :type stream: bool
 
     :return: None
     :rtype: None
     """
+    from .downloader.cli import db_code_prompt, output_prompt, token_prompt
+    from .downloader.download import download_extract_db
     if not db_code:
         db_code = db_code_prompt(enable_select)
     if not token:
         token = token_prompt()
     if not output:
         output = output_prompt()
-    download_extract_db(db_code, token, output)
+    download_extract_db(db_code, token, output, connections=connections, stream=stream)
+
+
+def bulk(codes=None, manifest=None, token=None, output=None, workers=4, connections=1, stream=False, report=None):
+    """
+    Downloads many IP2Location database files concurrently and prints a summary of the result of each database.
+
+    :param codes: The database codes to download.
+    :type codes: list
+    :param manifest: The path to a manifest file listing more databases to download (see `read_manifest`).
+    :type manifest: str
+    :param token: The token to use for authentication. If not provided, the user will be prompted to enter a token.
+    :type token: str
+    :param output: The output directory of the databases the manifest does not specify an output directory for.
+    :type output: str
+    :param workers: The number of databases to download at the same time. Defaults to 4.
+    :type workers: int
+    :param connections: The number of connections to download each database with. Defaults to 1.
+    :type connections: int
+    :param stream: Whether to extract the databases while they are being downloaded. Defaults to False.
+    :type stream: bool
+    :param report: The path to write a JSON report of the results to (optional).
+    :type report: str
+
+    :return: The result of each database (see `bulk_download`).
+    :rtype: list
+    """
+    from .downloader.bulk import bulk_download, print_summary, read_manifest, write_report
+    from .downloader.cli import token_prompt
+    entries = [(code, None) for code in codes or []]
+    if manifest:
+        entries += read_manifest(manifest)
+    if not token:
+        token = token_prompt()
+    results = bulk_download(entries, token, output, workers, connections, stream)
+    print_summary(results)
+    if report:
+        write_report(results, report)
+    return results
+
+
+def update(paths, token=None, workers=DEFAULT_SCAN_WORKERS, force=False, check_remote=True, keep_previous=False, connections=1, report=None):
+    """
+    Updates the outdated BIN databases among files and the files found in directories, downloading each database code once, then prints a JSON report of the result of each file (see `downloader.scan`).
+    When the report is printed to the standard output, the progress of the update is printed to the standard error, so that the output is valid JSON.
+
+    :param paths: The database files, and the directories to search for database files.
+    :type paths: list
+    :param token: The token to use for authentication. If not provided, the user will be prompted to enter a token when a database is outdated.
+    :type token: str
+    :param workers: The number of files read at the same time.
+    :type workers: int
+    :param force: Whether to update the databases even if they are up to date. Defaults to False.
+    :type force: bool
+    :param check_remote: Whether to check that the remote databases changed since the files were downloaded. Defaults to True.
+    :type check_remote: bool
+    :param keep_previous: Whether to keep the replaced versions next to the databases. Defaults to False.
+    :type keep_previous: bool
+    :param connections: The number of connections to download each database with. Defaults to 1.
+    :type connections: int
+    :param report: The path to write the JSON report to. Defaults to the standard output.
+    :type report: str
+
+    :return: The result of each file (see `update_fleet`), or None if no file or directory was provided.
+    :rtype: list
+    """
+    from colorama import Fore
+    from .downloader.scan import print_report, update_fleet
+    if not paths:
+        print(Fore.RED + 'Error: ' + Fore.RESET + 'Specify the database files to update, or directories to --scan.')
+        return None
+    if not token:
+        from .downloader.cli import token_prompt
+        token = token_prompt
+    if report:
+        results = update_fleet(paths, token, workers, force, check_remote, keep_previous, connections)
+    else:
+        # The report is printed to the standard output, so the progress of the update goes to the standard error.
+        with contextlib.redirect_stdout(sys.stderr):
+            results = update_fleet(paths, token, workers, force, check_remote, keep_previous, connections)
+    if report:
+        with open(report, 'w') as file:
+            print_report(results, file)
+    else:
+        print_report(results)
+    return results
+
+
+def compile_db(csv_path, output=None, db_code=None, version=None):
+    """
+    Compiles a LITE CSV database into a BIN database file that can be opened without parsing.
+
+    :param csv_path: The path to the CSV file, or to a zip archive containing it.
+    :type csv_path: str
+    :param output: The path of the compiled file. If not provided, the path of the CSV file with the `.BIN` extension is used.
+    :type output: str
+    :param db_code: The code of the CSV database. If not provided, it is guessed from the file name.
+    :type db_code: str
+    :param version: The version of the database in the format "year.month.day". If not provided, the download date of the CSV file is used.
+    :type version: str
+
+    :return: The path to the compiled file, or None if the compilation failed.
+    :rtype: str
+    """
+    from colorama import Fore
+    from .reader.compiler import compile_csv
+    try:
+        return compile_csv(csv_path, output, db_code, version)
+    except (ValueError, OSError) as e:
+        print(Fore.RED + 'Error: ' + Fore.RESET + '{}'.format(getattr(e, 'message', e)))
+        return None
+
+
+def create_delta(old, new, output=None):
+    """
+    Creates a patch rebuilding a release of a BIN database from the previous release (see `reader.delta`).
+
+    :param old: The path to the old release.
+    :type old: str
+    :param new: The path to the new release.
+    :type new: str
+    :param output: The path of the patch file. If not provided, the path of the new release with the `.delta` extension is used.
+    :type output: str
+
+    :return: The path to the patch file, or None if it could not be created.
+    :rtype: str
+    """
+    from colorama import Fore
+    from .reader.delta import create_delta as create
+    try:
+        return create(old, new, output)
+    except (ValueError, OSError) as e:
+        print(Fore.RED + 'Error: ' + Fore.RESET + '{}'.format(getattr(e, 'message', e)))
+        return None
+
+
+def apply_delta(old, delta, output=None, keep_previous=False):
+    """
+    Rebuilds a release of a BIN database from the previous release and a patch, checked against the checksum of the release.
+
+    :param old: The path to the old release.
+    :type old: str
+    :param delta: The path to the patch file.
+    :type delta: str
+    :param output: The path of the rebuilt release. If not provided, the old release is replaced.
+    :type output: str
+    :param keep_previous: Whether to keep the replaced release next to the database.
+    :type keep_previous: bool
+
+    :return: The path to the rebuilt release, or None if it could not be rebuilt.
+    :rtype: str
+    """
+    from colorama import Fore
+    from .reader.delta import apply_delta as apply
+    try:
+        return apply(old, delta, output, keep_previous)
+    except (ValueError, OSError) as e:
+        print(Fore.RED + 'Error: ' + Fore.RESET + '{}'.format(getattr(e, 'message', e)))
+        return None
+
+
+def queue_add(codes, token=None, output=None, queue_file=None):
+    """
+    Adds database downloads to the download queue (see `downloader.scheduler`).
+
+    :param codes: The database codes to download.
+    :type codes: list
+    :param token: The token to use for authentication. If not provided, the user will be prompted to enter a token.
+    :type token: str
+    :param output: The output directory of the databases.
+    :type output: str
+    :param queue_file: The path of the queue file. If not provided, the default queue file is used.
+    :type queue_file: str
+
+    :return: The added jobs, or None if a job could not be added.
+    :rtype: list
+    """
+    from colorama import Fore
+    from .downloader.cli import token_prompt
+    from .downloader.scheduler import JobQueue
+    if not token:
+        token = token_prompt()
+    queue = JobQueue(queue_file)
+    jobs = []
+    try:
+        for code in codes:
+            jobs.append(queue.add(code, token, output))
+            print('Queued {}.'.format(Fore.GREEN + code + Fore.RESET))
+    except (ValueError, OSError) as e:
+        print(Fore.RED + 'Error: ' + Fore.RESET + '{}'.format(getattr(e, 'message', e)))
+        return None
+    return jobs
+
+
+def queue_run(token=None, queue_file=None, code_quota=None, token_quota=None, wait=True, connections=1, stream=False):
+    """
+    Runs the queued downloads of a token as fast as the download quotas allow, then prints the status of each job it ran.
+
+    :param token: The token to use for authentication. If not provided, the user will be prompted to enter a token.
+    :type token: str
+    :param queue_file: The path of the queue file. If not provided, the default queue file is used.
+    :type queue_file: str
+    :param code_quota: The number of downloads of a database per day, 0 for no limit. If not provided, the default quota is used.
+    :type code_quota: int
+    :param token_quota: The number of downloads with the token per day, 0 for no limit. If not provided, the default quota is used.
+    :type token_quota: int
+    :param wait: Whether to wait for the jobs that cannot run yet. Defaults to True.
+    :type wait: bool
+    :param connections: The number of connections to download each database with. Defaults to 1.
+    :type connections: int
+    :param stream: Whether to extract the databases while they are being downloaded. Defaults to False.
+    :type stream: bool
+
+    :return: The job after each attempt (see `JobQueue.run`), or None if the queue could not be run or a job failed.
+    :rtype: list
+    """
+    from colorama import Fore
+    from .downloader.cli import token_prompt
+    from .downloader.scheduler import STATUS_FAILED, JobQueue
+    if not token:
+        token = token_prompt()
+    quotas = {name: value or None for name, value in (('code_quota', code_quota), ('token_quota', token_quota)) if value is not None}
+    try:
+        jobs = JobQueue(queue_file, **quotas).run(token, wait, connections, stream)
+    except (ValueError, OSError) as e:
+        print(Fore.RED + 'Error: ' + Fore.RESET + '{}'.format(getattr(e, 'message', e)))
+        return None
+    print_jobs(jobs)
+    if any(job['status'] == STATUS_FAILED for job in jobs):
+        return None
+    return jobs
+
+
+def queue_list(queue_file=None):
+    """
+    Prints the jobs of the download queue.
+
+    :param queue_file: The path of the queue file. If not provided, the default queue file is used.
+    :type queue_file: str
+
+    :return: The jobs, or None if the queue could not be read.
+    :rtype: list
+    """
+    from colorama import Fore
+    from .downloader.scheduler import JobQueue
+    try:
+        jobs = JobQueue(queue_file).jobs()
+    except (ValueError, OSError) as e:
+        print(Fore.RED + 'Error: ' + Fore.RESET + '{}'.format(getattr(e, 'message', e)))
+        return None
+    print_jobs(jobs)
+    return jobs
+
+
+def queue_clear(queue_file=None):
+    """
+    Removes the finished jobs from the download queue.
+
+    :param queue_file: The path of the queue file. If not provided, the default queue file is used.
+    :type queue_file: str
+
+    :return: The removed jobs, or None if the queue could not be read.
+    :rtype: list
+    """
+    from colorama import Fore
+    from .downloader.scheduler import JobQueue
+    try:
+        jobs = JobQueue(queue_file).clear()
+    except (ValueError, OSError) as e:
+        print(Fore.RED + 'Error: ' + Fore.RESET + '{}'.format(getattr(e, 'message', e)))
+        return None
+    print('Removed {} finished jobs.'.format(len(jobs)))
+    return jobs
+
+
+def print_jobs(jobs):
+    """
+    Prints the status of download jobs, one job per line.
+
+    :param jobs: The jobs (see `JobQueue.add`).
+    :type jobs: list
+
+    :return: None
+    """
+    from colorama import Fore
+    from .downloader.scheduler import STATUS_DONE, STATUS_FAILED
+    colors = {STATUS_DONE: Fore.GREEN, STATUS_FAILED: Fore.RED}
+    for job in jobs:
+        details = job['path'] if job['status'] == STATUS_DONE else job['error']
+        line = '   {} {} (attempts: {})'.format(colors.get(job['status'], Fore.YELLOW) + job['status'] + Fore.RESET, job['code'], job['attempts'])
+        print(line + (': {}'.format(details) if details else ''))
+
+
+def generate_db(db_code, output=None, rows=DEFAULT_ROWS, seed=0, version=DEFAULT_VERSION, cities=None, archive=False):
+    """
+    Writes a synthetic database file with the structure of the real databases, for load testing (see `reader.generator`).
+
+    :param db_code: The code of the database to generate.
+    :type db_code: str
+    :param output: The path of the generated file. If not provided, the database code with the `.BIN`, `.CSV` or `.zip` extension is used.
+    :type output: str
+    :param rows: The number of ranges holding records.
+    :type rows: int
+    :param seed: The seed of the random generator. The same seed always generates the same file.
+    :type seed: int
+    :param version: The version written in the header of BIN databases, in the format "year.month.day".
+    :type version: str
+    :param cities: The number of distinct cities. If not provided, one per 20 ranges is used.
+    :type cities: int
+    :param archive: Whether to write a zip archive holding the database.
+    :type archive: bool
+
+    :return: The path to the generated file, or None if the generation failed.
+    :rtype: str
+    """
+    from colorama import Fore
+    from .reader.generator import generate_database
+    print('Generating {} ({} ranges, seed {})...'.format(Fore.BLUE + str(db_code).upper() + Fore.RESET, rows, seed))
+    try:
+        path = generate_database(db_code, output, rows, seed, version, cities, archive)
+    except (ValueError, OSError) as e:
+        print(Fore.RED + 'Error: ' + Fore.RESET + '{}'.format(getattr(e, 'message', e)))
+        return None
+    print('   Generated {}'.format(Fore.GREEN + path + Fore.RESET))
+    return path
+
+
+def serve(database, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY):
+    """
+    Serves lookups from a BIN database over HTTP and a Unix socket until interrupted (see `server`).
+
+    :param database: The path to the BIN database file.
+    :type database: str
+    :param host: The address to listen for HTTP requests on. Defaults to 127.0.0.1.
+    :type host: str
+    :param port: The port to listen for HTTP requests on, or None to disable HTTP. Defaults to 8080.
+    :type port: int
+    :param unix_socket: The path of a Unix socket to listen on (optional).
+    :type unix_socket: str
+    :param max_batch: The maximum number of lookups resolved together.
+    :type max_batch: int
+    :param max_delay: The maximum number of seconds a lookup waits for others to be resolved with.
+    :type max_delay: float
+
+    :return: True if the server ran and was stopped, False if it could not be started.
+    :rtype: bool
+    """
+    from colorama import Fore
+    from .server import run_server
+    if port is None and not unix_socket:
+        print(Fore.RED + 'Error: ' + Fore.RESET + 'Nothing to listen on, specify a port or a Unix socket.')
+        return False
+    try:
+        run_server(str(database), host, port, unix_socket, max_batch, max_delay)
+    except (ValueError, OSError) as e:
+        print(Fore.RED + 'Error: ' + Fore.RESET + '{}'.format(getattr(e, 'message', e)))
+        return False
+    return True
+
+
+def enrich(inputs, database=None, db_code=None, database_dir=None, field=None, delimiter=None, regex=None, output_format='jsonl', fields=None, output_file=None, workers=1, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Enriches log lines with the records of their IP addresses and prints the throughput to the standard error (see `enrich.enrich_logs`).
+
+    :param inputs: The log files to enrich, "-" standing for the standard input.
+    :type inputs: list
+    :param database: The path to the BIN database file.
+    :type database: str
+    :param db_code: The code of a downloaded BIN database, used if no database file is provided.
+    :type db_code: str
+    :param database_dir: The directory the database of `db_code` was downloaded to. Defaults to the current directory.
+    :type database_dir: str
+    :param field: The 1-based position of the field holding the IP address. Defaults to 1 if no regular expression is provided.
+    :type field: int
+    :param delimiter: The delimiter of the fields. Defaults to any whitespace.
+    :type delimiter: str
+    :param regex: A regular expression matching the IP address.
+    :type regex: str
+    :param output_format: The output format, "jsonl", "csv" or "tsv". Defaults to "jsonl".
+    :type output_format: str
+    :param fields: The record fields to output. Defaults to all the fields of the database.
+    :type fields: list
+    :param output_file: The file to write the enriched lines to. Defaults to the standard output.
+    :type output_file: str
+    :param workers: The number of worker processes looking up batches. Defaults to 1, looking up in a thread.
+    :type workers: int
+    :param batch_size: The number of lines looked up together.
+    :type batch_size: int
+
+    :return: The statistics of the run (see `enrich_logs`), or None if it failed.
+    :rtype: dict
+    """
+    from colorama import Fore
+    from .enrich import IPExtractor, RecordFormatter, enrich_logs, get_database_path, get_record_fields
+    from .reader.database import BINDatabase
+    try:
+        if database is None:
+            if not db_code:
+                raise ValueError('Specify a database file or the code of a downloaded database.')
+            database = get_database_path(db_code, database_dir)
+        with BINDatabase(str(database)) as db:
+            available = get_record_fields(db)
+        for name in fields or ():
+            if name not in available:
+                raise ValueError('Unknown field ({}), expected one of {}.'.format(name, ', '.join(available)))
+        extractor = IPExtractor(field, delimiter, regex)
+        formatter = RecordFormatter(output_format, fields or available)
+        if output_file:
+            with open(output_file, 'w', encoding='utf-8', newline='') as output:
+                stats = enrich_logs(inputs, str(database), output, extractor, formatter, workers, batch_size)
+        else:
+            stats = enrich_logs(inputs, str(database), sys.stdout, extractor, formatter, workers, batch_size)
+    except (ValueError, OSError) as e:
+        print(Fore.RED + 'Error: ' + Fore.RESET + '{}'.format(getattr(e, 'message', e)), file=sys.stderr)
+        return None
+    print('Enriched {} lines ({} matched) in {:.2f}s, {} lines/s'.format(
+        Fore.GREEN + str(stats['lines']) + Fore.RESET, stats['matched'], stats['seconds'], int(stats['lines_per_second'])
+    ), file=sys.stderr)
+    return stats
 
 
 def select(enable_download=True):
@@ -81,17 +723,12 @@ def select(enable_download=True):
     :return: The database code for the selected options.
     :rtype: str
     """
-    db_type_options = CODES.keys()
-    db_type = selection_input('Database Type', db_type_options)
-
-    db_content_options = [db['title'] for db in CODES[db_type['value']]]
-    db_content = selection_input('Database Content', db_content_options)
-
-    ip_type_options = CODES[db_type['value']][0].keys() - ['title']
-    ip_type = selection_input('IP Type', ip_type_options)
-
-    db_format_options = CODES[db_type['value']][0][ip_type['value']].keys()
-    db_format = selection_input('Database Format', db_format_options)
+    from .catalog import FORMATS, IP_TYPES, get_products, get_titles
+    from .selector.cli import get_code, selection_input
+    db_type = selection_input('Database Type', get_products())
+    db_content = selection_input('Database Content', get_titles(db_type['value']))
+    ip_type = selection_input('IP Type', IP_TYPES)
+    db_format = selection_input('Database Format', FORMATS)
 
     db_code = get_code(db_type['value'], db_content['value'], ip_type['value'], db_format['value'])
     if enable_download:
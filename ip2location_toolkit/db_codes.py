@@ -65,7 +65,7 @@ CODES = {
             },
             "ipv6": {
                 "cvs": "PX1LITECSVIPV6",
-                "bin": "PX1LITEBIN"
+                "bin": "PX1LITEBINIPV6"
             }
         },
         {
@@ -76,7 +76,7 @@ CODES = {
             },
             "ipv6": {
                 "cvs": "PX2LITECSVIPV6",
-                "bin": "PX2LITEBIN"
+                "bin": "PX2LITEBINIPV6"
             }
         },
         {
@@ -87,7 +87,7 @@ CODES = {
             },
             "ipv6": {
                 "cvs": "PX3LITECSVIPV6",
-                "bin": "PX3LITEBIN"
+                "bin": "PX3LITEBINIPV6"
             }
         },
         {
@@ -98,7 +98,7 @@ CODES = {
             },
             "ipv6": {
                 "cvs": "PX4LITECSVIPV6",
-                "bin": "PX4LITEBIN"
+                "bin": "PX4LITEBINIPV6"
             }
         },
         {
@@ -109,7 +109,7 @@ CODES = {
             },
             "ipv6": {
                 "cvs": "PX5LITECSVIPV6",
-                "bin": "PX5LITEBIN"
+                "bin": "PX5LITEBINIPV6"
             }
         },
         {
@@ -120,7 +120,7 @@ CODES = {
             },
             "ipv6": {
                 "cvs": "PX6LITECSVIPV6",
-                "bin": "PX6LITEBIN"
+                "bin": "PX6LITEBINIPV6"
             }
         },
         {
@@ -131,7 +131,7 @@ CODES = {
             },
             "ipv6": {
                 "cvs": "PX7LITECSVIPV6",
-                "bin": "PX7LITEBIN"
+                "bin": "PX7LITEBINIPV6"
             }
         },
         {
@@ -142,7 +142,7 @@ CODES = {
             },
             "ipv6": {
                 "cvs": "PX8LITECSVIPV6",
-                "bin": "PX8LITEBIN"
+                "bin": "PX8LITEBINIPV6"
             }
         },
         {
@@ -153,7 +153,7 @@ CODES = {
             },
             "ipv6": {
                 "cvs": "PX9LITECSVIPV6",
-                "bin": "PX9LITEBIN"
+                "bin": "PX9LITEBINIPV6"
             }
         },
         {
@@ -164,7 +164,7 @@ CODES = {
             },
             "ipv6": {
                 "cvs": "PX10LITECSVIPV6",
-                "bin": "PX10LITEBIN"
+                "bin": "PX10LITEBINIPV6"
             }
         },
         {
@@ -175,7 +175,7 @@ CODES = {
             },
             "ipv6": {
                 "cvs": "PX11LITECSVIPV6",
-                "bin": "PX11LITEBIN"
+                "bin": "PX11LITEBINIPV6"
             }
         }
     ]
@@ -0,0 +1,26 @@
+"""
+This module contains the default settings of the commands that the command-line interface shows in its help.
+
+It imports nothing, so that building the argument parser does not load the modules of the commands (see `cli`).
+The modules of the commands import their defaults from here.
+"""
+
+# enrich
+ENRICH_FORMATS = ('jsonl', 'csv', 'tsv')
+ENRICH_BATCH_SIZE = 10000
+
+# metrics
+METRICS_FORMATS = ('prometheus', 'json')
+
+# downloader.scan
+SCAN_WORKERS = 16
+
+# reader.generator
+GENERATE_ROWS = 100000
+GENERATE_VERSION = '24.1.1'
+
+# server
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8080
+SERVER_MAX_BATCH = 1024
+SERVER_MAX_DELAY = 0.0005
@@ -0,0 +1,158 @@
+"""
+This module contains functions for downloading many databases at the same time.
+
+The databases are downloaded and extracted by a bounded pool of worker threads sharing a single `requests.Session`, so
+that connections to the download server are reused. Every download shows its own progress bar next to an aggregate
+progress bar of all downloads, and the outcome of each database is reported with a machine-readable status.
+
+Functions:
+    - read_manifest(path): Read the database codes (and optional output paths) listed in a manifest file.
+    - get_error_status(error): Map an error raised by a download to its status.
+    - bulk_download(codes, token, output_path, workers, connections, stream): Download and extract many databases concurrently.
+    - print_summary(results): Print a summary of the results of a bulk download.
+    - write_report(results, path): Write the results of a bulk download to a JSON file.
+"""
+import json, threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from colorama import Fore
+from tqdm import tqdm
+from ..exceptions import DataBaseNotFound, DownloadLimitExceeded, DownloadPermissionDenied
+from ..validators import db_code_validator, token_validator
+from .download import download_extract_db
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+ERROR_STATUSES = (
+    (DataBaseNotFound, 'not_found'),
+    (DownloadLimitExceeded, 'limit_exceeded'),
+    (DownloadPermissionDenied, 'permission_denied'),
+    (ValueError, 'invalid'),
+)
+
+
+def read_manifest(path):
+    """
+    Read a manifest file listing the databases to download.
+
+    Each line holds a database code, optionally followed by the output path of that database. Blank lines and lines starting with ``#`` are ignored.
+
+    :param path: The path to the manifest file.
+    :type path: str
+    :return: A list of ``(code, output path)`` tuples. The output path is None when the line does not specify one.
+    :rtype: list
+    """
+    entries = []
+    with open(path, 'r') as file:
+        for line in file:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split(None, 1)
+            entries.append((parts[0], parts[1].strip() if len(parts) > 1 else None))
+    return entries
+
+def get_error_status(error):
+    """
+    Map an error raised while downloading a database to a machine-readable status.
+
+    :param error: The error.
+    :type error: Exception
+    :return: One of ``not_found``, ``limit_exceeded``, ``permission_denied``, ``invalid`` or ``error``.
+    :rtype: str
+    """
+    for error_class, status in ERROR_STATUSES:
+        if isinstance(error, error_class):
+            return status
+    return STATUS_ERROR
+
+def bulk_download(codes, token, output_path=None, workers=4, connections=1, stream=False):
+    """
+    Download and extract many databases concurrently.
+
+    :param codes: The databases to download, either as database codes or as ``(code, output path)`` tuples (see `read_manifest`).
+    :type codes: list
+    :param token: Token for authentication.
+    :type token: str
+    :param output_path: The path to extract the databases to when a database does not specify its own.
+    :type output_path: str
+    :param workers: The maximum number of databases to download at the same time (default is 4).
+    :type workers: int
+    :param connections: The number of connections to download each database with (default is 1).
+    :type connections: int
+    :param stream: Whether to extract the databases while they are being downloaded (default is False).
+    :type stream: bool
+    :raises ValueError: If the token is invalid.
+    :return: A list with one result per database, in the order of `codes`. Each result is a dictionary with the keys ``code``, ``status`` (``ok`` or an error status, see `get_error_status`), ``path`` and ``error``.
+    :rtype: list
+    """
+    token_validator(token)
+    entries = [entry if isinstance(entry, tuple) else (entry, None) for entry in codes]
+    workers = max(1, min(workers, len(entries)))
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers * connections)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    aggregate_bar = tqdm(unit='B', unit_scale=True, desc='Total', total=0)
+    aggregate_lock = threading.Lock()
+
+    def download_entry(entry):
+        db_code, db_output_path = entry
+        result = {'code': db_code, 'status': STATUS_OK, 'path': None, 'error': None}
+        counted = []
+
+        def progress_callback(length, file_length):
+            with aggregate_lock:
+                if not counted:
+                    counted.append(file_length)
+                    aggregate_bar.total += file_length
+                    aggregate_bar.refresh()
+                aggregate_bar.update(length)
+
+        try:
+            db_code_validator(db_code)
+            path = download_extract_db(db_code, token, db_output_path or output_path, connections=connections, stream=stream, session=session, progress_callback=progress_callback, raise_errors=True)
+            result['path'] = str(path) if path else None
+        except Exception as e:
+            result['status'] = get_error_status(e)
+            result['error'] = str(getattr(e, 'message', e))
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(download_entry, entries))
+    finally:
+        aggregate_bar.close()
+        session.close()
+    return results
+
+def print_summary(results):
+    """
+    Print a summary of the results of a bulk download.
+
+    :param results: The results returned by `bulk_download`.
+    :type results: list
+    :return: None
+    """
+    succeeded = len([result for result in results if result['status'] == STATUS_OK])
+    print('Downloaded {} of {} databases.'.format(succeeded, len(results)))
+    for result in results:
+        if result['status'] == STATUS_OK:
+            print('   {} {}: {}'.format(Fore.GREEN + result['status'] + Fore.RESET, result['code'], result['path']))
+        else:
+            print('   {} {}: {}'.format(Fore.RED + result['status'] + Fore.RESET, result['code'], result['error']))
+
+def write_report(results, path):
+    """
+    Write the results of a bulk download to a JSON file.
+
+    :param results: The results returned by `bulk_download`.
+    :type results: list
+    :param path: The path of the report.
+    :type path: str
+    :return: None
+    """
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2)
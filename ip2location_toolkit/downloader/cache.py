@@ -0,0 +1,282 @@
+"""
+This module contains the download cache shared by the processes of a host, holding the downloaded database archives.
+
+Archives are named after their database code and the release they hold (``DB11LITEBIN-<release key>.zip``), and kept
+next to the metadata sidecar recorded by the download (the size, ETag and Last-Modified date of the remote file). The
+release key is a digest of the ETag of the remote file, or of its Last-Modified date and size when it has no ETag (see
+`get_release_key`). Before a download, the remote file is probed: an archive is only reused when its sidecar matches
+the remote file, so a release republished under the same name is downloaded again, and a remote file without
+validators is never served from the cache.
+
+The downloads of a database code are serialized with an exclusive lock on a lock file of the code: processes that
+need the same database at the same time wait for the first download and reuse its archive instead of downloading it
+again, and an interrupted download is resumed by the next process. After an archive is added, the least recently used
+archives are removed until the cache fits its size budget. Archives whose code is locked by another process are kept.
+
+The cache directory is ``$IP2LOCATION_TOOLKIT_CACHE_DIR``, or ``ip2location_toolkit`` in ``$XDG_CACHE_HOME`` (``~/.cache``
+by default, ``%LOCALAPPDATA%`` on Windows). Its budget is ``$IP2LOCATION_TOOLKIT_CACHE_SIZE`` bytes (2 GB by default); a
+budget of 0 disables the cache.
+
+Classes:
+    - DownloadCache: A directory of downloaded archives bounded in size.
+
+Functions:
+    - get_release_key(remote_metadata): Get the key identifying the release of a remote file.
+    - get_default_cache_dir(): Get the default cache directory.
+    - get_default_max_size(): Get the default size budget of the cache.
+    - get_download_cache(): Get the cache used by the downloads.
+    - set_download_cache(cache): Set the cache used by the downloads.
+"""
+import contextlib, hashlib, os, sys, threading
+from .locking import lock_file, unlock_file
+from .metadata import get_metadata_path, read_metadata, remove_metadata
+
+CACHE_DIR_ENV = 'IP2LOCATION_TOOLKIT_CACHE_DIR'
+CACHE_SIZE_ENV = 'IP2LOCATION_TOOLKIT_CACHE_SIZE'
+DEFAULT_MAX_SIZE = 2 * 1000 ** 3
+ARCHIVE_SUFFIX = '.zip'
+LOCK_SUFFIX = '.lock'
+
+_default = {}
+_default_lock = threading.Lock()
+
+
+def get_release_key(remote_metadata):
+    """
+    Get the key identifying the release of a remote file: a digest of its ETag, or of its Last-Modified date and size
+    when it has no ETag.
+
+    :param remote_metadata: The metadata of the remote file (see `download.probe_remote_file`).
+    :type remote_metadata: dict
+    :return: 16 hexadecimal digits, or None if the remote file has no validator to identify its release.
+    :rtype: str
+    """
+    if remote_metadata.get('etag'):
+        identity = 'etag:' + remote_metadata['etag']
+    elif remote_metadata.get('last_modified') and remote_metadata.get('content_length'):
+        identity = 'last-modified:{}:{}'.format(remote_metadata['last_modified'], remote_metadata['content_length'])
+    else:
+        return None
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()[:16]
+
+
+class DownloadCache:
+    """
+    A directory of downloaded database archives, shared by the processes of a host and bounded in size.
+
+    :param directory: The path to the cache directory. It is created when an archive is first added.
+    :type directory: str
+    :param max_size: The size budget of the cache in bytes.
+    :type max_size: int
+    """
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        self.directory = str(directory or get_default_cache_dir())
+        self.max_size = max_size
+
+    def get_path(self, db_code, remote_metadata):
+        """
+        Get the path of the archive of the release of a database.
+
+        :param db_code: The database code.
+        :type db_code: str
+        :param remote_metadata: The metadata of the remote file (see `download.probe_remote_file`).
+        :type remote_metadata: dict
+        :return: The path of the archive, or None if the release of the remote file cannot be identified.
+        :rtype: str
+        """
+        release_key = get_release_key(remote_metadata)
+        if release_key is None:
+            return None
+        return os.path.join(self.directory, '{}-{}{}'.format(db_code, release_key, ARCHIVE_SUFFIX))
+
+    @contextlib.contextmanager
+    def lock(self, db_code, blocking=True):
+        """
+        Hold the exclusive lock of a database code, waiting for the process or thread holding it to release it.
+
+        :param db_code: The database code.
+        :type db_code: str
+        :param blocking: Whether to wait for the lock (default is True).
+        :type blocking: bool
+        :return: A context manager returning True if the lock is held (always True when blocking).
+        :rtype: contextlib.AbstractContextManager
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, db_code + LOCK_SUFFIX), 'a+b') as file:
+            locked = lock_file(file, blocking)
+            try:
+                yield locked
+            finally:
+                if locked:
+                    unlock_file(file)
+
+    def is_fresh(self, path, remote_metadata):
+        """
+        Check whether an archive of the cache can be reused: its download completed, and it holds the current release
+        of the remote file (the same ETag, or the same Last-Modified date and size).
+
+        :param path: The path of the archive (see `get_path`).
+        :type path: str
+        :param remote_metadata: The current metadata of the remote file (see `download.probe_remote_file`).
+        :type remote_metadata: dict
+        :return: True if the archive can be reused.
+        :rtype: bool
+        """
+        from .download import remote_file_changed
+        metadata = read_metadata(path)
+        if not metadata.get('complete') or not os.path.isfile(path):
+            return False
+        if metadata.get('content_length') and os.path.getsize(path) != metadata['content_length']:
+            return False
+        return not remote_file_changed(metadata, remote_metadata)
+
+    def touch(self, path):
+        """
+        Mark an archive as used now, so that it is the last to be removed.
+
+        :param path: The path of the archive.
+        :type path: str
+        :return: None
+        """
+        os.utime(path)
+
+    def entries(self):
+        """
+        List the archives of the cache, including interrupted downloads.
+
+        :return: A list of ``(path, size, last use)`` tuples, the least recently used first. The size includes the metadata sidecar.
+        :rtype: list
+        """
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            if not name.endswith(ARCHIVE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            size = stat.st_size
+            if os.path.exists(get_metadata_path(path)):
+                size += os.path.getsize(get_metadata_path(path))
+            entries.append((path, size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def size(self):
+        """
+        Get the size of the archives of the cache.
+
+        :return: The size in bytes.
+        :rtype: int
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=()):
+        """
+        Remove the least recently used archives until the cache fits its size budget. Archives whose database code is
+        locked (being downloaded) are kept.
+
+        :param keep: The paths of archives that must not be removed.
+        :type keep: iterable
+        :return: The paths of the removed archives.
+        :rtype: list
+        """
+        keep = {os.path.abspath(path) for path in keep}
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for path, size, _ in entries:
+            if total <= self.max_size:
+                break
+            if os.path.abspath(path) in keep:
+                continue
+            db_code = os.path.basename(path).rsplit('-', 1)[0]
+            with self.lock(db_code, blocking=False) as locked:
+                if not locked:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                remove_metadata(path)
+            total -= size
+            removed.append(path)
+        return removed
+
+    def clear(self):
+        """
+        Remove every archive of the cache that is not being downloaded.
+
+        :return: The paths of the removed archives.
+        :rtype: list
+        """
+        max_size = self.max_size
+        self.max_size = -1
+        try:
+            return self.evict()
+        finally:
+            self.max_size = max_size
+
+
+def get_default_cache_dir():
+    """
+    Get the default cache directory: ``$IP2LOCATION_TOOLKIT_CACHE_DIR``, or ``ip2location_toolkit`` in the cache
+    directory of the user (``$XDG_CACHE_HOME``, ``~/.cache`` or ``%LOCALAPPDATA%`` on Windows).
+
+    :return: The path of the directory.
+    :rtype: str
+    """
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+        base = os.environ['LOCALAPPDATA']
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ip2location_toolkit')
+
+def get_default_max_size():
+    """
+    Get the default size budget of the cache: ``$IP2LOCATION_TOOLKIT_CACHE_SIZE``, or 2 GB.
+
+    :raises ValueError: If the budget of the environment variable is not a number of bytes.
+    :return: The budget in bytes.
+    :rtype: int
+    """
+    max_size = os.environ.get(CACHE_SIZE_ENV)
+    try:
+        return int(max_size) if max_size else DEFAULT_MAX_SIZE
+    except ValueError:
+        raise ValueError('Invalid {} ({}), expected a number of bytes.'.format(CACHE_SIZE_ENV, max_size))
+
+def get_download_cache():
+    """
+    Get the cache used by the downloads: the cache set with `set_download_cache`, or a cache in the default directory
+    with the default budget.
+
+    :raises ValueError: If the budget of the environment variable is not a number of bytes.
+    :return: The cache, or None if the cache is disabled.
+    :rtype: DownloadCache
+    """
+    with _default_lock:
+        if 'cache' in _default:
+            return _default['cache']
+    max_size = get_default_max_size()
+    return DownloadCache(max_size=max_size) if max_size > 0 else None
+
+def set_download_cache(cache):
+    """
+    Set the cache used by the downloads.
+
+    :param cache: The cache, None to disable it, or False to use the default cache again.
+    :type cache: DownloadCache
+    :return: None
+    """
+    with _default_lock:
+        if cache is False:
+            _default.pop('cache', None)
+        else:
+            _default['cache'] = cache
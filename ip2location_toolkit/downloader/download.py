@@ -1,11 +1,19 @@
 from __future__ import annotations
-import os, requests
+import hashlib, os, requests, threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from tqdm import tqdm
 from colorama import Fore
 from zipfile import ZipFile
+from .. import metrics
 from ..exceptions import DataBaseNotFound, DownloadLimitExceeded, DownloadPermissionDenied
 from ..validators import token_validator, db_code_validator, path_validator
+from .cache import get_download_cache
+from .metadata import get_metadata_path, hash_file, read_metadata, remove_metadata, write_metadata
+from .stream import extract_stream
+
+MIN_SEGMENT_SIZE = 1000000
+EXTRACT_CHUNK_SIZE = 1024 * 1024
 
 
 def get_dir_or_create(path):
@@ -44,49 +52,440 @@ def get_downloaded_zip_path(db_code):
     file_path  = os.path.join(tmp_path, "{filename}.zip".format(filename=db_code))
     return file_path
 
-def download_file(url, path):
+def get_download_url(db_code, token):
+    """
+    Build the IP2Location download URL of a database.
+
+    :param db_code: The code of the database to download.
+    :type db_code: str
+    :param token: Token for authentication.
+    :type token: str
+    :return: The download URL.
+    :rtype: str
+    """
+    return "https://www.ip2location.com/download?token={}&file={}".format(token, db_code)
+
+def get_response_header(response, name):
+    """
+    Get a header of a response as a string.
+
+    :param response: The response to read the header from.
+    :type response: requests.Response
+    :param name: The name of the header.
+    :type name: str
+    :return: The value of the header, or None if the response does not have it.
+    :rtype: str or None
+    """
+    value = response.headers.get(name)
+    if value is None:
+        return None
+    return str(value)
+
+def parse_content_range(content_range):
+    """
+    Parse the value of a ``Content-Range`` header (``bytes <start>-<end>/<total>``).
+
+    :param content_range: The value of the header.
+    :type content_range: str
+    :return: A tuple of the first byte, the last byte and the total length (None if the total is unknown), or None if the value cannot be parsed.
+    :rtype: tuple or None
+    """
+    try:
+        unit, byte_range = content_range.strip().split(' ', 1)
+        byte_range, total = byte_range.split('/', 1)
+        start, end = byte_range.split('-', 1)
+        if unit != 'bytes':
+            return None
+        return int(start), int(end), None if total == '*' else int(total)
+    except (AttributeError, ValueError):
+        return None
+
+def check_download_response(response, file_length):
+    """
+    Check a download response for the errors IP2Location reports in place of the database file.
+
+    :param response: The response of the download request.
+    :type response: requests.Response
+    :param file_length: The length of the response body.
+    :type file_length: int
+    :raises DataBaseNotFound: if the file is not found
+    :raises DownloadLimitExceeded: if the download limit of the database has been exceeded
+    :raises DownloadPermissionDenied: if permission to download the file is denied
+    :return: None
+    """
+    if file_length < 100000:
+        if response.status_code == 404:
+            raise DataBaseNotFound
+        if response.text.startswith('THIS FILE CAN ONLY BE DOWNLOADED'):
+            raise DownloadLimitExceeded
+        if response.text == 'NO PERMISSION':
+            raise DownloadPermissionDenied
+
+def get_resume_state(path):
+    """
+    Check whether a previous download of a file was interrupted and can be resumed.
+
+    A download can be resumed when the file exists, its metadata sidecar marks it as incomplete, it is smaller than the
+    remote file and the sidecar holds a validator (ETag or Last-Modified) to make sure the remote file has not changed.
+
+    :param path: The path of the partially downloaded file.
+    :type path: str
+    :return: A tuple of the number of bytes already downloaded and the recorded metadata, or ``(0, {})`` if the download cannot be resumed.
+    :rtype: tuple
+    """
+    metadata = read_metadata(path)
+    if not metadata or metadata.get('complete') or not os.path.isfile(path):
+        return 0, {}
+    if not metadata.get('etag') and not metadata.get('last_modified'):
+        return 0, {}
+    offset = os.path.getsize(path)
+    content_length = metadata.get('content_length') or 0
+    if offset == 0 or offset >= content_length:
+        return 0, {}
+    return offset, metadata
+
+def get_resume_headers(offset, metadata):
+    """
+    Build the request headers asking the server for the rest of a partially downloaded file.
+
+    :param offset: The number of bytes already downloaded.
+    :type offset: int
+    :param metadata: The metadata recorded when the download started.
+    :type metadata: dict
+    :return: The request headers.
+    :rtype: dict
+    """
+    return {
+        'Range': 'bytes={}-'.format(offset),
+        'If-Range': metadata.get('etag') or metadata.get('last_modified'),
+    }
+
+def is_resumed_response(response, offset, metadata):
+    """
+    Check whether a response continues a partially downloaded file from the given offset.
+
+    :param response: The response of the range request.
+    :type response: requests.Response
+    :param offset: The number of bytes already downloaded.
+    :type offset: int
+    :param metadata: The metadata recorded when the download started.
+    :type metadata: dict
+    :return: True if the response body is the rest of the same remote file.
+    :rtype: bool
+    """
+    if response.status_code != 206:
+        return False
+    content_range = parse_content_range(get_response_header(response, 'content-range'))
+    if not content_range:
+        return False
+    start, end, total = content_range
+    if start != offset or total != metadata.get('content_length'):
+        return False
+    etag = get_response_header(response, 'etag')
+    if etag and metadata.get('etag') and etag != metadata['etag']:
+        return False
+    return True
+
+def probe_remote_file(url, session=None):
+    """
+    Get the size and validators (ETag and Last-Modified headers) of a remote file without downloading it.
+
+    A range request for the first byte of the file is sent instead of a HEAD request, as it is answered the same way as a download.
+
+    :param url: The URL of the remote file.
+    :type url: str
+    :param session: The session to send the request with (optional).
+    :type session: requests.Session
+    :raises DataBaseNotFound: if the file is not found
+    :raises DownloadLimitExceeded: if the download limit of the database has been exceeded
+    :raises DownloadPermissionDenied: if permission to download the file is denied
+    :return: A dictionary with the keys ``content_length``, ``etag`` and ``last_modified``.
+    :rtype: dict
+    """
+    response = (session or requests).get(url, stream=True, headers={'Range': 'bytes=0-0'})
+    try:
+        content_range = parse_content_range(get_response_header(response, 'content-range')) if response.status_code == 206 else None
+        if content_range and content_range[2]:
+            file_length = content_range[2]
+        else:
+            file_length = int(response.headers.get('content-length', 0))
+            check_download_response(response, file_length)
+        return {
+            'content_length': file_length,
+            'etag': get_response_header(response, 'etag'),
+            'last_modified': get_response_header(response, 'last-modified'),
+        }
+    finally:
+        response.close()
+
+def remote_file_changed(metadata, remote_metadata):
+    """
+    Compare the metadata recorded when a file was downloaded with the current metadata of the remote file.
+
+    The ETag is compared when both have one, the Last-Modified date otherwise, and the size is always compared. The
+    file is considered changed when there is no validator to compare.
+
+    :param metadata: The metadata recorded when the file was downloaded.
+    :type metadata: dict
+    :param remote_metadata: The current metadata of the remote file (see `probe_remote_file`).
+    :type remote_metadata: dict
+    :return: True if the remote file changed (or may have changed) since it was downloaded.
+    :rtype: bool
+    """
+    if not metadata or metadata.get('content_length') != remote_metadata.get('content_length'):
+        return True
+    if metadata.get('etag') and remote_metadata.get('etag'):
+        return metadata['etag'] != remote_metadata['etag']
+    if metadata.get('last_modified') and remote_metadata.get('last_modified'):
+        return metadata['last_modified'] != remote_metadata['last_modified']
+    return True
+
+def record_source_metadata(path, db_code, source_metadata, sha256=None):
+    """
+    Record the metadata of the remote file a database was extracted from in the sidecar of the database, so that later updates can check whether the remote file changed.
+    The checksum of the database is recorded along with the checksum of the archive.
+
+    :param path: The path to the extracted database.
+    :type path: str
+    :param db_code: The code of the database.
+    :type db_code: str
+    :param source_metadata: The metadata of the downloaded remote file.
+    :type source_metadata: dict
+    :param sha256: The SHA-256 of the database (default is the checksum recorded in its sidecar when it was extracted).
+    :type sha256: str
+    :return: None
+    """
+    if not source_metadata:
+        return
+    write_metadata(path, {
+        'db_code': db_code,
+        'content_length': source_metadata.get('content_length'),
+        'etag': source_metadata.get('etag'),
+        'last_modified': source_metadata.get('last_modified'),
+        'sha256': sha256 or read_metadata(path).get('sha256'),
+        'archive_sha256': source_metadata.get('sha256'),
+    })
+
+def split_byte_ranges(file_length, connections):
+    """
+    Split a file into contiguous byte ranges, one per connection. Files too small to be worth splitting get fewer ranges so that no range is smaller than `MIN_SEGMENT_SIZE`.
+
+    :param file_length: The length of the file in bytes.
+    :type file_length: int
+    :param connections: The maximum number of ranges.
+    :type connections: int
+    :return: A list of ``(first byte, last byte)`` tuples.
+    :rtype: list
+    """
+    count = max(1, min(connections, file_length // MIN_SEGMENT_SIZE))
+    segment_size = -(-file_length // count)
+    return [(start, min(start + segment_size, file_length) - 1) for start in range(0, file_length, segment_size)]
+
+def download_file(url, path, resume=True, retries=2, connections=1, session=None, progress_callback=None):
     """
     Download a file from a given URL and save it to a specified path.
 
+    If a previous download of the same file was interrupted, only the missing bytes are requested (using an HTTP range
+    request validated with the ETag or Last-Modified header recorded when the download started). The download restarts
+    from the beginning only when the server does not resume it.
+
+    With more than one connection, the file is split into byte ranges that are downloaded at the same time into a
+    preallocated file. The single-stream download is used when the server does not support range requests.
+
     :param url: the URL of the file to download
     :type url: str
     :param path: the path where the file will be saved
     :type path: str
+    :param resume: whether to resume an interrupted download of the file (default is True)
+    :type resume: bool
+    :param retries: the number of times to resume the download if the connection drops (default is 2)
+    :type retries: int
+    :param connections: the number of connections to download the file with (default is 1)
+    :type connections: int
+    :param session: the session to send the requests with, to reuse its connections (default is a new connection per request)
+    :type session: requests.Session
+    :param progress_callback: a function called with the number of bytes received and the size of the file every time a chunk is written
+    :type progress_callback: callable
     :raises DataBaseNotFound: if the file is not found
     :raises DownloadPermissionDenied: if permission to download the file is denied
     :return: the path where the file was saved
     :rtype: str
     """
-    request = requests.get(url, stream=True)
-    file_length = int(request.headers.get('content-length', 0))
-    chunk_size = min(int(file_length / 100), 500000)
+    attempt = 0
+    with metrics.span('download_file') as span:
+        while True:
+            try:
+                return _download_file(url, path, resume, connections, session or requests, progress_callback, span)
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt >= retries:
+                    raise e
+                attempt += 1
+                span.add('retries')
+                resume = True
+                connections = 1
+                print('   Connection interrupted, resuming download ({}/{})...'.format(attempt, retries))
+
+def _download_file(url, path, resume, connections, http, progress_callback, span):
+    offset, metadata = get_resume_state(path) if resume else (0, {})
+    if offset:
+        request = http.get(url, stream=True, headers=get_resume_headers(offset, metadata))
+        if not is_resumed_response(request, offset, metadata):
+            print('   The server did not resume the download, restarting...')
+            offset = 0
+            if request.status_code != 200:
+                request.close()
+                request = http.get(url, stream=True)
+    elif connections > 1:
+        request = http.get(url, stream=True, headers={'Range': 'bytes=0-'})
+        content_range = parse_content_range(get_response_header(request, 'content-range')) if request.status_code == 206 else None
+        if content_range and content_range[0] == 0 and content_range[2]:
+            return _download_segments(url, path, request, content_range[2], connections, http, progress_callback, span)
+    else:
+        request = http.get(url, stream=True)
+
+    if offset:
+        file_length = metadata['content_length']
+    else:
+        file_length = int(request.headers.get('content-length', 0))
+    chunk_size = get_chunk_size(file_length)
     print('   File size: {} MB'.format(format(file_length / 1000000, '.2f')))
 
-    if file_length < 100000:
-        if request.status_code == 404:
-            raise DataBaseNotFound
-        if request.text.startswith('THIS FILE CAN ONLY BE DOWNLOADED'):
-            raise DownloadLimitExceeded
-        if request.text == 'NO PERMISSION':
-            raise DownloadPermissionDenied
+    if offset:
+        print('   Resuming from {} MB'.format(format(offset / 1000000, '.2f')))
+    else:
+        check_download_response(request, file_length)
+        metadata = get_download_metadata(request, file_length)
+        write_metadata(path, metadata)
 
-    tqdm_bar = tqdm(unit='B', unit_scale=True, desc="   " + path.split('/')[-1], total=file_length)
+    tqdm_bar = tqdm(unit='B', unit_scale=True, desc="   " + str(path).split('/')[-1], total=file_length, initial=offset)
+    if progress_callback and offset:
+        progress_callback(offset, file_length)
 
-    with open(path, 'wb') as file:
+    # The bytes received before an interruption are hashed again when the download is resumed.
+    digest = hash_file(path) if offset else hashlib.sha256()
+    with open(path, 'ab' if offset else 'wb') as file:
         for chunk in request.iter_content(chunk_size=chunk_size):
             tqdm_bar.update(len(chunk))
+            if progress_callback:
+                progress_callback(len(chunk), file_length)
             file.write(chunk)
+            digest.update(chunk)
+            span.add('bytes_received', len(chunk))
+
+    downloaded = os.path.getsize(path)
+    if file_length and downloaded < file_length:
+        raise requests.exceptions.ChunkedEncodingError('Connection closed after {} of {} bytes.'.format(downloaded, file_length))
+    metadata['complete'] = True
+    metadata['sha256'] = digest.hexdigest()
+    write_metadata(path, metadata)
+    return path
+
+def get_chunk_size(file_length):
+    """
+    Get the size of the chunks to read a response body of a given length in.
+
+    :param file_length: The length of the response body.
+    :type file_length: int
+    :return: The chunk size in bytes.
+    :rtype: int
+    """
+    return max(min(int(file_length / 100), 500000), 1024)
+
+def get_download_metadata(response, file_length):
+    """
+    Build the metadata recorded when a download starts.
+
+    :param response: The response of the download request.
+    :type response: requests.Response
+    :param file_length: The length of the remote file.
+    :type file_length: int
+    :return: The metadata.
+    :rtype: dict
+    """
+    return {
+        'complete': False,
+        'content_length': file_length,
+        'etag': get_response_header(response, 'etag'),
+        'last_modified': get_response_header(response, 'last-modified'),
+    }
+
+def _download_segments(url, path, first_response, file_length, connections, http, progress_callback, span):
+    segments = split_byte_ranges(file_length, connections)
+    print('   File size: {} MB'.format(format(file_length / 1000000, '.2f')))
+    print('   Downloading with {} connections...'.format(len(segments)))
+
+    metadata = get_download_metadata(first_response, file_length)
+    write_metadata(path, metadata)
+    with open(path, 'wb') as file:
+        file.truncate(file_length)
+
+    tqdm_bar = tqdm(unit='B', unit_scale=True, desc="   " + str(path).split('/')[-1], total=file_length)
+    tqdm_lock = threading.Lock()
+    validator = metadata.get('etag') or metadata.get('last_modified')
+
+    def download_segment(index):
+        start, end = segments[index]
+        if index == 0:
+            response = first_response
+        else:
+            headers = {'Range': 'bytes={}-{}'.format(start, end)}
+            if validator:
+                headers['If-Range'] = validator
+            response = http.get(url, stream=True, headers=headers)
+            content_range = parse_content_range(get_response_header(response, 'content-range'))
+            if response.status_code != 206 or not content_range or content_range[0] != start:
+                response.close()
+                raise requests.exceptions.ConnectionError('The server did not honour the range request for bytes {}-{}.'.format(start, end))
+        remaining = end - start + 1
+        with open(path, 'r+b') as file:
+            file.seek(start)
+            for chunk in response.iter_content(chunk_size=get_chunk_size(remaining)):
+                chunk = chunk[:remaining]
+                file.write(chunk)
+                span.add('bytes_received', len(chunk))
+                remaining -= len(chunk)
+                with tqdm_lock:
+                    tqdm_bar.update(len(chunk))
+                    if progress_callback:
+                        progress_callback(len(chunk), file_length)
+                if remaining <= 0:
+                    break
+        response.close()
+        if remaining > 0:
+            raise requests.exceptions.ChunkedEncodingError('Connection closed {} bytes before the end of bytes {}-{}.'.format(remaining, start, end))
 
+    with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+        for future in [executor.submit(download_segment, index) for index in range(len(segments))]:
+            future.result()
+
+    # The segments arrive out of order, so the assembled file is hashed once they are all written.
+    metadata['complete'] = True
+    metadata['sha256'] = hash_file(path).hexdigest()
+    write_metadata(path, metadata)
     return path
 
-def download_database(db_code, token):
+def download_database(db_code, token, connections=1, session=None, progress_callback=None, raise_errors=False, cache=True):
     """
     Download a database file from the IP2Location website using a provided database code and a token for authentication.
 
+    The file is downloaded into the shared download cache (see `cache.DownloadCache`). The remote file is probed first,
+    and an archive of the same release (the same ETag, or Last-Modified date and size) downloaded before, by this or
+    another process, is reused instead of being downloaded again.
+
     :param db_code: The code of the database to download.
     :type db_code: str
     :param token: Token for authentication.
     :type token: str
+    :param connections: The number of connections to download the database with.
+    :type connections: int
+    :param session: The session to send the requests with.
+    :type session: requests.Session
+    :param progress_callback: A function called with the number of bytes received and the size of the file every time a chunk is written.
+    :type progress_callback: callable
+    :param raise_errors: Whether to raise errors instead of printing them and returning None.
+    :type raise_errors: bool
+    :param cache: The cache to download the file into, True for the default cache (see `cache.get_download_cache`), or False to download it into the temporary directory.
+    :type cache: DownloadCache or bool
     :return: The downloaded file.
     :rtype: file
     :raises Exception: If the token is invalid or if there is an error downloading the file.
@@ -94,18 +493,52 @@ def download_database(db_code, token):
     try:
         token_validator(token)
     except Exception as e:
+        if raise_errors:
+            raise e
         print('Failed to download database. {}'.format(getattr(e, 'message', e)))
         return
 
-    url = "https://www.ip2location.com/download?token={}&file={}".format(token, db_code)
-    file_path = get_downloaded_zip_path(db_code)
-    print('Downloading {}...'.format(Fore.BLUE + db_code + Fore.RESET))
+    url = get_download_url(db_code, token)
+    if cache is True:
+        cache = get_download_cache()
+    if not cache:
+        return _download_database(db_code, url, get_downloaded_zip_path(db_code), connections, session, progress_callback, raise_errors)
 
     try:
-        file = download_file(url, file_path)
+        remote_metadata = probe_remote_file(url, session)
     except Exception as e:
         print('   Error downloading {}. \n   {}'.format(Fore.RED + db_code + Fore.RESET, getattr(e, 'message', e)))
+        if raise_errors:
+            raise e
         return
+    file_path = cache.get_path(db_code, remote_metadata)
+    if file_path is None:
+        # Without a validator, a cached archive cannot be told from a newer release.
+        return _download_database(db_code, url, get_downloaded_zip_path(db_code), connections, session, progress_callback, raise_errors)
+
+    with cache.lock(db_code):
+        if cache.is_fresh(file_path, remote_metadata):
+            cache.touch(file_path)
+            metrics.increment('download_cache_hits_total', db_code=db_code)
+            print('Using cached {}.'.format(Fore.GREEN + db_code + Fore.RESET))
+            return file_path
+        file = _download_database(db_code, url, file_path, connections, session, progress_callback, raise_errors)
+    if file:
+        cache.evict(keep=[file_path])
+    return file
+
+def _download_database(db_code, url, file_path, connections, session, progress_callback, raise_errors):
+    print('Downloading {}...'.format(Fore.BLUE + db_code + Fore.RESET))
+
+    with metrics.span('download_database', db_code=db_code) as span:
+        try:
+            file = download_file(url, file_path, connections=connections, session=session, progress_callback=progress_callback)
+        except Exception as e:
+            span.fail(e)
+            print('   Error downloading {}. \n   {}'.format(Fore.RED + db_code + Fore.RESET, getattr(e, 'message', e)))
+            if raise_errors:
+                raise e
+            return
 
     print('   Downloaded {}.'.format( Fore.GREEN + db_code + Fore.RESET))
     return file
@@ -135,20 +568,54 @@ def rename_file(file_path: str | Path, new_file_name: str) -> Path:
         raise ValueError('The path is not a file.')
 
     file_dir = Path(file_path).parent
-    try:
-        Path(file_path).rename(Path(file_dir) / new_file_name)
-    except Exception as e:
-        raise Exception(f'An error occurred while renaming the file: {str(e)}')
-    new_file_path = Path(file_dir) / new_file_name
-    new_file_exists = new_file_path.exists()
-    if not new_file_exists:
-        raise Exception('The file was not renamed.')
+    with metrics.span('rename_file'):
+        try:
+            Path(file_path).rename(Path(file_dir) / new_file_name)
+            if os.path.exists(get_metadata_path(file_path)):
+                os.replace(get_metadata_path(file_path), get_metadata_path(Path(file_dir) / new_file_name))
+            else:
+                remove_metadata(Path(file_dir) / new_file_name)
+        except Exception as e:
+            raise Exception(f'An error occurred while renaming the file: {str(e)}')
+        new_file_path = Path(file_dir) / new_file_name
+        new_file_exists = new_file_path.exists()
+        if not new_file_exists:
+            raise Exception('The file was not renamed.')
     return new_file_path
 
+def extract_member(zip_ref: ZipFile, name: str, output_path: str = None) -> str:
+    """
+    Extract a member of a zip archive, hashing it as it is written.
+
+    :param zip_ref: The open zip archive.
+    :type zip_ref: ZipFile
+    :param name: The name of the member.
+    :type name: str
+    :param output_path: The path to extract the member to (optional). If not specified, the current directory will be used.
+    :type output_path: str
+    :raises ValueError: If the name of the member points outside of the output path.
+    :return: The SHA-256 of the extracted member.
+    :rtype: str
+    """
+    output_path = os.path.abspath(output_path or os.getcwd())
+    target = os.path.abspath(os.path.join(output_path, name))
+    if os.path.commonpath([output_path, target]) != output_path:
+        raise ValueError('The archive member {} points outside of the output directory.'.format(name))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    digest = hashlib.sha256()
+    with zip_ref.open(name) as source, open(target, 'wb') as file:
+        for chunk in iter(lambda: source.read(EXTRACT_CHUNK_SIZE), b''):
+            file.write(chunk)
+            digest.update(chunk)
+    return digest.hexdigest()
+
 def unzip_db(file_path: str, output_path: str = None) -> str:
     """
     Unzip a database file and extract specific files with extensions `.BIN` or `.CSV` to a specified output path.
 
+    The SHA-256 of each extracted file is computed while it is written and recorded in its sidecar, along with the
+    SHA-256 of the archive recorded when it was downloaded.
+
     :param file_path: The path to the database file.
     :type file_path: str
 
@@ -158,12 +625,15 @@ def unzip_db(file_path: str, output_path: str = None) -> str:
     :return: The path to the extracted file.
     :rtype: str
     """
+    archive_sha256 = read_metadata(file_path).get('sha256')
     try:
-        with ZipFile(file_path, 'r') as zip_ref:
+        with metrics.span('unzip_db') as span, ZipFile(file_path, 'r') as zip_ref:
             extract_list = [f for f in zip_ref.namelist() if f.upper().endswith('.BIN') or f.upper().endswith('.CSV')]
             for f in extract_list:
                 print('   Extracting {}...'.format(Fore.BLUE + f + Fore.RESET))
-                zip_ref.extract(f, output_path)
+                sha256 = extract_member(zip_ref, f, output_path)
+                write_metadata(os.path.join(output_path or os.getcwd(), f), {'sha256': sha256, 'archive_sha256': archive_sha256})
+                span.add('bytes_extracted', zip_ref.getinfo(f).file_size)
     except Exception as e:
         print('   Error unzipping {}.'.format(Fore.RED + file_path.split('/')[-1] + Fore.RESET))
         raise e
@@ -175,7 +645,69 @@ def unzip_db(file_path: str, output_path: str = None) -> str:
     print('   Extracted {} into {}'.format(Fore.GREEN + str(extracted_file_path) + Fore.RESET, Fore.GREEN + str(output_path) + Fore.RESET))
     return str(extracted_file_path)
 
-def download_extract_db(db_code, token, output_path=None):
+def download_stream_extract_db(db_code, token, output_path=None, session=None, progress_callback=None, raise_errors=False):
+    """
+    Download a database and extract it while it is being downloaded, without writing the zip archive to disk.
+
+    The database member is decompressed into a temporary file next to its final destination and its CRC-32 is checked
+    as the bytes arrive. An interrupted streaming download cannot be resumed.
+
+    :param db_code: The code of the database to download.
+    :type db_code: str
+    :param token: Token for authentication.
+    :type token: str
+    :param output_path: The path to extract the database to (optional). If not specified, the current directory will be used.
+    :type output_path: str
+    :param session: The session to send the requests with.
+    :type session: requests.Session
+    :param progress_callback: A function called with the number of bytes received and the size of the file every time a chunk is read.
+    :type progress_callback: callable
+    :param raise_errors: Whether to raise errors instead of printing them and returning None.
+    :type raise_errors: bool
+    :return: The path to the extracted database, or None if the download or the extraction failed.
+    :rtype: str
+    """
+    if not output_path:
+        output_path = os.path.abspath(Path.cwd())
+    url = get_download_url(db_code, token)
+    print('Downloading {}...'.format(Fore.BLUE + db_code + Fore.RESET))
+
+    try:
+        with metrics.span('download_stream_extract_db', db_code=db_code) as span:
+            request = (session or requests).get(url, stream=True)
+            file_length = int(request.headers.get('content-length', 0))
+            print('   File size: {} MB'.format(format(file_length / 1000000, '.2f')))
+            check_download_response(request, file_length)
+
+            source_metadata = get_download_metadata(request, file_length)
+            digest, member_digest = hashlib.sha256(), hashlib.sha256()
+            tqdm_bar = tqdm(unit='B', unit_scale=True, desc="   " + db_code, total=file_length)
+            def chunks():
+                for chunk in request.iter_content(chunk_size=get_chunk_size(file_length)):
+                    tqdm_bar.update(len(chunk))
+                    if progress_callback:
+                        progress_callback(len(chunk), file_length)
+                    span.add('bytes_received', len(chunk))
+                    digest.update(chunk)
+                    yield chunk
+            stream = chunks()
+            extracted_file_path = extract_stream(stream, str(output_path), db_code, member_digest)
+            # The central directory is read only to hash the whole archive.
+            for _ in stream:
+                pass
+            source_metadata['sha256'] = digest.hexdigest()
+            span.add('bytes_extracted', os.path.getsize(extracted_file_path))
+            record_source_metadata(extracted_file_path, db_code, source_metadata, member_digest.hexdigest())
+    except Exception as e:
+        print('   Error downloading {}. \n   {}'.format(Fore.RED + db_code + Fore.RESET, getattr(e, 'message', e)))
+        if raise_errors:
+            raise e
+        return
+
+    print('   Extracted {} into {}'.format(Fore.GREEN + str(extracted_file_path) + Fore.RESET, Fore.GREEN + str(output_path) + Fore.RESET))
+    return extracted_file_path
+
+def download_extract_db(db_code, token, output_path=None, connections=1, stream=False, session=None, progress_callback=None, raise_errors=False, cache=True):
     """
     Download and extract a database given a database code, a token, and an optional output path.
 
@@ -185,6 +717,18 @@ def download_extract_db(db_code, token, output_path=None):
     :type token: str
     :param output_path: An optional path to save the downloaded and extracted database.
     :type output_path: str
+    :param connections: The number of connections to download the database with.
+    :type connections: int
+    :param stream: Whether to extract the database while it is being downloaded instead of saving the zip archive first (`connections` is ignored).
+    :type stream: bool
+    :param session: The session to send the requests with, to reuse its connections across downloads.
+    :type session: requests.Session
+    :param progress_callback: A function called with the number of bytes received and the size of the file every time a chunk is received.
+    :type progress_callback: callable
+    :param raise_errors: Whether to raise errors instead of printing them and returning None.
+    :type raise_errors: bool
+    :param cache: The cache to download the archive into, True for the default cache, or False to download it into the temporary directory (see `download_database`). Streaming downloads are not cached.
+    :type cache: DownloadCache or bool
     :return: The path to the downloaded and extracted database.
     :rtype: str
     :raises: Exception: If the token or database code is invalid, or if there is an error downloading or extracting the database.
@@ -194,13 +738,19 @@ def download_extract_db(db_code, token, output_path=None):
         db_code_validator(db_code)
         path_validator(output_path, required=False)
     except Exception as e:
+        if raise_errors:
+            raise e
         print('Failed to download database. {}'.format(getattr(e, 'message', e)))
         return
 
-    file_path = download_database(db_code, token)
+    if stream:
+        return download_stream_extract_db(db_code, token, output_path, session, progress_callback, raise_errors)
+
+    file_path = download_database(db_code, token, connections, session, progress_callback, raise_errors, cache)
     if not file_path:
         return
     output_file_path = unzip_db(file_path, output_path)
     if output_file_path:
-        output_file_path = rename_file(output_file_path, db_code + '.BIN')
+        output_file_path = rename_file(output_file_path, db_code + Path(output_file_path).suffix.upper())
+        record_source_metadata(output_file_path, db_code, read_metadata(file_path))
     return output_file_path
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+This module contains functions for holding exclusive locks on files, shared by the processes of a host.
+
+The locks are advisory locks taken with ``flock`` on POSIX systems, and with ``msvcrt.locking`` on the first byte of the
+file on Windows. They are released when the file is closed, so a process that stops releases its locks.
+
+Functions:
+    - lock_file(file, blocking): Take the exclusive lock of an open file.
+    - unlock_file(file): Release the lock of an open file.
+"""
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+LOCK_POLL_INTERVAL = 0.1
+
+
+def lock_file(file, blocking=True):
+    """
+    Take the exclusive lock of an open file.
+
+    :param file: The file, opened in a binary mode that allows writing (``a+b``).
+    :type file: file object
+    :param blocking: Whether to wait for the process holding the lock to release it (default is True).
+    :type blocking: bool
+    :return: True if the lock is held, False if it is held by another process and `blocking` is False.
+    :rtype: bool
+    """
+    if fcntl is not None:
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            return False
+    while True:
+        try:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(LOCK_POLL_INTERVAL)
+
+def unlock_file(file):
+    """
+    Release the lock of an open file taken with `lock_file`.
+
+    :param file: The file.
+    :type file: file object
+    :return: None
+    """
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
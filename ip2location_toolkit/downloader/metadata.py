@@ -0,0 +1,116 @@
+"""
+This module contains functions for reading and writing the metadata sidecar files kept next to downloaded files.
+
+A sidecar is a small JSON document stored at ``<file path>.meta.json``. It records what is known about the remote file
+a local file was downloaded from (validators such as the ETag and Last-Modified headers, the total size) and whether
+the download has completed, so that interrupted downloads can be resumed safely.
+
+The sidecars also serve as checksum manifests: the SHA-256 of a downloaded archive (``sha256``) is computed over the
+chunks as they are received, and the SHA-256 of an extracted database (``sha256``, with the digest of its archive in
+``archive_sha256``) as it is written, so that integrity checks and comparisons across hosts can read the digests
+instead of hashing the files again.
+
+Functions:
+    - get_metadata_path(path): Get the path of the sidecar file of a given file.
+    - read_metadata(path): Read the sidecar of a given file.
+    - write_metadata(path, metadata): Write the sidecar of a given file.
+    - remove_metadata(path): Remove the sidecar of a given file.
+    - hash_file(path, digest): Hash the contents of a file.
+    - verify_checksum(path): Check a file against the SHA-256 recorded in its sidecar.
+"""
+import hashlib, json, os
+
+METADATA_SUFFIX = '.meta.json'
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_metadata_path(path):
+    """
+    Get the path of the metadata sidecar file of a given file.
+
+    :param path: The path of the file the metadata describes.
+    :type path: str or Path
+    :return: The path of the sidecar file.
+    :rtype: str
+    """
+    return str(path) + METADATA_SUFFIX
+
+def read_metadata(path):
+    """
+    Read the metadata sidecar of a given file.
+
+    :param path: The path of the file the metadata describes.
+    :type path: str or Path
+    :return: The metadata, or an empty dictionary if the sidecar does not exist or is not valid.
+    :rtype: dict
+    """
+    try:
+        with open(get_metadata_path(path), 'r') as file:
+            metadata = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(metadata, dict):
+        return {}
+    return metadata
+
+def write_metadata(path, metadata):
+    """
+    Write the metadata sidecar of a given file. The sidecar is written to a temporary file first and then moved in place so that readers never see a half-written sidecar.
+
+    :param path: The path of the file the metadata describes.
+    :type path: str or Path
+    :param metadata: The metadata to write.
+    :type metadata: dict
+    :return: The path of the sidecar file.
+    :rtype: str
+    """
+    metadata_path = get_metadata_path(path)
+    tmp_path = metadata_path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(metadata, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, metadata_path)
+    return metadata_path
+
+def remove_metadata(path):
+    """
+    Remove the metadata sidecar of a given file if it exists.
+
+    :param path: The path of the file the metadata describes.
+    :type path: str or Path
+    :return: None
+    """
+    try:
+        os.remove(get_metadata_path(path))
+    except FileNotFoundError:
+        pass
+
+def hash_file(path, digest=None):
+    """
+    Hash the contents of a file, reading it in chunks.
+
+    :param path: The path of the file.
+    :type path: str or Path
+    :param digest: The hash object to update (default is a new SHA-256 hash object).
+    :type digest: hashlib.hash
+    :return: The updated hash object.
+    :rtype: hashlib.hash
+    """
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest
+
+def verify_checksum(path):
+    """
+    Check a file against the SHA-256 recorded in its sidecar, for example after copying it to another host.
+
+    :param path: The path of the file.
+    :type path: str or Path
+    :return: True if the file matches its checksum, False if it does not, or None if no checksum was recorded.
+    :rtype: bool
+    """
+    expected = read_metadata(path).get('sha256')
+    if not expected:
+        return None
+    return hash_file(path).hexdigest() == expected
@@ -0,0 +1,282 @@
+"""
+This module contains functions for updating every BIN database found in a set of directories at once.
+
+The directories are searched for ``.BIN`` files, and the header of each file is read concurrently with a single
+positioned read. The code of each database is taken from the metadata recorded when it was downloaded, from its
+header, or from its file name. The outdated databases are grouped by code: each code is checked against the remote
+file and downloaded once, and the extracted database is installed atomically at every location that needs it (see
+`update.install_db`), hard-linked when the location is on the same file system as the download.
+
+The result of each file is reported with the SHA-256 recorded in its sidecar when it was extracted, so that the
+reports of different hosts can be compared without hashing the files, and with a machine-readable status:
+
+    - ``up_to_date``: The database is up to date.
+    - ``unchanged``: A newer version is due, but the remote database has not changed since the file was downloaded.
+    - ``updated``: The database was replaced with the new version.
+    - ``unknown``: The file is not a valid database, or its code cannot be told.
+    - ``error``: The update failed; the file was left in place.
+
+Example:
+    results = update_fleet(['/srv/geoip', '/opt/app/data'], token)
+    print_report(results)
+
+Functions:
+    - find_databases(paths): Find the BIN database files in directories.
+    - read_file_header(path): Read the header of a BIN database file with a single positioned read.
+    - get_file_db_code(path, header): Tell the code of a BIN database file.
+    - scan_databases(paths, workers, force): Read the headers of the BIN database files in directories concurrently.
+    - update_fleet(paths, token, workers, force, check_remote, keep_previous, connections): Update every outdated BIN database in directories.
+    - print_report(results, file): Print the results of an update as JSON.
+"""
+import json, os, shutil, sys
+from concurrent.futures import ThreadPoolExecutor
+from .. import metrics
+from ..catalog import get_entry
+from ..defaults import SCAN_WORKERS as DEFAULT_WORKERS
+from ..reader.header import HEADER_STRUCT, parse_db_header
+from ..reader.lite_csv import guess_db_code
+from .metadata import get_metadata_path, read_metadata
+from .update import get_update_tmp_dir, install_db, version_outdated
+
+BIN_EXTENSION = '.BIN'
+STATUS_UP_TO_DATE = 'up_to_date'
+STATUS_UNCHANGED = 'unchanged'
+STATUS_UPDATED = 'updated'
+STATUS_UNKNOWN = 'unknown'
+STATUS_ERROR = 'error'
+
+
+def find_databases(paths):
+    """
+    Find the BIN database files in directories, recursively. Hidden directories, such as the temporary directories of
+    updates in progress, are skipped. Paths to files are returned as they are.
+
+    :param paths: The paths to the directories (or files).
+    :type paths: list
+    :return: The absolute paths of the files, sorted and without duplicates.
+    :rtype: list
+    """
+    found = set()
+    for path in paths:
+        path = os.path.abspath(str(path))
+        if os.path.isfile(path):
+            found.add(path)
+            continue
+        for directory, directories, files in os.walk(path):
+            directories[:] = [name for name in directories if not name.startswith('.')]
+            for name in files:
+                if name.upper().endswith(BIN_EXTENSION):
+                    found.add(os.path.join(directory, name))
+    return sorted(found)
+
+def read_file_header(path):
+    """
+    Read and parse the header of a BIN database file with a single positioned read.
+
+    :param path: The path to the database file.
+    :type path: str
+    :raises ValueError: If the header is not valid.
+    :raises OSError: If the file cannot be read.
+    :return: The parsed header.
+    :rtype: DBHeader
+    """
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        if hasattr(os, 'pread'):
+            header = os.pread(fd, HEADER_STRUCT.size, 0)
+        else:
+            header = os.read(fd, HEADER_STRUCT.size)
+    finally:
+        os.close(fd)
+    return parse_db_header(header)
+
+def _bin_code(db_code):
+    entry = get_entry(db_code)
+    return db_code if entry is not None and entry.db_format == 'bin' else None
+
+def get_file_db_code(path, header):
+    """
+    Tell the code of a BIN database file, from the metadata recorded when it was downloaded, from the product and
+    type in its header (files released since 2021 record their product), or from its file name, either as saved by
+    the toolkit (DB11LITEBIN.BIN) or as named in the downloaded archives (IP2LOCATION-LITE-DB11.IPV6.BIN).
+
+    :param path: The path to the database file.
+    :type path: str
+    :param header: The parsed header of the file.
+    :type header: DBHeader
+    :return: The database code, or None if it cannot be told.
+    :rtype: str
+    """
+    db_code = _bin_code(read_metadata(path).get('db_code'))
+    if db_code:
+        return db_code
+    if header.product:
+        prefix = 'DB' if header.product == 'ip2location' else 'PX'
+        db_code = _bin_code('{}{}LITEBIN{}'.format(prefix, header.db_type, 'IPV6' if header.ipv6_count else ''))
+        if db_code:
+            return db_code
+    name = os.path.basename(path)
+    db_code = _bin_code(os.path.splitext(name)[0].upper())
+    if db_code:
+        return db_code
+    try:
+        return _bin_code(guess_db_code(name).replace('LITECSV', 'LITEBIN'))
+    except ValueError:
+        return None
+
+def _scan_file(path, force):
+    result = {'path': path, 'code': None, 'version': None, 'status': STATUS_UNKNOWN, 'new_version': None, 'sha256': read_metadata(path).get('sha256'), 'error': None}
+    try:
+        header = read_file_header(path)
+        result['version'] = header.version
+        result['code'] = get_file_db_code(path, header)
+        if result['code'] is None:
+            result['error'] = 'Cannot tell the database code of the file.'
+        elif force or version_outdated(header.version):
+            result['status'] = None
+        else:
+            result['status'] = STATUS_UP_TO_DATE
+    except (ValueError, OSError) as e:
+        result['error'] = str(getattr(e, 'message', e))
+    return result
+
+def scan_databases(paths, workers=DEFAULT_WORKERS, force=False):
+    """
+    Find the BIN database files in directories and read their headers concurrently.
+
+    :param paths: The paths to the directories (or files).
+    :type paths: list
+    :param workers: The number of files read at the same time.
+    :type workers: int
+    :param force: Consider every database outdated.
+    :type force: bool
+    :return: One result per file, with the keys ``path``, ``code``, ``version``, ``status``, ``new_version``, ``sha256`` and ``error``. The status of the outdated databases is None.
+    :rtype: list
+    """
+    files = find_databases(paths)
+    with ThreadPoolExecutor(max(1, workers)) as executor:
+        return list(executor.map(lambda path: _scan_file(path, force), files))
+
+def _changed_results(db_code, token, results):
+    from .download import get_download_url, probe_remote_file, remote_file_changed
+    remote_metadata = probe_remote_file(get_download_url(db_code, token))
+    changed = []
+    for result in results:
+        metadata = read_metadata(result['path'])
+        if not metadata or metadata.get('db_code') != db_code or remote_file_changed(metadata, remote_metadata):
+            changed.append(result)
+        else:
+            result['status'] = STATUS_UNCHANGED
+    return changed
+
+def _install_copy(source, result, keep_previous):
+    target = result['path']
+    tmp_dir = get_update_tmp_dir(target)
+    try:
+        staged = os.path.join(tmp_dir, os.path.basename(target))
+        try:
+            os.link(source, staged)
+        except OSError:
+            shutil.copy2(source, staged)
+        if os.path.exists(get_metadata_path(source)):
+            shutil.copy2(get_metadata_path(source), get_metadata_path(staged))
+        install_db(staged, target, keep_previous)
+        result['status'] = STATUS_UPDATED
+        result['sha256'] = read_metadata(target).get('sha256')
+    except (ValueError, OSError) as e:
+        result['status'] = STATUS_ERROR
+        result['error'] = str(getattr(e, 'message', e))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def _update_group(db_code, token, results, executor, check_remote, keep_previous, connections):
+    from colorama import Fore
+    from .download import download_extract_db
+    if check_remote:
+        try:
+            results = _changed_results(db_code, token, results)
+        except Exception as e:
+            print('   Failed to check the remote database: {}'.format(getattr(e, 'message', e)))
+        if not results:
+            print('   The remote database {} has not changed.'.format(Fore.GREEN + db_code + Fore.RESET))
+            return 0
+
+    print('   Downloading {} for {} files...'.format(Fore.BLUE + db_code + Fore.RESET, len(results)))
+    tmp_dir = get_update_tmp_dir(results[0]['path'])
+    try:
+        try:
+            source = download_extract_db(db_code, token, tmp_dir, connections=connections, raise_errors=True)
+            if not source:
+                raise ValueError('An error occurred while downloading the database file')
+            new_version = read_file_header(source).version
+        except Exception as e:
+            for result in results:
+                result['status'] = STATUS_ERROR
+                result['error'] = str(getattr(e, 'message', e))
+            return 1
+        for result in results:
+            result['new_version'] = new_version
+        list(executor.map(lambda result: _install_copy(source, result, keep_previous), results))
+        return 1
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def update_fleet(paths, token, workers=DEFAULT_WORKERS, force=False, check_remote=True, keep_previous=False, connections=1):
+    """
+    Update every outdated BIN database found in directories, downloading each database code once.
+
+    :param paths: The paths to the directories (or files).
+    :type paths: list
+    :param token: Token for authentication, or a function returning it, called once if a database is outdated.
+    :type token: str or callable
+    :param workers: The number of files read (and installed) at the same time.
+    :type workers: int
+    :param force: Update the databases even if they are up to date.
+    :type force: bool
+    :param check_remote: Check that the remote database changed since the files were downloaded before downloading it (default is True).
+    :type check_remote: bool
+    :param keep_previous: Keep the replaced versions so that they can be restored with `update.rollback_db` (default is False).
+    :type keep_previous: bool
+    :param connections: The number of connections to download each database with.
+    :type connections: int
+    :return: One result per file (see the module documentation for the statuses), with the keys ``path``, ``code``, ``version``, ``status``, ``new_version``, ``sha256`` and ``error``.
+    :rtype: list
+    """
+    with metrics.span('update_fleet') as span:
+        print('Scanning {} for BIN databases...'.format(', '.join(str(path) for path in paths)))
+        results = scan_databases(paths, workers, force)
+        span.add('files', len(results))
+        groups = {}
+        for result in results:
+            if result['status'] is None:
+                groups.setdefault(result['code'], []).append(result)
+        print('   Found {} databases, {} outdated ({} database codes).'.format(
+            len(results), sum(len(group) for group in groups.values()), len(groups)
+        ))
+
+        if groups and callable(token):
+            token = token()
+        with ThreadPoolExecutor(max(1, workers)) as executor:
+            for db_code, group in sorted(groups.items()):
+                span.add('downloads', _update_group(db_code, token, group, executor, check_remote, keep_previous, connections))
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        span.add('updated', counts.get(STATUS_UPDATED, 0))
+        span.add('failed', counts.get(STATUS_ERROR, 0))
+        print('Updated {} of {} databases ({}).'.format(
+            counts.get(STATUS_UPDATED, 0), len(results), ', '.join('{} {}'.format(count, status) for status, count in sorted(counts.items())) or 'none found'
+        ))
+        return results
+
+def print_report(results, file=None):
+    """
+    Print the results of an update as a JSON array.
+
+    :param results: The results returned by `update_fleet`.
+    :type results: list
+    :param file: The file to print the report to (default is the standard output).
+    :type file: file
+    :return: None
+    """
+    print(json.dumps(results, indent=2), file=file or sys.stdout)
@@ -0,0 +1,343 @@
+"""
+This module contains a persistent queue of database downloads, scheduled around the download limits of IP2Location.
+
+IP2Location limits how many times a database can be downloaded with a token in a day, and answers with an error
+(`DownloadLimitExceeded`) once the limit is reached. Retrying right away only delays the reset of the limit, so the
+downloads are queued instead, and a runner drains the queue as fast as the quotas allow:
+
+- A database code is downloaded at most ``code_quota`` times per token, and a token is used for at most
+  ``token_quota`` downloads, in every window of ``window`` seconds (a day by default).
+- After a limit error, the downloads of the code with the token are held back with an exponential backoff with
+  jitter, doubling after every limit error until a download succeeds. Other transient errors (network errors, failed
+  extractions) retry the job with the same backoff, up to ``max_attempts`` attempts. A database that does not exist,
+  a permission error or an invalid job fails the job at once.
+
+The queue is a JSON file holding the jobs, the start times of the downloads of the current window and the backoff
+of each code, written atomically under an exclusive lock, so that several processes can add jobs to the same queue.
+Tokens are not stored: each job records a digest of its token, and a runner only runs the jobs of the token it is
+given. One runner drains a queue at a time; a job left running by a runner that stopped (a restart, a crash) is run
+again by the next runner, resuming the partial download where it stopped.
+
+The queue file is ``$IP2LOCATION_TOOLKIT_QUEUE_FILE``, or ``queue.json`` in the download cache directory.
+
+Classes:
+    - JobQueue: A persistent queue of database downloads.
+
+Functions:
+    - get_default_queue_path(): Get the default path of the queue file.
+    - get_token_key(token): Get the digest a job records instead of its token.
+    - get_backoff(failures, base, maximum): Get the delay before a retry.
+"""
+import contextlib, hashlib, json, os, random, time, uuid
+from colorama import Fore
+from .. import metrics
+from ..exceptions import DataBaseNotFound, DownloadLimitExceeded, DownloadPermissionDenied
+from ..validators import db_code_validator, token_validator
+from .cache import get_default_cache_dir
+from .download import download_extract_db
+from .locking import lock_file, unlock_file
+
+QUEUE_FILE_ENV = 'IP2LOCATION_TOOLKIT_QUEUE_FILE'
+QUEUE_FILE_NAME = 'queue.json'
+LOCK_SUFFIX = '.lock'
+RUNNER_LOCK_SUFFIX = '.run.lock'
+
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+DEFAULT_CODE_QUOTA = 5
+DEFAULT_TOKEN_QUOTA = None
+DEFAULT_WINDOW = 24 * 60 * 60
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF_BASE = 60
+DEFAULT_BACKOFF_MAX = 6 * 60 * 60
+POLL_INTERVAL = 60
+
+# The errors retrying cannot fix.
+PERMANENT_ERRORS = (DataBaseNotFound, DownloadPermissionDenied, ValueError)
+
+
+def get_default_queue_path():
+    """
+    Get the default path of the queue file: ``$IP2LOCATION_TOOLKIT_QUEUE_FILE``, or ``queue.json`` in the download cache directory.
+
+    :return: The path of the queue file.
+    :rtype: str
+    """
+    return os.environ.get(QUEUE_FILE_ENV) or os.path.join(get_default_cache_dir(), QUEUE_FILE_NAME)
+
+def get_token_key(token):
+    """
+    Get the digest a job records instead of its token, so that the queue file does not hold the tokens.
+
+    :param token: The token.
+    :type token: str
+    :return: The first 16 hexadecimal digits of the SHA-256 of the token.
+    :rtype: str
+    """
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+
+def get_backoff(failures, base=DEFAULT_BACKOFF_BASE, maximum=DEFAULT_BACKOFF_MAX):
+    """
+    Get the delay before retrying after a number of consecutive failures: the exponential backoff ``base * 2 ** (failures - 1)``,
+    capped at `maximum`, of which a random half is removed so that the runners retrying at the same time spread out.
+
+    :param failures: The number of consecutive failures (at least 1).
+    :type failures: int
+    :param base: The delay after the first failure in seconds.
+    :type base: float
+    :param maximum: The maximum delay in seconds.
+    :type maximum: float
+    :return: The delay in seconds, between half and all of the backoff.
+    :rtype: float
+    """
+    backoff = min(maximum, base * 2 ** min(max(failures, 1) - 1, 32))
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+def _quota_key(token_key, db_code):
+    return '{} {}'.format(token_key, db_code)
+
+
+class JobQueue:
+    """
+    A persistent queue of database downloads, drained as fast as the download quotas allow.
+
+    :param path: The path of the queue file (default: see `get_default_queue_path`). It is created when a job is first added.
+    :type path: str
+    :param code_quota: The number of downloads of a database code per token in a window, or None for no limit (default is 5).
+    :type code_quota: int
+    :param token_quota: The number of downloads with a token in a window, or None for no limit (default is None).
+    :type token_quota: int
+    :param window: The length of the quota window in seconds (default is a day).
+    :type window: float
+    :param max_attempts: The number of attempts of a job failing with transient errors before it fails (default is 5). Limit errors do not count.
+    :type max_attempts: int
+    :param backoff_base: The backoff after the first failure in seconds (default is 60).
+    :type backoff_base: float
+    :param backoff_max: The maximum backoff in seconds (default is 6 hours).
+    :type backoff_max: float
+    """
+    def __init__(self, path=None, code_quota=DEFAULT_CODE_QUOTA, token_quota=DEFAULT_TOKEN_QUOTA, window=DEFAULT_WINDOW, max_attempts=DEFAULT_MAX_ATTEMPTS, backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX):
+        self.path = str(path or get_default_queue_path())
+        self.code_quota = code_quota
+        self.token_quota = token_quota
+        self.window = window
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    @contextlib.contextmanager
+    def _state(self, write=True):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + LOCK_SUFFIX, 'a+b') as lock:
+            lock_file(lock, True)
+            try:
+                state = self._read()
+                yield state
+                if write:
+                    self._write(state)
+            finally:
+                unlock_file(lock)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            state = {}
+        except ValueError:
+            raise ValueError('The queue file {} is not valid.'.format(self.path))
+        state.setdefault('jobs', [])
+        state.setdefault('history', [])
+        state.setdefault('backoff', {})
+        return state
+
+    def _write(self, state):
+        now = time.time()
+        state['history'] = [entry for entry in state['history'] if entry['time'] > now - self.window]
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(state, file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def add(self, db_code, token, output_path=None):
+        """
+        Add a download to the queue. A download already waiting in the queue (the same code, token and output path) is not added again.
+
+        :param db_code: The code of the database to download.
+        :type db_code: str
+        :param token: Token for authentication.
+        :type token: str
+        :param output_path: The path to extract the database to (default is the current directory). It is stored as an absolute path, as the runner may run in another directory.
+        :type output_path: str
+        :raises ValueError: If the database code or the token is invalid.
+        :return: The job, a dictionary with the keys ``id``, ``code``, ``token_key``, ``output``, ``status``, ``attempts``, ``not_before``, ``added``, ``path`` and ``error``.
+        :rtype: dict
+        """
+        db_code_validator(db_code)
+        token_validator(token)
+        output_path = os.path.abspath(output_path or os.getcwd())
+        token_key = get_token_key(token)
+        with self._state() as state:
+            for job in state['jobs']:
+                if (job['code'], job['token_key'], job['output']) == (db_code, token_key, output_path) and job['status'] in (STATUS_PENDING, STATUS_RUNNING):
+                    return job
+            job = {'id': uuid.uuid4().hex, 'code': db_code, 'token_key': token_key, 'output': output_path, 'status': STATUS_PENDING, 'attempts': 0, 'not_before': 0, 'added': time.time(), 'path': None, 'error': None}
+            state['jobs'].append(job)
+        return job
+
+    def jobs(self, status=None):
+        """
+        Get the jobs of the queue, in the order they were added.
+
+        :param status: Only get the jobs with this status (``pending``, ``running``, ``done`` or ``failed``).
+        :type status: str
+        :return: The jobs (see `add`).
+        :rtype: list
+        """
+        with self._state(write=False) as state:
+            return [job for job in state['jobs'] if status is None or job['status'] == status]
+
+    def clear(self, statuses=(STATUS_DONE, STATUS_FAILED)):
+        """
+        Remove the finished jobs from the queue.
+
+        :param statuses: The statuses of the jobs to remove (default is the finished jobs).
+        :type statuses: tuple
+        :return: The removed jobs.
+        :rtype: list
+        """
+        with self._state() as state:
+            removed = [job for job in state['jobs'] if job['status'] in statuses]
+            state['jobs'] = [job for job in state['jobs'] if job['status'] not in statuses]
+        return removed
+
+    def get_ready_time(self, job, state, now=None):
+        """
+        Get the time a pending job can run at: after its own backoff, the backoff of its code, and the time its quotas free up.
+
+        :param job: The job.
+        :type job: dict
+        :param state: The state of the queue.
+        :type state: dict
+        :param now: The current time (default is the time of the call).
+        :type now: float
+        :return: The time as a Unix timestamp, at most `now` if the job can run now.
+        :rtype: float
+        """
+        now = time.time() if now is None else now
+        key = _quota_key(job['token_key'], job['code'])
+        ready = max(job['not_before'], state['backoff'].get(key, {}).get('until', 0))
+        window = [entry for entry in state['history'] if entry['time'] > now - self.window]
+        quotas = ((self.code_quota, [entry['time'] for entry in window if _quota_key(entry['token_key'], entry['code']) == key]), (self.token_quota, [entry['time'] for entry in window if entry['token_key'] == job['token_key']]))
+        for quota, times in quotas:
+            if quota is not None and len(times) >= quota:
+                # The quota frees up when enough of the downloads of the window leave it.
+                ready = max(ready, sorted(times)[len(times) - quota] + self.window)
+        return ready
+
+    def _claim(self, token_key):
+        with self._state() as state:
+            now = time.time()
+            pending = [job for job in state['jobs'] if job['status'] == STATUS_PENDING and job['token_key'] == token_key]
+            if not pending:
+                return None, None
+            ready_times = [(self.get_ready_time(job, state, now), index) for index, job in enumerate(pending)]
+            ready, index = min(ready_times)
+            if ready > now:
+                return None, ready
+            job = pending[index]
+            job['status'] = STATUS_RUNNING
+            job['attempts'] += 1
+            state['history'].append({'code': job['code'], 'token_key': token_key, 'time': now})
+            return dict(job), None
+
+    def _finish(self, job, path=None, error=None):
+        with self._state() as state:
+            stored = next((item for item in state['jobs'] if item['id'] == job['id']), None)
+            if stored is None:
+                return job
+            key = _quota_key(stored['token_key'], stored['code'])
+            now = time.time()
+            if error is None:
+                stored.update(status=STATUS_DONE, path=str(path), error=None)
+                state['backoff'].pop(key, None)
+                status = STATUS_DONE
+            elif isinstance(error, DownloadLimitExceeded):
+                # The limit applies to every download of the code with the token, and resets no matter how many times the job ran.
+                failures = state['backoff'].get(key, {}).get('failures', 0) + 1
+                state['backoff'][key] = {'failures': failures, 'until': now + get_backoff(failures, self.backoff_base, self.backoff_max)}
+                stored.update(status=STATUS_PENDING, attempts=stored['attempts'] - 1, error=error.message)
+                status = 'limited'
+            elif isinstance(error, PERMANENT_ERRORS) or stored['attempts'] >= self.max_attempts:
+                stored.update(status=STATUS_FAILED, error=str(getattr(error, 'message', error)))
+                status = STATUS_FAILED
+            else:
+                stored.update(status=STATUS_PENDING, not_before=now + get_backoff(stored['attempts'], self.backoff_base, self.backoff_max), error=str(getattr(error, 'message', error)))
+                status = 'retry'
+            metrics.increment('download_queue_attempts_total', db_code=stored['code'], status=status)
+            return dict(stored)
+
+    def _recover(self):
+        with self._state() as state:
+            for job in state['jobs']:
+                if job['status'] == STATUS_RUNNING:
+                    job['status'] = STATUS_PENDING
+
+    def run(self, token, wait=True, connections=1, stream=False, poll_interval=POLL_INTERVAL):
+        """
+        Run the pending jobs of a token as fast as the quotas and the backoffs allow, one at a time.
+
+        Only one runner drains a queue at a time. The jobs left running by a runner that stopped are run again first.
+
+        :param token: Token for authentication. Only the jobs added with this token are run.
+        :type token: str
+        :param wait: Whether to wait for the jobs that cannot run yet (default is True). If False, the runner returns when no job can run now.
+        :type wait: bool
+        :param connections: The number of connections to download each database with (default is 1).
+        :type connections: int
+        :param stream: Whether to extract the databases while they are being downloaded (default is False).
+        :type stream: bool
+        :param poll_interval: The longest time to wait before reading the queue again, to pick up the jobs added by other processes, in seconds (default is 60).
+        :type poll_interval: float
+        :raises ValueError: If the token is invalid, or if another runner is draining the queue.
+        :return: The job after each attempt of this run, in the order they ran: ``done``, ``failed``, or ``pending`` when it will be retried.
+        :rtype: list
+        """
+        token_validator(token)
+        token_key = get_token_key(token)
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + RUNNER_LOCK_SUFFIX, 'a+b') as runner_lock:
+            if not lock_file(runner_lock, False):
+                raise ValueError('Another process is running the jobs of the queue {}.'.format(self.path))
+            try:
+                self._recover()
+                return self._run(token, token_key, wait, connections, stream, poll_interval)
+            finally:
+                unlock_file(runner_lock)
+
+    def _run(self, token, token_key, wait, connections, stream, poll_interval):
+        finished = []
+        while True:
+            job, ready = self._claim(token_key)
+            if job is None:
+                if ready is None or not wait:
+                    return finished
+                delay = min(max(ready - time.time(), 0), poll_interval)
+                print('Waiting {:.0f}s for the download quotas...'.format(delay))
+                time.sleep(delay)
+                continue
+
+            print('Running the download of {} (attempt {})...'.format(Fore.BLUE + job['code'] + Fore.RESET, job['attempts']))
+            try:
+                path = download_extract_db(job['code'], token, job['output'], connections=connections, stream=stream, raise_errors=True)
+                if not path:
+                    raise OSError('Failed to extract the database.')
+                job = self._finish(job, path)
+            except Exception as e:
+                job = self._finish(job, error=e)
+                if job['status'] == STATUS_PENDING:
+                    print('   {} will be retried: {}'.format(Fore.RED + job['code'] + Fore.RESET, job['error']))
+            finished.append(job)
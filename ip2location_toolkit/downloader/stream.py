@@ -0,0 +1,254 @@
+"""
+This module contains functions for extracting a database from a zip archive while the archive is still being downloaded.
+
+The archive is read sequentially from an iterator of chunks (such as ``requests.Response.iter_content``). The local file
+headers are parsed as they arrive, the `.BIN` or `.CSV` member is decompressed straight into a temporary file next to
+its final destination, and its CRC-32 is checked (and its digest computed) as it goes. The archive itself is never
+written to disk.
+
+Functions:
+    - extract_stream(chunks, output_path, file_name, digest): Extract the database member of a zip archive read from a stream of chunks.
+"""
+import os, struct, tempfile, zlib
+from zipfile import BadZipFile
+
+LOCAL_FILE_HEADER_SIGNATURE = b'PK\x03\x04'
+CENTRAL_DIRECTORY_SIGNATURE = b'PK\x01\x02'
+END_OF_CENTRAL_DIRECTORY_SIGNATURE = b'PK\x05\x06'
+DATA_DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+LOCAL_FILE_HEADER = struct.Struct('<HHHHHIIIHH')
+ZIP64_EXTRA_ID = 0x0001
+ZIP64_LIMIT = 0xFFFFFFFF
+FLAG_ENCRYPTED = 0x01
+FLAG_DATA_DESCRIPTOR = 0x08
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+DATABASE_EXTENSIONS = ('.BIN', '.CSV')
+
+
+class ChunkReader:
+    """
+    A reader that reads exact amounts of bytes from an iterator of chunks of arbitrary sizes.
+    """
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def read_some(self, size):
+        """
+        Read up to `size` bytes, returning as soon as any bytes are available.
+
+        :param size: The maximum number of bytes to read.
+        :type size: int
+        :return: The bytes read, or an empty bytes object at the end of the stream.
+        :rtype: bytes
+        """
+        while not self._buffer:
+            try:
+                self._buffer = bytes(next(self._chunks))
+            except StopIteration:
+                return b''
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def read(self, size):
+        """
+        Read `size` bytes, or fewer at the end of the stream.
+
+        :param size: The number of bytes to read.
+        :type size: int
+        :return: The bytes read.
+        :rtype: bytes
+        """
+        parts = []
+        while size > 0:
+            data = self.read_some(size)
+            if not data:
+                break
+            parts.append(data)
+            size -= len(data)
+        return b''.join(parts)
+
+    def read_exact(self, size):
+        """
+        Read exactly `size` bytes.
+
+        :param size: The number of bytes to read.
+        :type size: int
+        :raises BadZipFile: If the stream ends first.
+        :return: The bytes read.
+        :rtype: bytes
+        """
+        data = self.read(size)
+        if len(data) != size:
+            raise BadZipFile('The archive ended unexpectedly.')
+        return data
+
+    def unread(self, data):
+        """
+        Push bytes back to the front of the stream.
+
+        :param data: The bytes to push back.
+        :type data: bytes
+        :return: None
+        """
+        self._buffer = bytes(data) + self._buffer
+
+
+def parse_zip64_extra(extra, compressed_size, uncompressed_size):
+    """
+    Read the 64-bit sizes of a member from the zip64 extra field of its local file header.
+
+    :param extra: The extra field of the local file header.
+    :type extra: bytes
+    :param compressed_size: The 32-bit compressed size from the header.
+    :type compressed_size: int
+    :param uncompressed_size: The 32-bit uncompressed size from the header.
+    :type uncompressed_size: int
+    :return: A tuple of the compressed size, the uncompressed size and whether a zip64 field was found.
+    :rtype: tuple
+    """
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, size = struct.unpack_from('<HH', extra, position)
+        if header_id == ZIP64_EXTRA_ID:
+            values = extra[position + 4:position + 4 + size]
+            offset = 0
+            if uncompressed_size == ZIP64_LIMIT and offset + 8 <= len(values):
+                uncompressed_size = struct.unpack_from('<Q', values, offset)[0]
+                offset += 8
+            if compressed_size == ZIP64_LIMIT and offset + 8 <= len(values):
+                compressed_size = struct.unpack_from('<Q', values, offset)[0]
+            return compressed_size, uncompressed_size, True
+        position += 4 + size
+    return compressed_size, uncompressed_size, False
+
+def is_database_member(name):
+    """
+    Check whether an archive member is a database file (`.BIN` or `.CSV`).
+
+    :param name: The name of the member.
+    :type name: str
+    :return: True if the member is a database file.
+    :rtype: bool
+    """
+    return name.upper().endswith(DATABASE_EXTENSIONS)
+
+def _discard(data):
+    # The data of the members that are not extracted is read and checked, but not written.
+    pass
+
+def _copy_stored(reader, size, write):
+    crc = 0
+    while size > 0:
+        data = reader.read_some(min(size, 1 << 20))
+        if not data:
+            raise BadZipFile('The archive ended unexpectedly.')
+        crc = zlib.crc32(data, crc)
+        write(data)
+        size -= len(data)
+    return crc
+
+def _copy_deflated(reader, write):
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    crc = 0
+    size = 0
+    while not decompressor.eof:
+        data = reader.read_some(1 << 20)
+        if not data:
+            raise BadZipFile('The archive ended unexpectedly.')
+        data = decompressor.decompress(data)
+        crc = zlib.crc32(data, crc)
+        size += len(data)
+        write(data)
+    reader.unread(decompressor.unused_data)
+    return crc, size
+
+def _read_data_descriptor(reader, zip64):
+    signature = reader.read_exact(4)
+    if signature != DATA_DESCRIPTOR_SIGNATURE:
+        reader.unread(signature)
+    if zip64:
+        return struct.unpack('<IQQ', reader.read_exact(20))
+    return struct.unpack('<III', reader.read_exact(12))
+
+def extract_stream(chunks, output_path, file_name, digest=None):
+    """
+    Extract the database member (`.BIN` or `.CSV`) of a zip archive read from an iterator of chunks.
+
+    The member is decompressed into a temporary file in `output_path` and moved to its final name only after its size
+    and CRC-32 have been checked, so a failed extraction never leaves a partial database behind. Other members are
+    decompressed and discarded.
+
+    :param chunks: An iterator of the bytes of the zip archive, such as ``response.iter_content()``.
+    :type chunks: iterable
+    :param output_path: The directory to extract the database to.
+    :type output_path: str
+    :param file_name: The name of the extracted database without its extension. The extension of the member is appended to it.
+    :type file_name: str
+    :param digest: A hash object updated with the bytes of the database as they are written, such as ``hashlib.sha256()`` (optional).
+    :type digest: hashlib.hash
+    :raises BadZipFile: If the archive is invalid or truncated, the CRC-32 of the member does not match or the archive has no database member.
+    :return: The path to the extracted database.
+    :rtype: str
+    """
+    reader = ChunkReader(chunks)
+    extracted_file_path = None
+
+    while True:
+        signature = reader.read(4)
+        if signature in (b'', CENTRAL_DIRECTORY_SIGNATURE, END_OF_CENTRAL_DIRECTORY_SIGNATURE):
+            break
+        if signature != LOCAL_FILE_HEADER_SIGNATURE:
+            raise BadZipFile('Invalid local file header signature.')
+
+        _, flags, method, _, _, crc, compressed_size, uncompressed_size, name_length, extra_length = LOCAL_FILE_HEADER.unpack(reader.read_exact(LOCAL_FILE_HEADER.size))
+        name = reader.read_exact(name_length).decode('utf-8' if flags & 0x800 else 'cp437')
+        extra = reader.read_exact(extra_length)
+        compressed_size, uncompressed_size, zip64 = parse_zip64_extra(extra, compressed_size, uncompressed_size)
+        extract = extracted_file_path is None and is_database_member(name)
+
+        if flags & FLAG_ENCRYPTED:
+            raise BadZipFile('Encrypted archives are not supported ({}).'.format(name))
+        if method == METHOD_STORED and flags & FLAG_DATA_DESCRIPTOR:
+            raise BadZipFile('Stored members with a data descriptor cannot be streamed ({}).'.format(name))
+        if method not in (METHOD_STORED, METHOD_DEFLATED):
+            raise BadZipFile('Unsupported compression method {} ({}).'.format(method, name))
+
+        if extract:
+            print('   Extracting {}...'.format(name))
+            final_path = os.path.join(output_path, file_name + os.path.splitext(name)[1].upper())
+            tmp_file = tempfile.NamedTemporaryFile(dir=output_path, prefix='.' + os.path.basename(final_path) + '.', suffix='.part', delete=False)
+            def write(data):
+                tmp_file.write(data)
+                if digest:
+                    digest.update(data)
+        else:
+            tmp_file = None
+            write = _discard
+
+        try:
+            if method == METHOD_STORED:
+                actual_crc = _copy_stored(reader, compressed_size, write)
+                actual_size = compressed_size
+            else:
+                actual_crc, actual_size = _copy_deflated(reader, write)
+            if flags & FLAG_DATA_DESCRIPTOR:
+                crc, compressed_size, uncompressed_size = _read_data_descriptor(reader, zip64)
+            if actual_crc != crc or actual_size != uncompressed_size:
+                raise BadZipFile('Bad CRC-32 for file {}.'.format(name))
+            if tmp_file:
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+                tmp_file.close()
+                os.replace(tmp_file.name, final_path)
+                extracted_file_path = final_path
+        except BaseException:
+            if tmp_file:
+                tmp_file.close()
+                os.remove(tmp_file.name)
+            raise
+
+    if extracted_file_path is None:
+        raise BadZipFile('The archive does not contain a database file.')
+    return extracted_file_path
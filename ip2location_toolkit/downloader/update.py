@@ -1,8 +1,10 @@
 import struct
-import datetime, os, pathlib
-from colorama import Fore
+import datetime, os, pathlib, shutil, tempfile
+from .. import metrics
 from ..validators import path_validator
-from .download import download_extract_db
+from .metadata import get_metadata_path, read_metadata
+
+PREVIOUS_VERSION_SUFFIX = '.prev'
 
 def get_db_header(filepath):
     """
@@ -57,15 +59,158 @@ def get_db_version(filepath):
     return f"{year}.{month}.{day}"
 
 def new_version_available(filepath):
-    current_version = get_db_version(filepath)
-    current_version_date = version_to_date(current_version)
+    return version_outdated(get_db_version(filepath))
+
+def version_outdated(version):
+    """
+    Check whether a newer version of a database was released since the given version. The LITE databases are released monthly, so a version is outdated once its month is over.
+
+    :param version: The version in the format "year.month.day".
+    :type version: str
+    :return: True if a newer version was released.
+    :rtype: bool
+    """
+    current_version_date = version_to_date(version)
     current_date = datetime.date.today()
     month_over = int((current_date.year - current_version_date.year) * 12 + (current_date.month - current_version_date.month))
     if month_over >= 1:
         return True
     return False
 
-def update_db(filepath, db_code, token, force=False):
+def remote_version_changed(filepath, db_code, token):
+    """
+    Check whether the remote database changed since the database file was downloaded, without downloading it.
+
+    The size, ETag and Last-Modified date of the remote file are compared with the metadata recorded next to the
+    database file when it was downloaded. The database is considered changed if no metadata was recorded, if it was
+    downloaded from another database code, or if the remote file cannot be checked.
+
+    :param filepath: The path to the IP2Location database file.
+    :type filepath: str
+    :param db_code: The code of the database to download.
+    :type db_code: str
+    :param token: Token for authentication.
+    :type token: str
+    :return: True if the remote database changed (or may have changed).
+    :rtype: bool
+    """
+    metadata = read_metadata(filepath)
+    if not metadata or metadata.get('db_code') != db_code:
+        return True
+    from .download import get_download_url, probe_remote_file, remote_file_changed
+    try:
+        remote_metadata = probe_remote_file(get_download_url(db_code, token))
+    except Exception as e:
+        print('   Failed to check the remote database: {}'.format(getattr(e, 'message', e)))
+        return True
+    return remote_file_changed(metadata, remote_metadata)
+
+def get_previous_version_path(filepath):
+    """
+    Get the path where the previous version of a database file is kept after an update.
+
+    :param filepath: The path to the IP2Location database file.
+    :type filepath: str
+    :return: The path to the previous version.
+    :rtype: str
+    """
+    return str(filepath) + PREVIOUS_VERSION_SUFFIX
+
+def get_update_tmp_dir(filepath):
+    """
+    Create a temporary directory next to a database file to download its new version into. Being on the same file system, the new version can then replace the database file atomically.
+
+    :param filepath: The path to the IP2Location database file.
+    :type filepath: str
+    :return: The path to the temporary directory.
+    :rtype: str
+    """
+    return tempfile.mkdtemp(prefix='.' + os.path.basename(filepath) + '.', suffix='.update', dir=os.path.dirname(os.path.abspath(filepath)))
+
+def fsync_path(path):
+    """
+    Flush a file or a directory to disk. Directories cannot be flushed on every platform; failures to flush them are ignored.
+
+    :param path: The path to the file or the directory.
+    :type path: str
+    :return: None
+    """
+    is_dir = os.path.isdir(path)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        if is_dir:
+            return
+        raise
+    try:
+        os.fsync(fd)
+    except OSError:
+        if not is_dir:
+            raise
+    finally:
+        os.close(fd)
+
+def _replace_with_metadata(source, destination):
+    os.replace(source, destination)
+    if os.path.exists(get_metadata_path(source)):
+        os.replace(get_metadata_path(source), get_metadata_path(destination))
+    elif os.path.exists(get_metadata_path(destination)):
+        os.remove(get_metadata_path(destination))
+
+def install_db(new_filepath, filepath, keep_previous=False):
+    """
+    Replace a database file with a new version atomically.
+
+    The new version is flushed to disk and its header is validated before it is moved over the database file with
+    ``os.replace``, so processes reading the database see either the complete old version or the complete new version.
+    Processes that already opened (or memory-mapped) the old version keep reading it until they reopen the file.
+
+    :param new_filepath: The path to the new version. It must be on the same file system as the database file.
+    :type new_filepath: str
+    :param filepath: The path to the IP2Location database file to replace.
+    :type filepath: str
+    :param keep_previous: Keep the replaced version next to the database file so that it can be restored with `rollback_db` (default is False).
+    :type keep_previous: bool
+    :raises ValueError: If the new version is not a valid database file.
+    :return: The path to the database file.
+    :rtype: str
+    """
+    fsync_path(new_filepath)
+    version_to_date(get_db_version(new_filepath))
+
+    if keep_previous and os.path.isfile(filepath):
+        previous_filepath = get_previous_version_path(filepath)
+        if os.path.exists(previous_filepath):
+            os.remove(previous_filepath)
+        try:
+            os.link(filepath, previous_filepath)
+        except OSError:
+            shutil.copy2(filepath, previous_filepath)
+        if os.path.exists(get_metadata_path(filepath)):
+            shutil.copy2(get_metadata_path(filepath), get_metadata_path(previous_filepath))
+
+    _replace_with_metadata(new_filepath, filepath)
+    fsync_path(os.path.dirname(os.path.abspath(filepath)))
+    return filepath
+
+def rollback_db(filepath):
+    """
+    Restore the version of a database file that was kept by the last update (see `install_db`).
+
+    :param filepath: The path to the IP2Location database file.
+    :type filepath: str
+    :raises ValueError: If no previous version was kept.
+    :return: The path to the database file.
+    :rtype: str
+    """
+    previous_filepath = get_previous_version_path(filepath)
+    if not os.path.isfile(previous_filepath):
+        raise ValueError("No previous version of the database file was kept")
+    _replace_with_metadata(previous_filepath, filepath)
+    fsync_path(os.path.dirname(os.path.abspath(filepath)))
+    return filepath
+
+def update_db(filepath, db_code, token, force=False, check_remote=True, keep_previous=False):
     """
     Update the IP2Location database file.
 
@@ -77,33 +222,48 @@ def update_db(filepath, db_code, token, force=False):
     :type token: str
     :param force: Force update the database file even if the current version is up to date.
     :type force: bool
+    :param check_remote: Check that the remote database changed since the last download before downloading it (default is True).
+    :type check_remote: bool
+    :param keep_previous: Keep the replaced version so that it can be restored with `rollback_db` (default is False).
+    :type keep_previous: bool
     :return: The path to the updated IP2Location database file.
     :rtype: str
     """
-    try:
-        filename = os.path.basename(filepath)
-        dirname = os.path.dirname(filepath)
-        filepath = path_validator(filepath)
+    from colorama import Fore
+    from .download import download_extract_db
+    with metrics.span('update_db', db_code=db_code) as span:
+        try:
+            filename = os.path.basename(filepath)
+            filepath = path_validator(filepath)
 
-        print(f"Updating database ({filename})...")
+            print(f"Updating database ({filename})...")
 
-        if not os.path.isfile(filepath) or not str(filename).upper().endswith('.BIN'):
-            raise ValueError("The path specified is not a valid IP2Location BIN database file")
+            if not os.path.isfile(filepath) or not str(filename).upper().endswith('.BIN'):
+                raise ValueError("The path specified is not a valid IP2Location BIN database file")
 
-        print ("   Checking for a newer version...")
-        if not new_version_available(filepath):
-            print (f"   Database {Fore.GREEN + filename + Fore.RESET} is up to date.")
-            if not force:
-                return
-            print("   Forcing update...")
-        else:
-            print (f"   New version available for {Fore.YELLOW + filename + Fore.RESET}!")
+            print ("   Checking for a newer version...")
+            if not new_version_available(filepath):
+                print (f"   Database {Fore.GREEN + filename + Fore.RESET} is up to date.")
+                if not force:
+                    return
+                print("   Forcing update...")
+            else:
+                print (f"   New version available for {Fore.YELLOW + filename + Fore.RESET}!")
 
-        output_filepath = download_extract_db(db_code, token, dirname)
-        if not output_filepath:
-            raise ValueError("An error occurred while downloading the database file")
+            if check_remote and not remote_version_changed(filepath, db_code, token):
+                print (f"   The remote database has not changed since {Fore.GREEN + filename + Fore.RESET} was downloaded.")
+                return
 
-        return output_filepath
-    except ValueError as e:
-        print(f'Failed to update {Fore.RED + filename + Fore.RESET}: {str(e)}')
-        return
+            tmp_dir = get_update_tmp_dir(filepath)
+            try:
+                output_filepath = download_extract_db(db_code, token, tmp_dir)
+                if not output_filepath:
+                    raise ValueError("An error occurred while downloading the database file")
+                span.add('installed')
+                return install_db(output_filepath, filepath, keep_previous)
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except (ValueError, OSError) as e:
+            span.fail(e)
+            print(f'Failed to update {Fore.RED + filename + Fore.RESET}: {str(e)}')
+            return
@@ -0,0 +1,326 @@
+"""
+This module contains a streaming pipeline enriching log lines with the records of the IP addresses they contain.
+
+Lines are read from files or the standard input in batches, and their IP address is extracted from a field (split on
+a delimiter) or with a regular expression. Each batch is looked up in a BIN database in one go (see `lookup_records`)
+and written as JSON lines, CSV or TSV. Reading, looking up and writing run in overlapping stages: the next batches are
+read while earlier ones are looked up by the workers (threads, or processes when there is more than one worker), and
+a writer thread writes the enriched batches in the order of the input.
+
+The database reader, the batch reader (and NumPy) and the executors are imported when the logs are enriched, so that
+the command line can read the constants of this module without loading them.
+
+Example:
+    ip2location-toolkit enrich access.log --database DB11LITEBIN.BIN --field 1 --format jsonl > enriched.jsonl
+
+Classes:
+    - IPExtractor: Extract the IP address of a log line.
+    - RecordFormatter: Format enriched log lines.
+
+Functions:
+    - get_database_path(db_code, directory): Get the path of a downloaded BIN database.
+    - get_record_fields(database): Get the names of the fields of the records of a database.
+    - read_batches(inputs, batch_size): Read the lines of files or of the standard input in batches.
+    - enrich_batch(lines): Enrich a batch of log lines.
+    - enrich_logs(inputs, database_path, output, extractor, formatter, workers, batch_size): Enrich log lines.
+"""
+import csv, io, json, queue, re, sys, threading, time
+from pathlib import Path
+from .defaults import ENRICH_BATCH_SIZE as DEFAULT_BATCH_SIZE, ENRICH_FORMATS as FORMATS
+from .reader.fields import COUNTRY
+
+READ_BUFFER_SIZE = 1 << 20
+STDIN = '-'
+
+_state = {}
+
+
+def get_database_path(db_code, directory=None):
+    """
+    Get the path of a BIN database downloaded by the toolkit, which saves it as ``<db_code>.BIN``.
+
+    :param db_code: The code of the database (for example DB11LITEBIN).
+    :type db_code: str
+    :param directory: The directory the database was downloaded to (default is the current directory).
+    :type directory: str
+    :raises ValueError: If the code is not the code of a BIN database, or the database was not downloaded.
+    :return: The path to the database.
+    :rtype: str
+    """
+    db_code = str(db_code).upper()
+    if 'BIN' not in db_code:
+        raise ValueError('{} is not a BIN database code.'.format(db_code))
+    path = Path(directory or Path.cwd()) / (db_code + '.BIN')
+    if not path.is_file():
+        raise ValueError('The database {} was not found in {}, download it first.'.format(db_code, path.parent))
+    return str(path)
+
+
+class IPExtractor:
+    """
+    Extract the IP address of a log line, from a field or with a regular expression.
+
+    :param field: The 1-based position of the field holding the address (default is 1 when no regular expression is given).
+    :type field: int
+    :param delimiter: The delimiter of the fields (default is any whitespace).
+    :type delimiter: str
+    :param regex: A regular expression matching the address. Its ``ip`` group is used if it has one, otherwise its first group, otherwise the whole match.
+    :type regex: str
+    :raises ValueError: If the field is less than 1 or the regular expression is not valid.
+    """
+    def __init__(self, field=None, delimiter=None, regex=None):
+        self.regex = None
+        self.group = 0
+        if regex:
+            try:
+                self.regex = re.compile(regex)
+            except re.error as e:
+                raise ValueError('Invalid regular expression ({}).'.format(e))
+            if 'ip' in self.regex.groupindex:
+                self.group = 'ip'
+            elif self.regex.groups:
+                self.group = 1
+        self.field = field if field is not None else (None if regex else 1)
+        if self.field is not None and self.field < 1:
+            raise ValueError('The field position must be at least 1.')
+        self.delimiter = delimiter
+
+    def __call__(self, line):
+        """
+        Extract the IP address of a line.
+
+        :param line: The line.
+        :type line: str
+        :return: The address, or None if the line has no such field or does not match.
+        :rtype: str
+        """
+        if self.field is not None:
+            fields = line.split(self.delimiter, self.field) if self.delimiter is not None else line.split(None, self.field)
+            if len(fields) < self.field:
+                return None
+            line = fields[self.field - 1].strip('"[]')
+            if self.regex is None:
+                return line or None
+        match = self.regex.search(line)
+        return match.group(self.group) if match else None
+
+
+class RecordFormatter:
+    """
+    Format enriched log lines as JSON lines, CSV or TSV. Every output line holds the extracted address, the fields of
+    its record (null or empty when the address was not found) and the original line.
+
+    :param output_format: ``jsonl``, ``csv`` or ``tsv``.
+    :type output_format: str
+    :param fields: The names of the fields of the records to output.
+    :type fields: list
+    :raises ValueError: If the format is not valid.
+    """
+    def __init__(self, output_format, fields):
+        if output_format not in FORMATS:
+            raise ValueError('Invalid output format ({}), expected one of {}.'.format(output_format, ', '.join(FORMATS)))
+        self.output_format = output_format
+        self.fields = list(fields)
+
+    def _writer(self, buffer):
+        return csv.writer(buffer, delimiter='\t' if self.output_format == 'tsv' else ',', lineterminator='\n')
+
+    def header(self):
+        """
+        Get the header of the output.
+
+        :return: The header line of CSV and TSV outputs, or an empty string for JSON lines.
+        :rtype: str
+        """
+        if self.output_format == 'jsonl':
+            return ''
+        buffer = io.StringIO()
+        self._writer(buffer).writerow(['ip'] + self.fields + ['line'])
+        return buffer.getvalue()
+
+    def format(self, lines, ips, records):
+        """
+        Format a batch of enriched lines.
+
+        :param lines: The original lines.
+        :type lines: list
+        :param ips: The address extracted from each line (None if there is none).
+        :type ips: list
+        :param records: The record of each address (None if it was not found).
+        :type records: list
+        :return: The formatted lines.
+        :rtype: str
+        """
+        fields = self.fields
+        if self.output_format == 'jsonl':
+            output = []
+            for line, ip, record in zip(lines, ips, records):
+                item = {'ip': ip}
+                for name in fields:
+                    item[name] = record.get(name) if record else None
+                item['line'] = line
+                output.append(json.dumps(item))
+            return '\n'.join(output) + '\n' if output else ''
+        buffer = io.StringIO()
+        writer = self._writer(buffer)
+        for line, ip, record in zip(lines, ips, records):
+            writer.writerow([ip or ''] + [record.get(name, '') if record else '' for name in fields] + [line])
+        return buffer.getvalue()
+
+
+def get_record_fields(database):
+    """
+    Get the names of the fields of the records of a database.
+
+    :param database: The open database.
+    :type database: BINDatabase
+    :return: The names of the fields, the country field being split into ``country_short`` and ``country_long``.
+    :rtype: list
+    """
+    names = []
+    for name, _, kind in database.fields:
+        names.extend(['country_short', 'country_long'] if kind == COUNTRY else [name])
+    return names
+
+def read_batches(inputs, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Read the lines of files or of the standard input in batches.
+
+    :param inputs: The paths of the files to read, ``-`` standing for the standard input.
+    :type inputs: list
+    :param batch_size: The number of lines of a batch.
+    :type batch_size: int
+    :return: A generator of lists of lines, without their line endings.
+    :rtype: generator
+    """
+    batch = []
+    for path in inputs:
+        if path == STDIN:
+            file = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', errors='replace', newline=None) if hasattr(sys.stdin, 'buffer') else sys.stdin
+            close = False
+        else:
+            file = open(path, 'r', encoding='utf-8', errors='replace', buffering=READ_BUFFER_SIZE)
+            close = True
+        try:
+            for line in file:
+                batch.append(line.rstrip('\r\n'))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        finally:
+            if close:
+                file.close()
+            elif file is not sys.stdin:
+                file.detach()
+    if batch:
+        yield batch
+
+def _init_enricher(database_path, extractor, formatter):
+    from .reader.batch import BatchReader, numpy
+    from .reader.database import BINDatabase
+    database = BINDatabase(database_path)
+    _state['database'] = database
+    _state['batch_reader'] = BatchReader(database) if numpy is not None and database.header.ipv4_count else None
+    _state['extractor'] = extractor
+    _state['formatter'] = formatter
+
+def _close_enricher():
+    database = _state.get('database')
+    _state.clear()
+    if database is not None:
+        database.close()
+
+def enrich_batch(lines):
+    """
+    Enrich a batch of log lines, in a worker initialized by `enrich_logs`.
+
+    :param lines: The lines.
+    :type lines: list
+    :return: A tuple of the formatted lines, the number of lines and the number of lines whose address was found.
+    :rtype: tuple
+    """
+    from .reader.batch import lookup_records
+    extractor = _state['extractor']
+    ips = [extractor(line) for line in lines]
+    found = [ip for ip in ips if ip]
+    results = iter(lookup_records(_state['database'], found, _state['batch_reader']))
+    records = []
+    for ip in ips:
+        record = next(results) if ip else None
+        records.append(record if isinstance(record, dict) else None)
+    matched = len([record for record in records if record is not None])
+    return _state['formatter'].format(lines, ips, records), len(lines), matched
+
+def enrich_logs(inputs, database_path, output, extractor, formatter, workers=1, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Enrich log lines with the records of their IP addresses.
+
+    :param inputs: The paths of the files to read, ``-`` standing for the standard input.
+    :type inputs: list
+    :param database_path: The path to the BIN database.
+    :type database_path: str
+    :param output: The file to write the enriched lines to.
+    :type output: file
+    :param extractor: The extractor of the addresses of the lines.
+    :type extractor: IPExtractor
+    :param formatter: The formatter of the enriched lines.
+    :type formatter: RecordFormatter
+    :param workers: The number of batches looked up at the same time. With more than one worker, the batches are looked up by worker processes (default is 1).
+    :type workers: int
+    :param batch_size: The number of lines of a batch (default is 10000).
+    :type batch_size: int
+    :raises ValueError: If the database is not valid.
+    :return: A dictionary with the keys ``lines``, ``matched`` (the number of lines whose address was found), ``seconds`` and ``lines_per_second``.
+    :rtype: dict
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+    from .reader.database import BINDatabase
+    BINDatabase(database_path).close()
+    started = time.perf_counter()
+    stats = {'lines': 0, 'matched': 0}
+    if workers > 1:
+        executor = ProcessPoolExecutor(workers, initializer=_init_enricher, initargs=(database_path, extractor, formatter))
+    else:
+        executor = ThreadPoolExecutor(1, initializer=_init_enricher, initargs=(database_path, extractor, formatter))
+    # The pending batches, in the order of the input. The queue is bounded so that reading does not run ahead of writing.
+    pending = queue.Queue(maxsize=max(workers, 1) * 2)
+    errors = []
+
+    def write_batches():
+        try:
+            output.write(formatter.header())
+            while True:
+                future = pending.get()
+                if future is None:
+                    break
+                text, lines, matched = future.result()
+                output.write(text)
+                stats['lines'] += lines
+                stats['matched'] += matched
+            output.flush()
+        except BaseException as e:
+            errors.append(e)
+            # Keep consuming the queue so that the reader is never blocked.
+            while pending.get() is not None:
+                pass
+
+    writer = threading.Thread(target=write_batches, daemon=True)
+    writer.start()
+    try:
+        for batch in read_batches(inputs, batch_size):
+            if errors:
+                break
+            pending.put(executor.submit(enrich_batch, batch))
+    finally:
+        pending.put(None)
+        writer.join()
+        executor.shutdown(cancel_futures=True)
+        if workers <= 1:
+            # The thread worker opened the database in this process (process workers close it when they exit).
+            _close_enricher()
+    if errors:
+        raise errors[0]
+    seconds = time.perf_counter() - started
+    stats['seconds'] = seconds
+    stats['lines_per_second'] = stats['lines'] / seconds if seconds else 0.0
+    return stats
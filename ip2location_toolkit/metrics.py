@@ -0,0 +1,377 @@
+"""
+This module contains the timing and byte metrics of the toolkit, with hooks and Prometheus and JSON exports.
+
+The download, extraction, rename and update functions run inside timing spans. When a span ends, the registry adds
+its duration and byte counts to counters (the number of runs, errors by exception class, total seconds and bytes),
+records the duration and throughput of the last run as gauges, and calls the registered hooks with an event
+describing the run.
+
+The batch lookup path (`lookup_records`, used by the lookup server and the enrich command) counts the addresses looked
+up, found and rejected in ``lookups_total``, ``lookups_found_total`` and ``lookups_invalid_total``. The single-address
+path (`BINDatabase.lookup` and `CachedBINDatabase.lookup`) counts them in ``single_lookups_total``,
+``single_lookups_found_total`` and ``single_lookups_invalid_total``, and the cached reader counts its cache hits and
+misses in ``lookup_cache_hits_total`` and ``lookup_cache_misses_total``. The single-address counters are kept by each
+database without a lock (see `Counters`) and added to the registry when its metrics are read or the database is
+closed. `LookupPool` does not count its lookups.
+
+Example:
+    from ip2location_toolkit import metrics
+
+    metrics.add_hook(lambda event: print(event['name'], event['seconds'], event['error']))
+    update_db('DB11LITEBIN.BIN', 'DB11LITEBIN', token)
+    metrics.write_metrics('/var/lib/node_exporter/ip2location.prom')
+
+An event is a dictionary with the keys ``name``, ``labels`` (a dictionary), ``seconds``, ``counts`` (the byte and
+retry counts of the span), ``throughput`` (bytes per second of each byte count) and ``error`` (the exception class
+name, or None).
+
+Classes:
+    - Span: A timed run of an operation.
+    - Metrics: A registry of counters and gauges.
+    - Counters: Counters kept on a hot path and added to a registry when it is read.
+
+Functions:
+    - span(name, **labels): Time a run of an operation with the default registry.
+    - increment(name, value, **labels): Increment a counter of the default registry.
+    - add_hook(hook): Call a function with the event of every span of the default registry.
+    - remove_hook(hook): Stop calling a hook.
+    - write_metrics(path, output_format): Write the metrics of the default registry to a file.
+"""
+import json, os, re, tempfile, threading, time, weakref
+from .defaults import METRICS_FORMATS as FORMATS
+
+PREFIX = 'ip2location_toolkit_'
+COUNTER = 'counter'
+GAUGE = 'gauge'
+
+_NAME_PATTERN = re.compile(r'[^a-zA-Z0-9_]')
+
+
+class Span:
+    """
+    A timed run of an operation. Use it as a context manager, obtained from `Metrics.span`.
+
+    :param metrics: The registry to record the run in.
+    :type metrics: Metrics
+    :param name: The name of the operation.
+    :type name: str
+    :param labels: The labels of the metrics of the run.
+    :type labels: dict
+    """
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.counts = {}
+        self.seconds = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def add(self, name, value=1):
+        """
+        Add to a count of the run, for example ``bytes_received`` or ``retries``. Counts whose name starts with
+        ``bytes`` get a throughput.
+
+        :param name: The name of the count.
+        :type name: str
+        :param value: The value to add.
+        :type value: int
+        :return: None
+        """
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def fail(self, error):
+        """
+        Record the error of a run that is handled without leaving the span.
+
+        :param error: The error.
+        :type error: Exception
+        :return: None
+        """
+        self.error = type(error).__name__
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.seconds = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.metrics.record(self)
+        return False
+
+
+class Metrics:
+    """
+    A registry of counters and gauges, identified by their name and labels.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._types = {}
+        self._hooks = []
+        self._collectors = weakref.WeakSet()
+
+    def _set(self, kind, name, labels, value, add):
+        key = (name, tuple(sorted((str(label), str(label_value)) for label, label_value in labels.items())))
+        with self._lock:
+            self._types[name] = kind
+            self._values[key] = self._values.get(key, 0) + value if add else value
+
+    def increment(self, name, value=1, **labels):
+        """
+        Increment a counter.
+
+        :param name: The name of the counter.
+        :type name: str
+        :param value: The value to add.
+        :type value: int or float
+        :return: None
+        """
+        self._set(COUNTER, name, labels, value, True)
+
+    def set_gauge(self, name, value, **labels):
+        """
+        Set a gauge.
+
+        :param name: The name of the gauge.
+        :type name: str
+        :param value: The value.
+        :type value: int or float
+        :return: None
+        """
+        self._set(GAUGE, name, labels, value, False)
+
+    def span(self, name, **labels):
+        """
+        Time a run of an operation.
+
+        :param name: The name of the operation.
+        :type name: str
+        :return: The span, to use as a context manager.
+        :rtype: Span
+        """
+        return Span(self, name, labels)
+
+    def record(self, span):
+        """
+        Record a finished span and call the hooks with its event.
+
+        :param span: The span.
+        :type span: Span
+        :return: The event.
+        :rtype: dict
+        """
+        labels = span.labels
+        throughput = {}
+        self.increment(span.name + '_total', **labels)
+        self.increment(span.name + '_seconds_total', span.seconds, **labels)
+        self.set_gauge(span.name + '_last_seconds', span.seconds, **labels)
+        for count, value in span.counts.items():
+            self.increment('{}_{}_total'.format(span.name, count), value, **labels)
+            if count.startswith('bytes') and span.seconds > 0:
+                throughput[count] = value / span.seconds
+                self.set_gauge('{}_last_{}_per_second'.format(span.name, count), throughput[count], **labels)
+        if span.error:
+            self.increment(span.name + '_errors_total', error=span.error, **labels)
+        event = {'name': span.name, 'labels': dict(labels), 'seconds': span.seconds, 'counts': dict(span.counts), 'throughput': throughput, 'error': span.error}
+        with self._lock:
+            hooks = list(self._hooks)
+        for hook in hooks:
+            try:
+                hook(event)
+            except Exception:
+                # A failing hook must not fail the operation it observes.
+                pass
+        return event
+
+    def add_hook(self, hook):
+        """
+        Call a function with the event of every finished span.
+
+        :param hook: The function, called with the event dictionary.
+        :type hook: callable
+        :return: None
+        """
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """
+        Stop calling a hook.
+
+        :param hook: The function.
+        :type hook: callable
+        :return: None
+        """
+        with self._lock:
+            if hook in self._hooks:
+                self._hooks.remove(hook)
+
+    def add_collector(self, counters):
+        """
+        Add counters kept outside of the registry to it whenever its metrics are read. The counters are held by a weak
+        reference, so they are forgotten with their owner.
+
+        :param counters: The counters.
+        :type counters: Counters
+        :return: None
+        """
+        with self._lock:
+            self._collectors.add(counters)
+
+    def reset(self):
+        """
+        Remove all the counters and gauges. The hooks are kept.
+
+        :return: None
+        """
+        with self._lock:
+            self._values.clear()
+            self._types.clear()
+
+    def snapshot(self):
+        """
+        Get the values of the counters and gauges.
+
+        :return: A dictionary mapping the name of each metric to its type and a list of its samples, each a dictionary of its ``labels`` and ``value``.
+        :rtype: dict
+        """
+        with self._lock:
+            collectors = list(self._collectors)
+        for counters in collectors:
+            counters.flush()
+        with self._lock:
+            items = sorted(self._values.items())
+            types = dict(self._types)
+        snapshot = {}
+        for (name, labels), value in items:
+            metric = snapshot.setdefault(name, {'type': types[name], 'samples': []})
+            metric['samples'].append({'labels': dict(labels), 'value': value})
+        return snapshot
+
+    def to_prometheus(self):
+        """
+        Format the metrics in the Prometheus text exposition format, prefixed with ``ip2location_toolkit_``.
+
+        :return: The metrics.
+        :rtype: str
+        """
+        lines = []
+        for name, metric in self.snapshot().items():
+            full_name = PREFIX + _NAME_PATTERN.sub('_', name)
+            lines.append('# TYPE {} {}'.format(full_name, metric['type']))
+            for sample in metric['samples']:
+                labels = ','.join('{}="{}"'.format(_NAME_PATTERN.sub('_', label), _escape(value)) for label, value in sample['labels'].items())
+                lines.append('{}{} {}'.format(full_name, '{' + labels + '}' if labels else '', repr(float(sample['value']))))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def to_json(self):
+        """
+        Format the metrics as JSON (see `snapshot`).
+
+        :return: The metrics.
+        :rtype: str
+        """
+        return json.dumps(self.snapshot(), indent=4)
+
+    def write(self, path, output_format=None):
+        """
+        Write the metrics to a file, replacing it atomically so that a collector never reads a partial file.
+
+        :param path: The path of the file.
+        :type path: str
+        :param output_format: ``prometheus`` or ``json`` (default is ``json`` for files with the `.json` extension, ``prometheus`` otherwise).
+        :type output_format: str
+        :raises ValueError: If the format is not valid.
+        :return: None
+        """
+        path = str(path)
+        output_format = output_format or ('json' if path.lower().endswith('.json') else 'prometheus')
+        if output_format not in FORMATS:
+            raise ValueError('Invalid metrics format ({}), expected one of {}.'.format(output_format, ', '.join(FORMATS)))
+        content = self.to_json() if output_format == 'json' else self.to_prometheus()
+        directory = os.path.dirname(os.path.abspath(path))
+        tmp_fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.{}.'.format(os.path.basename(path)), suffix='.part')
+        try:
+            with os.fdopen(tmp_fd, 'w') as file:
+                file.write(content)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class Counters:
+    """
+    Counters kept by an object on a hot path, such as the lookups of a database, without taking the lock of a registry.
+    Increment them with ``counters.values[name] += 1``. Their increments are added to the registry when its metrics are
+    read and when `flush` is called, for example when the object is closed. The increments are not locked, so
+    concurrent increments of the same counter can rarely be lost.
+
+    :param names: The names of the counters.
+    :type names: tuple
+    :param registry: The registry to add the counters to (default is the default registry).
+    :type registry: Metrics
+    """
+    def __init__(self, names, registry=None):
+        self.values = dict.fromkeys(names, 0)
+        self._flushed = dict.fromkeys(names, 0)
+        self._lock = threading.Lock()
+        self.registry = registry if registry is not None else METRICS
+        self.registry.add_collector(self)
+
+    def flush(self):
+        """
+        Add the increments of the counters since the last flush to the registry.
+
+        :return: None
+        """
+        with self._lock:
+            for name, value in list(self.values.items()):
+                delta = value - self._flushed[name]
+                if delta:
+                    self._flushed[name] = value
+                    self.registry.increment(name, delta)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+METRICS = Metrics()
+
+
+def span(name, **labels):
+    """
+    Time a run of an operation with the default registry (see `Metrics.span`).
+    """
+    return METRICS.span(name, **labels)
+
+def increment(name, value=1, **labels):
+    """
+    Increment a counter of the default registry (see `Metrics.increment`).
+    """
+    METRICS.increment(name, value, **labels)
+
+def add_hook(hook):
+    """
+    Call a function with the event of every span of the default registry (see `Metrics.add_hook`).
+    """
+    METRICS.add_hook(hook)
+
+def remove_hook(hook):
+    """
+    Stop calling a hook of the default registry.
+    """
+    METRICS.remove_hook(hook)
+
+def write_metrics(path, output_format=None):
+    """
+    Write the metrics of the default registry to a file (see `Metrics.write`).
+    """
+    METRICS.write(path, output_format)
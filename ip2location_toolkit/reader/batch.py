@@ -0,0 +1,254 @@
+"""
+This module contains a vectorized batch lookup API for the IPv4 section of BIN databases. It requires NumPy
+(``pip install ip2location_toolkit[numpy]``).
+
+The first-IP column and the field columns of the IPv4 rows are exposed as strided NumPy views over the memory-mapped
+file, so nothing is copied when the batch reader is created. When the rows are not 4-byte aligned in the file,
+``searchsorted`` would copy the first-IP column on every call, so that column is copied once instead (4 bytes per
+row). A batch of addresses is resolved with a single
+``searchsorted`` call, and the results are returned as columnar arrays: string fields are dictionary-encoded as
+indices into a table holding each distinct string of the batch once, and float fields are returned as float arrays.
+
+Example:
+    with BINDatabase('DB11LITEBIN.BIN') as database, BatchReader(database) as reader:
+        result = reader.lookup(numpy.array([0x08080808, 0x01010101], dtype=numpy.uint32))
+        codes, table = result.codes['country_short'], result.tables['country_short']
+
+Classes:
+    - BatchResult: The columnar result of a batch lookup.
+    - BatchReader: Resolve batches of IPv4 addresses against a BIN database.
+
+Functions:
+    - parse_ipv4_array(ips): Parse IPv4 addresses into a NumPy ``uint32`` array.
+    - lookup_records(database, ips, batch_reader): Look up a batch of IPv4 and IPv6 addresses as records.
+"""
+import socket
+from .. import metrics
+from .database import MAX_IPV4, ip_to_int
+from .fields import COUNTRY, FLOAT
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _pack_ipv4(ip):
+    return socket.inet_pton(socket.AF_INET, ip)
+
+def require_numpy():
+    """
+    Make sure NumPy is installed.
+
+    :raises ImportError: If NumPy is not installed.
+    :return: None
+    """
+    if numpy is None:
+        raise ImportError('The batch lookup API requires NumPy. Install it with "pip install ip2location_toolkit[numpy]".')
+
+def parse_ipv4_array(ips):
+    """
+    Parse IPv4 addresses into a NumPy ``uint32`` array.
+
+    :param ips: The IPv4 addresses, either as strings or as integers.
+    :type ips: iterable
+    :raises ValueError: If an address is not a valid IPv4 address.
+    :return: The addresses as an array of integers.
+    :rtype: numpy.ndarray
+    """
+    require_numpy()
+    if isinstance(ips, numpy.ndarray) and ips.dtype.kind in 'iu':
+        return ips.astype(numpy.uint32, copy=False)
+    ips = list(ips)
+    if ips and not isinstance(ips[0], str):
+        return numpy.asarray(ips, dtype=numpy.uint32)
+    try:
+        packed = b''.join(map(_pack_ipv4, ips))
+    except (OSError, TypeError):
+        for ip in ips:
+            try:
+                _pack_ipv4(ip)
+            except (OSError, TypeError):
+                raise ValueError('Invalid IPv4 address ({}).'.format(ip))
+        raise
+    return numpy.frombuffer(packed, dtype='>u4').astype(numpy.uint32)
+
+def lookup_records(database, ips, batch_reader=None):
+    """
+    Look up a batch of IPv4 and IPv6 addresses, decoding each matched row once. The IPv4 addresses are searched with
+    a single vectorized search when a batch reader is given; this function does not require NumPy otherwise.
+
+    :param database: The open database.
+    :type database: BINDatabase
+    :param ips: The addresses.
+    :type ips: list
+    :param batch_reader: A batch reader of the database (optional).
+    :type batch_reader: BatchReader
+    :return: The result of each address: its record (see `BINDatabase.lookup`), None if the database has no record for it, or a `ValueError` if the address is not valid. Addresses matching the same row share the same record.
+    :rtype: list
+    """
+    results = [None] * len(ips)
+    located = []
+    ipv4_positions, ipv4_numbers = [], []
+    for position, ip in enumerate(ips):
+        try:
+            version, ipno = ip_to_int(ip)
+        except ValueError as e:
+            results[position] = e
+            continue
+        if version == 4 and batch_reader is not None:
+            ipv4_positions.append(position)
+            ipv4_numbers.append(ipno)
+        else:
+            located.append((position, database.resolve(version, ipno)))
+    if ipv4_numbers:
+        rows = batch_reader.find_rows(numpy.array(ipv4_numbers, dtype=numpy.uint32)).tolist()
+        located.extend((position, (False, row)) for position, row in zip(ipv4_positions, rows))
+
+    records = {}
+    found = 0
+    for position, key in located:
+        if key[1] < 0:
+            continue
+        record = records.get(key)
+        if record is None:
+            record = records[key] = database.decode_row(key[1], key[0])
+        results[position] = record
+        found += 1
+    metrics.increment('lookup_batches_total')
+    metrics.increment('lookups_total', len(ips))
+    metrics.increment('lookups_found_total', found)
+    metrics.increment('lookups_invalid_total', len(ips) - len(located))
+    return results
+
+
+class BatchResult:
+    """
+    The columnar result of a batch lookup.
+
+    :ivar rows: The index of the row of each address, or -1 if the database has no record for it.
+    :ivar codes: The string fields, mapped to arrays of indices into `tables` (-1 where there is no record).
+    :ivar tables: The string fields, mapped to the list of distinct strings of the field in the batch.
+    :ivar values: The float fields, mapped to float arrays (NaN where there is no record).
+    """
+    def __init__(self, rows, codes, tables, values):
+        self.rows = rows
+        self.codes = codes
+        self.tables = tables
+        self.values = values
+
+    def __len__(self):
+        return len(self.rows)
+
+    def column(self, name):
+        """
+        Decode a field into a list with one value per address.
+
+        :param name: The name of the field.
+        :type name: str
+        :raises KeyError: If the database has no such field.
+        :return: The values of the field (None where there is no record).
+        :rtype: list
+        """
+        if name in self.values:
+            return [None if row < 0 else value for row, value in zip(self.rows.tolist(), self.values[name].tolist())]
+        table = self.tables[name]
+        return [None if code < 0 else table[code] for code in self.codes[name].tolist()]
+
+
+class BatchReader:
+    """
+    Resolve batches of IPv4 addresses against a BIN database.
+
+    The reader holds NumPy views over the memory map of the database, so it must be closed before the database.
+
+    :param database: The open database.
+    :type database: BINDatabase
+    :raises ImportError: If NumPy is not installed.
+    :raises ValueError: If the database has no IPv4 section.
+    """
+    def __init__(self, database):
+        require_numpy()
+        if not database.header.ipv4_count:
+            raise ValueError('The database has no IPv4 section.')
+        self.database = database
+        self.count = database.header.ipv4_count
+        self.ip_from = self._column_view(0, '<u4')
+        if not self.ip_from.flags.aligned:
+            self.ip_from = numpy.ascontiguousarray(self.ip_from)
+        self.columns = [(name, self._column_view(offset, '<f4' if kind == FLOAT else '<u4'), kind) for name, offset, kind in database._ipv4_columns]
+
+    def _column_view(self, column_offset, dtype):
+        return numpy.ndarray(
+            shape=(self.count,),
+            dtype=dtype,
+            buffer=self.database._mm,
+            offset=self.database._ipv4_base + column_offset,
+            strides=(self.database._ipv4_row_size,),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Release the views over the memory map of the database.
+
+        :return: None
+        """
+        self.ip_from = None
+        self.columns = []
+
+    def find_rows(self, ips):
+        """
+        Find the rows whose ranges contain a batch of addresses.
+
+        :param ips: The addresses (see `parse_ipv4_array`).
+        :type ips: numpy.ndarray or iterable
+        :return: The index of the row of each address, or -1 if no row contains it.
+        :rtype: numpy.ndarray
+        """
+        ips = numpy.minimum(parse_ipv4_array(ips), MAX_IPV4 - 1)
+        rows = numpy.searchsorted(self.ip_from, ips, side='right').astype(numpy.int64) - 1
+        rows[rows >= self.count - 1] = -1
+        return rows
+
+    def lookup(self, ips, fields=None):
+        """
+        Look up a batch of IPv4 addresses.
+
+        :param ips: The addresses (see `parse_ipv4_array`).
+        :type ips: numpy.ndarray or iterable
+        :param fields: The names of the fields to decode (default is all the fields of the database). The country field is decoded into ``country_short`` and ``country_long``, which share their codes.
+        :type fields: list
+        :return: The columnar result.
+        :rtype: BatchResult
+        """
+        rows = self.find_rows(ips)
+        found = rows >= 0
+        found_rows = rows[found]
+        codes, tables, values = {}, {}, {}
+        for name, column, kind in self.columns:
+            names = ('country_short', 'country_long') if kind == COUNTRY else (name,)
+            if fields is not None and not any(name in fields for name in names):
+                continue
+            if kind == FLOAT:
+                array = numpy.full(len(rows), numpy.nan, dtype=numpy.float32)
+                array[found] = column[found_rows]
+                values[name] = array
+                continue
+            pointers, inverse = numpy.unique(column[found_rows], return_inverse=True)
+            array = numpy.full(len(rows), -1, dtype=numpy.int32)
+            array[found] = inverse.reshape(-1)
+            pointers = pointers.tolist()
+            if kind == COUNTRY:
+                codes['country_short'] = codes['country_long'] = array
+                tables['country_short'] = [self.database.read_string(pointer) for pointer in pointers]
+                tables['country_long'] = [self.database.read_string(pointer + 3) for pointer in pointers]
+            else:
+                codes[name] = array
+                tables[name] = [self.database.read_string(pointer) for pointer in pointers]
+        return BatchResult(rows, codes, tables, values)
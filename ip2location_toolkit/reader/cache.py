@@ -0,0 +1,312 @@
+"""
+This module contains a size-bounded LRU cache for BIN database lookups.
+
+Traffic is usually skewed towards a small set of client addresses, so caching the decoded records of recent lookups
+skips most of the work of the lookup path. The cache is keyed either by the integer address (a hit skips the search
+and the decoding) or by the matched range (neighbouring addresses share one entry and only the decoding is skipped).
+
+`CachedBINDatabase` checks the status of the database file at most once every `check_interval` seconds. When the file
+has been replaced, for example by `update_db`, the database is reopened and the cache is cleared. Each opened version
+of the file is a generation: cache entries are keyed by generation, so records decoded from a replaced version by
+lookups still in flight are never served for the new one, and a replaced version is closed when its last lookup ends.
+
+Example:
+    with CachedBINDatabase('DB11LITEBIN.BIN', maxsize=100000) as database:
+        record = database.lookup('8.8.8.8')
+        print(database.cache.stats())
+
+Classes:
+    - LRUCache: A size-bounded LRU cache with hit, miss and eviction counters.
+    - CachedBINDatabase: A BIN database with an LRU cache in front of its lookups.
+"""
+import os, sys, threading, time
+from collections import OrderedDict
+from .. import metrics
+from .database import LOOKUP_COUNTERS, BINDatabase, ip_to_int
+
+KEY_IP = 'ip'
+KEY_RANGE = 'range'
+CACHE_COUNTERS = LOOKUP_COUNTERS + ('lookup_cache_hits_total', 'lookup_cache_misses_total')
+
+
+def get_entry_size(key, value):
+    """
+    Estimate the memory used by a cache entry. The values of dictionaries (such as records) are counted too.
+
+    :param key: The key of the entry.
+    :type key: object
+    :param value: The value of the entry.
+    :type value: object
+    :return: The estimated size of the entry in bytes.
+    :rtype: int
+    """
+    size = sys.getsizeof(key) + sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(item) for item in value.values())
+    return size
+
+
+class LRUCache:
+    """
+    A size-bounded cache evicting the least recently used entries.
+
+    :param maxsize: The maximum number of entries.
+    :type maxsize: int
+    :raises ValueError: If `maxsize` is less than 1.
+    """
+    def __init__(self, maxsize=65536):
+        if maxsize < 1:
+            raise ValueError('The size of the cache must be at least 1.')
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.memory = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Get the value of an entry and mark it as the most recently used one.
+
+        :param key: The key of the entry.
+        :type key: object
+        :param default: The value to return if there is no such entry.
+        :type default: object
+        :return: The value of the entry, or `default`.
+        :rtype: object
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value[0]
+
+    def put(self, key, value):
+        """
+        Add an entry, evicting the least recently used entry if the cache is full.
+
+        :param key: The key of the entry.
+        :type key: object
+        :param value: The value of the entry.
+        :type value: object
+        :return: None
+        """
+        size = get_entry_size(key, value)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.memory -= previous[1]
+            elif len(self._entries) >= self.maxsize:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.memory -= evicted_size
+                self.evictions += 1
+            self._entries[key] = (value, size)
+            self.memory += size
+
+    def clear(self):
+        """
+        Remove all the entries. The counters are kept.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.memory = 0
+
+    def stats(self):
+        """
+        Get the statistics of the cache.
+
+        :return: A dictionary with the keys ``hits``, ``misses``, ``evictions``, ``hit_rate``, ``size``, ``maxsize`` and ``memory`` (the estimated size of the entries in bytes).
+        :rtype: dict
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'memory': self.memory,
+            }
+
+
+class _Generation:
+    """
+    An opened version of a database file, with the number of lookups using it.
+    """
+    __slots__ = ('database', 'number', 'users', 'retired')
+
+    def __init__(self, database, number):
+        self.database = database
+        self.number = number
+        self.users = 0
+        self.retired = False
+
+
+class CachedBINDatabase:
+    """
+    A BIN database with an LRU cache in front of its lookups.
+
+    :param filepath: The path to the BIN database file.
+    :type filepath: str
+    :param maxsize: The maximum number of cached records (default is 65536).
+    :type maxsize: int
+    :param key: ``ip`` to cache records by address, or ``range`` to cache them by matched range (default is ``ip``).
+    :type key: str
+    :param check_interval: The minimum number of seconds between two checks for a replaced database file (default is 1). A value of 0 checks on every lookup.
+    :type check_interval: float
+    :param database_options: Keyword arguments for `BINDatabase`.
+    :raises ValueError: If the key is not valid, or the file is not a valid database file.
+    """
+    def __init__(self, filepath, maxsize=65536, key=KEY_IP, check_interval=1.0, **database_options):
+        if key not in (KEY_IP, KEY_RANGE):
+            raise ValueError('Invalid cache key ({}), expected "{}" or "{}".'.format(key, KEY_IP, KEY_RANGE))
+        self.filepath = str(filepath)
+        self.key = key
+        self.check_interval = check_interval
+        self.cache = LRUCache(maxsize)
+        self._database_options = database_options
+        self._lock = threading.Lock()
+        self._users_lock = threading.Lock()
+        self._generation = None
+        self.counters = metrics.Counters(CACHE_COUNTERS)
+        self._open()
+
+    @property
+    def database(self):
+        """
+        The current version of the database.
+
+        :rtype: BINDatabase
+        """
+        return self._generation.database
+
+    def _open(self):
+        file_status = self._get_file_status()
+        database = BINDatabase(self.filepath, **self._database_options)
+        previous = self._generation
+        self._generation = _Generation(database, previous.number + 1 if previous else 0)
+        self._file_status = file_status
+        self._checked_at = time.monotonic()
+        self.cache.clear()
+        if previous is not None:
+            self._retire(previous)
+
+    def _retire(self, generation):
+        # The lookups still using the version close it when they end (see `_release`).
+        with self._users_lock:
+            generation.retired = True
+            unused = generation.users == 0
+        if unused:
+            generation.database.close()
+
+    def _acquire(self):
+        with self._users_lock:
+            generation = self._generation
+            generation.users += 1
+            return generation
+
+    def _release(self, generation):
+        with self._users_lock:
+            generation.users -= 1
+            unused = generation.retired and generation.users == 0
+        if unused:
+            generation.database.close()
+
+    def _get_file_status(self):
+        status = os.stat(self.filepath)
+        return status.st_ino, status.st_dev, status.st_size, status.st_mtime_ns
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Close the database file and clear the cache. Lookups still in flight finish before the file is closed.
+
+        :return: None
+        """
+        self.cache.clear()
+        self.counters.flush()
+        self._retire(self._generation)
+
+    def check_file(self):
+        """
+        Reopen the database and clear the cache if the database file has been replaced.
+
+        :return: Whether the database was reopened.
+        :rtype: bool
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                if self._get_file_status() == self._file_status:
+                    return False
+            except OSError:
+                # The file is being replaced, keep serving the mapped version.
+                return False
+            self._open()
+            return True
+
+    def lookup(self, ip):
+        """
+        Look up an IP address, using the cached record if there is one.
+
+        :param ip: The IPv4 or IPv6 address.
+        :type ip: str
+        :raises ValueError: If the IP address is not valid.
+        :return: A copy of the record of the address (see `BINDatabase.lookup`), or None if the database has no record for it.
+        :rtype: dict or None
+        """
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.check_file()
+        counts = self.counters.values
+        try:
+            version, ipno = ip_to_int(ip)
+        except ValueError:
+            counts['single_lookups_invalid_total'] += 1
+            raise
+        counts['single_lookups_total'] += 1
+        generation = self._acquire()
+        try:
+            database = generation.database
+            if self.key == KEY_IP:
+                key = (generation.number, version, ipno)
+                record = self.cache.get(key, self)
+                counts['lookup_cache_misses_total' if record is self else 'lookup_cache_hits_total'] += 1
+                if record is self:
+                    ipv6, row = database.resolve(version, ipno)
+                    record = database.decode_row(row, ipv6) if row >= 0 else None
+                    self._put(generation, key, record)
+            else:
+                ipv6, row = database.resolve(version, ipno)
+                if row < 0:
+                    return None
+                key = (generation.number, ipv6, row)
+                record = self.cache.get(key)
+                counts['lookup_cache_misses_total' if record is None else 'lookup_cache_hits_total'] += 1
+                if record is None:
+                    record = database.decode_row(row, ipv6)
+                    self._put(generation, key, record)
+        finally:
+            self._release(generation)
+        if record is None:
+            return None
+        counts['single_lookups_found_total'] += 1
+        return dict(record)
+
+    def _put(self, generation, key, record):
+        # The records decoded from a replaced version are not cached: the cache was cleared for the new version.
+        if generation is self._generation:
+            self.cache.put(key, record)
@@ -0,0 +1,296 @@
+"""
+This module contains a compiler turning LITE CSV databases into BIN database files.
+
+The compiled file uses the layout of the IP2Location BIN databases, so it opens in milliseconds with `BINDatabase`
+(and the batch, cache and update tools), and its header can be read by `get_db_header` and `get_db_version`:
+
+    =================  ==========================================================================
+    Section            Content
+    =================  ==========================================================================
+    Header             The 30-byte BIN header (see `reader.header`), padded to 64 bytes
+    Index              The first-level index of the rows of each section (see `build_jump_table`)
+    Strings            Each distinct string of the database once, as a length byte and the string,
+                       padded to a multiple of 4 bytes so that the rows are 4-byte aligned
+    IPv4 rows          The sorted first IP address of each range, followed by one 4-byte column
+                       per field: the offset of its string, or a 32-bit float
+    IPv6 rows          The rows of IPv6 databases, with 16-byte first IP addresses
+    =================  ==========================================================================
+
+Like the official files, IPv6 databases carry both sections: the IPv6 section holds every range, and the IPv4 section
+holds the ranges of the IPv4-mapped block (``::ffff:0:0/96``), so that IPv4 addresses are looked up in it (and in
+the vectorized IPv4 path of `BatchReader`).
+
+The CSV file is read as a stream. Rows and strings are written to temporary files as they are parsed, so memory use
+only grows with the number of distinct strings, and the sections are then concatenated into the compiled file. Gaps
+between the ranges of the CSV file are filled with empty ("-") ranges.
+
+Functions:
+    - get_csv_version(path): Get the release date of a CSV database in the version format of the BIN databases.
+    - compile_csv(csv_path, output_path, db_code, version): Compile a LITE CSV database into a BIN database file.
+    - write_bin(rows, output_path, db_code, version): Write the rows of a LITE CSV database into a BIN database file.
+"""
+import datetime, mmap, os, shutil, struct, tempfile
+from pathlib import Path
+from colorama import Fore
+from ..downloader.metadata import read_metadata
+from ..downloader.update import version_to_date
+from .database import INDEX_ENTRY_SIZE, INDEX_SIZE, IPV4_COLUMN_SIZE, IPV4_MAPPED_PREFIX, IPV6_COLUMN_SIZE, MAX_IPV4, MAX_IPV6, build_jump_table
+from .fields import COUNTRY, FLOAT, get_fields
+from .header import HEADER_STRUCT
+from .lite_csv import get_csv_schema, guess_db_code, parse_csv_db_code, read_csv_rows
+
+HEADER_SIZE = 64
+PRODUCT_CODES = {'ip2location': 1, 'ip2proxy': 2}
+EMPTY_STRING = '-'
+WRITE_BUFFER_SIZE = 1 << 20
+ROW_ALIGNMENT = 4
+
+_UINT32 = struct.Struct('<I')
+_UINT128 = struct.Struct('<QQ')
+_FLOAT = struct.Struct('<f')
+
+
+def get_csv_version(path):
+    """
+    Get the release date of a CSV database in the "year.month.day" version format of the BIN databases. The
+    Last-Modified date recorded when the database was downloaded is used if there is one, otherwise the modification
+    date of the file.
+
+    :param path: The path to the CSV file.
+    :type path: str
+    :return: The version.
+    :rtype: str
+    """
+    date = None
+    last_modified = read_metadata(path).get('last_modified')
+    if last_modified:
+        import email.utils
+        try:
+            date = email.utils.parsedate_to_datetime(last_modified).date()
+        except (TypeError, ValueError):
+            date = None
+    if date is None:
+        date = datetime.date.fromtimestamp(os.path.getmtime(path))
+    return f"{date.year - 2000}.{date.month}.{date.day}"
+
+
+class _StringTable:
+    """
+    The strings section of a compiled database, written to a temporary file as new strings are added.
+    """
+    def __init__(self, file, base):
+        self.file = file
+        self.base = base
+        self.size = 0
+        self.offsets = {}
+
+    def _write(self, value):
+        data = value.encode('utf-8')[:255]
+        self.file.write(bytes([len(data)]) + data)
+        self.size += len(data) + 1
+
+    def add(self, value):
+        offset = self.offsets.get(value)
+        if offset is None:
+            offset = self.offsets[value] = self.base + self.size
+            self._write(value)
+        return offset
+
+    def add_country(self, short, long):
+        # The country name is stored 3 bytes after the country code.
+        key = (short, long)
+        offset = self.offsets.get(key)
+        if offset is None:
+            offset = self.offsets[key] = self.base + self.size
+            data = short.encode('utf-8')[:2]
+            self.file.write(bytes([len(data)]) + data.ljust(2, b'\x00'))
+            self.size += 3
+            self._write(long)
+        return offset
+
+    def align(self, alignment):
+        padding = -self.size % alignment
+        self.file.write(b'\x00' * padding)
+        self.size += padding
+
+
+class _RowSection:
+    """
+    The IPv4 or IPv6 rows of a compiled database, written to a temporary file as ranges are added. Gaps between the
+    ranges are filled with empty ranges.
+    """
+    def __init__(self, file, ipv6, column_count):
+        self.file = file
+        self.ipv6 = ipv6
+        self.ip_column_size = IPV6_COLUMN_SIZE if ipv6 else IPV4_COLUMN_SIZE
+        self.row_size = self.ip_column_size + (column_count - 1) * 4
+        self.max_ip = MAX_IPV6 if ipv6 else MAX_IPV4
+        self.count = 0
+        self.next_ip = 0
+        self._buffer = bytearray()
+
+    def _write_row(self, ip_from, columns):
+        if self.ipv6:
+            self._buffer.extend(_UINT128.pack(ip_from & 0xFFFFFFFFFFFFFFFF, ip_from >> 64))
+        else:
+            self._buffer.extend(_UINT32.pack(ip_from))
+        self._buffer.extend(columns)
+        self.count += 1
+        if len(self._buffer) >= WRITE_BUFFER_SIZE:
+            self.file.write(self._buffer)
+            self._buffer.clear()
+
+    def add(self, ip_from, ip_to, columns, empty_columns):
+        if ip_from > self.next_ip:
+            self._write_row(self.next_ip, empty_columns)
+        self._write_row(ip_from, columns)
+        self.next_ip = ip_to + 1
+
+    def close(self, empty_columns):
+        if self.next_ip < self.max_ip:
+            self._write_row(self.next_ip, empty_columns)
+        # The last row only marks the end of the last range.
+        self._write_row(self.max_ip, empty_columns)
+        self.file.write(self._buffer)
+        self._buffer.clear()
+
+
+def compile_csv(csv_path, output_path=None, db_code=None, version=None):
+    """
+    Compile a LITE CSV database into a BIN database file.
+
+    :param csv_path: The path to the CSV file, or to a zip archive containing it.
+    :type csv_path: str
+    :param output_path: The path of the compiled file (default is the path of the CSV file with the `.BIN` extension).
+    :type output_path: str
+    :param db_code: The code of the CSV database (default is guessed from the name of the file, see `guess_db_code`).
+    :type db_code: str
+    :param version: The version of the database in the format "year.month.day" (default is given by `get_csv_version`).
+    :type version: str
+    :raises ValueError: If the database code or version is not valid, or the CSV file cannot be parsed.
+    :return: The path to the compiled file.
+    :rtype: str
+    """
+    csv_path = str(csv_path)
+    db_code = (db_code or guess_db_code(csv_path)).upper()
+    parse_csv_db_code(db_code)
+    version = version or get_csv_version(csv_path)
+    output_path = str(output_path or Path(csv_path).with_suffix('.BIN'))
+
+    print('Compiling {}...'.format(Fore.BLUE + os.path.basename(csv_path) + Fore.RESET))
+    try:
+        count = write_bin(read_csv_rows(csv_path, db_code), output_path, db_code, version)
+    except ValueError as e:
+        raise ValueError('{} ({})'.format(e, csv_path))
+    print('   Compiled {} ranges into {}'.format(count, Fore.GREEN + output_path + Fore.RESET))
+    return output_path
+
+def write_bin(rows, output_path, db_code, version):
+    """
+    Write the rows of a LITE CSV database into a BIN database file.
+
+    :param rows: The sorted rows, as tuples of the columns of the CSV database (see `get_csv_schema`).
+    :type rows: iterable
+    :param output_path: The path of the BIN file.
+    :type output_path: str
+    :param db_code: The code of the CSV database.
+    :type db_code: str
+    :param version: The version of the database in the format "year.month.day".
+    :type version: str
+    :raises ValueError: If the database code or version is not valid, or the ranges are not sorted.
+    :return: The number of ranges of the BIN file (of its IPv6 section for IPv6 databases), including the empty ranges filling the gaps between the rows.
+    :rtype: int
+    """
+    db_code = db_code.upper()
+    product, db_type, ipv6 = parse_csv_db_code(db_code)
+    fields = sorted(get_fields(product, db_type), key=lambda field: field[1])
+    names = [name for name, _ in get_csv_schema(db_code)]
+    release_date = version_to_date(version)
+    output_path = str(output_path)
+
+    column_count = fields[-1][1]
+    max_ip = MAX_IPV6 if ipv6 else MAX_IPV4
+    index_base = HEADER_SIZE
+    # IPv6 databases also get an IPv4 section holding the ranges of the IPv4-mapped block, like the official files.
+    section_count = 2 if ipv6 else 1
+    strings_base = index_base + section_count * INDEX_SIZE * INDEX_ENTRY_SIZE
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.TemporaryFile(dir=output_dir) as strings_file, tempfile.TemporaryFile(dir=output_dir) as ipv4_file, tempfile.TemporaryFile(dir=output_dir) as ipv6_file:
+        strings = _StringTable(strings_file, strings_base)
+        sections = [_RowSection(ipv4_file, False, column_count)]
+        if ipv6:
+            sections.append(_RowSection(ipv6_file, True, column_count))
+        # The section the rows are read into: the IPv4 section of IPv4 databases, the IPv6 section of IPv6 ones.
+        ipv4_section, section = sections[0], sections[-1]
+
+        # The position in the CSV rows of the value (or the country code and name) of each column.
+        columns = []
+        empty_row = [EMPTY_STRING] * len(names)
+        for name, column, kind in fields:
+            if kind == COUNTRY:
+                columns.append((kind, names.index('country_short'), names.index('country_long')))
+            else:
+                columns.append((kind, names.index(name), None))
+            if kind == FLOAT:
+                empty_row[names.index(name)] = 0.0
+
+        def encode_columns(row):
+            data = bytearray()
+            for kind, index, long_index in columns:
+                if kind == FLOAT:
+                    data.extend(_FLOAT.pack(row[index]))
+                elif kind == COUNTRY:
+                    data.extend(_UINT32.pack(strings.add_country(row[index], row[long_index])))
+                else:
+                    data.extend(_UINT32.pack(strings.add(row[index])))
+            return data
+
+        empty_columns = encode_columns(empty_row)
+        for row in rows:
+            ip_from, ip_to = row[0], row[1]
+            if ip_from < section.next_ip or ip_to < ip_from or ip_to > max_ip:
+                raise ValueError('Invalid range {}-{} (the ranges must be sorted and not overlap).'.format(ip_from, ip_to))
+            row_columns = encode_columns(row)
+            section.add(ip_from, ip_to, row_columns, empty_columns)
+            if ipv6 and ip_to >= IPV4_MAPPED_PREFIX and ip_from <= IPV4_MAPPED_PREFIX | MAX_IPV4:
+                ipv4_section.add(max(ip_from, IPV4_MAPPED_PREFIX) & MAX_IPV4, min(ip_to, IPV4_MAPPED_PREFIX | MAX_IPV4) & MAX_IPV4, row_columns, empty_columns)
+        for row_section in sections:
+            row_section.close(empty_columns)
+
+        # Aligned rows let the batch reader search the first-IP column without copying it.
+        strings.align(ROW_ALIGNMENT)
+        bases = [strings_base + strings.size]
+        if ipv6:
+            bases.append(bases[0] + ipv4_section.count * ipv4_section.row_size)
+        header = HEADER_STRUCT.pack(
+            db_type, column_count, release_date.year - 2000, release_date.month, release_date.day,
+            ipv4_section.count, bases[0] + 1,
+            section.count if ipv6 else 0, bases[-1] + 1 if ipv6 else 0,
+            index_base + 1, index_base + INDEX_SIZE * INDEX_ENTRY_SIZE + 1 if ipv6 else 0,
+            PRODUCT_CODES[product],
+        )
+
+        tmp_fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix='.{}.'.format(os.path.basename(output_path)), suffix='.part')
+        try:
+            with os.fdopen(tmp_fd, 'w+b') as output:
+                output.write(header.ljust(HEADER_SIZE, b'\x00'))
+                output.write(b'\x00' * (section_count * INDEX_SIZE * INDEX_ENTRY_SIZE))
+                for section_file in [strings_file] + [row_section.file for row_section in sections]:
+                    section_file.seek(0)
+                    shutil.copyfileobj(section_file, output, WRITE_BUFFER_SIZE)
+                output.flush()
+                with mmap.mmap(output.fileno(), 0) as mm:
+                    for number, (row_section, base) in enumerate(zip(sections, bases)):
+                        index = build_jump_table(mm, base, row_section.count, row_section.row_size, row_section.ip_column_size)
+                        offset = index_base + number * INDEX_SIZE * INDEX_ENTRY_SIZE
+                        mm[offset:offset + len(index)] = index
+                    mm.flush()
+                os.fsync(output.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return section.count - 1
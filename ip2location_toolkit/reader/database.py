@@ -0,0 +1,338 @@
+"""
+This module contains a memory-mapped lookup engine for IP2Location and IP2Proxy BIN database files.
+
+The database file is mapped into memory once when it is opened. Lookups binary-search the fixed-width rows of the
+IPv4 or IPv6 section directly in the mapping with ``struct.unpack_from`` and decode only the columns the database type
+has, so no file reads or copies of the data happen per query.
+
+Each search is narrowed down by a first-level index mapping the top 16 bits of an address (the /16 prefix of IPv4
+addresses) to the first and last rows that can contain it. The index stored in the file is used when the header points
+to one; otherwise an equivalent jump table is built when the database is opened.
+
+Example:
+    with BINDatabase('DB11LITEBIN.BIN') as database:
+        record = database.lookup('8.8.8.8')
+        print(record['country_short'], record['city'])
+
+Classes:
+    - BINDatabase: A memory-mapped IP2Location or IP2Proxy BIN database.
+"""
+import mmap, socket, struct, sys
+from bisect import bisect_left
+from .. import metrics
+from .fields import COUNTRY, FLOAT, get_fields
+from .header import read_db_header
+
+LOOKUP_COUNTERS = ('single_lookups_total', 'single_lookups_found_total', 'single_lookups_invalid_total')
+MAX_IPV4 = (1 << 32) - 1
+MAX_IPV6 = (1 << 128) - 1
+IPV4_MAPPED_PREFIX = 0xFFFF << 32
+IPV4_COLUMN_SIZE = 4
+IPV6_COLUMN_SIZE = 16
+INDEX_SIZE = 65536
+INDEX_ENTRY_SIZE = 8
+
+_UINT32 = struct.Struct('<I')
+_UINT128 = struct.Struct('<QQ')
+_FLOAT = struct.Struct('<f')
+_INDEX_ENTRY = struct.Struct('<II')
+_UINT16 = struct.Struct('<H')
+
+
+def ip_to_int(ip):
+    """
+    Convert an IP address to an integer.
+
+    :param ip: The IPv4 or IPv6 address.
+    :type ip: str
+    :raises ValueError: If the IP address is not valid.
+    :return: A tuple of the IP version (4 or 6) and the address as an integer.
+    :rtype: tuple
+    """
+    try:
+        if ':' in ip:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+    except (OSError, TypeError):
+        raise ValueError('Invalid IP address ({}).'.format(ip))
+
+def build_jump_table(buffer, base, count, row_size, ip_column_size):
+    """
+    Build a first-level index of a section of a BIN database, in the layout of the index stored in the files: one
+    ``(first row, last row)`` pair of 32-bit integers for each value of the top 16 bits of an address.
+
+    :param buffer: The content of the database file.
+    :type buffer: mmap.mmap or bytes
+    :param base: The offset of the first row of the section.
+    :type base: int
+    :param count: The number of rows of the section, including the last row marking the end of the last range.
+    :type count: int
+    :param row_size: The size of a row.
+    :type row_size: int
+    :param ip_column_size: The size of the first IP address of a row (4 for IPv4 rows, 16 for IPv6 rows).
+    :type ip_column_size: int
+    :return: The index.
+    :rtype: bytearray
+    """
+    top_offset = ip_column_size - 2
+    if sys.byteorder == 'little':
+        # A strided view of the top 16 bits of the first IP address of each row, searched in C by bisect.
+        view = memoryview(buffer)[base:base + count * row_size].cast('H')
+        prefixes = view[top_offset // 2::row_size // 2]
+    else:
+        prefixes = [_UINT16.unpack_from(buffer, base + row * row_size + top_offset)[0] for row in range(count)]
+    try:
+        starts = [bisect_left(prefixes, prefix) for prefix in range(INDEX_SIZE + 1)]
+    finally:
+        if isinstance(prefixes, memoryview):
+            prefixes.release()
+            view.release()
+    last_row = max(count - 2, 0)
+    index = bytearray(INDEX_SIZE * INDEX_ENTRY_SIZE)
+    for prefix in range(INDEX_SIZE):
+        low = min(max(starts[prefix] - 1, 0), last_row)
+        high = min(max(starts[prefix + 1] - 1, low), last_row)
+        _INDEX_ENTRY.pack_into(index, prefix * INDEX_ENTRY_SIZE, low, high)
+    return index
+
+
+class BINDatabase:
+    """
+    A memory-mapped IP2Location or IP2Proxy BIN database.
+
+    :param filepath: The path to the BIN database file.
+    :type filepath: str
+    :param product: The product of the database ("ip2location" or "ip2proxy") for files whose header does not tell (default is "ip2location").
+    :type product: str
+    :param use_index: Whether to narrow searches down with the first-level index of the file, or with a jump table built when the file has none (default is True).
+    :type use_index: bool
+    :raises ValueError: If the file is not a valid database file or its database type is not supported.
+    """
+    def __init__(self, filepath, product=None, use_index=True):
+        self.filepath = str(filepath)
+        self.header = read_db_header(self.filepath)
+        self.product = self.header.product or product or 'ip2location'
+        self.fields = get_fields(self.product, self.header.db_type)
+
+        self._file = open(self.filepath, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._view = memoryview(self._mm)
+        self.counters = metrics.Counters(LOOKUP_COUNTERS)
+
+        column_count = self.header.column_count
+        self._ipv4_row_size = column_count * 4
+        self._ipv6_row_size = IPV6_COLUMN_SIZE + (column_count - 1) * 4
+        self._ipv4_base = self.header.ipv4_base_address - 1
+        self._ipv6_base = self.header.ipv6_base_address - 1
+        self._ipv4_columns = self._get_columns(IPV4_COLUMN_SIZE)
+        self._ipv6_columns = self._get_columns(IPV6_COLUMN_SIZE)
+
+        size = len(self._mm)
+        if self.header.ipv4_count and self._ipv4_base + self.header.ipv4_count * self._ipv4_row_size > size:
+            self.close()
+            raise ValueError('Invalid database file (the IPv4 rows are truncated).')
+        if self.header.ipv6_count and self._ipv6_base + self.header.ipv6_count * self._ipv6_row_size > size:
+            self.close()
+            raise ValueError('Invalid database file (the IPv6 rows are truncated).')
+
+        self._ipv4_index = self._ipv6_index = None
+        self._ipv4_index_base = self._ipv6_index_base = 0
+        if use_index:
+            self._ipv4_index, self._ipv4_index_base = self._get_index(self.header.ipv4_count, self.header.ipv4_index_base_address, self._ipv4_base, self._ipv4_row_size, IPV4_COLUMN_SIZE)
+            self._ipv6_index, self._ipv6_index_base = self._get_index(self.header.ipv6_count, self.header.ipv6_index_base_address, self._ipv6_base, self._ipv6_row_size, IPV6_COLUMN_SIZE)
+
+    def _get_index(self, count, index_base_address, base, row_size, ip_column_size):
+        if not count:
+            return None, 0
+        if index_base_address and index_base_address - 1 + INDEX_SIZE * INDEX_ENTRY_SIZE <= len(self._mm):
+            return self._mm, index_base_address - 1
+        return build_jump_table(self._mm, base, count, row_size, ip_column_size), 0
+
+    def _get_columns(self, ip_column_size):
+        columns = []
+        for name, column, kind in self.fields:
+            columns.append((name, ip_column_size + (column - 2) * 4, kind))
+        return columns
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Unmap and close the database file.
+
+        :return: None
+        """
+        if self._view is not None:
+            self.counters.flush()
+            self._view.release()
+            self._view = None
+            self._mm.close()
+            self._file.close()
+
+    @property
+    def closed(self):
+        """
+        Whether the database file is closed.
+        """
+        return self._view is None
+
+    def get_ip_from(self, row, ipv6=False):
+        """
+        Get the first IP address of the range of a row.
+
+        :param row: The index of the row.
+        :type row: int
+        :param ipv6: Whether the row is in the IPv6 section.
+        :type ipv6: bool
+        :return: The first IP address of the range as an integer.
+        :rtype: int
+        """
+        if ipv6:
+            low, high = _UINT128.unpack_from(self._mm, self._ipv6_base + row * self._ipv6_row_size)
+            return (high << 64) | low
+        return _UINT32.unpack_from(self._mm, self._ipv4_base + row * self._ipv4_row_size)[0]
+
+    def get_range(self, row, ipv6=False):
+        """
+        Get the IP range of a row. The last address of the range is the first address of the next row minus one.
+
+        :param row: The index of the row.
+        :type row: int
+        :param ipv6: Whether the row is in the IPv6 section.
+        :type ipv6: bool
+        :return: A tuple of the first and the last IP address of the range as integers.
+        :rtype: tuple
+        """
+        return self.get_ip_from(row, ipv6), self.get_ip_from(row + 1, ipv6) - 1
+
+    def find_row(self, ipno, ipv6=False):
+        """
+        Find the row whose range contains an IP address.
+
+        :param ipno: The IP address as an integer.
+        :type ipno: int
+        :param ipv6: Whether to search the IPv6 section.
+        :type ipv6: bool
+        :return: The index of the row, or -1 if no row contains the address.
+        :rtype: int
+        """
+        if ipv6:
+            count = self.header.ipv6_count
+            ipno = min(ipno, MAX_IPV6 - 1)
+            index, index_base, prefix = self._ipv6_index, self._ipv6_index_base, ipno >> 112
+        else:
+            count = self.header.ipv4_count
+            ipno = min(ipno, MAX_IPV4 - 1)
+            index, index_base, prefix = self._ipv4_index, self._ipv4_index_base, ipno >> 16
+        if index is None:
+            return self._search(ipno, ipv6, 0, count - 1)
+        low, high = _INDEX_ENTRY.unpack_from(index, index_base + prefix * INDEX_ENTRY_SIZE)
+        return self._search(ipno, ipv6, low, min(high, count - 2))
+
+    def _search(self, ipno, ipv6, low, high):
+        get_ip_from = self.get_ip_from
+        while low <= high:
+            mid = (low + high) >> 1
+            if ipno < get_ip_from(mid, ipv6):
+                high = mid - 1
+            elif ipno >= get_ip_from(mid + 1, ipv6):
+                low = mid + 1
+            else:
+                return mid
+        return -1
+
+    def read_string(self, offset):
+        """
+        Read a string stored at an offset of the database file.
+
+        :param offset: The offset of the length byte of the string.
+        :type offset: int
+        :return: The string.
+        :rtype: str
+        """
+        length = self._mm[offset]
+        return str(self._view[offset + 1:offset + 1 + length], 'utf-8', 'replace')
+
+    def decode_row(self, row, ipv6=False):
+        """
+        Decode the fields of a row.
+
+        :param row: The index of the row.
+        :type row: int
+        :param ipv6: Whether the row is in the IPv6 section.
+        :type ipv6: bool
+        :return: A dictionary of the fields of the row. The country field is decoded into ``country_short`` and ``country_long``.
+        :rtype: dict
+        """
+        if ipv6:
+            offset = self._ipv6_base + row * self._ipv6_row_size
+            columns = self._ipv6_columns
+        else:
+            offset = self._ipv4_base + row * self._ipv4_row_size
+            columns = self._ipv4_columns
+        mm = self._mm
+        record = {}
+        for name, column_offset, kind in columns:
+            if kind == FLOAT:
+                record[name] = round(_FLOAT.unpack_from(mm, offset + column_offset)[0], 6)
+                continue
+            pointer = _UINT32.unpack_from(mm, offset + column_offset)[0]
+            if kind == COUNTRY:
+                record['country_short'] = self.read_string(pointer)
+                record['country_long'] = self.read_string(pointer + 3)
+            else:
+                record[name] = self.read_string(pointer)
+        return record
+
+    def resolve(self, version, ipno):
+        """
+        Resolve an IP address given as an integer to the section and row containing it. IPv4-mapped IPv6 addresses are
+        looked up in the IPv4 section, and IPv4 addresses are looked up as IPv4-mapped addresses in databases that only
+        have an IPv6 section.
+
+        :param version: The IP version (4 or 6).
+        :type version: int
+        :param ipno: The IP address as an integer.
+        :type ipno: int
+        :return: A tuple of whether the row is in the IPv6 section and the index of the row (-1 if no row contains the address).
+        :rtype: tuple
+        """
+        if version == 6 and ipno >> 32 == 0xFFFF and self.header.ipv4_count:
+            version, ipno = 4, ipno & MAX_IPV4
+        if version == 4:
+            if self.header.ipv4_count:
+                return False, self.find_row(ipno)
+            version, ipno = 6, IPV4_MAPPED_PREFIX | ipno
+        if not self.header.ipv6_count:
+            return True, -1
+        return True, self.find_row(ipno, ipv6=True)
+
+    def lookup(self, ip):
+        """
+        Look up an IP address.
+
+        :param ip: The IPv4 or IPv6 address.
+        :type ip: str
+        :raises ValueError: If the IP address is not valid.
+        :return: A dictionary of the fields of the database for the address (see `decode_row`), or None if the database has no record for it.
+        :rtype: dict or None
+        """
+        counts = self.counters.values
+        try:
+            ipv6, row = self.resolve(*ip_to_int(ip))
+        except ValueError:
+            counts['single_lookups_invalid_total'] += 1
+            raise
+        counts['single_lookups_total'] += 1
+        if row < 0:
+            return None
+        counts['single_lookups_found_total'] += 1
+        return self.decode_row(row, ipv6)
@@ -0,0 +1,548 @@
+"""
+This module contains functions for creating and applying binary deltas between two releases of a BIN database.
+
+A monthly release changes a small part of the ranges of a database, but inserting a single new string moves every
+string after it, which changes the string offsets held by most rows. The delta therefore diffs the sections of the
+new file separately, in the order they appear in it:
+
+    ===========  ===================================================================================================
+    Section      Diff
+    ===========  ===================================================================================================
+    Strings      Each length-prefixed string of the new file is looked up in the strings of the old file. Runs of
+                 strings found in the same order are copied from the old file, the others are stored.
+    Rows         The rows of the old and new files are merged by the first IP address of their range. A row is
+                 copied from the old file when it is equal to the old row of the same range once the string offsets
+                 of the old row are moved to where the strings copied from the old file are in the new file.
+    Other bytes  The header, the index and any padding are copied from the same offsets of the old file in blocks
+                 where they have not changed, and stored otherwise.
+    ===========  ===================================================================================================
+
+A delta file is gzip-compressed. It starts with a magic string and a JSON header describing the old file (its size
+and SHA-256), the row sections rows are copied from, the runs of strings copied from the old file and the metadata
+sidecar of the new file. It is followed by the operations rebuilding the new file from start to end, and by the
+SHA-256 of the new file, which is checked when the delta is applied.
+
+Both files are read sequentially in blocks, so memory use only grows with the number of distinct strings of the old
+file (like `compiler.compile_csv`), not with the number of rows.
+
+Example:
+    create_delta('DB11LITEBIN-2024-05.BIN', 'DB11LITEBIN-2024-06.BIN', 'DB11LITEBIN.delta')
+    apply_delta('/srv/geoip/DB11LITEBIN.BIN', 'DB11LITEBIN.delta')
+
+Functions:
+    - create_delta(old_path, new_path, delta_path): Create a delta rebuilding a BIN database from its previous release.
+    - apply_delta(old_path, delta_path, output_path, keep_previous): Rebuild a BIN database from its previous release and a delta.
+    - read_delta_header(delta_path): Read the header of a delta file.
+"""
+import gzip, hashlib, json, os, shutil, struct, tempfile, zlib
+from bisect import bisect_right
+from collections import namedtuple
+from colorama import Fore
+from .. import metrics
+from ..downloader.metadata import hash_file, read_metadata, write_metadata
+from ..downloader.update import get_update_tmp_dir, install_db
+from .database import IPV4_COLUMN_SIZE, IPV6_COLUMN_SIZE
+from .fields import COUNTRY, FLOAT, get_fields
+from .header import read_db_header
+
+MAGIC = b'IP2DELTA'
+FORMAT_VERSION = 1
+DELTA_SUFFIX = '.delta'
+BLOCK_SIZE = 1 << 16
+ROW_BATCH_SIZE = 4096
+OP_COPY = b'C'
+OP_LITERAL = b'L'
+OP_ROWS = b'R'
+OP_END = b'E'
+
+_UINT32 = struct.Struct('<I')
+_COPY = struct.Struct('<QQ')
+_LITERAL = struct.Struct('<Q')
+_ROWS = struct.Struct('<BQQ')
+
+
+class _Section(namedtuple('_Section', ['ip_size', 'base', 'count', 'row_size', 'pointers', 'countries'])):
+    """
+    The rows of the IPv4 or IPv6 section of a BIN database file, with the offsets of the string columns of a row (and
+    of the country columns among them).
+    """
+    __slots__ = ()
+
+    @property
+    def end(self):
+        return self.base + self.count * self.row_size
+
+    def matches(self, other):
+        return (self.ip_size, self.row_size, self.pointers) == (other.ip_size, other.row_size, other.pointers)
+
+
+class _Translator:
+    """
+    Moves the string offsets of the old file to where the strings copied from the old file are in the new file.
+    Offsets outside of the copied runs are left as they are.
+    """
+    def __init__(self, runs):
+        self.runs = sorted(tuple(run) for run in runs)
+        self.starts = [run[0] for run in self.runs]
+        self.offsets = {}
+
+    def __call__(self, offset):
+        new_offset = self.offsets.get(offset)
+        if new_offset is None:
+            new_offset = offset
+            index = bisect_right(self.starts, offset) - 1
+            if index >= 0:
+                old_start, new_start, length = self.runs[index]
+                if offset < old_start + length:
+                    new_offset = new_start + offset - old_start
+            self.offsets[offset] = new_offset
+        return new_offset
+
+    def rows(self, data, section):
+        """
+        Move the string offsets of a block of rows.
+        """
+        if not self.runs or not section.pointers:
+            return data
+        row_struct, indexes = _get_row_struct(section)
+        output = bytearray()
+        for values in row_struct.iter_unpack(data):
+            values = list(values)
+            for index in indexes:
+                values[index] = self(values[index])
+            output += row_struct.pack(*values)
+        return bytes(output)
+
+
+class _OpWriter:
+    """
+    Writes the operations of a delta, merging consecutive copies and buffering stored bytes.
+    """
+    def __init__(self, file):
+        self.file = file
+        self.pending = None
+        self.literal_buffer = bytearray()
+        self.copied = self.stored = self.rows_copied = 0
+
+    def copy(self, offset, length):
+        if self.pending and self.pending[0] == OP_COPY and self.pending[1] + self.pending[2] == offset:
+            self.pending[2] += length
+        else:
+            self.flush()
+            self.pending = [OP_COPY, offset, length]
+        self.copied += length
+
+    def rows(self, section, index, count):
+        if self.pending and self.pending[0] == OP_ROWS and self.pending[1] == section and self.pending[2] + self.pending[3] == index:
+            self.pending[3] += count
+        else:
+            self.flush()
+            self.pending = [OP_ROWS, section, index, count]
+        self.rows_copied += count
+
+    def literal(self, data):
+        if self.pending:
+            self.flush()
+        self.literal_buffer += data
+        self.stored += len(data)
+        if len(self.literal_buffer) >= BLOCK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending and self.pending[0] == OP_COPY:
+            self.file.write(OP_COPY + _COPY.pack(*self.pending[1:]))
+        elif self.pending:
+            self.file.write(OP_ROWS + _ROWS.pack(*self.pending[1:]))
+        self.pending = None
+        if self.literal_buffer:
+            self.file.write(OP_LITERAL + _LITERAL.pack(len(self.literal_buffer)) + self.literal_buffer)
+            self.literal_buffer = bytearray()
+
+
+def _get_row_struct(section):
+    ip_format, first = ('I', 1) if section.ip_size == IPV4_COLUMN_SIZE else ('QQ', 2)
+    row_struct = struct.Struct('<' + ip_format + 'I' * ((section.row_size - section.ip_size) // 4))
+    return row_struct, [first + (pointer - section.ip_size) // 4 for pointer in section.pointers]
+
+def _get_sections(path, size):
+    header = read_db_header(path)
+    try:
+        fields = get_fields(header.product or 'ip2location', header.db_type)
+    except ValueError:
+        fields = []
+    sections = []
+    for count, base_address, ip_size in ((header.ipv4_count, header.ipv4_base_address, IPV4_COLUMN_SIZE), (header.ipv6_count, header.ipv6_base_address, IPV6_COLUMN_SIZE)):
+        if not count:
+            continue
+        row_size = ip_size + (header.column_count - 1) * 4
+        columns = [(ip_size + (column - 2) * 4, kind) for _, column, kind in fields if kind != FLOAT and ip_size + (column - 2) * 4 + 4 <= row_size]
+        pointers = tuple(offset for offset, _ in columns)
+        countries = tuple(offset for offset, kind in columns if kind == COUNTRY)
+        section = _Section(ip_size, base_address - 1, count, row_size, pointers, countries)
+        if section.base < 0 or section.end > size:
+            raise ValueError('Invalid database file (the rows are truncated) ({}).'.format(path))
+        sections.append(section)
+    return sections
+
+def _iter_batches(file, section, start=0):
+    for index in range(start, section.count, ROW_BATCH_SIZE):
+        count = min(ROW_BATCH_SIZE, section.count - index)
+        file.seek(section.base + index * section.row_size)
+        data = file.read(count * section.row_size)
+        if len(data) != count * section.row_size:
+            raise ValueError('The rows of the database file are truncated.')
+        yield index, data
+
+def _iter_rows(file, section):
+    for index, data in _iter_batches(file, section):
+        for offset in range(0, len(data), section.row_size):
+            yield index + offset // section.row_size, data[offset:offset + section.row_size]
+
+def _ip_from(row, ip_size):
+    return int.from_bytes(row[:ip_size], 'little')
+
+def _record_end(file, offset):
+    file.seek(offset)
+    length = file.read(1)
+    return offset + 1 + length[0] if length else None
+
+def _find_strings(file, size, sections):
+    """
+    Find the strings section of a database file: the bytes from the first string a row points to to the end of the
+    last one. Returns None if the section cannot be told apart from the rows.
+    """
+    start, ends = None, []
+    for section in sections:
+        row_struct, indexes = _get_row_struct(section)
+        if not indexes:
+            continue
+        maximums = [0] * len(indexes)
+        for _, data in _iter_batches(file, section):
+            for values in row_struct.iter_unpack(data):
+                for position, index in enumerate(indexes):
+                    value = values[index]
+                    if start is None or value < start:
+                        start = value
+                    if value > maximums[position]:
+                        maximums[position] = value
+        for maximum, pointer in zip(maximums, section.pointers):
+            # The country name is stored 3 bytes after the country code.
+            ends.append(_record_end(file, maximum + 3 if pointer in section.countries else maximum))
+    if start is None or None in ends:
+        return None
+    end = max(ends)
+    if not 0 < start < end <= size or any(start < section.end and section.base < end for section in sections):
+        return None
+    return start, end
+
+def _iter_records(file, start, end):
+    """
+    Read the length-prefixed strings between two offsets of a file, in blocks.
+
+    :raises ValueError: If the last string does not end at the end offset.
+    """
+    file.seek(start)
+    buffer, position, offset, read = b'', 0, start, start
+    while offset < end:
+        if position >= len(buffer) or position + 1 + buffer[position] > len(buffer):
+            data = file.read(min(BLOCK_SIZE, end - read))
+            read += len(data)
+            buffer, position = buffer[position:] + data, 0
+            if not data or 1 + buffer[0] > len(buffer):
+                raise ValueError('The strings section does not end with a complete string.')
+        length = 1 + buffer[position]
+        yield offset, buffer[position:position + length]
+        position += length
+        offset += length
+
+def _diff_strings(new, strings, old_offsets, duplicates, writer):
+    runs = []
+    for offset, record in _iter_records(new, *strings):
+        old_offset = old_offsets.get(record)
+        if old_offset is None:
+            writer.literal(record)
+            continue
+        # A string stored more than once (such as the empty "-") continues the current run where it can.
+        if record in duplicates and runs and runs[-1][0] + runs[-1][2] in duplicates[record]:
+            old_offset = runs[-1][0] + runs[-1][2]
+        if runs and runs[-1][0] + runs[-1][2] == old_offset and runs[-1][1] + runs[-1][2] == offset:
+            runs[-1][2] += len(record)
+        else:
+            runs.append([old_offset, offset, len(record)])
+        writer.copy(old_offset, len(record))
+    return runs
+
+def _diff_rows(old, old_section, new, new_section, section_id, translator, writer, digest):
+    old_rows = _iter_rows(old, old_section)
+    current = next(old_rows, None)
+    current_ip = _ip_from(current[1], old_section.ip_size) if current else None
+    ip_size, row_size = new_section.ip_size, new_section.row_size
+    for _, data in _iter_batches(new, new_section):
+        digest.update(data)
+        for offset in range(0, len(data), row_size):
+            row = data[offset:offset + row_size]
+            ip_from = _ip_from(row, ip_size)
+            while current is not None and current_ip < ip_from:
+                current = next(old_rows, None)
+                current_ip = _ip_from(current[1], ip_size) if current else None
+            if current is not None and current_ip == ip_from and translator.rows(current[1], old_section) == row:
+                writer.rows(section_id, current[0], 1)
+                current = next(old_rows, None)
+                current_ip = _ip_from(current[1], ip_size) if current else None
+            else:
+                writer.literal(row)
+
+def _diff_bytes(old, old_size, new, start, end, writer, digest):
+    new.seek(start)
+    offset = start
+    while offset < end:
+        data = new.read(min(BLOCK_SIZE, end - offset))
+        if not data:
+            raise ValueError('The database file is truncated.')
+        digest.update(data)
+        if offset + len(data) <= old_size:
+            old.seek(offset)
+            if old.read(len(data)) == data:
+                writer.copy(offset, len(data))
+                offset += len(data)
+                continue
+        writer.literal(data)
+        offset += len(data)
+
+def _hash_range(file, start, end, digest):
+    file.seek(start)
+    while start < end:
+        data = file.read(min(BLOCK_SIZE, end - start))
+        if not data:
+            raise ValueError('The database file is truncated.')
+        digest.update(data)
+        start += len(data)
+
+def create_delta(old_path, new_path, delta_path=None):
+    """
+    Create a delta rebuilding a BIN database from its previous release.
+
+    :param old_path: The path to the previous release.
+    :type old_path: str
+    :param new_path: The path to the new release.
+    :type new_path: str
+    :param delta_path: The path of the delta file (default is the path of the new release with the ``.delta`` extension).
+    :type delta_path: str
+    :raises ValueError: If a file is not a valid BIN database file.
+    :return: The path to the delta file.
+    :rtype: str
+    """
+    old_path, new_path = str(old_path), str(new_path)
+    delta_path = str(delta_path or os.path.splitext(new_path)[0] + DELTA_SUFFIX)
+    old_size, new_size = os.path.getsize(old_path), os.path.getsize(new_path)
+    old_sections, new_sections = _get_sections(old_path, old_size), _get_sections(new_path, new_size)
+    print('Creating a delta from {} to {}...'.format(Fore.BLUE + old_path + Fore.RESET, Fore.BLUE + new_path + Fore.RESET))
+
+    with metrics.span('create_delta') as span, open(old_path, 'rb') as old, open(new_path, 'rb') as new, \
+            tempfile.TemporaryFile() as string_ops:
+        old_strings = _find_strings(old, old_size, old_sections)
+        new_strings = _find_strings(new, new_size, new_sections)
+        old_offsets, duplicates = {}, {}
+        if old_strings:
+            try:
+                for offset, record in _iter_records(old, *old_strings):
+                    first = old_offsets.setdefault(record, offset)
+                    if first != offset:
+                        duplicates.setdefault(record, [first]).append(offset)
+            except ValueError:
+                old_offsets, duplicates = {}, {}
+
+        string_writer = _OpWriter(string_ops)
+        runs = []
+        if new_strings:
+            try:
+                runs = _diff_strings(new, new_strings, old_offsets, duplicates, string_writer)
+                string_writer.flush()
+            except ValueError:
+                new_strings, runs = None, []
+                string_ops.seek(0)
+                string_ops.truncate()
+                string_writer = _OpWriter(string_ops)
+        del old_offsets, duplicates
+
+        # The row sections rows are copied from, paired with the sections of the new file.
+        pairs = {}
+        for new_section in new_sections:
+            for old_section in old_sections:
+                if old_section.matches(new_section):
+                    pairs[new_section] = (len(pairs), old_section)
+        regions = sorted([(section.base, section.end, section) for section in new_sections] + ([new_strings + (None,)] if new_strings else []), key=lambda region: region[0])
+
+        header = json.dumps({
+            'format': FORMAT_VERSION,
+            'old_size': old_size,
+            'old_sha256': hash_file(old_path).hexdigest(),
+            'new_size': new_size,
+            'sections': [old_section._asdict() for _, old_section in sorted(pairs.values(), key=lambda pair: pair[0])],
+            'runs': runs,
+            'metadata': read_metadata(new_path),
+        }).encode('utf-8')
+        translator = _Translator(runs)
+        digest = hashlib.sha256()
+
+        tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(delta_path)), prefix='.' + os.path.basename(delta_path) + '.', suffix='.part')
+        try:
+            with os.fdopen(tmp_fd, 'wb') as raw_file, gzip.GzipFile(fileobj=raw_file, mode='wb') as delta:
+                delta.write(MAGIC + _UINT32.pack(len(header)) + header)
+                writer = _OpWriter(delta)
+                position = 0
+                for start, end, section in regions + [(new_size, new_size, None)]:
+                    if start > position:
+                        _diff_bytes(old, old_size, new, position, start, writer, digest)
+                    if start >= new_size:
+                        break
+                    if section is None:
+                        writer.flush()
+                        string_ops.seek(0)
+                        shutil.copyfileobj(string_ops, delta, BLOCK_SIZE)
+                        writer.copied += string_writer.copied
+                        writer.stored += string_writer.stored
+                        _hash_range(new, start, end, digest)
+                    elif section in pairs:
+                        section_id, old_section = pairs[section]
+                        _diff_rows(old, old_section, new, section, section_id, translator, writer, digest)
+                    else:
+                        _diff_bytes(old, old_size, new, start, end, writer, digest)
+                    position = end
+                writer.flush()
+                delta.write(OP_END + digest.digest())
+            os.replace(tmp_path, delta_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        delta_size = os.path.getsize(delta_path)
+        span.add('bytes_copied', writer.copied)
+        span.add('bytes_stored', writer.stored)
+        span.add('rows_copied', writer.rows_copied)
+        span.add('bytes_written', delta_size)
+    print('   Created {} ({} MB, {:.1f}% of the new release)'.format(
+        Fore.GREEN + delta_path + Fore.RESET, format(delta_size / 1000000, '.2f'), delta_size * 100 / max(new_size, 1)
+    ))
+    return delta_path
+
+def _read_exact(file, size):
+    try:
+        data = file.read(size)
+    except (EOFError, OSError, zlib.error) as e:
+        raise ValueError('The delta file is corrupted ({}).'.format(e))
+    if len(data) != size:
+        raise ValueError('The delta file is truncated.')
+    return data
+
+def _read_header(delta):
+    if _read_exact(delta, len(MAGIC)) != MAGIC:
+        raise ValueError('Not a delta file.')
+    try:
+        header = json.loads(_read_exact(delta, _UINT32.unpack(_read_exact(delta, _UINT32.size))[0]).decode('utf-8'))
+    except (UnicodeDecodeError, ValueError):
+        raise ValueError('The header of the delta file is not valid.')
+    if header.get('format') != FORMAT_VERSION:
+        raise ValueError('Unsupported delta format ({}).'.format(header.get('format')))
+    return header
+
+def read_delta_header(delta_path):
+    """
+    Read the header of a delta file.
+
+    :param delta_path: The path to the delta file.
+    :type delta_path: str
+    :raises ValueError: If the file is not a delta file.
+    :return: The header, with the keys ``format``, ``old_size``, ``old_sha256``, ``new_size``, ``sections``, ``runs`` and ``metadata``.
+    :rtype: dict
+    """
+    with gzip.open(str(delta_path), 'rb') as delta:
+        return _read_header(delta)
+
+def _copy_bytes(old, old_size, offset, length, output, digest):
+    if offset + length > old_size:
+        raise ValueError('The delta file copies bytes past the end of the old file.')
+    old.seek(offset)
+    while length:
+        data = old.read(min(BLOCK_SIZE, length))
+        output.write(data)
+        digest.update(data)
+        length -= len(data)
+
+def _copy_rows(old, section, index, count, translator, output, digest):
+    if index + count > section.count:
+        raise ValueError('The delta file copies rows past the end of the old file.')
+    for start, data in _iter_batches(old, section._replace(count=index + count), index):
+        data = translator.rows(data, section)
+        output.write(data)
+        digest.update(data)
+
+def apply_delta(old_path, delta_path, output_path=None, keep_previous=False):
+    """
+    Rebuild a BIN database from its previous release and a delta, and check it against the SHA-256 of the new release.
+
+    The new release is written to a temporary file next to the output file, which is replaced atomically once the
+    checksum matches (see `update.install_db`). The metadata sidecar of the new release is restored next to it.
+
+    :param old_path: The path to the previous release the delta was created from.
+    :type old_path: str
+    :param delta_path: The path to the delta file.
+    :type delta_path: str
+    :param output_path: The path of the new release (default is to replace the previous release).
+    :type output_path: str
+    :param keep_previous: Keep the replaced file so that it can be restored with `update.rollback_db` (default is False).
+    :type keep_previous: bool
+    :raises ValueError: If the delta was not created from the old file, is corrupted, or the rebuilt file does not match its checksum.
+    :return: The path to the new release.
+    :rtype: str
+    """
+    old_path, output_path = str(old_path), str(output_path or old_path)
+    print('Applying {} to {}...'.format(Fore.BLUE + str(delta_path) + Fore.RESET, Fore.BLUE + old_path + Fore.RESET))
+    with metrics.span('apply_delta') as span, gzip.open(str(delta_path), 'rb') as delta:
+        header = _read_header(delta)
+        old_size = os.path.getsize(old_path)
+        if old_size != header['old_size'] or hash_file(old_path).hexdigest() != header['old_sha256']:
+            raise ValueError('The delta was not created from {}.'.format(old_path))
+        sections = [_Section(**dict(section, pointers=tuple(section['pointers']), countries=tuple(section['countries']))) for section in header['sections']]
+        translator = _Translator(header['runs'])
+        digest = hashlib.sha256()
+
+        tmp_dir = get_update_tmp_dir(output_path)
+        try:
+            tmp_path = os.path.join(tmp_dir, os.path.basename(output_path))
+            with open(old_path, 'rb') as old, open(tmp_path, 'wb') as output:
+                while True:
+                    op = _read_exact(delta, 1)
+                    if op == OP_COPY:
+                        offset, length = _COPY.unpack(_read_exact(delta, _COPY.size))
+                        _copy_bytes(old, old_size, offset, length, output, digest)
+                        span.add('bytes_copied', length)
+                    elif op == OP_LITERAL:
+                        length = _LITERAL.unpack(_read_exact(delta, _LITERAL.size))[0]
+                        while length:
+                            data = _read_exact(delta, min(BLOCK_SIZE, length))
+                            output.write(data)
+                            digest.update(data)
+                            length -= len(data)
+                    elif op == OP_ROWS:
+                        section_id, index, count = _ROWS.unpack(_read_exact(delta, _ROWS.size))
+                        if section_id >= len(sections):
+                            raise ValueError('The delta file copies rows from an unknown section.')
+                        _copy_rows(old, sections[section_id], index, count, translator, output, digest)
+                        span.add('rows_copied', count)
+                    elif op == OP_END:
+                        expected = _read_exact(delta, digest.digest_size)
+                        break
+                    else:
+                        raise ValueError('The delta file is corrupted (unknown operation).')
+                size = output.tell()
+            if size != header['new_size'] or digest.digest() != expected:
+                raise ValueError('The rebuilt database does not match the checksum of the delta.')
+            write_metadata(tmp_path, dict(header['metadata'], sha256=digest.hexdigest()))
+            install_db(tmp_path, output_path, keep_previous)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        span.add('bytes_written', size)
+    print('   Rebuilt {}'.format(Fore.GREEN + output_path + Fore.RESET))
+    return output_path
@@ -0,0 +1,78 @@
+"""
+This module describes the columns of the rows of IP2Location and IP2Proxy BIN databases.
+
+A row starts with the first IP address of its range (4 bytes for IPv4 rows, 16 bytes for IPv6 rows) followed by one
+4-byte column per field. Most columns hold the offset of a string in the file (a length byte followed by the string);
+the country column points to the 2-letter country code, with the country name stored 3 bytes further. Latitude and
+longitude columns hold 32-bit floats.
+
+The fields of the database types the toolkit can download (see `db_codes.CODES`) are listed below. Each field is
+described by a ``(name, column, kind)`` tuple, where `column` is the 1-based position of the column in the row (column
+1 being the first IP address) and `kind` is one of ``country``, ``string`` or ``float``.
+
+Functions:
+    - get_fields(product, db_type): Get the fields of a database type.
+"""
+
+COUNTRY = 'country'
+STRING = 'string'
+FLOAT = 'float'
+
+IP2LOCATION_FIELDS = {
+    1: [('country', 2, COUNTRY)],
+    3: [('country', 2, COUNTRY), ('region', 3, STRING), ('city', 4, STRING)],
+    5: [('country', 2, COUNTRY), ('region', 3, STRING), ('city', 4, STRING), ('latitude', 5, FLOAT), ('longitude', 6, FLOAT)],
+    9: [('country', 2, COUNTRY), ('region', 3, STRING), ('city', 4, STRING), ('latitude', 5, FLOAT), ('longitude', 6, FLOAT), ('zip_code', 7, STRING)],
+    11: [('country', 2, COUNTRY), ('region', 3, STRING), ('city', 4, STRING), ('latitude', 5, FLOAT), ('longitude', 6, FLOAT), ('zip_code', 7, STRING), ('time_zone', 8, STRING)],
+}
+
+_PROXY_FIELDS = [
+    ('proxy_type', 2, STRING),
+    ('country', 3, COUNTRY),
+    ('region', 4, STRING),
+    ('city', 5, STRING),
+    ('isp', 6, STRING),
+    ('domain', 7, STRING),
+    ('usage_type', 8, STRING),
+    ('asn', 9, STRING),
+    ('as_name', 10, STRING),
+    ('last_seen', 11, STRING),
+    ('threat', 12, STRING),
+    ('provider', 13, STRING),
+]
+IP2PROXY_FIELDS = {
+    1: [('country', 2, COUNTRY)],
+    2: _PROXY_FIELDS[:2],
+    3: _PROXY_FIELDS[:4],
+    4: _PROXY_FIELDS[:5],
+    5: _PROXY_FIELDS[:6],
+    6: _PROXY_FIELDS[:7],
+    7: _PROXY_FIELDS[:9],
+    8: _PROXY_FIELDS[:10],
+    9: _PROXY_FIELDS[:11],
+    10: _PROXY_FIELDS[:11],
+    11: _PROXY_FIELDS[:12],
+}
+
+PRODUCT_FIELDS = {
+    'ip2location': IP2LOCATION_FIELDS,
+    'ip2proxy': IP2PROXY_FIELDS,
+}
+
+
+def get_fields(product, db_type):
+    """
+    Get the fields of a database type.
+
+    :param product: The product of the database ("ip2location" or "ip2proxy").
+    :type product: str
+    :param db_type: The database type (the number in DB11, PX11...).
+    :type db_type: int
+    :raises ValueError: If the database type is not supported.
+    :return: A list of ``(name, column, kind)`` tuples.
+    :rtype: list
+    """
+    try:
+        return PRODUCT_FIELDS[product][db_type]
+    except KeyError:
+        raise ValueError('Unsupported database type ({} {}).'.format(product, db_type))
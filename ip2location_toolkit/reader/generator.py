@@ -0,0 +1,254 @@
+"""
+This module contains a generator of synthetic IP2Location and IP2Proxy databases for load testing.
+
+It writes structurally valid LITE CSV files and BIN files (see `compiler.write_bin`) for every database code of the
+catalog (see `catalog`), with any number of ranges, so that the toolkit can be tested at the scale of the real
+databases without downloading them. The output is fully determined by the seed.
+
+The strings follow the cardinality of the real databases: about 250 countries, a few thousand regions and as many
+cities as requested, picked with a skewed distribution so that a few countries and cities hold most of the ranges.
+The fields of each range are consistent with each other (a city always has the same region, country, coordinates,
+zip code and time zone). IP2Location databases cover the whole address space, while IP2Proxy databases only list
+small ranges of proxy addresses. IPv6 databases hold half of their ranges in the IPv4-mapped block (``::ffff:0:0/96``)
+and the other half in the global unicast block (``2000::/3``). Their BIN files also carry an IPv4 section holding the
+ranges of the IPv4-mapped block, like the official files.
+
+Example:
+    generate_database('DB11LITEBIN', rows=3000000, seed=1, archive=True)
+
+Functions:
+    - generate_rows(db_code, rows, seed, cities): Generate the rows of a synthetic LITE CSV database.
+    - write_csv(rows, path, db_code): Write rows in the format of the LITE CSV databases.
+    - generate_database(db_code, output_path, rows, seed, version, cities, archive): Write a synthetic database file.
+"""
+import csv, os, random, re, tempfile, zipfile
+from pathlib import Path
+from ..catalog import is_valid_code
+from ..defaults import GENERATE_ROWS as DEFAULT_ROWS, GENERATE_VERSION as DEFAULT_VERSION
+from .compiler import write_bin
+from .database import MAX_IPV4, MAX_IPV6
+from .fields import FLOAT
+from .lite_csv import get_csv_schema, parse_csv_db_code
+
+COUNTRY_COUNT = 249
+REGIONS_PER_COUNTRY = 16
+EMPTY_STRING = '-'
+
+IPV4_MAPPED_BLOCK = (0xFFFF << 32, 0xFFFF << 32 | MAX_IPV4)
+GLOBAL_UNICAST_BLOCK = (0x2 << 124, (0x4 << 124) - 1)
+
+PROXY_TYPES = ['VPN', 'TOR', 'DCH', 'PUB', 'WEB', 'SES', 'RES', 'CPN', 'EPN']
+USAGE_TYPES = ['COM', 'ORG', 'GOV', 'MIL', 'EDU', 'LIB', 'CDN', 'ISP', 'MOB', 'DCH', 'SES', 'RSV']
+THREATS = ['-', 'SPAM', 'SCANNER', 'BOTNET', 'SPAM/SCANNER', 'BOTNET/SCANNER']
+NAME_SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'sen', 'to', 'vil', 'an', 'der', 'bur', 'ton', 'ia', 'no', 'sa', 'gu', 'el']
+
+BIN_CODE_PATTERN = re.compile(r'^(DB|PX)\d+LITEBIN(IPV6)?$')
+
+
+def _name(generator, syllables):
+    return ''.join(generator.choice(NAME_SYLLABLES) for _ in range(syllables)).capitalize()
+
+def _cumulative_weights(count):
+    # A Zipf-like distribution: the n-th value is picked about n times less often than the first one.
+    weights = []
+    total = 0.0
+    for rank in range(1, count + 1):
+        total += 1 / rank
+        weights.append(total)
+    return weights
+
+
+class _Pools:
+    """
+    The strings of a synthetic database, each city carrying its region, country, coordinates, zip code and time zone.
+    """
+    def __init__(self, generator, cities, proxy):
+        self.countries = []
+        codes = set()
+        while len(self.countries) < COUNTRY_COUNT:
+            code = chr(65 + generator.randrange(26)) + chr(65 + generator.randrange(26))
+            if code in codes:
+                continue
+            codes.add(code)
+            offset = generator.randint(-11, 13)
+            time_zone = '{}{:02d}:00'.format('+' if offset >= 0 else '-', abs(offset))
+            self.countries.append((code, _name(generator, 3), time_zone))
+        regions = [(country, _name(generator, 3)) for country in range(COUNTRY_COUNT) for _ in range(REGIONS_PER_COUNTRY)]
+        self.cities = []
+        for _ in range(cities):
+            country, region = generator.choice(regions)
+            self.cities.append((
+                self.countries[country], region, _name(generator, generator.randint(2, 4)),
+                round(generator.uniform(-90, 90), 6), round(generator.uniform(-180, 180), 6),
+                '{:05d}'.format(generator.randrange(100000)),
+            ))
+        generator.shuffle(self.cities)
+        self.city_weights = _cumulative_weights(cities)
+        if proxy:
+            self.isps = []
+            for _ in range(max(cities // 10, 10)):
+                name = _name(generator, 3)
+                self.isps.append((name + ' Networks', name.lower() + '.net', str(generator.randint(1000, 400000))))
+            self.isp_weights = _cumulative_weights(len(self.isps))
+            self.providers = [_name(generator, 2) + ' VPN' for _ in range(50)]
+
+    def pick_city(self, generator):
+        return generator.choices(self.cities, cum_weights=self.city_weights)[0]
+
+    def pick_isp(self, generator):
+        return generator.choices(self.isps, cum_weights=self.isp_weights)[0]
+
+
+def _get_blocks(ipv6, rows):
+    if not ipv6:
+        return [(0, MAX_IPV4, rows)]
+    return [(IPV4_MAPPED_BLOCK[0], IPV4_MAPPED_BLOCK[1], rows // 2), (GLOBAL_UNICAST_BLOCK[0], GLOBAL_UNICAST_BLOCK[1], rows - rows // 2)]
+
+def _get_ranges(generator, start, end, count, proxy):
+    """
+    Split the block from `start` to `end` into `count` random ranges. Proxy ranges are small and separated by gaps.
+    """
+    if count <= 0:
+        return
+    average = (end - start + 1) // count
+    if average < 1:
+        raise ValueError('Too many rows ({}) for the address space.'.format(count))
+    ip_from = start
+    for remaining in range(count, 0, -1):
+        if remaining == 1:
+            step = end - ip_from + 1
+        else:
+            # Keep at least one address for each of the remaining ranges.
+            step = min(generator.randint(1, 2 * average - 1), end - ip_from + 1 - (remaining - 1))
+        if proxy:
+            yield ip_from, ip_from + min(generator.randint(1, 256), step) - 1
+        else:
+            yield ip_from, ip_from + step - 1
+        ip_from += step
+
+def generate_rows(db_code, rows=DEFAULT_ROWS, seed=0, cities=None):
+    """
+    Generate the rows of a synthetic LITE CSV database.
+
+    :param db_code: The code of the database (for example DB11LITECSV or PX2LITEBINIPV6).
+    :type db_code: str
+    :param rows: The number of ranges holding records. IP2Location databases also get an empty range before and after each IPv6 block.
+    :type rows: int
+    :param seed: The seed of the random generator.
+    :type seed: int
+    :param cities: The number of distinct cities (default is one per 20 ranges, at least 100 and at most 100000).
+    :type cities: int
+    :raises ValueError: If the database code is not valid, or the address space cannot hold the ranges.
+    :return: A generator of tuples holding the typed values of the columns of each row (see `get_csv_schema`).
+    :rtype: generator
+    """
+    csv_code = str(db_code).upper().replace('LITEBIN', 'LITECSV')
+    product, _, ipv6 = parse_csv_db_code(csv_code)
+    proxy = product == 'ip2proxy'
+    names = [name for name, _ in get_csv_schema(csv_code)[2:]]
+    generator = random.Random(seed)
+    pools = _Pools(generator, cities or min(max(rows // 20, 100), 100000), proxy)
+    empty_row = tuple(0.0 if name in ('latitude', 'longitude') else EMPTY_STRING for name in names)
+
+    def make_row():
+        (country_short, country_long, time_zone), region, city, latitude, longitude, zip_code = pools.pick_city(generator)
+        values = {
+            'country_short': country_short, 'country_long': country_long, 'region': region, 'city': city,
+            'latitude': latitude, 'longitude': longitude, 'zip_code': zip_code, 'time_zone': time_zone,
+        }
+        if proxy:
+            isp, domain, asn = pools.pick_isp(generator)
+            values.update({
+                'proxy_type': generator.choice(PROXY_TYPES), 'isp': isp, 'domain': domain,
+                'usage_type': generator.choice(USAGE_TYPES), 'asn': asn, 'as_name': isp.upper(),
+                'last_seen': str(generator.randint(1, 30)), 'threat': generator.choice(THREATS),
+                'provider': generator.choice(pools.providers),
+            })
+        return tuple(values[name] for name in names)
+
+    next_ip = 0
+    for start, end, count in _get_blocks(ipv6, rows):
+        if start > next_ip and not proxy:
+            yield (next_ip, start - 1) + empty_row
+        for ip_from, ip_to in _get_ranges(generator, start, end, count, proxy):
+            yield (ip_from, ip_to) + make_row()
+        next_ip = end + 1
+    if ipv6 and next_ip <= MAX_IPV6 and not proxy:
+        yield (next_ip, MAX_IPV6) + empty_row
+
+def write_csv(rows, path, db_code):
+    """
+    Write rows in the format of the LITE CSV databases: every value is quoted, and lines end with CRLF.
+
+    :param rows: The rows, as tuples of the columns of the database (see `get_csv_schema`).
+    :type rows: iterable
+    :param path: The path of the CSV file.
+    :type path: str
+    :param db_code: The code of the CSV database.
+    :type db_code: str
+    :return: The number of rows written.
+    :rtype: int
+    """
+    floats = [index for index, (_, kind) in enumerate(get_csv_schema(db_code)) if kind == FLOAT]
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL, lineterminator='\r\n')
+        for row in rows:
+            if floats:
+                row = list(row)
+                for index in floats:
+                    row[index] = '{:.6f}'.format(row[index])
+            writer.writerow(row)
+            count += 1
+    return count
+
+def _get_member_name(db_code):
+    # The name of the database in the downloaded archives, for example IP2LOCATION-LITE-DB11.IPV6.BIN.
+    product, db_type, ipv6 = parse_csv_db_code(db_code.replace('LITEBIN', 'LITECSV'))
+    return '{}-LITE-{}{}{}.{}'.format(
+        product.upper(), 'DB' if product == 'ip2location' else 'PX', db_type, '.IPV6' if ipv6 else '',
+        'BIN' if 'LITEBIN' in db_code else 'CSV',
+    )
+
+def generate_database(db_code, output_path=None, rows=DEFAULT_ROWS, seed=0, version=DEFAULT_VERSION, cities=None, archive=False):
+    """
+    Write a synthetic database file, or a zip archive containing it like the downloaded archives.
+
+    :param db_code: The code of the database, one of the codes of the catalog (for example DB11LITEBIN or PX2LITECSVIPV6).
+    :type db_code: str
+    :param output_path: The path of the file (default is ``<db_code>.BIN``, ``<db_code>.CSV`` or ``<db_code>.zip`` in the current directory).
+    :type output_path: str
+    :param rows: The number of ranges holding records (see `generate_rows`).
+    :type rows: int
+    :param seed: The seed of the random generator.
+    :type seed: int
+    :param version: The version written in the header of BIN databases, in the format "year.month.day".
+    :type version: str
+    :param cities: The number of distinct cities (see `generate_rows`).
+    :type cities: int
+    :param archive: Whether to write a zip archive holding the database and a license file (default is False).
+    :type archive: bool
+    :raises ValueError: If the database code or version is not valid.
+    :return: The path to the file.
+    :rtype: str
+    """
+    db_code = str(db_code).upper()
+    if not is_valid_code(db_code):
+        raise ValueError('Unknown database code ({}).'.format(db_code))
+    is_bin = BIN_CODE_PATTERN.match(db_code) is not None
+    csv_code = db_code.replace('LITEBIN', 'LITECSV')
+    output_path = str(output_path or Path.cwd() / (db_code + ('.zip' if archive else '.BIN' if is_bin else '.CSV')))
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        path = os.path.join(tmp_dir, _get_member_name(db_code)) if archive else output_path
+        row_generator = generate_rows(db_code, rows, seed, cities)
+        if is_bin:
+            write_bin(row_generator, path, csv_code, version)
+        else:
+            write_csv(row_generator, path, csv_code)
+        if archive:
+            with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                zip_file.write(path, os.path.basename(path))
+                zip_file.writestr('LICENSE_LITE.TXT', 'Synthetic database generated with seed {}.\n'.format(seed))
+    return output_path
@@ -0,0 +1,98 @@
+"""
+This module contains functions for parsing the header of IP2Location and IP2Proxy BIN database files.
+
+The header is the first 30 bytes of the file (read by `get_db_header`), laid out as follows (integers are little-endian, addresses are 1-based file offsets):
+
+    ======  =====  =============================================
+    Offset  Size   Field
+    ======  =====  =============================================
+    0       1      Database type (the number in DB11, PX11...)
+    1       1      Number of columns of a row
+    2       3      Year (since 2000), month and day of the release
+    5       4      Number of IPv4 rows
+    9       4      Address of the first IPv4 row
+    13      4      Number of IPv6 rows
+    17      4      Address of the first IPv6 row
+    21      4      Address of the IPv4 index (0 if there is none)
+    25      4      Address of the IPv6 index (0 if there is none)
+    29      1      Product code (1: IP2Location, 2: IP2Proxy, 0 in older files)
+    ======  =====  =============================================
+
+Functions:
+    - parse_db_header(header): Parse the 30-byte header of a BIN database file.
+    - read_db_header(filepath): Read and parse the header of a BIN database file.
+"""
+import struct
+from collections import namedtuple
+from ..downloader.update import get_db_header
+
+HEADER_STRUCT = struct.Struct('<5B6IB')
+PRODUCT_CODES = {1: 'ip2location', 2: 'ip2proxy'}
+
+
+class DBHeader(namedtuple('DBHeader', [
+    'db_type',
+    'column_count',
+    'year',
+    'month',
+    'day',
+    'ipv4_count',
+    'ipv4_base_address',
+    'ipv6_count',
+    'ipv6_base_address',
+    'ipv4_index_base_address',
+    'ipv6_index_base_address',
+    'product_code',
+])):
+    """
+    The parsed header of a BIN database file.
+    """
+    __slots__ = ()
+
+    @property
+    def version(self):
+        """
+        The version of the database in the format "year.month.day", as returned by `get_db_version`.
+        """
+        return f"{self.year}.{self.month}.{self.day}"
+
+    @property
+    def product(self):
+        """
+        The product of the database ("ip2location" or "ip2proxy"), or None if the header does not tell.
+        """
+        return PRODUCT_CODES.get(self.product_code)
+
+
+def parse_db_header(header):
+    """
+    Parse the 30-byte header of an IP2Location or IP2Proxy BIN database file.
+
+    :param header: The header of the database file.
+    :type header: bytes
+    :raises ValueError: If the header is shorter than 30 bytes or does not describe a valid database.
+    :return: The parsed header.
+    :rtype: DBHeader
+    """
+    if len(header) < HEADER_STRUCT.size:
+        raise ValueError("Invalid database header (less than {} bytes)".format(HEADER_STRUCT.size))
+    db_header = DBHeader(*HEADER_STRUCT.unpack_from(header))
+    if db_header.column_count < 1:
+        raise ValueError("Invalid database header (no columns)")
+    if db_header.ipv4_count and not db_header.ipv4_base_address:
+        raise ValueError("Invalid database header (no IPv4 base address)")
+    if db_header.ipv6_count and not db_header.ipv6_base_address:
+        raise ValueError("Invalid database header (no IPv6 base address)")
+    return db_header
+
+def read_db_header(filepath):
+    """
+    Read and parse the header of an IP2Location or IP2Proxy BIN database file.
+
+    :param filepath: The path to the database file.
+    :type filepath: str
+    :raises ValueError: If the file cannot be read or its header is not valid.
+    :return: The parsed header.
+    :rtype: DBHeader
+    """
+    return parse_db_header(get_db_header(filepath))
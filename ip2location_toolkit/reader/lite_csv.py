@@ -0,0 +1,148 @@
+"""
+This module contains a streaming reader for the IP2Location and IP2Proxy LITE CSV databases.
+
+Rows are parsed one at a time from large buffered reads of the extracted CSV file, or directly from the CSV member of a
+downloaded zip archive, so memory use stays flat whatever the size of the database. Each row is returned as a tuple of
+typed values: the first and last IP addresses of the range as integers (IPv6 databases hold IPv4 ranges as IPv4-mapped
+addresses), latitude and longitude as floats, and the other columns as strings.
+
+The columns of a database are named like the fields returned by `BINDatabase.lookup`, after ``ip_from`` and ``ip_to``.
+
+Example:
+    for ip_from, ip_to, country_short in read_csv_rows('DB11LITECSV.zip', columns=['ip_from', 'ip_to', 'country_short']):
+        ...
+
+Functions:
+    - parse_csv_db_code(db_code): Get the product, database type and IP version of a LITE CSV database code.
+    - get_csv_schema(db_code): Get the columns of a LITE CSV database.
+    - guess_db_code(filename): Guess the database code of a LITE CSV file from its name.
+    - read_csv_rows(path, db_code, columns, buffer_size): Stream the rows of a LITE CSV database.
+"""
+import csv, io, os, re, zipfile
+from .fields import COUNTRY, FLOAT, STRING, get_fields
+
+INTEGER = 'integer'
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+DB_CODE_PATTERN = re.compile(r'^(DB|PX)(\d+)LITECSV(IPV6)?$')
+FILENAME_PATTERN = re.compile(r'(DB|PX)(\d+)')
+PRODUCTS = {'DB': 'ip2location', 'PX': 'ip2proxy'}
+CONVERTERS = {INTEGER: int, FLOAT: float, STRING: str}
+
+
+def parse_csv_db_code(db_code):
+    """
+    Get the product, database type and IP version of a LITE CSV database code.
+
+    :param db_code: The code of the database (for example DB11LITECSV or PX2LITECSVIPV6).
+    :type db_code: str
+    :raises ValueError: If the code is not the code of a LITE CSV database.
+    :return: A tuple of the product ("ip2location" or "ip2proxy"), the database type and whether it is an IPv6 database.
+    :rtype: tuple
+    """
+    match = DB_CODE_PATTERN.match(str(db_code).upper())
+    if not match:
+        raise ValueError('Invalid LITE CSV database code ({}).'.format(db_code))
+    return PRODUCTS[match.group(1)], int(match.group(2)), bool(match.group(3))
+
+def get_csv_schema(db_code):
+    """
+    Get the columns of a LITE CSV database.
+
+    :param db_code: The code of the database (for example DB11LITECSV or PX2LITECSVIPV6).
+    :type db_code: str
+    :raises ValueError: If the code is not the code of a supported LITE CSV database.
+    :return: A list of ``(name, kind)`` tuples, where `kind` is one of ``integer``, ``float`` or ``string``.
+    :rtype: list
+    """
+    product, db_type, _ = parse_csv_db_code(db_code)
+    schema = [('ip_from', INTEGER), ('ip_to', INTEGER)]
+    for name, column, kind in sorted(get_fields(product, db_type), key=lambda field: field[1]):
+        if kind == COUNTRY:
+            schema.extend([('country_short', STRING), ('country_long', STRING)])
+        else:
+            schema.append((name, kind))
+    return schema
+
+def guess_db_code(filename):
+    """
+    Guess the database code of a LITE CSV file from its name, either as saved by the toolkit (DB11LITECSV.CSV) or as
+    named in the downloaded archives (IP2LOCATION-LITE-DB11.IPV6.CSV).
+
+    :param filename: The name or path of the file.
+    :type filename: str
+    :raises ValueError: If the name does not contain a database type.
+    :return: The database code.
+    :rtype: str
+    """
+    name = os.path.basename(str(filename)).upper()
+    match = FILENAME_PATTERN.search(name)
+    if not match:
+        raise ValueError('Cannot tell the database code of {}, please specify it.'.format(filename))
+    return '{}{}LITECSV{}'.format(match.group(1), match.group(2), 'IPV6' if 'IPV6' in name else '')
+
+def _open_csv(path, buffer_size):
+    """
+    Open the CSV file, or the CSV member of a zip archive, as a binary stream.
+
+    :return: A tuple of the stream, the name of the CSV file and the objects to close after the stream.
+    """
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        try:
+            members = [name for name in archive.namelist() if name.upper().endswith('.CSV')]
+            if not members:
+                raise ValueError('The archive {} has no CSV file.'.format(path))
+            return io.BufferedReader(archive.open(members[0]), buffer_size), members[0], [archive]
+        except Exception:
+            archive.close()
+            raise
+    return open(path, 'rb', buffering=buffer_size), path, []
+
+def read_csv_rows(path, db_code=None, columns=None, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Stream the rows of a LITE CSV database.
+
+    :param path: The path to the CSV file, or to a zip archive containing it.
+    :type path: str
+    :param db_code: The code of the database (default is guessed from the name of the CSV file, see `guess_db_code`).
+    :type db_code: str
+    :param columns: The names of the columns to return, in order (default is all the columns, see `get_csv_schema`).
+    :type columns: list
+    :param buffer_size: The size of the reads from the file (default is 1 MiB).
+    :type buffer_size: int
+    :raises ValueError: If the database code or a column is not valid, or a row cannot be parsed.
+    :return: A generator of tuples holding the typed values of the columns of each row.
+    :rtype: generator
+    """
+    stream, filename, resources = _open_csv(str(path), buffer_size)
+    try:
+        schema = get_csv_schema(db_code or guess_db_code(filename))
+        names = [name for name, _ in schema]
+        for name in columns or ():
+            if name not in names:
+                raise ValueError('Unknown column ({}), expected one of {}.'.format(name, ', '.join(names)))
+        projection = [(names.index(name), CONVERTERS[schema[names.index(name)][1]]) for name in (columns or names)]
+    except Exception:
+        stream.close()
+        for resource in resources:
+            resource.close()
+        raise
+    return _read_rows(stream, resources, projection, len(schema))
+
+def _read_rows(stream, resources, projection, column_count):
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    try:
+        for line_number, row in enumerate(csv.reader(text), 1):
+            if not row:
+                continue
+            if len(row) < column_count:
+                raise ValueError('Invalid row at line {} ({} columns, expected {}).'.format(line_number, len(row), column_count))
+            try:
+                yield tuple([convert(row[index]) for index, convert in projection])
+            except ValueError:
+                raise ValueError('Invalid value at line {}.'.format(line_number))
+    finally:
+        text.close()
+        for resource in resources:
+            resource.close()
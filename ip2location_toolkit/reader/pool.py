@@ -0,0 +1,244 @@
+"""
+This module contains a multi-process lookup pool for BIN databases.
+
+Lookups are CPU-bound, so a single Python process cannot use more than one core for them. The pool starts worker
+processes that each memory-map the database file; the mappings share the pages of the OS page cache, so there is a
+single physical copy of the database however many workers run.
+
+Large batches are split into chunks spread across the workers. The addresses and the results are exchanged through a
+shared-memory buffer rather than pickled: the parent writes the addresses into the buffer, and each worker writes the
+row matched by each address of its chunk next to them. The parent then decodes each distinct row once. Batches can mix
+IPv4 and IPv6 addresses: the IPv4 addresses of a chunk are searched together with NumPy when it is installed, and the
+IPv6 addresses one by one.
+
+Example:
+    with LookupPool('DB11LITEBIN.BIN', workers=4) as pool:
+        records = pool.lookup(['8.8.8.8', '1.1.1.1'])
+
+Classes:
+    - LookupPool: A pool of worker processes looking up IP addresses in a BIN database.
+"""
+import multiprocessing, os
+from array import array
+from multiprocessing import shared_memory
+from .batch import BatchReader, numpy
+from .database import BINDatabase, ip_to_int
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# The layout of the shared buffer for `count` addresses: the matched rows (8-byte signed integers), the IPv6 addresses
+# (two 8-byte unsigned integers, high then low), the IPv4 addresses (4-byte unsigned integers), the version of the
+# addresses (1 byte, 4 or 6) and the section of the rows (1 byte, 1 for the IPv6 section).
+ROW_SIZE = 8
+IPV6_ADDRESS_SIZE = 16
+ADDRESS_SIZE = 4
+VERSION_SIZE = 1
+SECTION_SIZE = 1
+ITEM_SIZE = ROW_SIZE + IPV6_ADDRESS_SIZE + ADDRESS_SIZE + VERSION_SIZE + SECTION_SIZE
+MAX_UINT64 = (1 << 64) - 1
+
+_worker = {}
+
+
+def _init_worker(filepath, product, use_index, vectorized):
+    database = BINDatabase(filepath, product, use_index)
+    _worker['database'] = database
+    _worker['batch_reader'] = BatchReader(database) if vectorized and numpy is not None and database.header.ipv4_count else None
+    _worker['segment'] = None
+
+def _get_segment(name):
+    segment = _worker['segment']
+    if segment is None or segment.name != name:
+        if segment is not None:
+            segment.close()
+        segment = _worker['segment'] = shared_memory.SharedMemory(name)
+    return segment
+
+def _get_offsets(count):
+    # The offsets of the rows, IPv6 addresses, IPv4 addresses, versions and sections regions, and the end of the buffer.
+    offsets = [0]
+    for size in (ROW_SIZE, IPV6_ADDRESS_SIZE, ADDRESS_SIZE, VERSION_SIZE, SECTION_SIZE):
+        offsets.append(offsets[-1] + count * size)
+    return offsets
+
+def _get_views(buffer, count):
+    rows, ipv6_addresses, addresses, versions, sections, end = _get_offsets(count)
+    return (
+        buffer[rows:ipv6_addresses].cast('q'), buffer[ipv6_addresses:addresses].cast('Q'),
+        buffer[addresses:versions].cast('I'), buffer[versions:sections], buffer[sections:end],
+    )
+
+def _find_rows_chunk(task):
+    """
+    Find the rows of a chunk of the addresses of the shared buffer, in a worker process.
+    """
+    name, count, start, end, mixed = task
+    segment = _get_segment(name)
+    batch_reader = _worker['batch_reader']
+    positions = range(start, end)
+    if batch_reader is not None:
+        _, _, addresses_offset, versions_offset, sections_offset, _ = _get_offsets(count)
+        chunk = numpy.frombuffer(segment.buf, dtype=numpy.uint32, count=end - start, offset=addresses_offset + start * ADDRESS_SIZE)
+        chunk_rows = numpy.frombuffer(segment.buf, dtype=numpy.int64, count=end - start, offset=start * ROW_SIZE)
+        if not mixed:
+            chunk_rows[:] = batch_reader.find_rows(chunk)
+            segment.buf[sections_offset + start:sections_offset + end] = bytes(end - start)
+            return end - start
+        is_ipv4 = numpy.frombuffer(segment.buf, dtype=numpy.uint8, count=end - start, offset=versions_offset + start) == 4
+        chunk_rows[is_ipv4] = batch_reader.find_rows(chunk[is_ipv4])
+        numpy.frombuffer(segment.buf, dtype=numpy.uint8, count=end - start, offset=sections_offset + start)[is_ipv4] = 0
+        # The IPv6 addresses are searched one by one.
+        positions = (numpy.flatnonzero(~is_ipv4) + start).tolist()
+        del chunk, chunk_rows, is_ipv4
+    rows, ipv6_addresses, addresses, versions, sections = _get_views(segment.buf, count)
+    try:
+        resolve = _worker['database'].resolve
+        for position in positions:
+            if not mixed or versions[position] == 4:
+                ipv6, row = resolve(4, addresses[position])
+            else:
+                ipv6, row = resolve(6, ipv6_addresses[2 * position] << 64 | ipv6_addresses[2 * position + 1])
+            rows[position] = row
+            sections[position] = ipv6
+    finally:
+        for view in (rows, ipv6_addresses, addresses, versions, sections):
+            view.release()
+    return end - start
+
+
+class LookupPool:
+    """
+    A pool of worker processes looking up IPv4 and IPv6 addresses in a BIN database.
+
+    :param filepath: The path to the BIN database file.
+    :type filepath: str
+    :param workers: The number of worker processes (default is the number of CPUs).
+    :type workers: int
+    :param chunk_size: The maximum number of addresses a worker looks up at a time (default is 65536).
+    :type chunk_size: int
+    :param product: The product of the database for files whose header does not tell (see `BINDatabase`).
+    :type product: str
+    :param use_index: Whether to use the first-level index (see `BINDatabase`).
+    :type use_index: bool
+    :param vectorized: Whether the workers search with NumPy when it is installed (default is True).
+    :type vectorized: bool
+    :raises ValueError: If the file is not a valid database file.
+    """
+    def __init__(self, filepath, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, product=None, use_index=True, vectorized=True):
+        self.filepath = str(filepath)
+        self.database = BINDatabase(self.filepath, product, use_index)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        # The shared buffer is created before the workers are started, so that they share the resource tracker of the
+        # parent process instead of starting their own, which would unlink the buffers they used when they exit.
+        self._segment = None
+        self._get_segment(chunk_size)
+        self._pool = multiprocessing.Pool(self.workers, initializer=_init_worker, initargs=(self.filepath, product, use_index, vectorized))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Stop the worker processes and release the shared buffer and the database.
+
+        :return: None
+        """
+        if self._pool is None:
+            return
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+        if self._segment is not None:
+            self._segment.close()
+            self._segment.unlink()
+            self._segment = None
+        self.database.close()
+
+    def _get_segment(self, count):
+        size = max(count, 1) * ITEM_SIZE
+        if self._segment is None or self._segment.size < size:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment.unlink()
+            self._segment = shared_memory.SharedMemory(create=True, size=max(size, DEFAULT_CHUNK_SIZE * ITEM_SIZE))
+        return self._segment
+
+    def find_rows(self, ips):
+        """
+        Find the rows of a batch of IPv4 and IPv6 addresses across the worker processes.
+
+        :param ips: The addresses, as strings, or as integers for IPv4 addresses.
+        :type ips: list or numpy.ndarray
+        :raises ValueError: If an address is not a valid IP address.
+        :return: A tuple of the index of the row of each address (-1 if no row contains it) and whether each row is in the IPv6 section (1) or the IPv4 section (0).
+        :rtype: tuple(array.array, bytes)
+        """
+        addresses, ipv6_addresses = _to_addresses(ips)
+        count = len(addresses)
+        if not count:
+            return array('q'), b''
+        segment = self._get_segment(count)
+        rows, shared_ipv6_addresses, shared_addresses, shared_versions, sections = _get_views(segment.buf, count)
+        try:
+            shared_addresses[:] = addresses
+            # The versions are only written for batches holding IPv6 addresses; the workers know the other batches
+            # only hold IPv4 addresses.
+            if ipv6_addresses:
+                shared_versions[:] = bytes([4]) * count
+                for position, ipno in ipv6_addresses:
+                    shared_versions[position] = 6
+                    shared_ipv6_addresses[2 * position] = ipno >> 64
+                    shared_ipv6_addresses[2 * position + 1] = ipno & MAX_UINT64
+            mixed = bool(ipv6_addresses)
+            tasks = [(segment.name, count, start, min(start + self.chunk_size, count), mixed) for start in range(0, count, self.chunk_size)]
+            self._pool.map(_find_rows_chunk, tasks, chunksize=1)
+            return array('q', rows), bytes(sections)
+        finally:
+            for view in (rows, shared_ipv6_addresses, shared_addresses, shared_versions, sections):
+                view.release()
+
+    def lookup(self, ips):
+        """
+        Look up a batch of IPv4 and IPv6 addresses across the worker processes.
+
+        :param ips: The addresses, as strings, or as integers for IPv4 addresses.
+        :type ips: list or numpy.ndarray
+        :raises ValueError: If an address is not a valid IP address.
+        :return: The record of each address (see `BINDatabase.lookup`), or None for addresses the database has no record for. Addresses matching the same row share the same record.
+        :rtype: list
+        """
+        rows, sections = self.find_rows(ips)
+        records = {}
+        results = []
+        for row, ipv6 in zip(rows, sections):
+            if row < 0:
+                results.append(None)
+                continue
+            record = records.get((ipv6, row))
+            if record is None:
+                record = records[(ipv6, row)] = self.database.decode_row(row, bool(ipv6))
+            results.append(record)
+        return results
+
+
+def _to_addresses(ips):
+    # The IPv4 addresses (0 in place of the IPv6 addresses), and the position and value of each IPv6 address.
+    if numpy is not None and isinstance(ips, numpy.ndarray):
+        ips = ips.tolist()
+    addresses = array('I')
+    ipv6_addresses = []
+    for ip in ips:
+        if isinstance(ip, int):
+            addresses.append(ip)
+            continue
+        version, ipno = ip_to_int(ip)
+        if version == 4:
+            addresses.append(ipno)
+        else:
+            ipv6_addresses.append((len(addresses), ipno))
+            addresses.append(0)
+    return addresses, ipv6_addresses
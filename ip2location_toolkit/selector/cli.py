@@ -10,7 +10,7 @@ Functions:
     get_code(db_type: str, db_content: str, ip_type: str, db_format: str) -> str
 """
 import os
-from ..db_codes import CODES
+from ..catalog import find_code
 
 
 
@@ -108,7 +108,7 @@ def selection_input(title: str, options: list):
 
 def get_code(db_type: str, db_content: str, ip_type: str, db_format: str):
     """
-    Given the type of database (IP2LOCATION, IP2PROXY), the content of the database, the type of IP (v4, v6), and the format of the database (CSV, BIN), retrieve the corresponding code from the CODES dictionary.
+    Given the type of database (IP2LOCATION, IP2PROXY), the content of the database, the type of IP (v4, v6), and the format of the database (CSV, BIN), retrieve the corresponding code from the catalog of databases.
 
     :param db_type: The type of database
     :type db_type: str
@@ -120,6 +120,6 @@ def get_code(db_type: str, db_content: str, ip_type: str, db_format: str):
     :type db_format: str
     :return: The code corresponding to the given parameters
     :rtype: str
+    :raises ValueError: If no database matches the given parameters.
     """
-    db_content_index = [idx for idx, db in enumerate(CODES[db_type]) if db['title'] == db_content][0]
-    return CODES[db_type][db_content_index][ip_type][db_format]
\ No newline at end of file
+    return find_code(db_type, db_content, ip_type, db_format)
\ No newline at end of file
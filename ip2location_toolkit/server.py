@@ -0,0 +1,520 @@
+"""
+This module contains a local lookup server answering IP lookups from a BIN database over HTTP and a Unix socket.
+
+The database is opened once and shared by every client. The server runs on asyncio: the lookups of concurrent requests
+are collected for up to `max_delay` seconds (or `max_batch` addresses) and resolved together, with a single vectorized
+search for the IPv4 addresses when NumPy is installed, and each matched row is decoded once per batch. The latency of
+every request is recorded in histograms, which are served with the other statistics of the server. asyncio, the
+database reader and the batch reader (and NumPy) are imported when a server is started, so that the command line can
+read the defaults of this module without loading them.
+
+HTTP endpoints (HTTP/1.1 with keep-alive, so requests can be pipelined):
+    - ``GET /lookup?ip=8.8.8.8``: Look up one address.
+    - ``POST /bulk``: Look up the addresses listed in the body, as a JSON array or one address per line. The addresses
+      are resolved and their results encoded in batches of `max_batch`, so that a large request does not hold back
+      the other clients.
+    - ``GET /stats``: The statistics and latency histograms of the server.
+    - ``GET /health``: Check that the server is running.
+
+Unix socket protocol:
+    Clients write one address per line and read one JSON result per line, in the same order. Lines can be pipelined:
+    the lookups of the lines a client sends without waiting are batched together.
+
+A result is a JSON object with the keys ``ip`` and ``record`` (the fields returned by `BINDatabase.lookup`, or null if
+the database has no record for the address), or ``ip`` and ``error`` for invalid addresses.
+
+Example:
+    ip2location-toolkit serve DB11LITEBIN.BIN --port 8080 --unix-socket /run/ip2location.sock
+    curl "http://127.0.0.1:8080/lookup?ip=8.8.8.8"
+
+Classes:
+    - LatencyHistogram: A histogram of request latencies.
+    - LookupBatcher: Batch the lookups of concurrent requests.
+    - LookupServer: A lookup server over HTTP and a Unix socket.
+
+Functions:
+    - run_server(filepath, host, port, unix_path, max_batch, max_delay): Run a lookup server until it is interrupted.
+"""
+import bisect, json, os, time
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from .defaults import SERVER_HOST as DEFAULT_HOST, SERVER_MAX_BATCH as DEFAULT_MAX_BATCH, SERVER_MAX_DELAY as DEFAULT_MAX_DELAY, SERVER_PORT as DEFAULT_PORT
+
+MAX_BODY_SIZE = 64 * 1024 * 1024
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class LatencyHistogram:
+    """
+    A histogram of request latencies.
+
+    :param buckets: The upper bounds of the buckets in seconds, in increasing order. Latencies above the last bound are counted in an overflow bucket.
+    :type buckets: tuple
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        """
+        Record a latency.
+
+        :param seconds: The latency in seconds.
+        :type seconds: float
+        :return: None
+        """
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """
+        Estimate a quantile of the latencies from the buckets.
+
+        :param q: The quantile, between 0 and 1.
+        :type q: float
+        :return: The upper bound of the bucket holding the quantile in seconds (None if no latency was recorded, or infinity for the overflow bucket).
+        :rtype: float
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        """
+        Get the state of the histogram.
+
+        :return: A dictionary with the keys ``count``, ``sum``, ``buckets`` (a list of ``[upper bound, count]`` pairs, the overflow bucket having the bound "+Inf"), ``p50``, ``p90`` and ``p99``.
+        :rtype: dict
+        """
+        bounds = list(self.buckets) + ['+Inf']
+        quantiles = {}
+        for name, q in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99)):
+            value = self.quantile(q)
+            quantiles[name] = '+Inf' if value == float('inf') else value
+        return dict({
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': [[bound, count] for bound, count in zip(bounds, self.counts)],
+        }, **quantiles)
+
+
+def _error_result(ip, error):
+    return {'ip': ip, 'error': str(error)}
+
+
+class LookupBatcher:
+    """
+    Batch the lookups of concurrent requests.
+
+    :param database: The open database.
+    :type database: BINDatabase
+    :param max_batch: The maximum number of addresses of a batch.
+    :type max_batch: int
+    :param max_delay: The maximum number of seconds a lookup waits for other lookups to batch it with.
+    :type max_delay: float
+    """
+    def __init__(self, database, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY):
+        from .reader.batch import BatchReader, numpy
+        self.database = database
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batch_reader = BatchReader(database) if numpy is not None and database.header.ipv4_count else None
+        self.batches = 0
+        self.batched_lookups = 0
+        self._pending = []
+        self._flush_handle = None
+
+    def close(self):
+        """
+        Release the views of the batch reader over the database.
+
+        :return: None
+        """
+        if self.batch_reader is not None:
+            self.batch_reader.close()
+
+    def resolve(self, ips):
+        """
+        Look up a batch of addresses.
+
+        :param ips: The addresses.
+        :type ips: list
+        :return: One result per address (see the module documentation).
+        :rtype: list
+        """
+        from .reader.batch import lookup_records
+        results = []
+        for ip, record in zip(ips, lookup_records(self.database, ips, self.batch_reader)):
+            if isinstance(record, ValueError):
+                results.append(_error_result(ip, record))
+            else:
+                results.append({'ip': ip, 'record': record})
+        self.batches += 1
+        self.batched_lookups += len(ips)
+        return results
+
+    async def resolve_all(self, ips):
+        """
+        Look up the addresses of a bulk request in batches of `max_batch` addresses, letting the other clients be
+        served between the batches.
+
+        :param ips: The addresses.
+        :type ips: list
+        :return: One result per address (see the module documentation).
+        :rtype: list
+        """
+        import asyncio
+        results = []
+        for start in range(0, len(ips), self.max_batch):
+            if start:
+                await asyncio.sleep(0)
+            results.extend(self.resolve(ips[start:start + self.max_batch]))
+        return results
+
+    def lookup(self, ip):
+        """
+        Look up an address in the next batch.
+
+        :param ip: The address.
+        :type ip: str
+        :return: A future of the result of the address.
+        :rtype: asyncio.Future
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((ip, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_delay, self.flush)
+        return future
+
+    def flush(self):
+        """
+        Resolve the pending lookups.
+
+        :return: None
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            results = self.resolve([ip for ip, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class LookupServer:
+    """
+    A lookup server answering lookups from a BIN database over HTTP and a Unix socket.
+
+    :param filepath: The path to the BIN database file.
+    :type filepath: str
+    :param host: The address to listen for HTTP requests on (default is 127.0.0.1).
+    :type host: str
+    :param port: The port to listen for HTTP requests on (default is 8080, 0 picks a free port, None disables HTTP).
+    :type port: int
+    :param unix_path: The path of the Unix socket to listen on (default is None, which disables the Unix socket).
+    :type unix_path: str
+    :param max_batch: The maximum number of addresses of a batch (default is 1024).
+    :type max_batch: int
+    :param max_delay: The maximum number of seconds a lookup waits for other lookups to batch it with (default is 0.0005).
+    :type max_delay: float
+    :raises ValueError: If the file is not a valid database file.
+    """
+    def __init__(self, filepath, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY):
+        from .reader.database import BINDatabase
+        self.filepath = str(filepath)
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.database = BINDatabase(self.filepath)
+        self.batcher = LookupBatcher(self.database, max_batch, max_delay)
+        self.latency = {name: LatencyHistogram() for name in ('lookup', 'bulk', 'unix')}
+        self.started_at = None
+        self._servers = []
+
+    @property
+    def http_port(self):
+        """
+        The port the HTTP server listens on (useful when it was started on port 0).
+        """
+        for server in self._servers:
+            for sock in server.sockets:
+                address = sock.getsockname()
+                if isinstance(address, tuple):
+                    return address[1]
+        return None
+
+    async def start(self):
+        """
+        Start listening for requests.
+
+        :return: None
+        """
+        import asyncio
+        if self.port is not None:
+            self._servers.append(await asyncio.start_server(self._handle_http, self.host, self.port))
+        if self.unix_path:
+            if os.path.exists(self.unix_path):
+                os.remove(self.unix_path)
+            self._servers.append(await asyncio.start_unix_server(self._handle_unix, self.unix_path))
+        self.started_at = time.time()
+
+    async def serve_forever(self):
+        """
+        Serve requests until the server is closed or the task is cancelled.
+
+        :return: None
+        """
+        import asyncio
+        if not self._servers:
+            await self.start()
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in self._servers))
+        except asyncio.CancelledError:
+            pass
+
+    async def close(self):
+        """
+        Stop listening, and close the database.
+
+        :return: None
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.remove(self.unix_path)
+        self.batcher.flush()
+        self.batcher.close()
+        self.database.close()
+
+    def stats(self):
+        """
+        Get the statistics of the server.
+
+        :return: A dictionary with the database, the uptime, the batching statistics and a snapshot of each latency histogram.
+        :rtype: dict
+        """
+        return {
+            'database': self.filepath,
+            'version': self.database.header.version,
+            'uptime': time.time() - self.started_at if self.started_at else 0.0,
+            'batches': self.batcher.batches,
+            'batched_lookups': self.batcher.batched_lookups,
+            'latency': {name: histogram.snapshot() for name, histogram in self.latency.items()},
+        }
+
+    async def _handle_unix(self, reader, writer):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        async def write_results():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                started, future = item
+                result = await future
+                writer.write(json.dumps(result).encode() + b'\n')
+                self.latency['unix'].observe(loop.time() - started)
+                if queue.empty():
+                    await writer.drain()
+
+        writer_task = asyncio.ensure_future(write_results())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                ip = line.strip().decode('utf-8', 'replace')
+                if ip:
+                    queue.put_nowait((loop.time(), self.batcher.lookup(ip)))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # The server is shutting down: the results not written yet are dropped.
+            writer_task.cancel()
+        finally:
+            queue.put_nowait(None)
+            try:
+                await writer_task
+                await writer.drain()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+            finally:
+                writer.close()
+
+    async def _handle_http(self, reader, writer):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                started = loop.time()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._write_response(writer, HTTPStatus.BAD_REQUEST, {'error': 'Invalid request line.'}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' and (version != 'HTTP/1.0' or connection == 'keep-alive')
+
+                try:
+                    length = int(headers.get('content-length') or 0)
+                    if length < 0:
+                        raise ValueError
+                except ValueError:
+                    await self._write_response(writer, HTTPStatus.BAD_REQUEST, {'error': 'Invalid Content-Length header.'}, keep_alive=False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self._write_response(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': 'The request body is too large.'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload, histogram = await self._route(method, target, body)
+                await self._write_response(writer, status, payload, keep_alive)
+                if histogram:
+                    self.latency[histogram].observe(loop.time() - started)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # The client went away, or the server is shutting down.
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == '/lookup' and method == 'GET':
+            ip = parse_qs(url.query).get('ip', [''])[0]
+            result = await self.batcher.lookup(ip)
+            return (HTTPStatus.BAD_REQUEST if 'error' in result else HTTPStatus.OK), result, 'lookup'
+        if url.path == '/bulk' and method == 'POST':
+            try:
+                ips = parse_bulk_body(body)
+            except ValueError as e:
+                return HTTPStatus.BAD_REQUEST, {'error': str(e)}, 'bulk'
+            return HTTPStatus.OK, await self.batcher.resolve_all(ips), 'bulk'
+        if url.path == '/stats' and method == 'GET':
+            return HTTPStatus.OK, self.stats(), None
+        if url.path == '/health' and method == 'GET':
+            return HTTPStatus.OK, {'status': 'ok'}, None
+        if url.path in ('/lookup', '/bulk', '/stats', '/health'):
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': 'Method not allowed.'}, None
+        return HTTPStatus.NOT_FOUND, {'error': 'Not found.'}, None
+
+    async def _encode_results(self, results):
+        # The results of a bulk request are encoded in batches, letting the other clients be served in between.
+        import asyncio
+        pieces = []
+        for start in range(0, len(results), self.batcher.max_batch):
+            if start:
+                pieces.append(b', ')
+                await asyncio.sleep(0)
+            pieces.append(', '.join(json.dumps(result) for result in results[start:start + self.batcher.max_batch]).encode())
+        return [b'['] + pieces + [b']']
+
+    async def _write_response(self, writer, status, payload, keep_alive=True):
+        pieces = await self._encode_results(payload) if isinstance(payload, list) else [json.dumps(payload).encode()]
+        writer.write(
+            'HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+                status.value, status.phrase, sum(len(piece) for piece in pieces), 'keep-alive' if keep_alive else 'close'
+            ).encode('latin-1')
+        )
+        for piece in pieces:
+            writer.write(piece)
+            await writer.drain()
+
+
+def parse_bulk_body(body):
+    """
+    Parse the addresses of a bulk request, sent as a JSON array or one address per line.
+
+    :param body: The body of the request.
+    :type body: bytes
+    :raises ValueError: If the body is not a valid JSON array of strings or text.
+    :return: The addresses.
+    :rtype: list
+    """
+    try:
+        text = body.decode('utf-8')
+    except UnicodeDecodeError:
+        raise ValueError('The request body is not valid UTF-8.')
+    if text.lstrip().startswith('['):
+        try:
+            ips = json.loads(text)
+        except json.JSONDecodeError:
+            raise ValueError('The request body is not a valid JSON array.')
+        if not all(isinstance(ip, str) for ip in ips):
+            raise ValueError('The addresses must be strings.')
+        return ips
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+def run_server(filepath, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, max_batch=DEFAULT_MAX_BATCH, max_delay=DEFAULT_MAX_DELAY):
+    """
+    Run a lookup server until it is interrupted.
+
+    :param filepath: The path to the BIN database file.
+    :type filepath: str
+    :param host: The address to listen for HTTP requests on.
+    :type host: str
+    :param port: The port to listen for HTTP requests on (None disables HTTP).
+    :type port: int
+    :param unix_path: The path of the Unix socket to listen on (None disables the Unix socket).
+    :type unix_path: str
+    :param max_batch: The maximum number of addresses of a batch.
+    :type max_batch: int
+    :param max_delay: The maximum number of seconds a lookup waits for other lookups to batch it with.
+    :type max_delay: float
+    :raises ValueError: If the file is not a valid database file.
+    :return: None
+    """
+    import asyncio
+    async def main():
+        server = LookupServer(filepath, host, port, unix_path, max_batch, max_delay)
+        await server.start()
+        if port is not None:
+            print('Serving {} on http://{}:{}'.format(filepath, host, server.http_port))
+        if unix_path:
+            print('Serving {} on {}'.format(filepath, unix_path))
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
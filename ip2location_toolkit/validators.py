@@ -9,7 +9,7 @@ Functions:
 """
 import os
 from pathlib import WindowsPath
-from .db_codes import CODES
+from .catalog import ENTRIES, is_valid_code
 
 
 
@@ -20,13 +20,7 @@ def get_all_db_codes():
     :return: A list of all the database codes.
     :rtype: list
     """
-    all_dbs = CODES['ip2location'] + CODES['ip2proxy']
-    all_db_codes = []
-    for db in all_dbs:
-        for ip_type in ['ipv4', 'ipv6']:
-            for db_type in ['cvs', 'bin']:
-                all_db_codes.append(db[ip_type][db_type])
-    return all_db_codes
+    return [entry.code for entry in ENTRIES]
 
 def path_validator(path, required=True):
     """
@@ -89,6 +83,6 @@ def db_code_validator(db_code):
     """
     if not bool(str(db_code).strip()):
         raise ValueError('The IP2LOCATION database code is required.')
-    if db_code not in get_all_db_codes():
+    if not is_valid_code(db_code):
         raise ValueError('The IP2LOCATION database code is invalid. Please make sure you have the correct database code.')
     return db_code
\ No newline at end of file
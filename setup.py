@@ -35,6 +35,9 @@ setup(
         'tqdm',
         'colorama',
     ],
+    extras_require={
+        'numpy': ['numpy'],
+    },
     entry_points={
         'console_scripts': [
             'ip2location-toolkit=ip2location_toolkit:run',
@@ -0,0 +1,5 @@
+import atexit, os, shutil, tempfile
+
+# Keep the downloads of the tests out of the download cache of the user.
+os.environ['IP2LOCATION_TOOLKIT_CACHE_DIR'] = tempfile.mkdtemp(prefix='ip2location_toolkit_tests_')
+atexit.register(shutil.rmtree, os.environ['IP2LOCATION_TOOLKIT_CACHE_DIR'], True)
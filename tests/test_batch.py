@@ -0,0 +1,97 @@
+from unittest import TestCase, skipIf
+from ip2location_toolkit.reader.batch import BatchReader, numpy, parse_ipv4_array
+from ip2location_toolkit.reader.database import BINDatabase
+import os
+
+from .test_reader import AUSTRALIA, IPV4_ROWS, IPV6_ROWS, UNITED_STATES, ip4
+from .utils import build_bin_file, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_DIR = os.path.join(TESTS_DIR, '__batch__')
+
+
+@skipIf(numpy is None, 'NumPy is not installed')
+class TestParseIPv4Array(TestCase):
+    def test_strings(self):
+        array = parse_ipv4_array(['8.8.8.8', '1.0.0.1', '255.255.255.255'])
+        self.assertEqual(array.dtype, numpy.uint32)
+        self.assertEqual(array.tolist(), [0x08080808, 0x01000001, 0xFFFFFFFF])
+
+    def test_integers(self):
+        self.assertEqual(parse_ipv4_array(numpy.array([1, 2], dtype=numpy.int64)).dtype, numpy.uint32)
+        self.assertEqual(parse_ipv4_array([1, 2]).tolist(), [1, 2])
+
+    def test_empty(self):
+        self.assertEqual(len(parse_ipv4_array([])), 0)
+
+    def test_invalid(self):
+        for ip in ['8.8.8', '::1', '256.1.1.1', None]:
+            with self.assertRaises(ValueError, msg=ip):
+                parse_ipv4_array(['8.8.8.8', ip])
+
+
+@skipIf(numpy is None, 'NumPy is not installed')
+class TestBatchReader(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.makedirs(BATCH_DIR, exist_ok=True)
+        cls.path = os.path.join(BATCH_DIR, 'DB11LITEBIN.BIN')
+        build_bin_file(cls.path, 11, IPV4_ROWS)
+
+    @classmethod
+    def tearDownClass(cls):
+        recursive_remove_dir(BATCH_DIR)
+
+    def test_matches_lookup(self):
+        ips = ['0.0.0.0', '1.0.0.0', '8.8.7.255', '8.8.8.8', '8.8.8.255', '8.8.9.0', '255.255.255.255']
+        with BINDatabase(self.path) as database:
+            with BatchReader(database) as reader:
+                result = reader.lookup(ips)
+            for name in ['country_short', 'country_long', 'region', 'city', 'zip_code', 'time_zone']:
+                self.assertEqual(result.column(name), [database.lookup(ip)[name] for ip in ips], msg=name)
+            for name in ['latitude', 'longitude']:
+                for value, ip in zip(result.column(name), ips):
+                    self.assertAlmostEqual(value, database.lookup(ip)[name], places=4, msg=name)
+
+    def test_unaligned_rows(self):
+        path = os.path.join(BATCH_DIR, 'DB11LITEBIN-UNALIGNED.BIN')
+        build_bin_file(path, 11, IPV4_ROWS, padding=1)
+        ips = ['0.0.0.0', '1.0.0.0', '8.8.8.8', '8.8.9.0', '255.255.255.255']
+        with BINDatabase(path) as database, BatchReader(database) as reader:
+            self.assertTrue(reader.ip_from.flags.c_contiguous, msg="An unaligned first-IP column should be copied once.")
+            self.assertEqual(reader.lookup(ips).column('city'), [database.lookup(ip)['city'] if database.lookup(ip) else None for ip in ips])
+        with BINDatabase(self.path) as database, BatchReader(database) as reader:
+            self.assertIs(reader.ip_from.base, database._mm, msg="An aligned first-IP column should not be copied.")
+
+    def test_deduplicated_tables(self):
+        ips = numpy.array([ip4('8.8.8.8'), ip4('1.2.3.4'), ip4('8.8.8.9'), ip4('1.2.3.5')], dtype=numpy.uint32)
+        with BINDatabase(self.path) as database, BatchReader(database) as reader:
+            result = reader.lookup(ips)
+        self.assertEqual(len(result), 4)
+        self.assertEqual(sorted(result.tables['country_short']), ['AU', 'US'])
+        codes = result.codes['country_short'].tolist()
+        self.assertEqual(codes[0], codes[2])
+        self.assertEqual(codes[1], codes[3])
+        self.assertEqual(result.tables['city'][result.codes['city'][0]], UNITED_STATES['city'])
+        self.assertEqual(result.tables['country_long'][codes[1]], AUSTRALIA['country_long'])
+
+    def test_fields(self):
+        with BINDatabase(self.path) as database, BatchReader(database) as reader:
+            result = reader.lookup(['8.8.8.8'], fields=['country_short', 'latitude'])
+        self.assertEqual(set(result.codes), {'country_short', 'country_long'})
+        self.assertEqual(set(result.values), {'latitude'})
+
+    def test_not_found(self):
+        path = os.path.join(BATCH_DIR, 'DB1LITEBIN.BIN')
+        build_bin_file(path, 1, [(ip4('8.0.0.0'), UNITED_STATES)])
+        with BINDatabase(path) as database, BatchReader(database) as reader:
+            result = reader.lookup(['1.1.1.1', '8.8.8.8'])
+        self.assertEqual(result.rows.tolist(), [-1, 0])
+        self.assertEqual(result.column('country_short'), [None, 'US'])
+
+    def test_no_ipv4_section(self):
+        path = os.path.join(BATCH_DIR, 'DB1LITEBINIPV6.BIN')
+        build_bin_file(path, 1, ipv6_rows=IPV6_ROWS)
+        with BINDatabase(path) as database:
+            with self.assertRaises(ValueError):
+                BatchReader(database)
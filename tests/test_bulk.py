@@ -0,0 +1,79 @@
+from unittest.mock import patch
+from ip2location_toolkit.downloader.bulk import bulk_download, get_error_status, read_manifest
+from ip2location_toolkit.exceptions import DataBaseNotFound, DownloadLimitExceeded, DownloadPermissionDenied
+import os, json
+
+from .utils import VALID_TOKEN, INVALID_TOKEN_SHORT, SilentTestCase, SilentTqdm, LocalHTTPServer, recursive_remove_dir
+from .test_stream import build_zip, DATABASE
+
+
+class TestReadManifest(SilentTestCase):
+    def tearDown(self):
+        os.remove('manifest.txt')
+        super().tearDown()
+
+    def test_read_manifest(self):
+        with open('manifest.txt', 'w') as file:
+            file.write('# databases\nDB1LITEBIN\n\nDB11LITEBINIPV6   /srv/geo  # ipv6\n')
+        self.assertEqual(read_manifest('manifest.txt'), [('DB1LITEBIN', None), ('DB11LITEBINIPV6', '/srv/geo')])
+
+
+class TestGetErrorStatus(SilentTestCase):
+    def test_error_statuses(self):
+        self.assertEqual(get_error_status(DataBaseNotFound()), 'not_found')
+        self.assertEqual(get_error_status(DownloadLimitExceeded()), 'limit_exceeded')
+        self.assertEqual(get_error_status(DownloadPermissionDenied()), 'permission_denied')
+        self.assertEqual(get_error_status(ValueError()), 'invalid')
+        self.assertEqual(get_error_status(OSError()), 'error')
+
+
+@patch('ip2location_toolkit.downloader.bulk.tqdm', SilentTqdm)
+class TestBulkDownload(SilentTestCase):
+    def test_invalid_token(self):
+        with self.assertRaises(ValueError):
+            bulk_download(['DB1LITEBIN'], INVALID_TOKEN_SHORT)
+
+    @patch('ip2location_toolkit.downloader.bulk.download_extract_db')
+    def test_statuses(self, download_extract_db_mock):
+        errors = {'DB3LITEBIN': DataBaseNotFound(), 'DB5LITEBIN': DownloadLimitExceeded(), 'DB9LITEBIN': DownloadPermissionDenied()}
+        def download(db_code, *args, **kwargs):
+            if db_code in errors:
+                raise errors[db_code]
+            return db_code + '.BIN'
+        download_extract_db_mock.side_effect = download
+
+        results = bulk_download(['DB1LITEBIN', 'DB3LITEBIN', 'DB5LITEBIN', 'DB9LITEBIN', 'XX1'], VALID_TOKEN, workers=3)
+        self.assertEqual([result['code'] for result in results], ['DB1LITEBIN', 'DB3LITEBIN', 'DB5LITEBIN', 'DB9LITEBIN', 'XX1'], msg="The results should keep the order of the codes.")
+        self.assertEqual([result['status'] for result in results], ['ok', 'not_found', 'limit_exceeded', 'permission_denied', 'invalid'])
+        self.assertEqual(results[0]['path'], 'DB1LITEBIN.BIN')
+        self.assertEqual(results[1]['error'], DataBaseNotFound.message)
+        json.dumps(results)
+
+    @patch('ip2location_toolkit.downloader.bulk.download_extract_db', return_value='DB1LITEBIN.BIN')
+    def test_shared_session(self, download_extract_db_mock):
+        bulk_download(['DB1LITEBIN', ('DB3LITEBIN', 'other')], VALID_TOKEN, 'output')
+        sessions = {id(call.kwargs['session']) for call in download_extract_db_mock.call_args_list}
+        self.assertEqual(len(sessions), 1, msg="All downloads should share one session.")
+        output_paths = sorted(call.args[2] for call in download_extract_db_mock.call_args_list)
+        self.assertEqual(output_paths, ['other', 'output'])
+
+
+@patch('ip2location_toolkit.downloader.bulk.tqdm', SilentTqdm)
+@patch('ip2location_toolkit.downloader.download.tqdm', SilentTqdm)
+class TestBulkDownloadServer(SilentTestCase):
+    def setUp(self):
+        super().setUp()
+        os.mkdir('bulk_output')
+
+    def tearDown(self):
+        recursive_remove_dir('bulk_output')
+        super().tearDown()
+
+    def test_bulk_download(self):
+        with LocalHTTPServer(build_zip()) as server:
+            with patch('ip2location_toolkit.downloader.download.get_download_url', return_value=server.url):
+                results = bulk_download(['DB1LITEBIN', 'DB3LITEBIN'], VALID_TOKEN, 'bulk_output', workers=2, stream=True)
+        self.assertEqual([result['status'] for result in results], ['ok', 'ok'])
+        self.assertEqual(sorted(os.listdir('bulk_output')), ['DB1LITEBIN.BIN', 'DB1LITEBIN.BIN.meta.json', 'DB3LITEBIN.BIN', 'DB3LITEBIN.BIN.meta.json'])
+        with open(os.path.join('bulk_output', 'DB3LITEBIN.BIN'), 'rb') as file:
+            self.assertEqual(file.read(), DATABASE)
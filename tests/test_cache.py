@@ -0,0 +1,167 @@
+from unittest import TestCase
+from ip2location_toolkit.downloader.update import install_db
+from ip2location_toolkit.reader.cache import CachedBINDatabase, LRUCache
+import os, threading
+
+from .test_reader import AUSTRALIA, GERMANY, IPV4_ROWS, UNITED_STATES, ip4
+from .utils import build_bin_file, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(TESTS_DIR, '__cache__')
+
+
+class TestLRUCache(TestCase):
+    def test_hits_and_misses(self):
+        cache = LRUCache(2)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', {'country_short': 'US'})
+        self.assertEqual(cache.get('a'), {'country_short': 'US'})
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+        self.assertGreater(stats['memory'], 0)
+
+    def test_lru_eviction(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        self.assertEqual(cache.get('b', 'evicted'), 'evicted')
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_replace_entry(self):
+        cache = LRUCache(2)
+        cache.put('a', 'x' * 100)
+        memory = cache.memory
+        cache.put('a', 'x')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.stats()['evictions'], 0)
+        self.assertEqual(cache.memory, memory - 99)
+
+    def test_clear(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.memory, 0)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            LRUCache(0)
+
+
+class TestCachedBINDatabase(TestCase):
+    def setUp(self):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.path = os.path.join(CACHE_DIR, 'DB11LITEBIN.BIN')
+        build_bin_file(self.path, 11, IPV4_ROWS)
+
+    def tearDown(self):
+        recursive_remove_dir(CACHE_DIR)
+
+    def test_ip_key(self):
+        with CachedBINDatabase(self.path) as database:
+            self.assertEqual(database.lookup('8.8.8.8'), database.database.lookup('8.8.8.8'))
+            database.lookup('8.8.8.8')
+            database.lookup('8.8.8.9')
+            stats = database.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 2, 2))
+
+    def test_range_key(self):
+        with CachedBINDatabase(self.path, key='range') as database:
+            self.assertEqual(database.lookup('8.8.8.8')['city'], UNITED_STATES['city'])
+            self.assertEqual(database.lookup('8.8.8.9')['city'], UNITED_STATES['city'])
+            self.assertEqual(database.lookup('1.1.1.1')['city'], AUSTRALIA['city'])
+            stats = database.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 2, 2))
+
+    def test_returns_copies(self):
+        with CachedBINDatabase(self.path) as database:
+            database.lookup('8.8.8.8')['city'] = 'Modified'
+            self.assertEqual(database.lookup('8.8.8.8')['city'], UNITED_STATES['city'])
+
+    def test_not_found(self):
+        path = os.path.join(CACHE_DIR, 'DB1LITEBIN.BIN')
+        build_bin_file(path, 1, [(ip4('8.0.0.0'), UNITED_STATES)])
+        for key in ['ip', 'range']:
+            with CachedBINDatabase(path, key=key) as database:
+                self.assertIsNone(database.lookup('1.1.1.1'))
+                self.assertIsNone(database.lookup('1.1.1.1'))
+
+    def test_invalid_key(self):
+        with self.assertRaises(ValueError):
+            CachedBINDatabase(self.path, key='row')
+
+    def test_cleared_when_file_replaced(self):
+        new_path = os.path.join(CACHE_DIR, 'NEW.BIN')
+        build_bin_file(new_path, 11, [(0, IPV4_ROWS[0][1]), (ip4('8.8.8.0'), GERMANY), (ip4('8.8.9.0'), IPV4_ROWS[0][1])], date=(23, 10, 1))
+        with CachedBINDatabase(self.path, check_interval=0) as database:
+            self.assertEqual(database.lookup('8.8.8.8')['country_short'], 'US')
+            install_db(new_path, self.path)
+            self.assertEqual(database.lookup('8.8.8.8')['country_short'], 'DE')
+            self.assertEqual(database.database.header.month, 10)
+            self.assertEqual(database.cache.stats()['size'], 1)
+
+    def test_check_interval(self):
+        with CachedBINDatabase(self.path, check_interval=3600) as database:
+            database.lookup('8.8.8.8')
+            self.assertFalse(database.check_file())
+            os.replace(self.path, self.path + '.old')
+            build_bin_file(self.path, 11, IPV4_ROWS)
+            database.lookup('8.8.8.8')
+            self.assertEqual(database.cache.stats()['hits'], 1, msg="The file should not be checked before the interval has passed.")
+            self.assertTrue(database.check_file())
+            self.assertEqual(len(database.cache), 0)
+
+    def replacement(self):
+        new_path = os.path.join(CACHE_DIR, 'NEW.BIN')
+        build_bin_file(new_path, 11, [(0, IPV4_ROWS[0][1]), (ip4('8.8.8.0'), GERMANY), (ip4('8.8.9.0'), IPV4_ROWS[0][1])], date=(23, 10, 1))
+        return new_path
+
+    def original(self):
+        path = os.path.join(CACHE_DIR, 'OLD.BIN')
+        build_bin_file(path, 11, IPV4_ROWS)
+        return path
+
+    def test_reload_during_lookup(self):
+        for key in ['ip', 'range']:
+            build_bin_file(self.path, 11, IPV4_ROWS)
+            with CachedBINDatabase(self.path, key=key, check_interval=0) as database:
+                old_database = database.database
+                decode_row = old_database.decode_row
+                def reload_then_decode(row, ipv6=False):
+                    # Another thread replaces the file and reloads while this lookup is in flight.
+                    install_db(self.replacement(), self.path)
+                    self.assertTrue(database.check_file())
+                    self.assertFalse(old_database.closed, msg="The replaced version should stay open while a lookup uses it.")
+                    return decode_row(row, ipv6)
+                old_database.decode_row = reload_then_decode
+                self.assertEqual(database.lookup('8.8.8.8')['country_short'], 'US')
+                self.assertTrue(old_database.closed, msg="The replaced version should be closed when its last lookup ends.")
+                self.assertEqual(len(database.cache), 0, msg="A record of the replaced version should not be cached.")
+                self.assertEqual(database.lookup('8.8.8.8')['country_short'], 'DE')
+
+    def test_concurrent_reload(self):
+        errors = []
+        stop = threading.Event()
+        with CachedBINDatabase(self.path, key='range', check_interval=0) as database:
+            def lookups():
+                try:
+                    while not stop.is_set():
+                        self.assertIn(database.lookup('8.8.8.8')['country_short'], ('US', 'DE'))
+                except Exception as e:
+                    errors.append(e)
+            threads = [threading.Thread(target=lookups) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for index in range(20):
+                install_db(self.replacement() if index % 2 == 0 else self.original(), self.path)
+                database.check_file()
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
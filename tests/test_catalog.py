@@ -0,0 +1,48 @@
+from unittest import TestCase
+from ip2location_toolkit.catalog import CODE_SET, ENTRIES, DatabaseEntry, _build_entries, filter_entries, find_code, get_entry, get_products, get_titles, is_valid_code
+from ip2location_toolkit.db_codes import CODES
+from ip2location_toolkit.selector.cli import get_code
+from ip2location_toolkit.validators import get_all_db_codes
+
+
+class TestCatalog(TestCase):
+    def test_codes(self):
+        self.assertEqual(len(ENTRIES), 64)
+        self.assertEqual(len(CODE_SET), len(ENTRIES), msg="Every database should have its own code.")
+        self.assertEqual(get_all_db_codes(), [entry.code for entry in ENTRIES])
+        self.assertTrue(is_valid_code('DB11LITEBIN'))
+        self.assertFalse(is_valid_code('DB11'))
+        self.assertFalse(is_valid_code(None))
+
+    def test_proxy_ipv6_bin_codes(self):
+        self.assertEqual(get_entry('PX11LITEBINIPV6'), DatabaseEntry('PX11LITEBINIPV6', 'ip2proxy', CODES['ip2proxy'][10]['title'], 'ipv6', 'bin'))
+        self.assertEqual(get_entry('PX11LITEBIN').ip_type, 'ipv4')
+
+    def test_get_entry(self):
+        entry = get_entry('DB1LITECSVIPV6')
+        self.assertEqual(entry, DatabaseEntry('DB1LITECSVIPV6', 'ip2location', 'IP-COUNTRY', 'ipv6', 'csv'))
+        self.assertIsNone(get_entry('DB2LITEBIN'))
+
+    def test_find_code(self):
+        self.assertEqual(find_code('ip2location', 'IP-COUNTRY', 'ipv4', 'bin'), 'DB1LITEBIN')
+        self.assertEqual(find_code('ip2location', 'IP-COUNTRY', 'ipv6', 'cvs'), 'DB1LITECSVIPV6')
+        self.assertEqual(get_code('ip2location', 'IP-COUNTRY', 'ipv6', 'csv'), 'DB1LITECSVIPV6')
+        with self.assertRaises(ValueError):
+            find_code('ip2location', 'IP-COUNTRY', 'ipv5', 'bin')
+
+    def test_filter_entries(self):
+        entries = filter_entries(product='ip2proxy', ip_type='ipv6', db_format='bin')
+        self.assertEqual([entry.code for entry in entries], ['PX{}LITEBINIPV6'.format(number) for number in range(1, 12)])
+        self.assertEqual(len(filter_entries(db_format='cvs')), 32)
+        self.assertEqual(filter_entries(), list(ENTRIES))
+        self.assertEqual(filter_entries(title='Unknown'), [])
+
+    def test_products_and_titles(self):
+        self.assertEqual(get_products(), ['ip2location', 'ip2proxy'])
+        self.assertEqual(get_titles('ip2location'), [database['title'] for database in CODES['ip2location']])
+        self.assertEqual(get_titles('unknown'), [])
+
+    def test_duplicate_codes(self):
+        codes = {'ip2proxy': [{'title': 'PROXY', 'ipv4': {'bin': 'PX1LITEBIN'}, 'ipv6': {'bin': 'PX1LITEBIN'}}]}
+        with self.assertRaises(ValueError):
+            _build_entries(codes)
@@ -0,0 +1,100 @@
+from unittest.mock import patch
+from ip2location_toolkit.cli import compile_db
+from ip2location_toolkit.downloader.metadata import write_metadata
+from ip2location_toolkit.downloader.update import get_db_version
+from ip2location_toolkit.reader.compiler import compile_csv, get_csv_version
+from ip2location_toolkit.reader.database import BINDatabase
+from ip2location_toolkit.reader.lite_csv import read_csv_rows
+import os
+
+from .test_lite_csv import DB11_CSV, PX2_CSV
+from .utils import SilentTestCase, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPILER_DIR = os.path.join(TESTS_DIR, '__compiler__')
+
+
+class TestCompileCSV(SilentTestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(COMPILER_DIR, exist_ok=True)
+        self.csv_path = os.path.join(COMPILER_DIR, 'DB11LITECSV.CSV')
+        with open(self.csv_path, 'w', newline='') as file:
+            file.write(DB11_CSV)
+
+    def tearDown(self):
+        super().tearDown()
+        recursive_remove_dir(COMPILER_DIR)
+
+    def write_csv(self, name, content):
+        path = os.path.join(COMPILER_DIR, name)
+        with open(path, 'w', newline='') as file:
+            file.write(content)
+        return path
+
+    def test_lookups_match_csv(self):
+        path = compile_csv(self.csv_path, version='23.9.1')
+        self.assertEqual(path, os.path.join(COMPILER_DIR, 'DB11LITECSV.BIN'))
+        self.assertEqual(get_db_version(path), '23.9.1')
+        with BINDatabase(path) as database:
+            self.assertEqual(database.header.db_type, 11)
+            self.assertIs(database._ipv4_index, database._mm, msg="The compiled file should carry its own index.")
+            self.assertEqual(database._ipv4_base % 4, 0, msg="The rows should be 4-byte aligned.")
+            for row in read_csv_rows(self.csv_path):
+                for ip in (row[0], row[1]):
+                    ipv6, found = database.resolve(4, ip)
+                    record = database.decode_row(found, ipv6)
+                    self.assertEqual((record['country_short'], record['country_long'], record['city'], record['time_zone']), (row[2], row[3], row[5], row[9]))
+                    self.assertAlmostEqual(record['latitude'], row[6], places=4)
+
+    def test_gaps_are_filled(self):
+        path = self.write_csv('DB1LITECSV.CSV', '"16777216","16777471","AU","Australia"\n"134744064","134744319","US","United States of America"\n')
+        with BINDatabase(compile_csv(path, version='23.9.1')) as database:
+            self.assertEqual(database._ipv4_base % 4, 0, msg="The rows should be 4-byte aligned whatever the length of the strings.")
+            self.assertEqual(database.lookup('0.0.0.1')['country_short'], '-')
+            self.assertEqual(database.lookup('1.0.0.1')['country_short'], 'AU')
+            self.assertEqual(database.lookup('1.0.1.0')['country_short'], '-')
+            self.assertEqual(database.lookup('8.8.8.8')['country_short'], 'US')
+            self.assertEqual(database.lookup('8.8.9.0')['country_short'], '-')
+            self.assertEqual(database.lookup('255.255.255.255')['country_short'], '-')
+
+    def test_ipv6_proxy_database(self):
+        path = self.write_csv('IP2PROXY-LITE-PX2.IPV6.CSV', PX2_CSV)
+        output = os.path.join(COMPILER_DIR, 'PX2.BIN')
+        with BINDatabase(compile_csv(path, output, version='23.9.1')) as database:
+            self.assertEqual(database.product, 'ip2proxy')
+            self.assertEqual(database.header.ipv4_count, 5, msg="The IPv4-mapped ranges should also be written to an IPv4 section, gaps included.")
+            self.assertEqual(database._ipv6_base % 4, 0)
+            self.assertEqual(database.resolve(4, 134744072)[0], False, msg="IPv4 addresses should be looked up in the IPv4 section.")
+            self.assertEqual(database.lookup('8.8.8.8'), {'proxy_type': 'VPN', 'country_short': 'US', 'country_long': 'United States of America'})
+            self.assertEqual(database.lookup('::ffff:8.8.8.8'), database.lookup('8.8.8.8'))
+            self.assertEqual(database.lookup('8.8.9.0')['proxy_type'], '-')
+            self.assertEqual(database.lookup('2001:db8::1')['proxy_type'], '-')
+
+    def test_unsorted_ranges(self):
+        path = self.write_csv('DB1LITECSV.CSV', '"16777216","16777471","AU","Australia"\n"0","16777215","-","-"\n')
+        with self.assertRaises(ValueError):
+            compile_csv(path, version='23.9.1')
+        self.assertEqual(sorted(os.listdir(COMPILER_DIR)), ['DB11LITECSV.CSV', 'DB1LITECSV.CSV'], msg="No partial file should be left behind.")
+
+    def test_version_from_metadata(self):
+        write_metadata(self.csv_path, {'last_modified': 'Fri, 01 Sep 2023 08:00:00 GMT'})
+        self.assertEqual(get_csv_version(self.csv_path), '23.9.1')
+        os.remove(self.csv_path + '.meta.json')
+
+    def test_version_from_file(self):
+        os.utime(self.csv_path, (1696118400, 1696118400))
+        self.assertIn(get_csv_version(self.csv_path), ['23.9.30', '23.10.1'])
+
+    def test_invalid_version(self):
+        with self.assertRaises(ValueError):
+            compile_csv(self.csv_path, version='2023-09-01')
+
+    def test_compile_db_error(self):
+        self.assertIsNone(compile_db(os.path.join(COMPILER_DIR, 'database.csv')))
+
+    @patch('ip2location_toolkit.reader.compiler.compile_csv')
+    def test_compile_db(self, mock_compile_csv):
+        mock_compile_csv.return_value = 'DB11LITECSV.BIN'
+        self.assertEqual(compile_db(self.csv_path, version='23.9.1'), 'DB11LITECSV.BIN')
+        mock_compile_csv.assert_called_once_with(self.csv_path, None, None, '23.9.1')
@@ -0,0 +1,125 @@
+from ip2location_toolkit.cli import apply_delta as apply_delta_command, create_delta as create_delta_command
+from ip2location_toolkit.downloader.metadata import read_metadata, write_metadata
+from ip2location_toolkit.downloader.update import get_previous_version_path
+from ip2location_toolkit.reader.compiler import write_bin
+from ip2location_toolkit.reader.database import BINDatabase
+from ip2location_toolkit.reader.delta import apply_delta, create_delta, read_delta_header
+from ip2location_toolkit.reader.generator import generate_rows
+from ip2location_toolkit.reader.lite_csv import get_csv_schema
+import gzip, hashlib, os, random
+
+from .utils import SilentTestCase, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DELTA_DIR = os.path.join(TESTS_DIR, '__delta__')
+
+
+def change_rows(rows, db_code, share=100, seed=2):
+    """
+    Give a new city to one row in `share`, and split one range in `share` in two.
+    """
+    city = [name for name, _ in get_csv_schema(db_code)].index('city')
+    generator = random.Random(seed)
+    changed = []
+    for row in rows:
+        if generator.randrange(share) == 0:
+            row = row[:city] + ('Newtown {}'.format(generator.randrange(50)),) + row[city + 1:]
+        if generator.randrange(share) == 0 and row[1] > row[0]:
+            middle = (row[0] + row[1]) // 2
+            changed.append((row[0], middle) + row[2:])
+            row = (middle + 1,) + row[1:]
+        changed.append(row)
+    return changed
+
+
+class TestDelta(SilentTestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(DELTA_DIR, exist_ok=True)
+
+    def tearDown(self):
+        super().tearDown()
+        recursive_remove_dir(DELTA_DIR)
+
+    def path(self, name):
+        return os.path.join(DELTA_DIR, name)
+
+    def releases(self, db_code='DB11LITECSV', rows=3000):
+        old_rows = list(generate_rows(db_code, rows))
+        write_bin(old_rows, self.path('old.BIN'), db_code, '24.5.1')
+        write_bin(change_rows(old_rows, db_code), self.path('new.BIN'), db_code, '24.6.1')
+        return self.path('old.BIN'), self.path('new.BIN')
+
+    def read(self, path):
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def test_round_trip(self):
+        old_path, new_path = self.releases()
+        write_metadata(new_path, {'db_code': 'DB11LITEBIN', 'etag': '"v2"'})
+        delta_path = create_delta(old_path, new_path)
+        self.assertEqual(delta_path, self.path('new.delta'))
+        output_path = apply_delta(old_path, delta_path, self.path('rebuilt.BIN'))
+        self.assertEqual(self.read(output_path), self.read(new_path))
+        self.assertEqual(read_metadata(output_path), {'db_code': 'DB11LITEBIN', 'etag': '"v2"', 'sha256': hashlib.sha256(self.read(new_path)).hexdigest()})
+
+        compressed_size = len(gzip.compress(self.read(new_path)))
+        self.assertLess(os.path.getsize(delta_path), os.path.getsize(new_path) / 20, msg="The delta should be much smaller than the new release.")
+        self.assertLess(os.path.getsize(delta_path), compressed_size / 2, msg="The delta should be smaller than the compressed new release.")
+        header = read_delta_header(delta_path)
+        self.assertEqual((header['old_size'], header['new_size']), (os.path.getsize(old_path), os.path.getsize(new_path)))
+
+    def test_ipv6_proxy_round_trip(self):
+        old_path, new_path = self.releases('PX4LITECSVIPV6', 1000)
+        output_path = apply_delta(old_path, create_delta(old_path, new_path), self.path('rebuilt.BIN'))
+        self.assertEqual(self.read(output_path), self.read(new_path))
+        with BINDatabase(output_path) as database:
+            self.assertEqual(database.header.ipv6_count, BINDatabase(new_path).header.ipv6_count)
+
+    def test_unrelated_releases(self):
+        old_path = self.path('old.BIN')
+        write_bin(generate_rows('DB3LITECSV', 500, seed=1), old_path, 'DB3LITECSV', '24.5.1')
+        new_path = self.path('new.BIN')
+        write_bin(generate_rows('DB11LITECSV', 500, seed=2), new_path, 'DB11LITECSV', '24.6.1')
+        output_path = apply_delta(old_path, create_delta(old_path, new_path), self.path('rebuilt.BIN'))
+        self.assertEqual(self.read(output_path), self.read(new_path))
+
+    def test_replace_in_place(self):
+        old_path, new_path = self.releases(rows=500)
+        delta_path = create_delta(old_path, new_path, self.path('patch.delta'))
+        old_data = self.read(old_path)
+        self.assertEqual(apply_delta(old_path, delta_path, keep_previous=True), old_path)
+        self.assertEqual(self.read(old_path), self.read(new_path))
+        self.assertEqual(self.read(get_previous_version_path(old_path)), old_data)
+        self.assertEqual(sorted(os.listdir(DELTA_DIR)), sorted(['old.BIN', 'old.BIN.meta.json', 'old.BIN.prev', 'new.BIN', 'patch.delta']), msg="No temporary file should be left behind.")
+
+    def test_wrong_old_release(self):
+        old_path, new_path = self.releases(rows=500)
+        delta_path = create_delta(old_path, new_path)
+        with self.assertRaises(ValueError):
+            apply_delta(new_path, delta_path, self.path('rebuilt.BIN'))
+        self.assertFalse(os.path.exists(self.path('rebuilt.BIN')))
+
+    def test_corrupted_delta(self):
+        old_path, new_path = self.releases(rows=500)
+        delta_path = create_delta(old_path, new_path)
+        with gzip.open(delta_path, 'rb') as file:
+            data = bytearray(file.read())
+        # Change the last byte of the checksum of the new release.
+        data[-1] ^= 0xFF
+        with gzip.open(delta_path, 'wb') as file:
+            file.write(data)
+        with self.assertRaises(ValueError):
+            apply_delta(old_path, delta_path, self.path('rebuilt.BIN'))
+        with open(delta_path, 'wb') as file:
+            file.write(gzip.compress(bytes(data))[:100])
+        with self.assertRaises(ValueError):
+            apply_delta(old_path, delta_path, self.path('rebuilt.BIN'))
+        self.assertFalse(os.path.exists(self.path('rebuilt.BIN')))
+
+    def test_delta_commands(self):
+        old_path, new_path = self.releases(rows=500)
+        delta_path = create_delta_command(old_path, new_path, self.path('patch.delta'))
+        self.assertEqual(apply_delta_command(old_path, delta_path, self.path('rebuilt.BIN')), self.path('rebuilt.BIN'))
+        self.assertIsNone(apply_delta_command(new_path, delta_path, self.path('rebuilt.BIN')))
+        self.assertIsNone(create_delta_command(self.path('missing.BIN'), new_path))
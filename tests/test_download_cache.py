@@ -0,0 +1,138 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from ip2location_toolkit.cli import configure_cache
+from ip2location_toolkit.downloader.cache import CACHE_DIR_ENV, CACHE_SIZE_ENV, DownloadCache, get_default_cache_dir, get_download_cache, get_release_key, set_download_cache
+from ip2location_toolkit.downloader.download import download_database, download_extract_db
+from ip2location_toolkit.downloader.metadata import get_metadata_path, read_metadata, write_metadata
+import io, os, time, zipfile
+
+from .utils import SilentTestCase, LocalHTTPServer, VALID_TOKEN, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(TESTS_DIR, '__download_cache__')
+OUTPUT_DIR = os.path.join(TESTS_DIR, '__download_cache_output__')
+
+
+def zip_payload(name='IP2LOCATION-LITE-DB1.BIN', size=200000):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr(name, os.urandom(size))
+    return buffer.getvalue()
+
+
+class TestDownloadCache(SilentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = DownloadCache(CACHE_DIR, max_size=10 ** 9)
+        self.payload = zip_payload()
+
+    def tearDown(self):
+        super().tearDown()
+        set_download_cache(False)
+        for path in (CACHE_DIR, OUTPUT_DIR):
+            if os.path.exists(path):
+                recursive_remove_dir(path)
+
+    def entry(self, db_code, etag, size, used):
+        path = self.cache.get_path(db_code, {'etag': etag})
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(b'\x00' * size)
+        write_metadata(path, {'complete': True, 'content_length': size})
+        os.utime(path, (used, used))
+        return path
+
+    def download(self, server):
+        with patch('ip2location_toolkit.downloader.download.get_download_url', return_value=server.url):
+            return download_database('DB1LITEBIN', VALID_TOKEN, cache=self.cache, raise_errors=True)
+
+    def test_default_cache_dir(self):
+        with patch.dict(os.environ, {CACHE_DIR_ENV: '', 'XDG_CACHE_HOME': '/var/cache/user'}):
+            self.assertEqual(get_default_cache_dir(), os.path.join('/var/cache/user', 'ip2location_toolkit'))
+        with patch.dict(os.environ, {CACHE_DIR_ENV: CACHE_DIR}):
+            self.assertEqual(get_download_cache().directory, CACHE_DIR)
+        with patch.dict(os.environ, {CACHE_SIZE_ENV: '0'}):
+            self.assertIsNone(get_download_cache(), msg="A budget of 0 should disable the cache.")
+        with patch.dict(os.environ, {CACHE_SIZE_ENV: '2GB'}), self.assertRaises(ValueError):
+            get_download_cache()
+
+    def test_get_path(self):
+        path = self.cache.get_path('DB11LITEBIN', {'etag': '"v1"', 'content_length': 10})
+        self.assertEqual(path, os.path.join(CACHE_DIR, 'DB11LITEBIN-{}.zip'.format(get_release_key({'etag': '"v1"'}))))
+        self.assertNotEqual(self.cache.get_path('DB11LITEBIN', {'etag': '"v2"'}), path)
+        self.assertNotEqual(get_release_key({'last_modified': 'Mon, 02 Oct 2023 00:00:00 GMT', 'content_length': 10}), get_release_key({'last_modified': 'Mon, 02 Oct 2023 00:00:00 GMT', 'content_length': 11}))
+        self.assertIsNone(self.cache.get_path('DB11LITEBIN', {'content_length': 10}), msg="A release without validators should not be cached.")
+
+    def test_reuse_current_release(self):
+        with LocalHTTPServer(self.payload) as server:
+            path = self.download(server)
+            downloads = len([headers for headers in server.requests if headers.get('Range') != 'bytes=0-0'])
+            self.assertEqual(self.download(server), path)
+            self.assertEqual(len([headers for headers in server.requests if headers.get('Range') != 'bytes=0-0']), downloads, msg="The cached archive of the current release should be reused.")
+        self.assertEqual(os.path.dirname(path), CACHE_DIR)
+        self.assertTrue(self.cache.is_fresh(path, {'etag': '"v1"', 'content_length': len(self.payload)}))
+
+    def test_download_republished_release(self):
+        with LocalHTTPServer(self.payload) as server:
+            path = self.download(server)
+            server.payload = zip_payload()
+            server.etag = '"v2"'
+            new_path = self.download(server)
+        self.assertNotEqual(new_path, path, msg="A release republished in the same month should not be served from the cache.")
+        self.assertFalse(self.cache.is_fresh(path, {'etag': '"v2"', 'content_length': len(server.payload)}))
+        with open(new_path, 'rb') as file:
+            self.assertEqual(file.read(), server.payload)
+        self.assertEqual(read_metadata(new_path)['etag'], '"v2"')
+
+    def test_no_validators(self):
+        with LocalHTTPServer(self.payload, etag=None, last_modified=None) as server:
+            path = self.download(server)
+        self.assertNotEqual(os.path.dirname(path), CACHE_DIR)
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_concurrent_downloads(self):
+        with LocalHTTPServer(self.payload) as server:
+            with ThreadPoolExecutor(4) as executor:
+                paths = list(executor.map(lambda _: self.download(server), range(4)))
+        self.assertEqual(len(set(paths)), 1)
+        self.assertEqual(len([headers for headers in server.requests if headers.get('Range') != 'bytes=0-0']), 1, msg="The archive should be downloaded once.")
+
+    def test_download_extract_from_cache(self):
+        set_download_cache(self.cache)
+        os.makedirs(OUTPUT_DIR)
+        with LocalHTTPServer(self.payload) as server:
+            with patch('ip2location_toolkit.downloader.download.get_download_url', return_value=server.url):
+                path = download_extract_db('DB1LITEBIN', VALID_TOKEN, OUTPUT_DIR, raise_errors=True)
+        self.assertEqual(os.path.basename(path), 'DB1LITEBIN.BIN')
+        self.assertEqual(read_metadata(path)['db_code'], 'DB1LITEBIN')
+        self.assertEqual(len(self.cache.entries()), 1, msg="The archive should stay in the cache after the extraction.")
+
+    def test_evict_least_recently_used(self):
+        now = time.time()
+        oldest = self.entry('DB1LITEBIN', '"v1"', 1000, now - 300)
+        kept = self.entry('DB3LITEBIN', '"v1"', 1000, now - 200)
+        older = self.entry('DB5LITEBIN', '"v1"', 1000, now - 100)
+        newest = self.entry('DB1LITEBIN', '"v2"', 1000, now)
+        self.cache.max_size = 2500
+        self.assertEqual(self.cache.evict(keep=[kept]), [oldest, older])
+        self.assertEqual([path for path, _, _ in self.cache.entries()], [kept, newest])
+        self.assertFalse(os.path.exists(get_metadata_path(oldest)), msg="The metadata of the removed archives should be removed.")
+        self.assertLessEqual(self.cache.size(), 2500)
+
+    def test_evict_skips_locked_codes(self):
+        now = time.time()
+        locked = self.entry('DB1LITEBIN', '"v1"', 1000, now - 100)
+        unlocked = self.entry('DB3LITEBIN', '"v1"', 1000, now)
+        self.cache.max_size = 0
+        with self.cache.lock('DB1LITEBIN'):
+            self.assertEqual(self.cache.evict(), [unlocked])
+        self.assertTrue(os.path.exists(locked))
+        self.assertEqual(self.cache.clear(), [locked])
+
+    def test_configure_cache(self):
+        self.assertTrue(configure_cache(CACHE_DIR, 1000))
+        self.assertEqual((get_download_cache().directory, get_download_cache().max_size), (str(CACHE_DIR), 1000))
+        self.assertTrue(configure_cache(disabled=True))
+        self.assertIsNone(get_download_cache())
+        with patch.dict(os.environ, {CACHE_SIZE_ENV: 'large'}):
+            self.assertFalse(configure_cache(CACHE_DIR))
@@ -7,15 +7,19 @@ from ip2location_toolkit.downloader.download import (
     download_file,
     get_dir_or_create,
     get_downloaded_zip_path,
+    get_resume_state,
     get_tmp_dir,
+    parse_content_range,
+    split_byte_ranges,
     rename_file,
     unzip_db,
 )
+from ip2location_toolkit.downloader.metadata import read_metadata, remove_metadata, verify_checksum, write_metadata
 from ip2location_toolkit.exceptions import DataBaseNotFound, DownloadLimitExceeded, DownloadPermissionDenied
-import os, io, sys, zipfile
+import hashlib, os, io, sys, zipfile
 
 from .utils import VALID_TOKEN, INVALID_TOKEN_SHORT, INVALID_TOKEN_LONG
-from .utils import SilentTestCase, SilentTqdm, recursive_remove_dir
+from .utils import SilentTestCase, SilentTqdm, LocalHTTPServer, recursive_remove_dir
 
 mocked_404_response = MagicMock(status_code=404)
 mocked_limit_exceeded_response = MagicMock(status_code=200, text='THIS FILE CAN ONLY BE DOWNLOADED')
@@ -66,25 +70,174 @@ class TestDownloadFile(SilentTestCase):
             download_file('https://www.ip2location.com/download?token=123&file=DB1LITEBIN', 'test.zip')
 
     @patch('ip2location_toolkit.downloader.download.tqdm', SilentTqdm)
-    @patch('ip2location_toolkit.downloader.download.requests.get', return_value=MagicMock(status_code=200, text='test'))
+    @patch('ip2location_toolkit.downloader.download.requests.get', return_value=MagicMock(status_code=200, text='test', headers={'content-length': '4'}, iter_content=MagicMock(return_value=[b'test'])))
     def test_download_file(self, mocker):
         file = download_file('https://www.ip2location.com/download?token=123&file=DB1LITEBIN', 'test.zip')
         self.assertEqual(file, 'test.zip', msg="The function should return the path to the downloaded zip file.")
         self.assertTrue(os.path.exists(file), msg="The downloaded zip file should exist.")
         os.remove(file)
+        remove_metadata(file)
+
+class TestParseContentRange(TestCase):
+    def test_valid_content_range(self):
+        self.assertEqual(parse_content_range('bytes 100-199/200'), (100, 199, 200))
+
+    def test_unknown_total(self):
+        self.assertEqual(parse_content_range('bytes 100-199/*'), (100, 199, None))
+
+    def test_invalid_content_range(self):
+        self.assertIsNone(parse_content_range(None))
+        self.assertIsNone(parse_content_range('items 1-2/3'))
+
+
+@patch('ip2location_toolkit.downloader.download.tqdm', SilentTqdm)
+class TestResumeDownload(SilentTestCase):
+    payload = bytes(range(256)) * 2000
+
+    def setUp(self):
+        super().setUp()
+        self.path = 'test_resume.zip'
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        remove_metadata(self.path)
+        super().tearDown()
+
+    def write_partial(self, size, etag='"v1"'):
+        with open(self.path, 'wb') as file:
+            file.write(self.payload[:size])
+        write_metadata(self.path, {'complete': False, 'content_length': len(self.payload), 'etag': etag, 'last_modified': None})
+
+    def read(self):
+        with open(self.path, 'rb') as file:
+            return file.read()
+
+    def test_fresh_download_records_metadata(self):
+        with LocalHTTPServer(self.payload) as server:
+            download_file(server.url, self.path)
+        self.assertEqual(self.read(), self.payload)
+        metadata = read_metadata(self.path)
+        self.assertTrue(metadata['complete'], msg="The metadata should mark the download as complete.")
+        self.assertEqual(metadata['etag'], '"v1"')
+        self.assertEqual(metadata['content_length'], len(self.payload))
+        self.assertEqual(metadata['sha256'], hashlib.sha256(self.payload).hexdigest(), msg="The checksum should be computed over the received chunks.")
+
+    def test_resume_partial_download(self):
+        self.write_partial(300000)
+        with LocalHTTPServer(self.payload) as server:
+            download_file(server.url, self.path)
+        self.assertEqual(server.requests[0]['Range'], 'bytes=300000-', msg="Only the missing bytes should be requested.")
+        self.assertEqual(server.requests[0]['If-Range'], '"v1"', msg="The range request should be validated with the recorded ETag.")
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(self.read(), self.payload)
+        self.assertTrue(verify_checksum(self.path), msg="The checksum of a resumed download should cover the bytes received before the interruption.")
+
+    def test_restart_when_ranges_not_supported(self):
+        self.write_partial(300000)
+        with LocalHTTPServer(self.payload, accept_ranges=False) as server:
+            download_file(server.url, self.path)
+        self.assertEqual(len(server.requests), 1, msg="The full response should be used without a second request.")
+        self.assertEqual(self.read(), self.payload)
+
+    def test_restart_when_remote_file_changed(self):
+        self.write_partial(300000, etag='"v0"')
+        with LocalHTTPServer(self.payload) as server:
+            download_file(server.url, self.path)
+        self.assertEqual(self.read(), self.payload)
+        self.assertEqual(read_metadata(self.path)['etag'], '"v1"')
+
+    def test_resume_after_dropped_connection(self):
+        with LocalHTTPServer(self.payload, fail_after=200000) as server:
+            download_file(server.url, self.path)
+        self.assertEqual(len(server.requests), 2)
+        self.assertIn('Range', server.requests[1], msg="The download should be resumed with a range request.")
+        self.assertEqual(self.read(), self.payload)
+
+    def test_dropped_connection_without_retries(self):
+        with LocalHTTPServer(self.payload, fail_after=200000) as server:
+            with self.assertRaises(Exception):
+                download_file(server.url, self.path, retries=0)
+        self.assertGreater(get_resume_state(self.path)[0], 0, msg="The partial download should be resumable.")
+
+    def test_no_resume(self):
+        self.write_partial(300000)
+        with LocalHTTPServer(self.payload) as server:
+            download_file(server.url, self.path, resume=False)
+        self.assertNotIn('Range', server.requests[0])
+        self.assertEqual(self.read(), self.payload)
+
+
+class TestSplitByteRanges(TestCase):
+    def test_split_byte_ranges(self):
+        ranges = split_byte_ranges(10000000, 4)
+        self.assertEqual(ranges, [(0, 2499999), (2500000, 4999999), (5000000, 7499999), (7500000, 9999999)])
+
+    def test_uneven_split(self):
+        ranges = split_byte_ranges(3000001, 3)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], 3000000)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end + 1, start, msg="The ranges should be contiguous.")
+
+    def test_small_file(self):
+        self.assertEqual(split_byte_ranges(1500000, 8), [(0, 1499999)], msg="Files smaller than two segments should not be split.")
+
+
+@patch('ip2location_toolkit.downloader.download.tqdm', SilentTqdm)
+@patch('ip2location_toolkit.downloader.download.MIN_SEGMENT_SIZE', 100000)
+class TestSegmentedDownload(SilentTestCase):
+    payload = bytes(range(256)) * 2000
+
+    def setUp(self):
+        super().setUp()
+        self.path = 'test_segmented.zip'
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        remove_metadata(self.path)
+        super().tearDown()
+
+    def read(self):
+        with open(self.path, 'rb') as file:
+            return file.read()
+
+    def test_segmented_download(self):
+        with LocalHTTPServer(self.payload) as server:
+            download_file(server.url, self.path, connections=4)
+        self.assertEqual(len(server.requests), 4, msg="One request should be sent per segment.")
+        self.assertEqual(sorted(request['Range'] for request in server.requests), ['bytes=0-', 'bytes=128000-255999', 'bytes=256000-383999', 'bytes=384000-511999'])
+        self.assertEqual(self.read(), self.payload)
+        self.assertTrue(read_metadata(self.path)['complete'])
+        self.assertTrue(verify_checksum(self.path))
+
+    def test_fallback_without_range_support(self):
+        with LocalHTTPServer(self.payload, accept_ranges=False) as server:
+            download_file(server.url, self.path, connections=4)
+        self.assertEqual(len(server.requests), 1, msg="The single-stream download should be used when ranges are not supported.")
+        self.assertEqual(self.read(), self.payload)
+
+    def test_dropped_segment(self):
+        with LocalHTTPServer(self.payload, fail_after=50000) as server:
+            download_file(server.url, self.path, connections=4)
+        self.assertEqual(self.read(), self.payload)
+
 
 class TestDownloadDatabase(SilentTestCase):
 
     def test_invalid_token(self):
         self.assertIsNone(download_database('DB1LITEBIN', INVALID_TOKEN_LONG), msg="Expected None to be returned for invalid token.")
 
+    @patch('ip2location_toolkit.downloader.download.probe_remote_file', return_value={'content_length': 10, 'etag': '"v1"', 'last_modified': None})
     @patch('ip2location_toolkit.downloader.download.download_file', return_value='test.zip')
-    def test_download_database(self, mocker):
+    def test_download_database(self, mocker, probe_mock):
         file = download_database('DB1LITEBIN', VALID_TOKEN)
         self.assertEqual(file, 'test.zip', msg="The function should return the path to the downloaded zip file.")
 
+    @patch('ip2location_toolkit.downloader.download.probe_remote_file', return_value={'content_length': 10, 'etag': '"v1"', 'last_modified': None})
     @patch('ip2location_toolkit.downloader.download.download_file', return_value=None, side_effect=DataBaseNotFound)
-    def test_download_file_failed(self, mocker):
+    def test_download_file_failed(self, mocker, probe_mock):
         file = download_database('DB1LITEBIN', VALID_TOKEN)
         self.assertIsNone(file, msg="The function should return None if the download_file function failed.")
 
@@ -117,14 +270,17 @@ class TestUnzipDB(SilentTestCase):
             os.remove(self.zipfile_name)
         if os.path.exists(getattr(self, 'output_file_path', '')):
             os.remove(self.output_file_path)
+            remove_metadata(self.output_file_path)
         if os.path.exists(getattr(self, 'output_dir', '')):
             os.rmdir(self.output_dir)
 
     def test_unzip_db(self):
         self.output_file_path = unzip_db('test_file.zip', self.output_dir)
         self.assertTrue(os.path.exists(os.path.join(self.output_dir, self. file_name)), msg="The unzipped file should exist.")
+        self.assertEqual(read_metadata(self.output_file_path)['sha256'], hashlib.sha256(b'This is a test file.').hexdigest(), msg="The checksum of the extracted file should be recorded.")
+        self.assertTrue(verify_checksum(self.output_file_path))
 
-    @patch('ip2location_toolkit.downloader.download.ZipFile.extract', side_effect=zipfile.BadZipFile)
+    @patch('ip2location_toolkit.downloader.download.ZipFile.open', side_effect=zipfile.BadZipFile)
     def test_failed_unzip(self, mocker):
         with self.assertRaises(zipfile.BadZipFile, msg="Expected BadZipFile exception to be raised"):
             unzip_db('test_file.zip', self.output_dir)
@@ -0,0 +1,156 @@
+from unittest import TestCase
+from unittest.mock import patch
+from ip2location_toolkit.enrich import _state as enrich_state, IPExtractor, RecordFormatter, enrich_logs, get_database_path, get_record_fields, read_batches
+from ip2location_toolkit.reader.database import BINDatabase
+from ip2location_toolkit.cli import enrich
+import csv, io, json, os
+
+from .test_reader import IPV4_ROWS, IPV6_ROWS, UNITED_STATES, AUSTRALIA, GERMANY
+from .utils import SilentTestCase, build_bin_file, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ENRICH_DIR = os.path.join(TESTS_DIR, '__enrich__')
+
+LOG_LINES = [
+    '8.8.8.8 - - [01/Sep/2023:10:00:00 +0000] "GET / HTTP/1.1" 200 512',
+    '1.1.1.1 - - [01/Sep/2023:10:00:01 +0000] "GET /about HTTP/1.1" 200 128',
+    'not-an-address - - [01/Sep/2023:10:00:02 +0000] "GET / HTTP/1.1" 400 0',
+    '',
+    '2a00:1450::1 - - [01/Sep/2023:10:00:03 +0000] "GET / HTTP/1.1" 200 512',
+]
+
+
+class TestIPExtractor(TestCase):
+    def test_field(self):
+        self.assertEqual(IPExtractor()(LOG_LINES[0]), '8.8.8.8')
+        self.assertEqual(IPExtractor(field=2, delimiter=',')('x,"[::1]",y'), '::1')
+        self.assertIsNone(IPExtractor(field=3)('one two'))
+        self.assertIsNone(IPExtractor()(''))
+
+    def test_regex(self):
+        self.assertEqual(IPExtractor(regex=r'client=(\S+)')('a client=1.2.3.4 b'), '1.2.3.4')
+        self.assertEqual(IPExtractor(regex=r'(\w+)=(?P<ip>[\d.]+)')('src=1.2.3.4'), '1.2.3.4')
+        self.assertEqual(IPExtractor(regex=r'\d+\.\d+\.\d+\.\d+')('from 10.0.0.1 to 10.0.0.2'), '10.0.0.1')
+        self.assertIsNone(IPExtractor(regex=r'client=(\S+)')('no client'))
+
+    def test_field_and_regex(self):
+        self.assertEqual(IPExtractor(field=2, regex=r'[\d.]+')('GET ip:1.2.3.4 200'), '1.2.3.4')
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            IPExtractor(field=0)
+        with self.assertRaises(ValueError):
+            IPExtractor(regex='(')
+
+
+class TestRecordFormatter(TestCase):
+    def test_jsonl(self):
+        formatter = RecordFormatter('jsonl', ['country_short', 'city'])
+        self.assertEqual(formatter.header(), '')
+        output = formatter.format(['a', 'b'], ['8.8.8.8', None], [UNITED_STATES, None])
+        self.assertEqual([json.loads(line) for line in output.splitlines()], [
+            {'ip': '8.8.8.8', 'country_short': 'US', 'city': 'Mountain View', 'line': 'a'},
+            {'ip': None, 'country_short': None, 'city': None, 'line': 'b'},
+        ])
+        self.assertEqual(formatter.format([], [], []), '')
+
+    def test_csv_and_tsv(self):
+        for output_format, delimiter in (('csv', ','), ('tsv', '\t')):
+            formatter = RecordFormatter(output_format, ['country_short', 'latitude'])
+            output = formatter.header() + formatter.format(['a, "b"'], ['1.1.1.1'], [AUSTRALIA])
+            rows = list(csv.reader(io.StringIO(output), delimiter=delimiter))
+            self.assertEqual(rows, [['ip', 'country_short', 'latitude', 'line'], ['1.1.1.1', 'AU', '-27.467939', 'a, "b"']], msg=output_format)
+
+    def test_invalid_format(self):
+        with self.assertRaises(ValueError):
+            RecordFormatter('xml', [])
+
+
+class TestEnrichLogs(SilentTestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.makedirs(ENRICH_DIR, exist_ok=True)
+        cls.database = os.path.join(ENRICH_DIR, 'DB11LITEBIN.BIN')
+        build_bin_file(cls.database, 11, IPV4_ROWS, IPV6_ROWS)
+        cls.log = os.path.join(ENRICH_DIR, 'access.log')
+        with open(cls.log, 'w') as file:
+            file.write('\n'.join(LOG_LINES) + '\n')
+
+    @classmethod
+    def tearDownClass(cls):
+        recursive_remove_dir(ENRICH_DIR)
+
+    def enrich(self, inputs=None, workers=1, batch_size=2):
+        output = io.StringIO()
+        formatter = RecordFormatter('jsonl', ['country_short', 'city'])
+        stats = enrich_logs(inputs or [self.log], self.database, output, IPExtractor(), formatter, workers, batch_size)
+        return [json.loads(line) for line in output.getvalue().splitlines()], stats
+
+    def test_get_database_path(self):
+        self.assertEqual(get_database_path('db11litebin', ENRICH_DIR), self.database)
+        with self.assertRaises(ValueError):
+            get_database_path('DB11LITECSV', ENRICH_DIR)
+        with self.assertRaises(ValueError):
+            get_database_path('DB5LITEBIN', ENRICH_DIR)
+
+    def test_get_record_fields(self):
+        with BINDatabase(self.database) as database:
+            self.assertEqual(get_record_fields(database), list(UNITED_STATES))
+
+    def test_read_batches(self):
+        self.assertEqual(list(read_batches([self.log, self.log], 4)), [LOG_LINES[:4], LOG_LINES[4:] + LOG_LINES[:3], LOG_LINES[3:]])
+
+    def test_enrich(self):
+        records, stats = self.enrich()
+        self.assertEqual([record['line'] for record in records], LOG_LINES)
+        self.assertEqual([record['country_short'] for record in records], ['US', 'AU', None, None, 'DE'])
+        self.assertEqual(records[0], {'ip': '8.8.8.8', 'country_short': 'US', 'city': 'Mountain View', 'line': LOG_LINES[0]})
+        self.assertEqual(records[4]['city'], GERMANY['city'])
+        self.assertIsNone(records[3]['ip'])
+        self.assertEqual((stats['lines'], stats['matched']), (5, 3))
+        self.assertGreater(stats['lines_per_second'], 0)
+
+    def test_closes_database(self):
+        opened = []
+        original_init = BINDatabase.__init__
+        def init(database, *args, **kwargs):
+            opened.append(database)
+            original_init(database, *args, **kwargs)
+        with patch.object(BINDatabase, '__init__', init):
+            self.enrich()
+        self.assertTrue(all(database.closed for database in opened), msg="The database of the thread worker should be closed.")
+        self.assertEqual(enrich_state, {}, msg="The worker state should not keep the database alive.")
+
+    def test_ordered_with_workers(self):
+        inputs = [self.log] * 20
+        expected, _ = self.enrich(inputs, workers=1, batch_size=3)
+        records, stats = self.enrich(inputs, workers=2, batch_size=3)
+        self.assertEqual(records, expected)
+        self.assertEqual(stats['lines'], 100)
+
+    def test_stdin(self):
+        with patch('sys.stdin', io.StringIO('8.8.8.8 x\n')):
+            records, _ = self.enrich(['-'])
+        self.assertEqual(records[0]['country_short'], 'US')
+
+    def test_missing_input(self):
+        with self.assertRaises(OSError):
+            self.enrich([os.path.join(ENRICH_DIR, 'missing.log')])
+
+    def test_cli(self):
+        output_file = os.path.join(ENRICH_DIR, 'enriched.csv')
+        with patch('sys.stderr', io.StringIO()) as stderr:
+            stats = enrich([self.log], db_code='DB11LITEBIN', database_dir=ENRICH_DIR, output_format='csv', fields=['country_long'], output_file=output_file)
+        self.assertEqual(stats['matched'], 3)
+        self.assertIn('lines/s', stderr.getvalue())
+        with open(output_file, newline='') as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(rows[0], ['ip', 'country_long', 'line'])
+        self.assertEqual(rows[1][:2], ['8.8.8.8', 'United States of America'])
+
+    def test_cli_errors(self):
+        with patch('sys.stderr', io.StringIO()) as stderr:
+            self.assertIsNone(enrich([self.log]))
+            self.assertIsNone(enrich([self.log], self.database, fields=['asn']))
+            self.assertIsNone(enrich([self.log], self.database, regex='('))
+        self.assertEqual(stderr.getvalue().count('Error'), 3)
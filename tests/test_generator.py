@@ -0,0 +1,129 @@
+from ip2location_toolkit.cli import generate_db
+from ip2location_toolkit.downloader.download import unzip_db
+from ip2location_toolkit.downloader.update import get_db_header, get_db_version
+from ip2location_toolkit.reader.database import BINDatabase, MAX_IPV4, MAX_IPV6
+from ip2location_toolkit.reader.generator import generate_database, generate_rows
+from ip2location_toolkit.reader.header import parse_db_header
+from ip2location_toolkit.reader.lite_csv import get_csv_schema, read_csv_rows
+import filecmp, ipaddress, os, zipfile
+
+from .utils import SilentTestCase, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATOR_DIR = os.path.join(TESTS_DIR, '__generator__')
+
+
+class TestGenerateRows(SilentTestCase):
+    def test_deterministic(self):
+        self.assertEqual(list(generate_rows('DB11LITECSV', 500, seed=4)), list(generate_rows('DB11LITEBIN', 500, seed=4)))
+        self.assertNotEqual(list(generate_rows('DB11LITECSV', 500, seed=4)), list(generate_rows('DB11LITECSV', 500, seed=5)))
+
+    def test_ipv4_ranges_cover_address_space(self):
+        rows = list(generate_rows('DB3LITECSV', 1000, seed=1))
+        self.assertEqual(len(rows), 1000)
+        self.assertEqual(rows[0][0], 0)
+        self.assertEqual(rows[-1][1], MAX_IPV4)
+        for previous, row in zip(rows, rows[1:]):
+            self.assertEqual(row[0], previous[1] + 1)
+        self.assertTrue(all(len(row) == len(get_csv_schema('DB3LITECSV')) for row in rows))
+
+    def test_ipv6_ranges(self):
+        rows = list(generate_rows('DB1LITECSVIPV6', 1000, seed=1))
+        self.assertEqual(len(rows), 1003, msg="The unallocated space should be covered by empty ranges.")
+        self.assertEqual((rows[0][0], rows[-1][1]), (0, MAX_IPV6))
+        self.assertEqual(rows[1][0], 0xFFFF << 32)
+        self.assertEqual(rows[0][2:], ('-', '-'))
+
+    def test_proxy_ranges_have_gaps(self):
+        rows = list(generate_rows('PX11LITECSV', 1000, seed=1))
+        self.assertEqual(len(rows), 1000)
+        self.assertTrue(all(row[1] - row[0] < 256 for row in rows))
+        self.assertTrue(all(row[0] > previous[1] for previous, row in zip(rows, rows[1:])))
+
+    def test_string_cardinality(self):
+        rows = list(generate_rows('DB11LITECSV', 5000, seed=1, cities=200))
+        cities = {(row[4], row[5]) for row in rows}
+        self.assertLessEqual(len(cities), 200)
+        self.assertGreater(len(cities), 50)
+        self.assertGreater(len({row[2] for row in rows}), 20)
+        city_fields = {}
+        for row in rows:
+            self.assertEqual(city_fields.setdefault(row[2:6], row[6:]), row[6:], msg="A city should always have the same fields.")
+
+    def test_invalid_code(self):
+        with self.assertRaises(ValueError):
+            list(generate_rows('DB2LITECSV', 10))
+
+
+class TestGenerateDatabase(SilentTestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(GENERATOR_DIR, exist_ok=True)
+
+    def tearDown(self):
+        super().tearDown()
+        recursive_remove_dir(GENERATOR_DIR)
+
+    def test_bin_database(self):
+        path = generate_database('DB11LITEBIN', os.path.join(GENERATOR_DIR, 'DB11LITEBIN.BIN'), rows=2000, seed=3, version='24.2.1')
+        self.assertEqual(get_db_version(path), '24.2.1')
+        self.assertEqual(parse_db_header(get_db_header(path)).ipv4_count, 2001)
+        rows = list(generate_rows('DB11LITEBIN', 2000, seed=3))
+        with BINDatabase(path) as database:
+            self.assertEqual(database.header.db_type, 11)
+            for row in rows[::97]:
+                record = database.lookup('{}.{}.{}.{}'.format(*row[1].to_bytes(4, 'big')))
+                self.assertEqual(record['city'], row[5])
+                self.assertAlmostEqual(record['latitude'], row[6], places=4)
+
+    def test_ipv6_bin_database(self):
+        path = generate_database('DB11LITEBINIPV6', os.path.join(GENERATOR_DIR, 'DB11LITEBINIPV6.BIN'), rows=400, seed=3)
+        header = parse_db_header(get_db_header(path))
+        self.assertGreater(header.ipv4_count, 200, msg="IPv6 databases should carry an IPv4 section, like the official files.")
+        self.assertTrue(header.ipv4_index_base_address and header.ipv6_index_base_address)
+        rows = list(generate_rows('DB11LITEBINIPV6', 400, seed=3))
+        with BINDatabase(path) as database:
+            for row in rows[1::13]:
+                if row[0] >> 32 == 0xFFFF:
+                    ip = '{}.{}.{}.{}'.format(*(row[1] & 0xFFFFFFFF).to_bytes(4, 'big'))
+                    self.assertEqual(database.resolve(4, row[1] & 0xFFFFFFFF)[0], False, msg=ip)
+                else:
+                    ip = str(ipaddress.IPv6Address(row[1]))
+                self.assertEqual(database.lookup(ip)['city'], row[5], msg=ip)
+
+    def test_csv_database(self):
+        path = generate_database('PX2LITECSVIPV6', os.path.join(GENERATOR_DIR, 'PX2LITECSVIPV6.CSV'), rows=300, seed=3)
+        self.assertEqual(list(read_csv_rows(path, 'PX2LITECSVIPV6')), list(generate_rows('PX2LITECSVIPV6', 300, seed=3)))
+        with open(path, newline='') as file:
+            self.assertTrue(file.readline().startswith('"'))
+
+    def test_deterministic_files(self):
+        first = generate_database('DB5LITEBIN', os.path.join(GENERATOR_DIR, 'first.BIN'), rows=500, seed=9)
+        second = generate_database('DB5LITEBIN', os.path.join(GENERATOR_DIR, 'second.BIN'), rows=500, seed=9)
+        self.assertTrue(filecmp.cmp(first, second, shallow=False))
+
+    def test_archive(self):
+        path = generate_database('DB1LITEBINIPV6', os.path.join(GENERATOR_DIR, 'DB1LITEBINIPV6.zip'), rows=100, archive=True)
+        self.assertEqual(zipfile.ZipFile(path).namelist(), ['IP2LOCATION-LITE-DB1.IPV6.BIN', 'LICENSE_LITE.TXT'])
+        extracted = unzip_db(path, GENERATOR_DIR)
+        with BINDatabase(extracted) as database:
+            self.assertEqual(database.lookup('::1'), {'country_short': '-', 'country_long': '-'})
+            self.assertNotEqual(database.lookup('8.8.8.8')['country_short'], '-')
+
+    def test_default_path(self):
+        cwd = os.getcwd()
+        os.chdir(GENERATOR_DIR)
+        try:
+            path = generate_database('db1litecsv', rows=10)
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(path, os.path.join(GENERATOR_DIR, 'DB1LITECSV.CSV'))
+
+    def test_unknown_code(self):
+        with self.assertRaises(ValueError):
+            generate_database('DB2LITEBIN', os.path.join(GENERATOR_DIR, 'DB2LITEBIN.BIN'), rows=10)
+
+    def test_generate_db(self):
+        path = generate_db('PX1LITEBIN', os.path.join(GENERATOR_DIR, 'PX1LITEBIN.BIN'), rows=50)
+        self.assertTrue(os.path.isfile(path))
+        self.assertIsNone(generate_db('DB2LITEBIN', os.path.join(GENERATOR_DIR, 'DB2LITEBIN.BIN')))
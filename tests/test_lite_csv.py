@@ -0,0 +1,101 @@
+from unittest import TestCase
+from ip2location_toolkit.reader.lite_csv import get_csv_schema, guess_db_code, read_csv_rows
+from zipfile import ZipFile, ZIP_DEFLATED
+import os
+
+from .utils import recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_DIR = os.path.join(TESTS_DIR, '__csv__')
+
+DB11_CSV = (
+    '"0","16777215","-","-","-","-","0.000000","0.000000","-","-"\r\n'
+    '"16777216","16777471","AU","Australia","Queensland","Brisbane","-27.467939","153.028091","4000","+10:00"\r\n'
+    '"134744064","134744319","US","United States of America","California","Mountain View","37.405991","-122.078514","94043","-07:00"\r\n'
+    '"134744320","4294967295","BQ","Bonaire, Sint Eustatius and Saba","Bonaire","Kralendijk","12.150000","-68.266670","-","-04:00"\r\n'
+)
+PX2_CSV = (
+    '"281470681743360","281470698520575","-","-","-"\n'
+    '"281470816487424","281470816487679","VPN","US","United States of America"\n'
+)
+
+
+class TestGetCSVSchema(TestCase):
+    def test_db11(self):
+        self.assertEqual([name for name, _ in get_csv_schema('DB11LITECSV')], [
+            'ip_from', 'ip_to', 'country_short', 'country_long', 'region', 'city', 'latitude', 'longitude', 'zip_code', 'time_zone'])
+
+    def test_px_ipv6(self):
+        self.assertEqual(get_csv_schema('PX2LITECSVIPV6'), [
+            ('ip_from', 'integer'), ('ip_to', 'integer'), ('proxy_type', 'string'), ('country_short', 'string'), ('country_long', 'string')])
+
+    def test_invalid(self):
+        for code in ['DB11LITEBIN', 'DB2LITECSV', 'PX12LITECSV', 'CSV']:
+            with self.assertRaises(ValueError, msg=code):
+                get_csv_schema(code)
+
+
+class TestGuessDBCode(TestCase):
+    def test_names(self):
+        self.assertEqual(guess_db_code('/data/DB11LITECSV.CSV'), 'DB11LITECSV')
+        self.assertEqual(guess_db_code('DB1LITECSVIPV6.CSV'), 'DB1LITECSVIPV6')
+        self.assertEqual(guess_db_code('IP2LOCATION-LITE-DB11.IPV6.CSV'), 'DB11LITECSVIPV6')
+        self.assertEqual(guess_db_code('IP2PROXY-LITE-PX2.CSV'), 'PX2LITECSV')
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            guess_db_code('database.csv')
+
+
+class TestReadCSVRows(TestCase):
+    def setUp(self):
+        os.makedirs(CSV_DIR, exist_ok=True)
+        self.csv_path = os.path.join(CSV_DIR, 'DB11LITECSV.CSV')
+        with open(self.csv_path, 'w', newline='') as file:
+            file.write(DB11_CSV)
+
+    def tearDown(self):
+        recursive_remove_dir(CSV_DIR)
+
+    def test_typed_rows(self):
+        rows = list(read_csv_rows(self.csv_path))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[2], (134744064, 134744319, 'US', 'United States of America', 'California', 'Mountain View', 37.405991, -122.078514, '94043', '-07:00'))
+        self.assertEqual(rows[3][3], 'Bonaire, Sint Eustatius and Saba')
+
+    def test_projection(self):
+        rows = list(read_csv_rows(self.csv_path, columns=['country_short', 'ip_from']))
+        self.assertEqual(rows[1], ('AU', 16777216))
+
+    def test_unknown_column(self):
+        with self.assertRaises(ValueError):
+            read_csv_rows(self.csv_path, columns=['isp'])
+
+    def test_zip_member(self):
+        zip_path = os.path.join(CSV_DIR, 'PX2LITECSVIPV6.zip')
+        with ZipFile(zip_path, 'w', ZIP_DEFLATED) as archive:
+            archive.writestr('README_LITE.TXT', 'readme')
+            archive.writestr('IP2PROXY-LITE-PX2.IPV6.CSV', PX2_CSV)
+        rows = list(read_csv_rows(zip_path))
+        self.assertEqual(rows[1], (281470816487424, 281470816487679, 'VPN', 'US', 'United States of America'))
+
+    def test_explicit_db_code(self):
+        path = os.path.join(CSV_DIR, 'database.csv')
+        with open(path, 'w') as file:
+            file.write(PX2_CSV)
+        self.assertEqual(len(list(read_csv_rows(path, 'PX2LITECSVIPV6'))), 2)
+
+    def test_invalid_rows(self):
+        with open(self.csv_path, 'a') as file:
+            file.write('"1","2","US"\n')
+        with self.assertRaises(ValueError):
+            list(read_csv_rows(self.csv_path))
+        with open(self.csv_path, 'w') as file:
+            file.write('"a","2","US","United States","-","-","0","0","-","-"\n')
+        with self.assertRaises(ValueError):
+            list(read_csv_rows(self.csv_path))
+
+    def test_streams(self):
+        rows = read_csv_rows(self.csv_path, buffer_size=16)
+        self.assertEqual(next(rows)[:2], (0, 16777215))
+        rows.close()
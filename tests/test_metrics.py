@@ -0,0 +1,189 @@
+from unittest import TestCase
+from unittest.mock import patch
+from ip2location_toolkit import metrics
+from ip2location_toolkit.downloader.download import download_file, rename_file, unzip_db
+from ip2location_toolkit.downloader.metadata import remove_metadata
+from ip2location_toolkit.metrics import Metrics
+from ip2location_toolkit.reader.batch import lookup_records
+from ip2location_toolkit.reader.cache import CachedBINDatabase
+from ip2location_toolkit.reader.database import BINDatabase
+import json, os, zipfile
+
+from .test_reader import IPV4_ROWS
+from .utils import SilentTestCase, SilentTqdm, LocalHTTPServer, build_bin_file, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_DIR = os.path.join(TESTS_DIR, '__metrics__')
+
+
+def value(registry, name, **labels):
+    for sample in registry.snapshot().get(name, {'samples': []})['samples']:
+        if sample['labels'] == {label: str(label_value) for label, label_value in labels.items()}:
+            return sample['value']
+    return None
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_span(self):
+        with self.metrics.span('download', db_code='DB1LITEBIN') as span:
+            span.add('bytes_received', 1000)
+            span.add('bytes_received', 500)
+            span.add('retries')
+        self.assertEqual(value(self.metrics, 'download_total', db_code='DB1LITEBIN'), 1)
+        self.assertEqual(value(self.metrics, 'download_bytes_received_total', db_code='DB1LITEBIN'), 1500)
+        self.assertEqual(value(self.metrics, 'download_retries_total', db_code='DB1LITEBIN'), 1)
+        self.assertGreater(value(self.metrics, 'download_last_bytes_received_per_second', db_code='DB1LITEBIN'), 0)
+        self.assertIsNone(value(self.metrics, 'download_last_retries_per_second', db_code='DB1LITEBIN'))
+        self.assertIsNone(value(self.metrics, 'download_errors_total', db_code='DB1LITEBIN', error='ValueError'))
+
+    def test_span_errors(self):
+        with self.assertRaises(ValueError):
+            with self.metrics.span('update'):
+                raise ValueError('Invalid version format')
+        with self.metrics.span('update') as span:
+            span.fail(OSError())
+        self.assertEqual(value(self.metrics, 'update_total'), 2)
+        self.assertEqual(value(self.metrics, 'update_errors_total', error='ValueError'), 1)
+        self.assertEqual(value(self.metrics, 'update_errors_total', error='OSError'), 1)
+
+    def test_hooks(self):
+        events = []
+        def failing_hook(event):
+            raise RuntimeError()
+        self.metrics.add_hook(failing_hook)
+        self.metrics.add_hook(events.append)
+        with self.metrics.span('unzip', db_code='DB1LITEBIN') as span:
+            span.add('bytes_extracted', 10)
+        self.metrics.remove_hook(events.append)
+        with self.metrics.span('unzip'):
+            pass
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['name'], 'unzip')
+        self.assertEqual(events[0]['labels'], {'db_code': 'DB1LITEBIN'})
+        self.assertEqual(events[0]['counts'], {'bytes_extracted': 10})
+        self.assertIn('bytes_extracted', events[0]['throughput'])
+        self.assertIsNone(events[0]['error'])
+
+    def test_counters(self):
+        counters = metrics.Counters(('lookups_total', 'misses_total'), self.metrics)
+        counters.values['lookups_total'] += 2
+        self.assertEqual(value(self.metrics, 'lookups_total'), 2)
+        counters.values['lookups_total'] += 1
+        counters.flush()
+        self.assertEqual(value(self.metrics, 'lookups_total'), 3, msg="Only the increments since the last flush should be added.")
+        self.assertIsNone(value(self.metrics, 'misses_total'))
+        del counters
+        self.assertEqual(len(self.metrics._collectors), 0, msg="The registry should forget the counters with their owner.")
+
+    def test_prometheus(self):
+        self.metrics.increment('lookups_total', 3)
+        self.metrics.increment('errors_total', error='Connection"Error')
+        self.metrics.set_gauge('last_seconds', 0.5, db_code='DB1')
+        text = self.metrics.to_prometheus()
+        self.assertIn('# TYPE ip2location_toolkit_lookups_total counter\nip2location_toolkit_lookups_total 3.0\n', text)
+        self.assertIn('ip2location_toolkit_errors_total{error="Connection\\"Error"} 1.0\n', text)
+        self.assertIn('# TYPE ip2location_toolkit_last_seconds gauge\nip2location_toolkit_last_seconds{db_code="DB1"} 0.5\n', text)
+        self.metrics.reset()
+        self.assertEqual(self.metrics.to_prometheus(), '')
+
+    def test_write(self):
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        try:
+            self.metrics.increment('lookups_total', 3)
+            self.metrics.write(os.path.join(METRICS_DIR, 'metrics.json'))
+            self.metrics.write(os.path.join(METRICS_DIR, 'metrics.prom'))
+            with open(os.path.join(METRICS_DIR, 'metrics.json')) as file:
+                self.assertEqual(json.load(file), {'lookups_total': {'type': 'counter', 'samples': [{'labels': {}, 'value': 3}]}})
+            with open(os.path.join(METRICS_DIR, 'metrics.prom')) as file:
+                self.assertIn('ip2location_toolkit_lookups_total 3.0', file.read())
+            self.assertEqual(sorted(os.listdir(METRICS_DIR)), ['metrics.json', 'metrics.prom'])
+            with self.assertRaises(ValueError):
+                self.metrics.write(os.path.join(METRICS_DIR, 'metrics.txt'), 'xml')
+        finally:
+            recursive_remove_dir(METRICS_DIR)
+
+
+@patch('ip2location_toolkit.downloader.download.tqdm', SilentTqdm)
+class TestInstrumentation(SilentTestCase):
+    payload = bytes(range(256)) * 2000
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        metrics.METRICS.reset()
+        self.events = []
+        metrics.add_hook(self.events.append)
+
+    def tearDown(self):
+        metrics.remove_hook(self.events.append)
+        recursive_remove_dir(METRICS_DIR)
+        super().tearDown()
+
+    def test_download_file(self):
+        path = os.path.join(METRICS_DIR, 'test.zip')
+        with LocalHTTPServer(self.payload, fail_after=200000) as server:
+            download_file(server.url, path)
+        remove_metadata(path)
+        self.assertEqual(value(metrics.METRICS, 'download_file_bytes_received_total'), len(self.payload))
+        self.assertEqual(value(metrics.METRICS, 'download_file_retries_total'), 1)
+        self.assertEqual([event['name'] for event in self.events], ['download_file'])
+
+    def test_download_file_error(self):
+        path = os.path.join(METRICS_DIR, 'test.zip')
+        with LocalHTTPServer(self.payload, fail_after=200000) as server:
+            with self.assertRaises(Exception):
+                download_file(server.url, path, retries=0)
+        remove_metadata(path)
+        self.assertEqual(self.events[0]['error'], 'ChunkedEncodingError')
+        self.assertEqual(value(metrics.METRICS, 'download_file_errors_total', error='ChunkedEncodingError'), 1)
+
+    def test_unzip_and_rename(self):
+        archive = os.path.join(METRICS_DIR, 'DB1LITEBIN.zip')
+        with zipfile.ZipFile(archive, 'w') as zip_file:
+            zip_file.writestr('IP2LOCATION-LITE-DB1.BIN', b'\x00' * 1000)
+            zip_file.writestr('README_LITE.TXT', b'readme')
+        extracted = unzip_db(archive, METRICS_DIR)
+        rename_file(extracted, 'DB1LITEBIN.BIN')
+        self.assertEqual(value(metrics.METRICS, 'unzip_db_bytes_extracted_total'), 1000)
+        self.assertEqual(value(metrics.METRICS, 'rename_file_total'), 1)
+        self.assertEqual([event['name'] for event in self.events], ['unzip_db', 'rename_file'])
+
+    def test_lookup_records(self):
+        path = os.path.join(METRICS_DIR, 'DB1LITEBIN.BIN')
+        build_bin_file(path, 1, IPV4_ROWS)
+        with BINDatabase(path) as database:
+            lookup_records(database, ['8.8.8.8', '1.1.1.1', '::1', 'invalid'])
+        self.assertEqual(value(metrics.METRICS, 'lookups_total'), 4)
+        self.assertEqual(value(metrics.METRICS, 'lookups_found_total'), 2)
+        self.assertEqual(value(metrics.METRICS, 'lookups_invalid_total'), 1)
+        self.assertEqual(value(metrics.METRICS, 'lookup_batches_total'), 1)
+        self.assertIsNone(value(metrics.METRICS, 'single_lookups_total'), msg="Batch lookups should not count as single lookups.")
+
+    def test_single_lookups(self):
+        path = os.path.join(METRICS_DIR, 'DB1LITEBIN.BIN')
+        build_bin_file(path, 1, IPV4_ROWS)
+        with BINDatabase(path) as database:
+            database.lookup('8.8.8.8')
+            database.lookup('::1')
+            with self.assertRaises(ValueError):
+                database.lookup('invalid')
+            self.assertEqual(value(metrics.METRICS, 'single_lookups_total'), 2, msg="The counts of an open database should be added when the metrics are read.")
+            database.lookup('1.1.1.1')
+        self.assertEqual(value(metrics.METRICS, 'single_lookups_total'), 3, msg="The counts should be added when the database is closed.")
+        self.assertEqual(value(metrics.METRICS, 'single_lookups_found_total'), 2)
+        self.assertEqual(value(metrics.METRICS, 'single_lookups_invalid_total'), 1)
+        self.assertIsNone(value(metrics.METRICS, 'lookups_total'), msg="Single lookups should not count as batch lookups.")
+
+    def test_cached_lookups(self):
+        path = os.path.join(METRICS_DIR, 'DB1LITEBIN.BIN')
+        build_bin_file(path, 1, IPV4_ROWS)
+        with CachedBINDatabase(path) as database:
+            for ip in ('8.8.8.8', '8.8.8.8', '::1', '::1'):
+                database.lookup(ip)
+        self.assertEqual(value(metrics.METRICS, 'single_lookups_total'), 4)
+        self.assertEqual(value(metrics.METRICS, 'single_lookups_found_total'), 2)
+        self.assertEqual(value(metrics.METRICS, 'lookup_cache_hits_total'), 2)
+        self.assertEqual(value(metrics.METRICS, 'lookup_cache_misses_total'), 2)
@@ -0,0 +1,71 @@
+from unittest import TestCase
+from ip2location_toolkit.reader.database import BINDatabase
+from ip2location_toolkit.reader.pool import LookupPool
+import os, random
+
+from .test_reader import IPV4_ROWS, IPV6_ROWS, ip4
+from .utils import build_bin_file, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+POOL_DIR = os.path.join(TESTS_DIR, '__pool__')
+
+
+class TestLookupPool(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.makedirs(POOL_DIR, exist_ok=True)
+        cls.path = os.path.join(POOL_DIR, 'DB11LITEBIN.BIN')
+        build_bin_file(cls.path, 11, IPV4_ROWS)
+        generator = random.Random(3)
+        cls.addresses = [generator.getrandbits(32) for _ in range(500)] + [ip4('8.8.8.8'), 0, 2 ** 32 - 1]
+
+    @classmethod
+    def tearDownClass(cls):
+        recursive_remove_dir(POOL_DIR)
+
+    def expected(self, path, addresses):
+        with BINDatabase(path) as database:
+            return [database.lookup('{}.{}.{}.{}'.format(*address.to_bytes(4, 'big'))) for address in addresses]
+
+    def test_lookup(self):
+        for vectorized in (True, False):
+            with LookupPool(self.path, workers=2, chunk_size=64, vectorized=vectorized) as pool:
+                self.assertEqual(pool.lookup(self.addresses), self.expected(self.path, self.addresses), msg=vectorized)
+
+    def test_mixed_addresses(self):
+        path = os.path.join(POOL_DIR, 'DB11LITEBINIPV6-MIXED.BIN')
+        build_bin_file(path, 11, IPV4_ROWS, IPV6_ROWS)
+        ips = ['8.8.8.8', '2001:4860::1', '1.1.1.1', '::ffff:8.8.8.8', '2a00:1450::1', '::1', ip4('8.8.4.4')] * 20
+        with BINDatabase(path) as database:
+            expected = [database.lookup(ip if isinstance(ip, str) else '8.8.4.4') for ip in ips]
+        for vectorized in (True, False):
+            with LookupPool(path, workers=2, chunk_size=16, vectorized=vectorized) as pool:
+                self.assertEqual(pool.lookup(ips), expected, msg=vectorized)
+                self.assertEqual(pool.find_rows(ips)[1][:7], b'\x00\x01\x00\x00\x01\x01\x00', msg="IPv4 and IPv4-mapped addresses should be looked up in the IPv4 section.")
+
+    def test_find_rows(self):
+        with LookupPool(self.path, workers=2, chunk_size=2) as pool:
+            rows, sections = pool.find_rows(['0.0.0.1', '1.0.0.1', '8.8.8.8', '9.9.9.9', '255.255.255.255'])
+            self.assertEqual(list(rows), [0, 1, 2, 3, 3])
+            self.assertEqual(sections, bytes(5))
+            self.assertEqual(pool.find_rows([]), (rows[:0], b''))
+
+    def test_buffer_grows(self):
+        with LookupPool(self.path, workers=1, chunk_size=1000) as pool:
+            pool.lookup(['8.8.8.8'])
+            addresses = self.addresses * 200
+            self.assertEqual(pool.lookup(addresses)[-3:], self.expected(self.path, addresses[-3:]))
+
+    def test_ipv6_only_database(self):
+        path = os.path.join(POOL_DIR, 'DB11LITEBINIPV6.BIN')
+        build_bin_file(path, 11, ipv6_rows=IPV6_ROWS[:1] + [(0xFFFF << 32 | ip4('8.8.8.0'), IPV4_ROWS[2][1]), (0xFFFF << 32 | ip4('8.8.9.0'), IPV4_ROWS[0][1])] + IPV6_ROWS[1:])
+        with LookupPool(path, workers=1) as pool:
+            rows, sections = pool.find_rows(['8.8.8.8'])
+            self.assertEqual(sections, b'\x01')
+            self.assertEqual(pool.lookup(['8.8.8.8'])[0]['country_short'], 'US')
+
+    def test_invalid_address(self):
+        with LookupPool(self.path, workers=1) as pool:
+            for ip in ['example.com', '8.8.8']:
+                with self.assertRaises(ValueError, msg=ip):
+                    pool.lookup([ip])
@@ -0,0 +1,217 @@
+from unittest import TestCase
+from ip2location_toolkit.reader.database import BINDatabase, ip_to_int
+from ip2location_toolkit.reader.header import parse_db_header, read_db_header
+from ip2location_toolkit.downloader.update import get_db_version
+import os, random, struct
+from bisect import bisect_right
+
+from .utils import build_bin_file, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+READER_DIR = os.path.join(TESTS_DIR, '__reader__')
+
+
+def ip4(ip):
+    return ip_to_int(ip)[1]
+
+def location(country_short, country_long, region='-', city='-', latitude=0.0, longitude=0.0, zip_code='-', time_zone='-'):
+    return {'country_short': country_short, 'country_long': country_long, 'region': region, 'city': city, 'latitude': latitude, 'longitude': longitude, 'zip_code': zip_code, 'time_zone': time_zone}
+
+UNKNOWN = location('-', '-')
+AUSTRALIA = location('AU', 'Australia', 'Queensland', 'Brisbane', -27.467939, 153.028091, '4000', '+10:00')
+UNITED_STATES = location('US', 'United States of America', 'California', 'Mountain View', 37.405991, -122.078514, '94043', '-07:00')
+GERMANY = location('DE', 'Germany', 'Hessen', 'Frankfurt am Main', 50.115520, 8.684170, '60306', '+02:00')
+
+IPV4_ROWS = [
+    (0, UNKNOWN),
+    (ip4('1.0.0.0'), AUSTRALIA),
+    (ip4('8.8.8.0'), UNITED_STATES),
+    (ip4('8.8.9.0'), UNKNOWN),
+]
+IPV6_ROWS = [
+    (0, UNKNOWN),
+    (ip_to_int('2001:4860::')[1], UNITED_STATES),
+    (ip_to_int('2001:4861::')[1], UNKNOWN),
+    (ip_to_int('2a00:1450::')[1], GERMANY),
+    (ip_to_int('2a00:1451::')[1], UNKNOWN),
+]
+
+
+class TestParseDBHeader(TestCase):
+    def test_read_db_header(self):
+        header = read_db_header(os.path.join(TESTS_DIR, 'BINS', '22-12-1-VALID.BIN'))
+        self.assertEqual(header.column_count, 2)
+        self.assertEqual((header.year, header.month, header.day), (22, 12, 1))
+        self.assertEqual(header.ipv4_count, 239726)
+        self.assertEqual(header.ipv4_base_address, 65 + 65536 * 8)
+        self.assertEqual(header.ipv4_index_base_address, 65)
+        self.assertEqual(header.product, 'ip2location')
+        self.assertEqual(header.version, get_db_version(os.path.join(TESTS_DIR, 'BINS', '22-12-1-VALID.BIN')))
+
+    def test_short_header(self):
+        with self.assertRaises(ValueError):
+            parse_db_header(b'\x01' * 29)
+
+    def test_no_columns(self):
+        with self.assertRaises(ValueError):
+            parse_db_header(struct.pack('<5B6IB', 1, 0, 23, 9, 1, 0, 0, 0, 0, 0, 0, 1))
+
+
+class TestIPToInt(TestCase):
+    def test_ipv4(self):
+        self.assertEqual(ip_to_int('8.8.8.8'), (4, 0x08080808))
+
+    def test_ipv6(self):
+        self.assertEqual(ip_to_int('::1'), (6, 1))
+
+    def test_invalid(self):
+        for ip in ['8.8.8', '256.0.0.1', 'example.com', '', None]:
+            with self.assertRaises(ValueError, msg=ip):
+                ip_to_int(ip)
+
+
+class TestBINDatabase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.makedirs(READER_DIR, exist_ok=True)
+        cls.db11_path = os.path.join(READER_DIR, 'DB11LITEBINIPV6.BIN')
+        build_bin_file(cls.db11_path, 11, IPV4_ROWS, IPV6_ROWS)
+        cls.db1_path = os.path.join(READER_DIR, 'DB1LITEBIN.BIN')
+        build_bin_file(cls.db1_path, 1, IPV4_ROWS)
+        cls.database = BINDatabase(cls.db11_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.database.close()
+        recursive_remove_dir(READER_DIR)
+
+    def assertLocation(self, record, expected):
+        self.assertEqual(set(record), set(expected))
+        for key, value in expected.items():
+            if isinstance(value, float):
+                self.assertAlmostEqual(record[key], value, places=4, msg=key)
+            else:
+                self.assertEqual(record[key], value, msg=key)
+
+    def test_header(self):
+        self.assertEqual(self.database.header.db_type, 11)
+        self.assertEqual(self.database.header.ipv4_count, len(IPV4_ROWS) + 1)
+        self.assertEqual(self.database.product, 'ip2location')
+
+    def test_ipv4_lookup(self):
+        self.assertLocation(self.database.lookup('8.8.8.8'), UNITED_STATES)
+        self.assertLocation(self.database.lookup('1.2.3.4'), AUSTRALIA)
+        self.assertLocation(self.database.lookup('9.9.9.9'), UNKNOWN)
+
+    def test_range_boundaries(self):
+        self.assertLocation(self.database.lookup('8.8.8.0'), UNITED_STATES)
+        self.assertLocation(self.database.lookup('8.8.8.255'), UNITED_STATES)
+        self.assertLocation(self.database.lookup('8.8.7.255'), AUSTRALIA)
+        self.assertLocation(self.database.lookup('0.0.0.0'), UNKNOWN)
+        self.assertLocation(self.database.lookup('255.255.255.255'), UNKNOWN)
+
+    def test_ipv6_lookup(self):
+        self.assertLocation(self.database.lookup('2001:4860:4860::8888'), UNITED_STATES)
+        self.assertLocation(self.database.lookup('2a00:1450:4001:80b::200e'), GERMANY)
+        self.assertLocation(self.database.lookup('2a00:1451::1'), UNKNOWN)
+        self.assertLocation(self.database.lookup('ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'), UNKNOWN)
+
+    def test_ipv4_mapped_lookup(self):
+        self.assertLocation(self.database.lookup('::ffff:8.8.8.8'), UNITED_STATES)
+
+    def test_get_range(self):
+        ipv6, row = self.database.resolve(*ip_to_int('8.8.8.8'))
+        self.assertEqual(self.database.get_range(row, ipv6), (ip4('8.8.8.0'), ip4('8.8.8.255')))
+
+    def test_decode_only_database_columns(self):
+        with BINDatabase(self.db1_path) as database:
+            self.assertEqual(database.lookup('8.8.8.8'), {'country_short': 'US', 'country_long': 'United States of America'})
+            self.assertIsNone(database.lookup('2001:4860:4860::8888'), msg="An IPv4 database should have no record for IPv6 addresses.")
+
+    def test_ip2proxy_database(self):
+        path = os.path.join(READER_DIR, 'PX2LITEBIN.BIN')
+        proxy = {'proxy_type': 'VPN', 'country_short': 'US', 'country_long': 'United States of America'}
+        no_proxy = {'proxy_type': '-', 'country_short': '-', 'country_long': '-'}
+        build_bin_file(path, 2, [(0, no_proxy), (ip4('8.8.8.0'), proxy), (ip4('8.8.9.0'), no_proxy)], product_code=2)
+        with BINDatabase(path) as database:
+            self.assertEqual(database.product, 'ip2proxy')
+            self.assertEqual(database.lookup('8.8.8.8'), proxy)
+            self.assertEqual(database.lookup('8.8.9.8'), no_proxy)
+
+    def test_invalid_ip(self):
+        with self.assertRaises(ValueError):
+            self.database.lookup('8.8.8')
+
+    def test_unsupported_db_type(self):
+        with self.assertRaises(ValueError):
+            BINDatabase(os.path.join(TESTS_DIR, 'BINS', '22-12-1-VALID.BIN'))
+
+    def test_truncated_file(self):
+        with open(self.db1_path, 'rb') as file:
+            content = file.read()
+        path = os.path.join(READER_DIR, 'TRUNCATED.BIN')
+        with open(path, 'wb') as file:
+            file.write(content[:80])
+        with self.assertRaises(ValueError):
+            BINDatabase(path)
+
+    def test_close(self):
+        database = BINDatabase(self.db1_path)
+        database.close()
+        self.assertTrue(database.closed)
+        database.close()
+
+
+class TestFirstLevelIndex(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.makedirs(READER_DIR, exist_ok=True)
+        generator = random.Random(9)
+        cls.ipv4_rows = [(0, UNKNOWN)] + [(ip_from, choice) for ip_from, choice in zip(
+            sorted(generator.sample(range(1, 2 ** 32 - 1), 3000)), [AUSTRALIA, UNITED_STATES, GERMANY] * 1000)]
+        cls.ipv6_rows = [(0, UNKNOWN)] + [(ip_from, choice) for ip_from, choice in zip(
+            sorted(generator.getrandbits(128) >> generator.randrange(0, 32) for _ in range(3000)), [AUSTRALIA, UNITED_STATES, GERMANY] * 1000)]
+        cls.indexed_path = os.path.join(READER_DIR, 'DB1INDEXED.BIN')
+        build_bin_file(cls.indexed_path, 1, cls.ipv4_rows, cls.ipv6_rows, index=True)
+        cls.path = os.path.join(READER_DIR, 'DB1UNINDEXED.BIN')
+        build_bin_file(cls.path, 1, cls.ipv4_rows, cls.ipv6_rows)
+        cls.addresses = [generator.getrandbits(32) for _ in range(2000)] + [ip_from for ip_from, _ in cls.ipv4_rows] + [0, 2 ** 32 - 1]
+        cls.ipv6_addresses = [generator.getrandbits(128) >> generator.randrange(0, 32) for _ in range(2000)] + [ip_from for ip_from, _ in cls.ipv6_rows] + [0, 2 ** 128 - 1]
+
+    @classmethod
+    def tearDownClass(cls):
+        recursive_remove_dir(READER_DIR)
+
+    def expected_rows(self, rows, addresses):
+        ip_froms = [ip_from for ip_from, _ in rows]
+        return [bisect_right(ip_froms, address) - 1 for address in addresses]
+
+    def assertRowsMatch(self, database):
+        self.assertEqual([database.find_row(address) for address in self.addresses], self.expected_rows(self.ipv4_rows, self.addresses))
+        self.assertEqual([database.find_row(address, ipv6=True) for address in self.ipv6_addresses], self.expected_rows(self.ipv6_rows, self.ipv6_addresses))
+
+    def test_file_index(self):
+        with BINDatabase(self.indexed_path) as database:
+            self.assertIs(database._ipv4_index, database._mm)
+            self.assertIs(database._ipv6_index, database._mm)
+            self.assertRowsMatch(database)
+
+    def test_built_jump_table(self):
+        with BINDatabase(self.path) as database:
+            self.assertIsInstance(database._ipv4_index, bytearray)
+            self.assertIsInstance(database._ipv6_index, bytearray)
+            self.assertRowsMatch(database)
+
+    def test_built_jump_table_matches_file_index(self):
+        with BINDatabase(self.path) as database, BINDatabase(self.indexed_path) as indexed_database:
+            for index, indexed_base in [(database._ipv4_index, indexed_database._ipv4_index_base), (database._ipv6_index, indexed_database._ipv6_index_base)]:
+                for prefix in range(0, 65536, 7):
+                    low, high = struct.unpack_from('<II', index, prefix * 8)
+                    file_low, file_high = struct.unpack_from('<II', indexed_database._mm, indexed_base + prefix * 8)
+                    self.assertLessEqual(low, file_low, msg=prefix)
+                    self.assertGreaterEqual(high, file_high, msg=prefix)
+
+    def test_without_index(self):
+        with BINDatabase(self.indexed_path, use_index=False) as database:
+            self.assertIsNone(database._ipv4_index)
+            self.assertRowsMatch(database)
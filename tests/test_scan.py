@@ -0,0 +1,145 @@
+from unittest.mock import patch
+from ip2location_toolkit.cli import update
+from ip2location_toolkit.downloader.metadata import hash_file, read_metadata, write_metadata
+from ip2location_toolkit.downloader.scan import find_databases, get_file_db_code, print_report, read_file_header, scan_databases, update_fleet
+from ip2location_toolkit.downloader.update import get_db_version
+from ip2location_toolkit.reader.generator import generate_database
+import datetime, io, json, os, sys
+
+from .utils import SilentTestCase, VALID_TOKEN, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCAN_DIR = os.path.join(TESTS_DIR, '__scan__')
+OLD_VERSION = '20.1.1'
+NEW_VERSION = '{}.{}.1'.format(datetime.date.today().year - 2000, datetime.date.today().month)
+REMOTE_METADATA = {'content_length': 1000, 'etag': '"v2"', 'last_modified': 'Mon, 01 Jan 2024 00:00:00 GMT', 'accept_ranges': True}
+
+
+def fake_download(downloads):
+    def download_extract_db(db_code, token, output_path=None, connections=1, raise_errors=False, **kwargs):
+        downloads.append(db_code)
+        path = generate_database(db_code, os.path.join(output_path, db_code + '.BIN'), rows=50, version=NEW_VERSION)
+        write_metadata(path, dict(REMOTE_METADATA, db_code=db_code, sha256=hash_file(path).hexdigest()))
+        return path
+    return download_extract_db
+
+
+class TestScan(SilentTestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(SCAN_DIR, 'a', 'nested'), exist_ok=True)
+        os.makedirs(os.path.join(SCAN_DIR, 'b', '.hidden'), exist_ok=True)
+
+    def tearDown(self):
+        super().tearDown()
+        recursive_remove_dir(SCAN_DIR)
+
+    def database(self, db_code, *path, version=OLD_VERSION, product_code=None):
+        path = generate_database(db_code, os.path.join(SCAN_DIR, *path), rows=50, version=version)
+        if product_code is not None:
+            # Files released before 2021 do not record their product.
+            with open(path, 'r+b') as file:
+                file.seek(29)
+                file.write(bytes([product_code]))
+        return path
+
+    def test_find_databases(self):
+        paths = [
+            self.database('DB1LITEBIN', 'a', 'DB1LITEBIN.BIN'),
+            self.database('DB1LITEBIN', 'a', 'nested', 'db1.bin'),
+            self.database('DB1LITEBIN', 'b', 'DB1LITEBIN.BIN'),
+        ]
+        self.database('DB1LITEBIN', 'b', '.hidden', 'DB1LITEBIN.BIN')
+        self.database('DB1LITECSV', 'b', 'DB1LITECSV.CSV')
+        self.assertEqual(find_databases([os.path.join(SCAN_DIR, 'a'), os.path.join(SCAN_DIR, 'b'), paths[0]]), sorted(paths))
+
+    def test_get_file_db_code(self):
+        path = self.database('PX2LITEBINIPV6', 'a', 'proxy.BIN')
+        self.assertEqual(get_file_db_code(path, read_file_header(path)), 'PX2LITEBINIPV6')
+        write_metadata(path, {'db_code': 'PX2LITEBIN'})
+        self.assertEqual(get_file_db_code(path, read_file_header(path)), 'PX2LITEBIN', msg="The code recorded at download should be used first.")
+
+        old_path = self.database('DB11LITEBINIPV6', 'a', 'IP2LOCATION-LITE-DB11.IPV6.BIN', product_code=0)
+        self.assertEqual(get_file_db_code(old_path, read_file_header(old_path)), 'DB11LITEBINIPV6')
+        unknown_path = self.database('DB11LITEBINIPV6', 'a', 'geo.BIN', product_code=0)
+        self.assertIsNone(get_file_db_code(unknown_path, read_file_header(unknown_path)))
+
+    def test_scan_databases(self):
+        self.database('DB1LITEBIN', 'a', 'DB1LITEBIN.BIN')
+        self.database('DB3LITEBIN', 'a', 'DB3LITEBIN.BIN', version=NEW_VERSION)
+        with open(os.path.join(SCAN_DIR, 'a', 'broken.BIN'), 'wb') as file:
+            file.write(b'\x00' * 10)
+        results = {os.path.basename(result['path']): result for result in scan_databases([SCAN_DIR])}
+        self.assertIsNone(results['DB1LITEBIN.BIN']['status'])
+        self.assertEqual(results['DB1LITEBIN.BIN']['version'], OLD_VERSION)
+        self.assertEqual(results['DB3LITEBIN.BIN']['status'], 'up_to_date')
+        self.assertEqual(results['broken.BIN']['status'], 'unknown')
+        self.assertIsNotNone(results['broken.BIN']['error'])
+
+    def test_update_fleet(self):
+        outdated = [
+            self.database('DB1LITEBIN', 'a', 'DB1LITEBIN.BIN'),
+            self.database('DB1LITEBIN', 'a', 'nested', 'DB1LITEBIN.BIN'),
+            self.database('DB1LITEBIN', 'b', 'DB1LITEBIN.BIN'),
+            self.database('PX2LITEBIN', 'b', 'PX2LITEBIN.BIN'),
+        ]
+        current = self.database('DB11LITEBIN', 'b', 'DB11LITEBIN.BIN', version=NEW_VERSION)
+        downloads = []
+        with patch('ip2location_toolkit.downloader.download.download_extract_db', side_effect=fake_download(downloads)):
+            results = update_fleet([os.path.join(SCAN_DIR, 'a'), os.path.join(SCAN_DIR, 'b')], VALID_TOKEN, check_remote=False)
+        self.assertEqual(downloads, ['DB1LITEBIN', 'PX2LITEBIN'], msg="Each database code should be downloaded once.")
+        statuses = {result['path']: result['status'] for result in results}
+        self.assertEqual(statuses, dict([(path, 'updated') for path in outdated] + [(current, 'up_to_date')]))
+        for path in outdated:
+            self.assertEqual(get_db_version(path), NEW_VERSION)
+            self.assertEqual(next(result['sha256'] for result in results if result['path'] == path), hash_file(path).hexdigest())
+            self.assertEqual(read_metadata(path)['db_code'], os.path.basename(path)[:-4])
+        self.assertEqual([name for name in os.listdir(os.path.join(SCAN_DIR, 'b')) if name.startswith('.')], ['.hidden'], msg="The temporary directories should be removed.")
+
+        output = io.StringIO()
+        print_report(results, output)
+        self.assertEqual(json.loads(output.getvalue()), results)
+
+    def test_remote_unchanged(self):
+        path = self.database('DB1LITEBIN', 'a', 'DB1LITEBIN.BIN')
+        write_metadata(path, dict(REMOTE_METADATA, db_code='DB1LITEBIN'))
+        changed = self.database('DB1LITEBIN', 'b', 'DB1LITEBIN.BIN')
+        downloads = []
+        with patch('ip2location_toolkit.downloader.download.probe_remote_file', return_value=REMOTE_METADATA) as mock_probe, \
+                patch('ip2location_toolkit.downloader.download.download_extract_db', side_effect=fake_download(downloads)):
+            results = update_fleet([SCAN_DIR], VALID_TOKEN)
+        self.assertEqual(mock_probe.call_count, 1)
+        self.assertEqual(downloads, ['DB1LITEBIN'])
+        self.assertEqual({result['path']: result['status'] for result in results}, {path: 'unchanged', changed: 'updated'})
+        self.assertEqual(get_db_version(path), OLD_VERSION)
+
+    def test_failed_download(self):
+        paths = [self.database('DB1LITEBIN', 'a', 'DB1LITEBIN.BIN'), self.database('DB1LITEBIN', 'b', 'DB1LITEBIN.BIN')]
+        with patch('ip2location_toolkit.downloader.download.download_extract_db', side_effect=ValueError('Download failed')):
+            results = update_fleet([SCAN_DIR], VALID_TOKEN, check_remote=False)
+        self.assertEqual([(result['status'], result['error']) for result in results], [('error', 'Download failed')] * 2)
+        for path in paths:
+            self.assertEqual(get_db_version(path), OLD_VERSION)
+
+    def test_token_not_asked_when_up_to_date(self):
+        self.database('DB1LITEBIN', 'a', 'DB1LITEBIN.BIN', version=NEW_VERSION)
+        prompts = []
+        update_fleet([SCAN_DIR], lambda: prompts.append(1) or VALID_TOKEN)
+        self.assertEqual(prompts, [], msg="The token should not be asked for when every database is up to date.")
+
+    def test_update_command(self):
+        self.assertIsNone(update([]))
+        self.database('DB1LITEBIN', 'a', 'DB1LITEBIN.BIN', version=NEW_VERSION)
+        report = os.path.join(SCAN_DIR, 'report.json')
+        results = update([os.path.join(SCAN_DIR, 'a')], VALID_TOKEN, report=report)
+        with open(report) as file:
+            self.assertEqual(json.load(file), results)
+
+    def test_update_command_report_on_stdout(self):
+        self.database('DB1LITEBIN', 'a', 'DB1LITEBIN.BIN', version=NEW_VERSION)
+        sys.stdout = io.StringIO()
+        stderr = io.StringIO()
+        with patch('sys.stderr', stderr):
+            results = update([os.path.join(SCAN_DIR, 'a')], VALID_TOKEN)
+        self.assertEqual(json.loads(sys.stdout.getvalue()), results, msg="The standard output should only hold the JSON report.")
+        self.assertIn('Scanning', stderr.getvalue())
@@ -0,0 +1,181 @@
+from unittest.mock import patch
+from ip2location_toolkit.cli import queue_add, queue_run
+from ip2location_toolkit.downloader.cache import CACHE_DIR_ENV
+from ip2location_toolkit.downloader.scheduler import QUEUE_FILE_ENV, JobQueue, get_backoff, get_default_queue_path, get_token_key
+from ip2location_toolkit.exceptions import DataBaseNotFound, DownloadLimitExceeded
+import json, os
+
+from .utils import VALID_TOKEN, SilentTestCase, random_token, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+QUEUE_DIR = os.path.join(TESTS_DIR, '__scheduler__')
+QUEUE_FILE = os.path.join(QUEUE_DIR, 'queue.json')
+DAY = 24 * 60 * 60
+
+
+class FakeClock:
+    """
+    A clock the scheduler reads the time from and sleeps with, without waiting.
+    """
+    def __init__(self, now=1700000000.0):
+        self.now = now
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestBackoff(SilentTestCase):
+    def test_get_backoff(self):
+        for failures, backoff in ((1, 60), (2, 120), (4, 480), (100, 6 * 60 * 60)):
+            for _ in range(20):
+                self.assertTrue(backoff / 2 <= get_backoff(failures) <= backoff, msg="The delay should be between half and all of the backoff.")
+        self.assertNotEqual(len({get_backoff(3) for _ in range(20)}), 1, msg="The delay should be jittered.")
+
+    def test_default_queue_path(self):
+        with patch.dict(os.environ, {QUEUE_FILE_ENV: '', CACHE_DIR_ENV: QUEUE_DIR}):
+            self.assertEqual(get_default_queue_path(), QUEUE_FILE)
+        with patch.dict(os.environ, {QUEUE_FILE_ENV: '/var/lib/queue.json'}):
+            self.assertEqual(JobQueue().path, '/var/lib/queue.json')
+
+
+class TestJobQueue(SilentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.clock = FakeClock()
+        self.clock_patch = patch('ip2location_toolkit.downloader.scheduler.time', self.clock)
+        self.clock_patch.start()
+        self.download_patch = patch('ip2location_toolkit.downloader.scheduler.download_extract_db', side_effect=self.download)
+        self.download_mock = self.download_patch.start()
+        self.errors = {}
+        self.queue = JobQueue(QUEUE_FILE)
+
+    def tearDown(self):
+        self.download_patch.stop()
+        self.clock_patch.stop()
+        super().tearDown()
+        if os.path.exists(QUEUE_DIR):
+            recursive_remove_dir(QUEUE_DIR)
+
+    def download(self, db_code, token, output_path=None, **kwargs):
+        errors = self.errors.get(db_code)
+        if errors:
+            raise errors.pop(0)
+        return os.path.join(output_path or '.', db_code + '.BIN')
+
+    def downloaded(self):
+        return [call.args[0] for call in self.download_mock.call_args_list]
+
+    def test_add(self):
+        job = self.queue.add('DB1LITEBIN', VALID_TOKEN, 'output')
+        self.assertEqual(self.queue.add('DB1LITEBIN', VALID_TOKEN, 'output'), job, msg="A waiting download should not be added again.")
+        self.queue.add('DB1LITEBIN', VALID_TOKEN, 'other')
+        self.assertEqual([(job['code'], job['output'], job['status']) for job in self.queue.jobs()], [('DB1LITEBIN', os.path.abspath('output'), 'pending'), ('DB1LITEBIN', os.path.abspath('other'), 'pending')], msg="The output paths should not depend on the directory of the runner.")
+        with open(QUEUE_FILE, 'r') as file:
+            self.assertNotIn(VALID_TOKEN, file.read(), msg="The queue file should not hold the tokens.")
+        with self.assertRaises(ValueError):
+            self.queue.add('XX1', VALID_TOKEN)
+
+    def test_run(self):
+        self.queue.add('DB1LITEBIN', VALID_TOKEN, 'output')
+        self.queue.add('DB3LITEBIN', VALID_TOKEN)
+        jobs = self.queue.run(VALID_TOKEN)
+        self.assertEqual([(job['code'], job['status'], job['path']) for job in jobs], [('DB1LITEBIN', 'done', os.path.abspath(os.path.join('output', 'DB1LITEBIN.BIN'))), ('DB3LITEBIN', 'done', os.path.join(os.getcwd(), 'DB3LITEBIN.BIN'))])
+        self.assertEqual(self.queue.run(VALID_TOKEN), [])
+        self.assertEqual(len(self.queue.clear()), 2)
+        self.assertEqual(self.queue.jobs(), [])
+
+    def test_other_token(self):
+        other_token = random_token(64)
+        self.queue.add('DB1LITEBIN', other_token)
+        self.queue.add('DB3LITEBIN', VALID_TOKEN)
+        self.assertEqual([job['code'] for job in self.queue.run(VALID_TOKEN)], ['DB3LITEBIN'])
+        self.assertEqual(self.queue.jobs('pending')[0]['token_key'], get_token_key(other_token))
+
+    def test_code_quota(self):
+        self.queue.code_quota = 2
+        for output in ('a', 'b', 'c'):
+            self.queue.add('DB1LITEBIN', VALID_TOKEN, output)
+        self.queue.add('DB3LITEBIN', VALID_TOKEN)
+        start = self.clock.now
+        jobs = self.queue.run(VALID_TOKEN, wait=False)
+        self.assertEqual([(job['code'], job['output']) for job in jobs], [('DB1LITEBIN', os.path.abspath('a')), ('DB1LITEBIN', os.path.abspath('b')), ('DB3LITEBIN', os.getcwd())], msg="The quota of a code should not hold back the other codes.")
+        self.assertEqual(len(self.queue.jobs('pending')), 1)
+
+        jobs = self.queue.run(VALID_TOKEN, poll_interval=DAY * 2)
+        self.assertEqual([job['output'] for job in jobs], [os.path.abspath('c')])
+        self.assertEqual(self.clock.now, start + DAY, msg="The job should run as soon as the first download leaves the quota window.")
+
+    def test_token_quota(self):
+        self.queue.token_quota = 2
+        for code in ('DB1LITEBIN', 'DB3LITEBIN', 'DB5LITEBIN'):
+            self.queue.add(code, VALID_TOKEN)
+        self.assertEqual(len(self.queue.run(VALID_TOKEN, wait=False)), 2)
+        self.queue.run(VALID_TOKEN, poll_interval=600)
+        self.assertEqual(self.clock.sleeps, [600] * (DAY // 600), msg="The runner should read the queue again at every poll interval.")
+        self.assertEqual(self.downloaded(), ['DB1LITEBIN', 'DB3LITEBIN', 'DB5LITEBIN'])
+
+    def test_limit_backoff(self):
+        self.errors['DB1LITEBIN'] = [DownloadLimitExceeded(), DownloadLimitExceeded()]
+        self.queue.add('DB1LITEBIN', VALID_TOKEN, 'a')
+        self.queue.add('DB1LITEBIN', VALID_TOKEN, 'b')
+        with patch('ip2location_toolkit.downloader.scheduler.random.uniform', side_effect=lambda low, high: high):
+            jobs = self.queue.run(VALID_TOKEN, poll_interval=DAY)
+        self.assertEqual([(os.path.basename(job['output']), job['status']) for job in jobs], [('a', 'pending'), ('a', 'pending'), ('a', 'done'), ('b', 'done')])
+        self.assertEqual(jobs[0]['error'], DownloadLimitExceeded.message)
+        self.assertEqual(self.clock.sleeps, [60, 120], msg="The backoff should double after every limit error.")
+        self.assertEqual(jobs[-1]['attempts'], 1, msg="Limit errors should not count as attempts.")
+        with open(QUEUE_FILE, 'r') as file:
+            self.assertEqual(json.load(file)['backoff'], {}, msg="A successful download should reset the backoff.")
+
+    def test_limit_holds_back_code(self):
+        self.errors['DB1LITEBIN'] = [DownloadLimitExceeded()]
+        self.queue.add('DB1LITEBIN', VALID_TOKEN, 'a')
+        self.queue.add('DB1LITEBIN', VALID_TOKEN, 'b')
+        self.queue.add('DB3LITEBIN', VALID_TOKEN)
+        jobs = self.queue.run(VALID_TOKEN, wait=False)
+        self.assertEqual([(job['code'], job['status']) for job in jobs], [('DB1LITEBIN', 'pending'), ('DB3LITEBIN', 'done')], msg="A limit error should hold back every download of the code.")
+
+    def test_transient_errors(self):
+        self.queue.max_attempts = 3
+        self.errors['DB1LITEBIN'] = [OSError('Connection reset.')] * 3
+        self.errors['DB3LITEBIN'] = [OSError('Connection reset.')]
+        self.errors['DB5LITEBIN'] = [DataBaseNotFound()]
+        for code in ('DB1LITEBIN', 'DB3LITEBIN', 'DB5LITEBIN'):
+            self.queue.add(code, VALID_TOKEN)
+        self.queue.run(VALID_TOKEN)
+        self.assertEqual(self.downloaded().count('DB1LITEBIN'), 3)
+        self.assertEqual(self.downloaded().count('DB5LITEBIN'), 1, msg="A missing database should not be downloaded again.")
+        self.assertEqual({job['code']: (job['status'], job['attempts']) for job in self.queue.jobs()}, {'DB1LITEBIN': ('failed', 3), 'DB3LITEBIN': ('done', 2), 'DB5LITEBIN': ('failed', 1)})
+        self.assertEqual(self.queue.jobs('failed')[1]['error'], DataBaseNotFound.message)
+
+    def test_resume_after_restart(self):
+        job = self.queue.add('DB1LITEBIN', VALID_TOKEN)
+        with open(QUEUE_FILE, 'r') as file:
+            state = json.load(file)
+        state['jobs'][0].update(status='running', attempts=1)
+        state['history'].append({'code': 'DB1LITEBIN', 'token_key': job['token_key'], 'time': self.clock.now})
+        with open(QUEUE_FILE, 'w') as file:
+            json.dump(state, file)
+        jobs = self.queue.run(VALID_TOKEN)
+        self.assertEqual([(job['status'], job['attempts']) for job in jobs], [('done', 2)], msg="A job left running by a stopped runner should run again.")
+
+    def test_single_runner(self):
+        self.queue.add('DB1LITEBIN', VALID_TOKEN)
+        def download(*args, **kwargs):
+            with self.assertRaises(ValueError):
+                JobQueue(QUEUE_FILE).run(VALID_TOKEN)
+            return 'DB1LITEBIN.BIN'
+        self.download_mock.side_effect = download
+        self.assertEqual(len(self.queue.run(VALID_TOKEN)), 1)
+
+    def test_queue_commands(self):
+        self.assertEqual(len(queue_add(['DB1LITEBIN', 'DB3LITEBIN'], VALID_TOKEN, queue_file=QUEUE_FILE)), 2)
+        self.assertIsNone(queue_add(['XX1'], VALID_TOKEN, queue_file=QUEUE_FILE))
+        self.errors['DB3LITEBIN'] = [DataBaseNotFound()]
+        self.assertIsNone(queue_run(VALID_TOKEN, QUEUE_FILE), msg="The command should fail when a job fails.")
+        self.assertEqual([job['status'] for job in JobQueue(QUEUE_FILE).jobs()], ['done', 'failed'])
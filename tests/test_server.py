@@ -0,0 +1,178 @@
+from unittest import IsolatedAsyncioTestCase, TestCase, skipUnless
+from ip2location_toolkit.reader.database import BINDatabase
+from ip2location_toolkit.server import LatencyHistogram, LookupBatcher, LookupServer, parse_bulk_body
+import asyncio, json, os, socket, tempfile
+
+from .test_reader import IPV4_ROWS, IPV6_ROWS
+from .utils import build_bin_file, recursive_remove_dir
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(TESTS_DIR, '__server__')
+
+
+def setUpModule():
+    os.makedirs(SERVER_DIR, exist_ok=True)
+    build_bin_file(os.path.join(SERVER_DIR, 'DB11LITEBINIPV6.BIN'), 11, IPV4_ROWS, IPV6_ROWS)
+
+def tearDownModule():
+    recursive_remove_dir(SERVER_DIR)
+
+
+async def http_request(port, method, target, body=b''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write('{} {} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'.format(method, target, len(body)).encode() + body)
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+class TestLatencyHistogram(TestCase):
+    def test_observe(self):
+        histogram = LatencyHistogram((0.001, 0.01))
+        for latency in [0.0005, 0.0005, 0.005, 0.5]:
+            histogram.observe(latency)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 4)
+        self.assertEqual(snapshot['buckets'], [[0.001, 2], [0.01, 1], ['+Inf', 1]])
+        self.assertEqual(snapshot['p50'], 0.001)
+        self.assertEqual(snapshot['p90'], '+Inf')
+        self.assertAlmostEqual(snapshot['sum'], 0.506)
+
+    def test_empty(self):
+        self.assertIsNone(LatencyHistogram().snapshot()['p99'])
+
+
+class TestParseBulkBody(TestCase):
+    def test_formats(self):
+        self.assertEqual(parse_bulk_body(b'["8.8.8.8", "::1"]'), ['8.8.8.8', '::1'])
+        self.assertEqual(parse_bulk_body(b'8.8.8.8\r\n\r\n::1\n'), ['8.8.8.8', '::1'])
+
+    def test_invalid(self):
+        for body in [b'[8, 8]', b'[', b'\xff']:
+            with self.assertRaises(ValueError, msg=body):
+                parse_bulk_body(body)
+
+
+class TestLookupBatcher(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.database = BINDatabase(os.path.join(SERVER_DIR, 'DB11LITEBINIPV6.BIN'))
+        self.batcher = LookupBatcher(self.database, max_batch=3, max_delay=0.05)
+
+    async def asyncTearDown(self):
+        self.batcher.close()
+        self.database.close()
+
+    def test_resolve(self):
+        results = self.batcher.resolve(['8.8.8.8', '2001:4860::1', 'invalid', '8.8.4.4', '::ffff:8.8.8.8'])
+        self.assertEqual(results[0], {'ip': '8.8.8.8', 'record': self.database.lookup('8.8.8.8')})
+        self.assertEqual(results[1]['record']['city'], 'Mountain View')
+        self.assertIn('error', results[2])
+        self.assertEqual(results[3]['record']['country_short'], 'AU')
+        self.assertEqual(results[4]['record'], results[0]['record'])
+
+    async def test_concurrent_lookups_are_batched(self):
+        results = await asyncio.gather(*(self.batcher.lookup(ip) for ip in ['8.8.8.8', '1.1.1.1', '8.8.4.4', '9.9.9.9']))
+        self.assertEqual([result['record']['country_short'] for result in results], ['US', 'AU', 'AU', '-'])
+        self.assertEqual(self.batcher.batches, 2, msg="A batch should be resolved as soon as it is full, and the rest after the delay.")
+        self.assertEqual(self.batcher.batched_lookups, 4)
+
+
+    async def test_resolve_all_yields(self):
+        task = asyncio.ensure_future(self.batcher.resolve_all(['8.8.8.8', '1.1.1.1', 'invalid'] * 3 + ['::1']))
+        await asyncio.sleep(0)
+        self.assertFalse(task.done(), msg="Other tasks should run between the batches of a bulk request.")
+        self.assertEqual(self.batcher.batches, 1)
+        results = await task
+        self.assertEqual(self.batcher.batches, 4)
+        self.assertEqual(results, self.batcher.resolve(['8.8.8.8', '1.1.1.1', 'invalid'] * 3 + ['::1']))
+
+
+class TestLookupServer(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.unix_path = os.path.join(tempfile.mkdtemp(), 'lookup.sock') if hasattr(socket, 'AF_UNIX') else None
+        self.server = LookupServer(os.path.join(SERVER_DIR, 'DB11LITEBINIPV6.BIN'), port=0, unix_path=self.unix_path)
+        await self.server.start()
+        self.port = self.server.http_port
+
+    async def asyncTearDown(self):
+        await self.server.close()
+        if self.unix_path:
+            os.rmdir(os.path.dirname(self.unix_path))
+
+    async def test_lookup(self):
+        status, result = await http_request(self.port, 'GET', '/lookup?ip=8.8.8.8')
+        self.assertEqual(status, 200)
+        self.assertEqual(result['record']['city'], 'Mountain View')
+
+    async def test_invalid_lookup(self):
+        status, result = await http_request(self.port, 'GET', '/lookup?ip=8.8.8')
+        self.assertEqual(status, 400)
+        self.assertIn('error', result)
+
+    async def test_bulk(self):
+        status, results = await http_request(self.port, 'POST', '/bulk', b'8.8.8.8\n2a00:1450::1\nexample.com\n')
+        self.assertEqual(status, 200)
+        self.assertEqual([result.get('record', {}).get('country_short') for result in results], ['US', 'DE', None])
+
+    async def test_large_bulk(self):
+        ips = ['8.8.8.8', '1.1.1.1', 'invalid'] * 1000
+        status, results = await http_request(self.port, 'POST', '/bulk', json.dumps(ips).encode())
+        self.assertEqual(status, 200)
+        self.assertEqual([result['ip'] for result in results], ips)
+        self.assertEqual(results[-2]['record']['country_short'], 'AU')
+        self.assertEqual(self.server.batcher.batches, 3, msg="A bulk request should be resolved in batches of max_batch addresses.")
+
+    async def test_invalid_content_length(self):
+        for length in ['abc', '-5', '1.5']:
+            reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+            writer.write('POST /bulk HTTP/1.1\r\nHost: localhost\r\nContent-Length: {}\r\n\r\n8.8.8.8'.format(length).encode())
+            response = await reader.read()
+            writer.close()
+            await writer.wait_closed()
+            head, _, body = response.partition(b'\r\n\r\n')
+            self.assertEqual(int(head.split()[1]), 400, msg="Content-Length {} should be rejected.".format(length))
+            self.assertIn('error', json.loads(body))
+        self.assertEqual((await http_request(self.port, 'GET', '/health'))[0], 200, msg="The server should keep serving after an invalid request.")
+
+    async def test_pipelined_requests(self):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(b''.join('GET /lookup?ip={} HTTP/1.1\r\nHost: localhost\r\n\r\n'.format(ip).encode() for ip in ['8.8.8.8', '1.1.1.1', '2a00:1450::1']))
+        cities = []
+        for _ in range(3):
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = int([line for line in head.split(b'\r\n') if line.lower().startswith(b'content-length')][0].split(b':')[1])
+            cities.append(json.loads(await reader.readexactly(length))['record']['city'])
+        writer.close()
+        await writer.wait_closed()
+        self.assertEqual(cities, ['Mountain View', 'Brisbane', 'Frankfurt am Main'])
+
+    async def test_stats(self):
+        await http_request(self.port, 'GET', '/lookup?ip=8.8.8.8')
+        await http_request(self.port, 'POST', '/bulk', b'["8.8.8.8", "1.1.1.1"]')
+        status, stats = await http_request(self.port, 'GET', '/stats')
+        self.assertEqual(status, 200)
+        self.assertEqual(stats['latency']['lookup']['count'], 1)
+        self.assertEqual(stats['latency']['bulk']['count'], 1)
+        self.assertEqual(stats['batched_lookups'], 3)
+        self.assertEqual(stats['version'], '23.9.1')
+
+    async def test_not_found(self):
+        self.assertEqual((await http_request(self.port, 'GET', '/unknown'))[0], 404)
+        self.assertEqual((await http_request(self.port, 'POST', '/lookup'))[0], 405)
+        self.assertEqual(await http_request(self.port, 'GET', '/health'), (200, {'status': 'ok'}))
+
+    @skipUnless(hasattr(socket, 'AF_UNIX'), 'Unix sockets are not supported')
+    async def test_unix_socket(self):
+        reader, writer = await asyncio.open_unix_connection(self.unix_path)
+        writer.write(b'8.8.8.8\n1.1.1.1\ninvalid\n2a00:1450::1\n')
+        await writer.drain()
+        results = [json.loads(await reader.readline()) for _ in range(4)]
+        writer.close()
+        await writer.wait_closed()
+        self.assertEqual([result['ip'] for result in results], ['8.8.8.8', '1.1.1.1', 'invalid', '2a00:1450::1'])
+        self.assertEqual(results[0]['record']['country_short'], 'US')
+        self.assertIn('error', results[2])
+        self.assertEqual(results[3]['record']['country_short'], 'DE')
+        self.assertEqual(self.server.latency['unix'].count, 4)
@@ -0,0 +1,48 @@
+from unittest import TestCase
+import os, subprocess, sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules only the commands need (the downloads, the lookups and the colored output).
+HEAVY_MODULES = ('requests', 'urllib3', 'tqdm', 'numpy', 'asyncio', 'concurrent.futures', 'colorama', 'csv')
+# The cumulative import time of the package, in microseconds. It was about 250ms when the CLI imported every command.
+IMPORT_TIME_BUDGET = 150000
+
+
+def import_times(*args):
+    """
+    Run a new interpreter with ``-X importtime`` and parse the import times it reports.
+
+    :return: A dictionary mapping each imported module to its cumulative import time in microseconds.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + list(args), cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestStartup(TestCase):
+    def assertLightImport(self, *args):
+        times = import_times(*args)
+        self.assertIn('ip2location_toolkit', times)
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, times, msg="{} should not be imported by {}.".format(module, ' '.join(args)))
+
+    def test_help(self):
+        self.assertLightImport('-m', 'ip2location_toolkit', '--help')
+        self.assertLightImport('-m', 'ip2location_toolkit', 'generate', '--help')
+
+    def test_header_check(self):
+        self.assertLightImport('-c', 'from ip2location_toolkit.downloader.update import get_db_version')
+        self.assertLightImport('-c', 'from ip2location_toolkit.reader.database import BINDatabase')
+
+    def test_command_imports(self):
+        self.assertIn('requests', import_times('-c', 'from ip2location_toolkit.downloader.download import download_file'))
+
+    def test_import_time_budget(self):
+        best = min(import_times('-c', 'import ip2location_toolkit.cli')['ip2location_toolkit'] for _ in range(3))
+        self.assertLess(best, IMPORT_TIME_BUDGET, msg="Importing the CLI took {:.1f}ms.".format(best / 1000))
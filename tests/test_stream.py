@@ -0,0 +1,133 @@
+from unittest import TestCase
+from unittest.mock import patch
+from zipfile import BadZipFile, ZipFile, ZIP_DEFLATED, ZIP_STORED
+from ip2location_toolkit.downloader.download import download_extract_db
+from ip2location_toolkit.downloader.metadata import read_metadata
+from ip2location_toolkit.downloader.stream import ChunkReader, extract_stream
+import hashlib, io, os, random
+
+from .utils import VALID_TOKEN, SilentTestCase, SilentTqdm, LocalHTTPServer, recursive_remove_dir
+
+DATABASE = random.Random(1).randbytes(200000) + b'\x00' * 200000
+
+
+class UnseekableBuffer(io.RawIOBase):
+    """
+    A write-only buffer without seek support, so that `ZipFile` writes data descriptors after each member.
+    """
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+def build_zip(compression=ZIP_DEFLATED, streamed=False, name='IP2LOCATION-LITE-DB1.BIN', data=DATABASE):
+    buffer = UnseekableBuffer() if streamed else io.BytesIO()
+    with ZipFile(buffer, 'w', compression=compression) as zip_file:
+        zip_file.writestr('README_LITE.TXT', b'Read me.' * 100)
+        zip_file.writestr(name, data)
+        zip_file.writestr('LICENSE_LITE.TXT', b'License.' * 100)
+    return (buffer.buffer if streamed else buffer).getvalue()
+
+def chunked(data, size=4099):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+class TestChunkReader(TestCase):
+    def test_read_across_chunks(self):
+        reader = ChunkReader([b'ab', b'cde', b'f'])
+        self.assertEqual(reader.read(4), b'abcd')
+        reader.unread(b'xy')
+        self.assertEqual(reader.read(10), b'xyef')
+        self.assertEqual(reader.read(1), b'')
+
+    def test_read_exact_at_end(self):
+        reader = ChunkReader([b'abc'])
+        with self.assertRaises(BadZipFile):
+            reader.read_exact(4)
+
+
+class TestExtractStream(SilentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.output_dir = 'stream_output'
+        os.mkdir(self.output_dir)
+
+    def tearDown(self):
+        recursive_remove_dir(self.output_dir)
+        super().tearDown()
+
+    def read(self, path):
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def test_deflated(self):
+        path = extract_stream(chunked(build_zip()), self.output_dir, 'DB1LITEBIN')
+        self.assertEqual(path, os.path.join(self.output_dir, 'DB1LITEBIN.BIN'))
+        self.assertEqual(self.read(path), DATABASE)
+        self.assertEqual(os.listdir(self.output_dir), ['DB1LITEBIN.BIN'], msg="No temporary file should be left behind.")
+
+    def test_stored(self):
+        path = extract_stream(chunked(build_zip(ZIP_STORED)), self.output_dir, 'DB1LITEBIN')
+        self.assertEqual(self.read(path), DATABASE)
+
+    def test_data_descriptor(self):
+        path = extract_stream(chunked(build_zip(streamed=True), 1), self.output_dir, 'DB1LITEBIN')
+        self.assertEqual(self.read(path), DATABASE)
+
+    def test_csv_member(self):
+        path = extract_stream(chunked(build_zip(name='IP2LOCATION-LITE-DB1.CSV', data=b'"0","1","-","-"\n')), self.output_dir, 'DB1LITECSV')
+        self.assertEqual(path, os.path.join(self.output_dir, 'DB1LITECSV.CSV'))
+
+    def test_bad_crc(self):
+        archive = bytearray(build_zip(ZIP_STORED))
+        archive[archive.index(DATABASE[:64]) + 100] ^= 0xFF
+        with self.assertRaises(BadZipFile):
+            extract_stream(chunked(bytes(archive)), self.output_dir, 'DB1LITEBIN')
+        self.assertEqual(os.listdir(self.output_dir), [], msg="A corrupted database should not be extracted.")
+
+    def test_truncated_archive(self):
+        archive = build_zip()
+        with self.assertRaises(BadZipFile):
+            extract_stream(chunked(archive[:len(archive) // 2]), self.output_dir, 'DB1LITEBIN')
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+    def test_no_database_member(self):
+        with self.assertRaises(BadZipFile):
+            extract_stream(chunked(build_zip(name='NOTES.TXT')), self.output_dir, 'DB1LITEBIN')
+
+
+@patch('ip2location_toolkit.downloader.download.tqdm', SilentTqdm)
+class TestDownloadStreamExtractDB(SilentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.output_dir = 'stream_output'
+        os.mkdir(self.output_dir)
+
+    def tearDown(self):
+        recursive_remove_dir(self.output_dir)
+        super().tearDown()
+
+    def test_download_extract_db_stream(self):
+        archive = build_zip()
+        with LocalHTTPServer(archive) as server:
+            with patch('ip2location_toolkit.downloader.download.get_download_url', return_value=server.url):
+                path = download_extract_db('DB1LITEBIN', VALID_TOKEN, self.output_dir, stream=True)
+        self.assertEqual(path, os.path.join(self.output_dir, 'DB1LITEBIN.BIN'))
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), DATABASE)
+        self.assertFalse(os.path.exists(os.path.join('__tmp__', 'DB1LITEBIN.zip')), msg="The archive should not be written to disk.")
+        metadata = read_metadata(path)
+        self.assertEqual(metadata['sha256'], hashlib.sha256(DATABASE).hexdigest())
+        self.assertEqual(metadata['archive_sha256'], hashlib.sha256(archive).hexdigest())
+
+    def test_download_failed(self):
+        with LocalHTTPServer(build_zip(), fail_after=1000) as server:
+            with patch('ip2location_toolkit.downloader.download.get_download_url', return_value=server.url):
+                path = download_extract_db('DB1LITEBIN', VALID_TOKEN, self.output_dir, stream=True)
+        self.assertIsNone(path)
+        self.assertEqual(os.listdir(self.output_dir), [])
@@ -1,9 +1,10 @@
 from pathlib import Path
 from unittest import TestCase
 from unittest.mock import patch
-from .utils import SilentTestCase, VALID_TOKEN
-from ip2location_toolkit.downloader.update import version_to_date, get_db_version, new_version_available, get_db_header, update_db
-import datetime, os
+from .utils import SilentTestCase, VALID_TOKEN, LocalHTTPServer, recursive_remove_dir
+from ip2location_toolkit.downloader.update import version_to_date, get_db_version, new_version_available, get_db_header, update_db, remote_version_changed, install_db, rollback_db
+from ip2location_toolkit.downloader.metadata import read_metadata, write_metadata
+import datetime, os, shutil
 
 TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -138,11 +139,13 @@ class TestUpdateDB(SilentTestCase):
         result = update_db(filepath, "DB11LITEBIN", VALID_TOKEN, False)
         self.assertIsNone(result, msg="update_db() should return None if the database is up to date and force is False")
 
-    @patch('ip2location_toolkit.downloader.update.download_extract_db')
+    @patch('ip2location_toolkit.downloader.update.install_db', side_effect=lambda new_filepath, filepath, keep_previous: filepath)
+    @patch('ip2location_toolkit.downloader.update.get_update_tmp_dir', return_value='test/path/.db.bin.update')
+    @patch('ip2location_toolkit.downloader.download.download_extract_db')
     @patch('ip2location_toolkit.downloader.update.new_version_available', return_value=True)
     @patch('ip2location_toolkit.downloader.update.path_validator')
     @patch('ip2location_toolkit.downloader.update.os', wraps=os)
-    def test_upto_date_force_true(self, mock_os, mock_path_validator, mock_new_version_available, mock_download_extract_db):
+    def test_upto_date_force_true(self, mock_os, mock_path_validator, mock_new_version_available, mock_download_extract_db, mock_get_update_tmp_dir, mock_install_db):
         filepath = "test/path/db.bin"
         mock_path_validator.return_value = filepath
         mock_os.path.isfile.return_value = True
@@ -150,7 +153,7 @@ class TestUpdateDB(SilentTestCase):
         result = update_db(filepath, "DB11LITEBIN", VALID_TOKEN, False)
         self.assertEqual(result, filepath, msg="update_db() should return None if the database is up to date and force is False")
 
-    @patch('ip2location_toolkit.downloader.update.download_extract_db', return_value=None)
+    @patch('ip2location_toolkit.downloader.download.download_extract_db', return_value=None)
     @patch('ip2location_toolkit.downloader.update.new_version_available', return_value=True)
     @patch('ip2location_toolkit.downloader.update.path_validator')
     @patch('ip2location_toolkit.downloader.update.os', wraps=os)
@@ -162,14 +165,157 @@ class TestUpdateDB(SilentTestCase):
         self.assertIsNone(result, msg="update_db() should return None if the download failed")
 
 
-    @patch('ip2location_toolkit.downloader.update.download_extract_db')
+    @patch('ip2location_toolkit.downloader.update.install_db', side_effect=lambda new_filepath, filepath, keep_previous: filepath)
+    @patch('ip2location_toolkit.downloader.update.get_update_tmp_dir', return_value='test/path/.db.bin.update')
+    @patch('ip2location_toolkit.downloader.download.download_extract_db')
     @patch('ip2location_toolkit.downloader.update.new_version_available', return_value=True)
     @patch('ip2location_toolkit.downloader.update.path_validator')
     @patch('ip2location_toolkit.downloader.update.os', wraps=os)
-    def test_successful_download(self,  mock_os, mock_path_validator, mock_new_version_available, mock_download_extract_db):
+    def test_successful_download(self,  mock_os, mock_path_validator, mock_new_version_available, mock_download_extract_db, mock_get_update_tmp_dir, mock_install_db):
         filepath = "test/path/db.bin"
         mock_path_validator.return_value = filepath
         mock_os.path.isfile.return_value = True
-        mock_download_extract_db.return_value = 'test/path/new_db.bin'
+        mock_download_extract_db.return_value = 'test/path/.db.bin.update/new_db.bin'
         result = update_db(filepath, "DB11LITEBIN", VALID_TOKEN, False)
-        self.assertEqual(result, 'test/path/new_db.bin', msg="update_db() should return the filepath if the download is successful")
+        mock_download_extract_db.assert_called_once_with("DB11LITEBIN", VALID_TOKEN, 'test/path/.db.bin.update')
+        mock_install_db.assert_called_once_with('test/path/.db.bin.update/new_db.bin', filepath, False)
+        self.assertEqual(result, filepath, msg="update_db() should return the filepath if the download is successful")
+
+
+class TestRemoteVersionChanged(SilentTestCase):
+    payload = b'PK' + b'\x00' * 200000
+
+    def setUp(self):
+        super().setUp()
+        os.mkdir('update_output')
+        self.path = os.path.join('update_output', 'DB1LITEBIN.BIN')
+        shutil.copy(TESTS_DIR + "/BINS/23-9-1-VALID.BIN", self.path)
+
+    def tearDown(self):
+        recursive_remove_dir('update_output')
+        super().tearDown()
+
+    def record(self, etag='"v1"', content_length=None, db_code='DB1LITEBIN'):
+        write_metadata(self.path, {'db_code': db_code, 'etag': etag, 'last_modified': None, 'content_length': content_length or len(self.payload)})
+
+    def check(self, db_code='DB1LITEBIN', **server_options):
+        with LocalHTTPServer(self.payload, **server_options) as server:
+            with patch('ip2location_toolkit.downloader.download.get_download_url', return_value=server.url):
+                changed = remote_version_changed(self.path, db_code, VALID_TOKEN)
+        self.requests = server.requests
+        return changed
+
+    def test_unchanged(self):
+        self.record()
+        self.assertFalse(self.check())
+        self.assertEqual(self.requests[0]['Range'], 'bytes=0-0', msg="Only the first byte of the remote file should be requested.")
+
+    def test_etag_changed(self):
+        self.record(etag='"v0"')
+        self.assertTrue(self.check())
+
+    def test_size_changed(self):
+        self.record(content_length=10)
+        self.assertTrue(self.check())
+
+    def test_last_modified_without_etag(self):
+        write_metadata(self.path, {'db_code': 'DB1LITEBIN', 'etag': None, 'last_modified': 'Mon, 02 Oct 2023 00:00:00 GMT', 'content_length': len(self.payload)})
+        self.assertFalse(self.check(etag=None))
+
+    def test_without_ranges(self):
+        self.record()
+        self.assertFalse(self.check(accept_ranges=False))
+
+    def test_no_metadata(self):
+        self.assertTrue(self.check())
+        self.assertEqual(self.requests, [], msg="No request should be sent when there is nothing to compare with.")
+
+    def test_other_db_code(self):
+        self.record(db_code='DB3LITEBIN')
+        self.assertTrue(self.check())
+
+    @patch('ip2location_toolkit.downloader.download.download_extract_db')
+    @patch('ip2location_toolkit.downloader.update.new_version_available', return_value=False)
+    def test_forced_update_skipped_when_unchanged(self, mock_new_version_available, mock_download_extract_db):
+        self.record()
+        with LocalHTTPServer(self.payload) as server:
+            with patch('ip2location_toolkit.downloader.download.get_download_url', return_value=server.url):
+                result = update_db(self.path, 'DB1LITEBIN', VALID_TOKEN, force=True)
+        self.assertIsNone(result)
+        mock_download_extract_db.assert_not_called()
+
+
+class TestInstallDB(SilentTestCase):
+    def setUp(self):
+        super().setUp()
+        os.mkdir('install_output')
+        self.path = os.path.join('install_output', 'DB1LITEBIN.BIN')
+        self.new_path = os.path.join('install_output', 'new.BIN')
+        shutil.copy(TESTS_DIR + "/BINS/22-12-1-VALID.BIN", self.path)
+        shutil.copy(TESTS_DIR + "/BINS/23-9-1-VALID.BIN", self.new_path)
+        write_metadata(self.path, {'etag': '"old"'})
+        write_metadata(self.new_path, {'etag': '"new"'})
+
+    def tearDown(self):
+        recursive_remove_dir('install_output')
+        super().tearDown()
+
+    def test_install_db(self):
+        with open(self.path, 'rb') as reader:
+            result = install_db(self.new_path, self.path)
+            self.assertEqual(len(reader.read()), 30, msg="An open reader should keep reading the complete old version.")
+        self.assertEqual(result, self.path)
+        self.assertEqual(get_db_version(self.path), "23.9.1")
+        self.assertEqual(read_metadata(self.path)['etag'], '"new"', msg="The metadata should follow the new version.")
+        self.assertEqual(sorted(os.listdir('install_output')), ['DB1LITEBIN.BIN', 'DB1LITEBIN.BIN.meta.json'])
+
+    def test_invalid_new_version(self):
+        shutil.copy(TESTS_DIR + "/BINS/238-YEAR-INVALID.BIN", self.new_path)
+        with self.assertRaises(ValueError):
+            install_db(self.new_path, self.path)
+        self.assertEqual(get_db_version(self.path), "22.12.1", msg="An invalid version should not replace the database.")
+
+    def test_keep_previous_and_rollback(self):
+        install_db(self.new_path, self.path, keep_previous=True)
+        self.assertEqual(get_db_version(self.path + '.prev'), "22.12.1")
+        rollback_db(self.path)
+        self.assertEqual(get_db_version(self.path), "22.12.1")
+        self.assertEqual(read_metadata(self.path)['etag'], '"old"')
+        self.assertFalse(os.path.exists(self.path + '.prev'))
+
+    def test_rollback_without_previous(self):
+        with self.assertRaises(ValueError):
+            rollback_db(self.path)
+
+
+class TestUpdateDBReplace(SilentTestCase):
+    def setUp(self):
+        super().setUp()
+        os.mkdir('update_output')
+        self.path = os.path.join('update_output', 'GEO.BIN')
+        shutil.copy(TESTS_DIR + "/BINS/22-12-1-VALID.BIN", self.path)
+
+    def tearDown(self):
+        recursive_remove_dir('update_output')
+        super().tearDown()
+
+    def download(self, db_code, token, output_path):
+        new_path = os.path.join(output_path, db_code + '.BIN')
+        shutil.copy(TESTS_DIR + "/BINS/23-9-1-VALID.BIN", new_path)
+        return new_path
+
+    @patch('ip2location_toolkit.downloader.update.new_version_available', return_value=True)
+    def test_update_replaces_file(self, mock_new_version_available):
+        with patch('ip2location_toolkit.downloader.download.download_extract_db', side_effect=self.download) as mock_download_extract_db:
+            result = update_db(self.path, 'DB1LITEBIN', VALID_TOKEN, keep_previous=True)
+        self.assertEqual(result, self.path)
+        self.assertNotEqual(os.path.abspath(mock_download_extract_db.call_args.args[2]), os.path.abspath('update_output'), msg="The new version should not be extracted over the live file.")
+        self.assertEqual(get_db_version(self.path), "23.9.1")
+        self.assertEqual(sorted(os.listdir('update_output')), ['GEO.BIN', 'GEO.BIN.prev'], msg="The temporary directory should be removed.")
+
+    @patch('ip2location_toolkit.downloader.update.new_version_available', return_value=True)
+    @patch('ip2location_toolkit.downloader.download.download_extract_db', return_value=None)
+    def test_failed_update_keeps_file(self, mock_download_extract_db, mock_new_version_available):
+        self.assertIsNone(update_db(self.path, 'DB1LITEBIN', VALID_TOKEN))
+        self.assertEqual(get_db_version(self.path), "22.12.1")
+        self.assertEqual(os.listdir('update_output'), ['GEO.BIN'])
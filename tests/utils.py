@@ -1,7 +1,8 @@
 from functools import partialmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from random import choice
 from unittest import TestCase
-import io, sys
+import io, sys, threading
 from pathlib import Path
 from tqdm import tqdm
 
@@ -63,3 +64,199 @@ class SilentTqdm(tqdm):
     def __init__(self, *args, **kwargs):
         kwargs['disable'] = True
         super().__init__(*args, **kwargs)
+
+
+class LocalHTTPServer:
+    """
+    A local stand-in for the IP2Location download server. It serves a single payload on every path, supports HEAD and
+    range requests (validated with ``If-Range``) and can drop the connection part way through a response to simulate a
+    flaky link. Use it as a context manager; the headers of every request it receives are recorded in `requests`.
+    """
+    def __init__(self, payload: bytes, etag='"v1"', last_modified='Mon, 02 Oct 2023 00:00:00 GMT', accept_ranges=True, fail_after=None, fail_times=1):
+        """
+        @param payload - the bytes to serve
+        @param etag - the ETag header to send (None to omit it)
+        @param last_modified - the Last-Modified header to send (None to omit it)
+        @param accept_ranges - whether range requests are honoured
+        @param fail_after - drop the connection after sending this many body bytes (None to never drop it)
+        @param fail_times - the number of responses to drop
+        """
+        self.payload = payload
+        self.etag = etag
+        self.last_modified = last_modified
+        self.accept_ranges = accept_ranges
+        self.fail_after = fail_after
+        self.fail_times = fail_times
+        self.requests = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/download'.format(self._server.server_address[1])
+
+    def __enter__(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _should_fail(self):
+        with self._lock:
+            if self.fail_after is None or self.fail_times <= 0:
+                return False
+            self.fail_times -= 1
+            return True
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _range(self):
+                range_header = self.headers.get('Range')
+                if not server.accept_ranges or not range_header or not range_header.startswith('bytes='):
+                    return None
+                if_range = self.headers.get('If-Range')
+                if if_range and if_range not in (server.etag, server.last_modified):
+                    return None
+                start, end = range_header[len('bytes='):].split('-')
+                end = int(end) if end else len(server.payload) - 1
+                return int(start), min(end, len(server.payload) - 1)
+
+            def _respond(self, send_body):
+                server.requests.append(dict(self.headers))
+                byte_range = self._range()
+                if byte_range and byte_range[0] >= len(server.payload):
+                    self.send_response(416)
+                    self.send_header('Content-Range', 'bytes */{}'.format(len(server.payload)))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if byte_range:
+                    start, end = byte_range
+                    body = server.payload[start:end + 1]
+                    self.send_response(206)
+                    self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, end, len(server.payload)))
+                else:
+                    body = server.payload
+                    self.send_response(200)
+                if server.accept_ranges:
+                    self.send_header('Accept-Ranges', 'bytes')
+                if server.etag:
+                    self.send_header('ETag', server.etag)
+                if server.last_modified:
+                    self.send_header('Last-Modified', server.last_modified)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if not send_body:
+                    return
+                if server._should_fail():
+                    self.wfile.write(body[:server.fail_after])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond(True)
+
+            def do_HEAD(self):
+                self._respond(False)
+
+        return Handler
+
+
+def build_bin_file(path, db_type=1, ipv4_rows=(), ipv6_rows=(), product_code=1, date=(23, 9, 1), index=False, padding=0):
+    """
+    Write a small IP2Location-format BIN database file.
+    @param path - the path of the file to write
+    @param db_type - the database type (the number in DB11, PX11...)
+    @param ipv4_rows - a sorted list of (ip_from, record) tuples for the IPv4 section, the last range ending at the last IPv4 address
+    @param ipv6_rows - a sorted list of (ip_from, record) tuples for the IPv6 section
+    @param product_code - 1 for IP2Location, 2 for IP2Proxy
+    @param date - the (year since 2000, month, day) release date
+    @param index - whether to write the first-level index of each section
+    @param padding - the number of bytes left between the header and the sections (to write sections that are not 4-byte aligned)
+    @return None
+    """
+    import struct
+    from bisect import bisect_right
+    from ip2location_toolkit.reader.fields import COUNTRY, FLOAT, get_fields
+
+    fields = get_fields({1: 'ip2location', 2: 'ip2proxy'}[product_code], db_type)
+    column_count = max(column for _, column, _ in fields)
+    ipv4_row_size = column_count * 4
+    ipv6_row_size = 16 + (column_count - 1) * 4
+    ipv4_count = len(ipv4_rows) + 1 if ipv4_rows else 0
+    ipv6_count = len(ipv6_rows) + 1 if ipv6_rows else 0
+    ipv4_index_base = ipv6_index_base = 0
+    ipv4_base = 64 + padding
+    if index and ipv4_rows:
+        ipv4_index_base, ipv4_base = ipv4_base, ipv4_base + 65536 * 8
+    if index and ipv6_rows:
+        ipv6_index_base, ipv4_base = ipv4_base, ipv4_base + 65536 * 8
+    ipv6_base = ipv4_base + ipv4_count * ipv4_row_size
+    strings = bytearray()
+    strings_base = ipv6_base + ipv6_count * ipv6_row_size
+    pointers = {}
+
+    def pointer(value, country=False):
+        key = (value, country)
+        if key not in pointers:
+            pointers[key] = strings_base + len(strings)
+            if country:
+                short, long = value
+                strings.extend(bytes([len(short)]) + short.encode().ljust(2, b'\x00'))
+                strings.extend(bytes([len(long.encode())]) + long.encode())
+            else:
+                strings.extend(bytes([len(value.encode())]) + value.encode())
+        return pointers[key]
+
+    def row(ip_from, record, ipv6):
+        columns = [0] * (column_count - 1)
+        for name, column, kind in fields:
+            if kind == COUNTRY:
+                columns[column - 2] = pointer((record['country_short'], record['country_long']), True)
+            elif kind == FLOAT:
+                columns[column - 2] = struct.unpack('<I', struct.pack('<f', record[name]))[0]
+            else:
+                columns[column - 2] = pointer(record[name])
+        ip_column = struct.pack('<QQ', ip_from & (2 ** 64 - 1), ip_from >> 64) if ipv6 else struct.pack('<I', ip_from)
+        return ip_column + struct.pack('<{}I'.format(column_count - 1), *columns)
+
+    ipv4_data = b''.join(row(ip_from, record, False) for ip_from, record in ipv4_rows)
+    if ipv4_rows:
+        ipv4_data += struct.pack('<I', 2 ** 32 - 1) + b'\x00' * (ipv4_row_size - 4)
+    ipv6_data = b''.join(row(ip_from, record, True) for ip_from, record in ipv6_rows)
+    if ipv6_rows:
+        ipv6_data += b'\xff' * 16 + b'\x00' * (ipv6_row_size - 16)
+
+    def build_index(rows, shift):
+        # The rows containing the first and the last address of each prefix.
+        ip_froms = [ip_from for ip_from, _ in rows]
+        entries = []
+        for prefix in range(65536):
+            low = bisect_right(ip_froms, prefix << shift) - 1
+            high = bisect_right(ip_froms, ((prefix + 1) << shift) - 1) - 1
+            entries.append(struct.pack('<II', max(low, 0), max(high, 0)))
+        return b''.join(entries)
+
+    indexes = b''
+    if ipv4_index_base:
+        indexes += build_index(ipv4_rows, 16)
+    if ipv6_index_base:
+        indexes += build_index(ipv6_rows, 112)
+
+    header = struct.pack('<5B6IB', db_type, column_count, date[0], date[1], date[2], ipv4_count, ipv4_base + 1, ipv6_count, ipv6_base + 1 if ipv6_rows else 0, ipv4_index_base + 1 if ipv4_index_base else 0, ipv6_index_base + 1 if ipv6_index_base else 0, product_code)
+    with open(path, 'wb') as file:
+        file.write(header.ljust(64 + padding, b'\x00') + indexes + ipv4_data + ipv6_data + strings)